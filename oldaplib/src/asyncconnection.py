@@ -0,0 +1,625 @@
+"""
+# AsyncConnection
+
+Asyncio implementation of the connection to the triple store. All methods that talk to the triple store are
+coroutines and use a non-blocking HTTP client (httpx) with a pool of keep-alive connections. Independent
+queries can therefore run concurrently on one event loop, e.g.:
+
+```python
+con = await AsyncConnection.create(userId="rosenth", credentials="RioGrande")
+shacl_version, onto_version = await asyncio.gather(con.query(q1), con.query(q2))
+```
+
+Since the constructor cannot await, an AsyncConnection is created with the coroutine `AsyncConnection.create()`,
+which performs the login (or the verification of the token).
+
+_Note_: The object model (`Project`, `DataModel`, `ResourceClass` etc.) calls the connection synchronously and
+requires a `Connection` instance. The AsyncConnection is intended for asynchronous web backends that issue
+their SPARQL queries directly.
+"""
+import asyncio
+import logging
+import os
+import weakref
+from pathlib import Path
+from typing import Optional, Any, Dict, Self, AsyncIterator
+
+import httpx
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.enums.adminpermissions import AdminPermission
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.context import Context, DEFAULT_CONTEXT
+from oldaplib.src.helpers.irincname import IriOrNCName
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorNoPermission
+from oldaplib.src.helpers.json_stream import SparqlJsonStreamParser
+from oldaplib.src.helpers.login_cache import LoginCache
+from oldaplib.src.helpers.query_cache import QueryResultCache, query_graphs, update_graphs, merge_graphs, Graphs
+from oldaplib.src.helpers.query_processor import QueryProcessor, RowType
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.helpers.session_store import SessionStore
+from oldaplib.src.helpers.sparql_prologue import prune_prefixes
+from oldaplib.src.helpers.sparql_result_table import decode_query_result
+from oldaplib.src.iconnection import IConnection
+from oldaplib.src.userdataclass import UserData
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+from oldaplib.src.xsd.xsd_string import Xsd_string
+
+#
+# One pool of httpx clients per event loop (an AsyncClient must not be shared between event loops)
+#
+_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]] = weakref.WeakKeyDictionary()
+
+
+def _client(server: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    key = SessionPool.host_key(server)
+    client = clients.get(key)
+    if client is None or client.is_closed:
+        maxsize = SessionPool().pool_maxsize
+        client = httpx.AsyncClient(limits=httpx.Limits(max_connections=maxsize,
+                                                       max_keepalive_connections=maxsize),
+                                   timeout=httpx.Timeout(float(os.getenv("OLDAP_HTTP_TIMEOUT", "60"))))
+        clients[key] = client
+    return client
+
+
+async def close_clients() -> None:
+    """
+    Closes all HTTP clients of the running event loop. Should be called before the event loop is shut down.
+
+    :return: None
+    """
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+async def _none() -> None:
+    return None
+
+
+class AsyncConnection(IConnection):
+    """
+    Asynchronous connection to a triple store (GraphDB/RDF4J protocol). The methods have the same semantics
+    as the methods of ~Connection, but are coroutines:
+
+    - _query(query: str, format: SparqlResultFormat)_, _query_stream(query: str, context: Context)_
+    - _update_query(query: str)_
+    - _transaction_start()_, _transaction_query(query, result_format)_, _transaction_update(query)_,
+      _transaction_commit()_, _transaction_abort()_
+    - _clear_graph(graph_iri)_, _clear_repo()_, _upload_turtle(filename, graphname)_, _graph_exists(graph)_
+
+    Use the coroutine `AsyncConnection.create(...)` to create a logged-in instance.
+    """
+    _server: str
+    _repo: str
+    _dbuser: str
+    _dbpassword: str
+    _query_url: str
+    _update_url: str
+    _transaction_graphs: Graphs
+    _prune_prefixes: bool
+    __jwtkey: str
+
+    def __init__(self, *,
+                 server: Optional[str] = None,
+                 repo: Optional[str] = None,
+                 dbuser: Optional[str] = None,
+                 dbpassword: Optional[str] = None,
+                 context_name: Optional[str] = DEFAULT_CONTEXT) -> None:
+        """
+        Constructor that sets the connection parameters. It does not log in, use the coroutine `create()`.
+
+        :param server: URL of the server (including port information if necessary)
+        :type server: str
+        :param repo: Name of the triple store repository on the server
+        :type repo: str
+        :param dbuser: User for the triple store (if it is protected)
+        :type dbuser: str
+        :param dbpassword: Password for the triple store (if it is protected)
+        :type dbpassword: str
+        :param context_name: A name of the Context to be used (see ~Context).
+        :type context_name: Optional[str]
+        """
+        super().__init__(context_name=context_name)
+        self.__jwtkey = os.getenv("OLDAP_JWT_SECRET", "You have to change this!!! +D&RWG+")
+        self._server = server or os.getenv("OLDAP_TS_SERVER", "http://localhost:7200")
+        self._repo = repo or os.getenv("OLDAP_TS_REPO", "oldap")
+        self._dbuser = dbuser or os.getenv("OLDAP_TS_USER", "")
+        self._dbpassword = dbpassword or os.getenv("OLDAP_TS_PASSWORD", "")
+        self._query_url = f'{self._server}/repositories/{self._repo}'
+        self._update_url = f'{self._server}/repositories/{self._repo}/statements'
+        self._transaction_graphs = frozenset()
+        self._prune_prefixes = os.getenv("OLDAP_PRUNE_PREFIXES", "true").lower() in ("1", "true", "yes")
+
+    @classmethod
+    async def create(cls, *,
+                     server: Optional[str] = None,
+                     repo: Optional[str] = None,
+                     userId: Optional[str | Xsd_NCName] = None,
+                     credentials: Optional[str | Xsd_string] = None,
+                     token: Optional[str] = None,
+                     dbuser: Optional[str] = None,
+                     dbpassword: Optional[str] = None,
+                     context_name: Optional[str] = DEFAULT_CONTEXT) -> Self:
+        """
+        Creates a connection and logs in, either with userId/credentials or with a token (see ~Connection).
+
+        :return: The logged-in connection
+        :rtype: AsyncConnection
+        :raises OldapError: Wrong credentials or token, or the triple store cannot be reached
+        :raises OldapErrorNotFound: The user does not exist
+        """
+        instance = cls(server=server, repo=repo, dbuser=dbuser, dbpassword=dbpassword, context_name=context_name)
+        if token is not None:
+            # the verification may need Redis (compact tokens), the loader runs the queries on this event loop
+            loop = asyncio.get_running_loop()
+
+            def loader(userIri: str) -> UserData:
+                return asyncio.run_coroutine_threadsafe(instance._read_userdata(userIri), loop).result()
+
+            instance._userdata = await asyncio.to_thread(Connection._userdata_from_token, token, instance.__jwtkey,
+                                                         loader)
+            instance._token = token
+        else:
+            await instance._login(userId=userId, credentials=credentials)
+        return instance
+
+    async def _login(self, userId: Optional[str | Xsd_NCName] = None,
+                    credentials: Optional[str | Xsd_string] = None) -> None:
+        """
+        Logs in the given user. The queries for the project prefixes and the user data are
+        sent concurrently, unless they are answered by the ~LoginCache.
+
+        :param userId: The user id. If userId and credentials are omitted, the user "unknown" is used
+        :type userId: Optional[str | Xsd_NCName]
+        :param credentials: The credentials
+        :type credentials: Optional[str | Xsd_string]
+        :return: None
+        :raises OldapError: Wrong credentials, or the triple store cannot be reached
+        :raises OldapErrorNotFound: The user does not exist
+        """
+        logger = logging.getLogger(__name__)
+        if userId is None and credentials is None:
+            userId = Xsd_NCName("unknown", validate=False)
+        if not isinstance(userId, Xsd_NCName):
+            userId = Xsd_NCName(userId)
+
+        context = Context(name=self._context_name)
+        login_cache = LoginCache()
+        prefixes = login_cache.get_prefixes(self._server, self._repo)
+        userdata = await asyncio.to_thread(login_cache.get_userdata, self._server, self._repo, userId)
+        projects_json, user_json = await asyncio.gather(
+            self._login_query(Connection._projects_sparql(context)) if prefixes is None else _none(),
+            self._login_query(UserData.sparql_query(context=context, userId=userId)) if userdata is None else _none())
+        if prefixes is None:
+            prefixes = [(r['sname'], r['ns']) for r in QueryProcessor(context=context, query_result=projects_json)]
+            login_cache.set_prefixes(self._server, self._repo, prefixes)
+        for sname, ns in prefixes:
+            context[sname] = ns
+        if userdata is None:
+            userdata = UserData.from_query(QueryProcessor(context=context, query_result=user_json))
+            await asyncio.to_thread(login_cache.set_userdata, self._server, self._repo, userdata)
+        await asyncio.to_thread(Connection._check_credentials, userdata, userId, credentials)  # bcrypt is slow
+        self._userdata = userdata
+        self._token = Connection._issue_token(userdata, self.__jwtkey)
+        logger.info(f'Async connection established. User "{str(self._userdata.userId)}".')
+
+    async def _read_userdata(self, userIri: str) -> UserData:
+        """
+        Reads the UserData of a user from the triple store (used to resolve compact tokens).
+
+        :param userIri: The IRI of the user
+        :type userIri: str
+        :return: The UserData
+        :rtype: UserData
+        :raises OldapErrorNotFound: If the user does not exist
+        """
+        context = Context(name=self._context_name)
+        login_cache = LoginCache()
+        prefixes = login_cache.get_prefixes(self._server, self._repo)
+        if prefixes is None:
+            projects_json = await self._login_query(Connection._projects_sparql(context))
+            prefixes = [(r['sname'], r['ns']) for r in QueryProcessor(context=context, query_result=projects_json)]
+            login_cache.set_prefixes(self._server, self._repo, prefixes)
+        for sname, ns in prefixes:
+            context[sname] = ns
+        user_json = await self._login_query(UserData.sparql_query(context=context, userId=IriOrNCName(userIri)))
+        return UserData.from_query(QueryProcessor(context=context, query_result=user_json))
+
+    async def _login_query(self, sparql: str) -> Dict:
+        logger = logging.getLogger(__name__)
+        res = await self._client.post(self._query_url,
+                                      headers={
+                                          "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+                                          "Accept": "application/x-sparqlstar-results+json, application/sparql-results+json;q=0.9, */*;q=0.8",
+                                      },
+                                      data={'query': sparql},
+                                      auth=self._auth)
+        if res.status_code != 200:
+            logger.error(f"Could not connect to triplestore: {res.text}")
+            raise OldapError(res.status_code, res.text)
+        return res.json()
+
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        return _client(self._server)
+
+    @property
+    def _auth(self) -> httpx.BasicAuth | None:
+        return httpx.BasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
+
+    @property
+    def jwtkey(self) -> str:
+        """Getter for the JWT token"""
+        return self.__jwtkey
+
+    @property
+    def server(self) -> str:
+        """Getter for server string"""
+        return self._server
+
+    @property
+    def repo(self) -> str:
+        """Getter for repository name"""
+        return self._repo
+
+    @property
+    def cache_scope(self) -> str:
+        """Scope of the cache: "<server>/<repo>" (see ~CacheKeyspace)"""
+        return f'{self._server}/{self._repo}'
+
+    def _check_root(self) -> None:
+        logger = logging.getLogger(__name__)
+        if not self._userdata:
+            logger.error("Connection with no permission to clear graph.")
+            raise OldapErrorNoPermission("No permission")
+        sysperms = self._userdata.inProject.get(Xsd_QName('oldap:SystemProject'))
+        if not sysperms or AdminPermission.ADMIN_OLDAP not in sysperms:
+            raise OldapErrorNoPermission("No permission")
+
+    async def graph_exists(self, graph: Xsd_QName) -> bool:
+        """
+        Checks if the given RDF graph exists.
+
+        :param graph: RDF graph name as QName. The prefix must be defined
+        :return: True if the graph exists, False otherwise
+        """
+        context = Context(name=self._context_name)
+        sparql = context.sparql_context
+        sparql += f"""
+        ASK {{
+            GRAPH {graph.toRdf} {{
+                ?s ?p ?o
+            }}
+        }}
+        """
+        result = await self.query(sparql)
+        return bool(result['boolean'])
+
+    async def clear_graph(self, graph_iri: Xsd_QName) -> None:
+        """
+        Clears (deletes) the given RDF graph. Requires the ADMIN_OLDAP permission.
+
+        :param graph_iri: RDF graph name as QName. The prefix must be defined in the context.
+        :type graph_iri: Xsd_QName
+        :return: None
+        :raises OldapErrorNoPermission: If the user lacks the required permission.
+        :raises OldapError: If the SPARQL update operation fails.
+        """
+        logger = logging.getLogger(__name__)
+        self._check_root()
+        context = Context(name=self._context_name)
+        res = await self._client.post(self._update_url,
+                                      headers={
+                                          "Content-Type": "application/sparql-update",
+                                          "Accept": "application/json, text/plain, */*",
+                                      },
+                                      content=f"CLEAR GRAPH <{context.qname2iri(graph_iri)}>",
+                                      auth=self._auth)
+        if not res.is_success:
+            logger.error(f'Clearing of graph "{graph_iri}" failed: {res.text}')
+            raise OldapError(res.text)
+        QueryResultCache().invalidate(self._server, self._repo, frozenset({str(context.qname2iri(graph_iri))}))
+        LoginCache().clear()
+        await asyncio.to_thread(SessionStore().bump)
+        await asyncio.to_thread(Connection._invalidate_object_cache, self, graph_iri)
+        logger.info(f'Graph "{graph_iri}" cleared.')
+
+    async def clear_repo(self) -> None:
+        """
+        Deletes the complete repository ("CLEAR ALL"). Use with extreme caution!
+
+        :return: None
+        """
+        res = await self._client.post(self._update_url,
+                                      headers={"Accept": "application/json, text/plain, */*"},
+                                      data={"update": "CLEAR ALL"},
+                                      auth=self._auth)
+        if not res.is_success:
+            raise OldapError(res.text)
+        QueryResultCache().invalidate(self._server, self._repo, None)
+        LoginCache().clear()
+        await asyncio.to_thread(SessionStore().bump)
+        await asyncio.to_thread(Connection._invalidate_object_cache, self, None)
+
+    async def upload_turtle(self, filename: str, graphname: Optional[str] = None) -> None:
+        """
+        Upload a TTL/TRiG file using the RDF4J /statements endpoint. The file is streamed in chunks.
+
+        :param filename: Path of the file (extension ".ttl" or ".trig")
+        :param graphname: Optional graph IRI all triples are loaded into
+        :return: None
+        """
+        logger = logging.getLogger(__name__)
+        ext = Path(filename).suffix.lower()
+        if ext == ".ttl":
+            mime = "text/turtle"
+        elif ext == ".trig":
+            mime = "application/trig"
+        else:
+            raise OldapError(f"Unsupported RDF extension: {ext}")
+        params = {"context": f"<{graphname}>"} if graphname else {}
+
+        async def chunks() -> AsyncIterator[bytes]:
+            with open(filename, "rb") as f:
+                while chunk := await asyncio.to_thread(f.read, 1 << 20):
+                    yield chunk
+
+        res = await self._client.post(self._update_url,
+                                      params=params,
+                                      headers={"Content-Type": mime, "Accept": "text/plain"},
+                                      content=chunks(),
+                                      auth=self._auth)
+        if not res.is_success:
+            logger.error(f'Upload of file "{filename}" failed: {res.status_code} {res.text}')
+            raise OldapError(res.text)
+        QueryResultCache().invalidate(self._server, self._repo, frozenset({graphname}) if graphname else None)
+        LoginCache().clear()
+        await asyncio.to_thread(SessionStore().bump)
+        graph = Context(name=self._context_name).iri2qname(graphname, validate=False) if graphname else None
+        await asyncio.to_thread(Connection._invalidate_object_cache, self, graph)
+        logger.info(f'File "{filename}" uploaded via /statements.')
+
+    async def query(self, query: str, format: SparqlResultFormat = SparqlResultFormat.AUTO) -> Any:
+        """
+        Send a SPARQL-query and return the result. The result may be nested dict (in case of JSON), a
+        ~SparqlResultTable (in case of TSV or the binary format) or a text. By default, the cheapest result
+        format supported by the triple store is negotiated (see ~SparqlResultFormat.AUTO).
+        If the ~QueryResultCache is enabled, results are answered from the cache if possible.
+
+        :param query: SPARQL query as string
+        :type query: str
+        :param format: The format desired (see ~SparqlResultFormat)
+        :type format: SparqlResultFormat
+        :return: Query results
+        :rtype: Any
+        :raises OldapError: Raised if not logged in or if there is an issue with the query execution.
+        """
+        logger = logging.getLogger(__name__)
+        if not self._userdata:
+            logger.error("Not a valid user session.")
+            raise OldapError("No login")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        cache = QueryResultCache()
+        key = None
+        if cache.enabled and format in QueryResultCache.FORMATS:
+            key = cache.key(self._server, self._repo, self._userdata.userIri, format, query)
+            hit = cache.get(key)
+            if hit is not None:
+                return hit.decode(format)
+            generation = cache.generation
+        res = await self._client.post(self._query_url,
+                                      headers={
+                                          "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+                                          "Accept": format.value,
+                                      },
+                                      data={'query': query},
+                                      auth=self._auth)
+        if res.status_code == 200:
+            if key is not None:
+                cache.put(key, res.headers.get('Content-Type', ''), res.content, query_graphs(query), generation)
+            return AsyncConnection._decode(res, format)
+        logger.error(f"SPARQL query failed: {res.text}")
+        raise OldapError(res.text)
+
+    async def query_stream(self, query: str, context: Context) -> AsyncIterator[RowType]:
+        """
+        Sends a SPARQL SELECT query and returns an asynchronous generator of the result rows. The response
+        is parsed incrementally while the bytes arrive (see ~SparqlJsonStreamParser):
+
+        ```python
+        async for row in await con.query_stream(sparql, context):
+            ...
+        ```
+
+        :param query: SPARQL SELECT query
+        :type query: str
+        :param context: The context used to convert the IRIs of the result into QNames
+        :type context: Context
+        :return: Asynchronous generator of rows
+        :rtype: AsyncIterator[RowType]
+        :raises OldapError: Raised if not logged in or if the query fails.
+        """
+        logger = logging.getLogger(__name__)
+        if not self._userdata:
+            logger.error("Not a valid user session.")
+            raise OldapError("No login")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        request = self._client.build_request("POST", self._query_url,
+                                             headers={
+                                                 "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+                                                 "Accept": SparqlResultFormat.JSON.value,
+                                             },
+                                             data={'query': query})
+        res = await self._client.send(request, auth=self._auth, stream=True)
+        if res.status_code != 200:
+            await res.aread()
+            await res.aclose()
+            logger.error(f"SPARQL query failed: {res.text}")
+            raise OldapError(res.text)
+
+        async def rows() -> AsyncIterator[RowType]:
+            try:
+                parser = SparqlJsonStreamParser()
+                async for chunk in res.aiter_bytes():
+                    for binding in parser.feed(chunk):
+                        yield QueryProcessor.row_from_binding(context, binding)
+                for binding in parser.close():
+                    yield QueryProcessor.row_from_binding(context, binding)
+            finally:
+                await res.aclose()
+
+        return rows()
+
+    async def update_query(self, query: str) -> Dict[str, str]:
+        """
+        Sends an SPARQL UPDATE query to the triple store.
+
+        :param query: The SPARQL UPDATE query
+        :type query: str
+        :raises OldapError: If user authentication is missing or the SPARQL UPDATE execution fails.
+        """
+        logger = logging.getLogger(__name__)
+        if not self._userdata:
+            logger.error("Not a valid user session.")
+            raise OldapError("No login")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        res = await self._client.post(self._update_url,
+                                      headers={"Accept": "*/*"},
+                                      data={"update": query},
+                                      auth=self._auth)
+        if not res.is_success:
+            logger.error(f"SPARQL update query failed: {res.text}")
+            raise OldapError(f'Update query failed. Reason: "{res.text}"')
+        QueryResultCache().invalidate_update(self._server, self._repo, query)
+
+    async def transaction_start(self) -> None:
+        """
+        Starts a new transaction.
+
+        :raises OldapError: If the user is not logged in or the transaction cannot be started.
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        res = await self._client.post(f"{self._server}/repositories/{self._repo}/transactions",
+                                      headers={"Accept": "*/*"},
+                                      auth=self._auth)
+        if res.headers.get('location') is None:
+            raise OldapError('GraphDB start of transaction failed')
+        self._transaction_url = res.headers['location']
+        self._transaction_graphs = frozenset()
+
+    async def transaction_query(self, query: str, result_format: SparqlResultFormat = SparqlResultFormat.AUTO) -> Any:
+        """
+        Executes a SPARQL query within the running transaction.
+
+        :param query: The SPARQL query
+        :type query: str
+        :param result_format: The expected format of the SPARQL query result.
+        :type result_format: SparqlResultFormat
+        :return: The query result in the specified format.
+        :raises OldapError: If no user is logged in, no transaction is started, or the query fails.
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        if self._transaction_url is None:
+            raise OldapError("No GraphDB transaction started")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        res = await self._client.post(self._transaction_url,
+                                      headers={
+                                          "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+                                          "Accept": result_format.value
+                                      },
+                                      data={'action': 'QUERY', 'query': query},
+                                      auth=self._auth)
+        if not res.is_success:
+            raise OldapError(f'GraphDB Transaction query failed. Reason: "{res.text}"')
+        return AsyncConnection._decode(res, result_format)
+
+    async def transaction_update(self, query: str) -> None:
+        """
+        Executes a SPARQL update within the running transaction.
+
+        :param query: The SPARQL update
+        :type query: str
+        :raises OldapError: If no user is logged in, no transaction is started, or the update fails.
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        if self._transaction_url is None:
+            raise OldapError("No GraphDB transaction started")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        res = await self._client.post(self._transaction_url,
+                                      headers={
+                                          "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+                                          "Accept": "*/*"
+                                      },
+                                      data={'action': 'UPDATE', 'update': query},
+                                      auth=self._auth)
+        if not res.is_success:
+            raise OldapError(f'GraphDB Transaction update failed. Reason: "{res.text}"')
+        if QueryResultCache().enabled:
+            self._transaction_graphs = merge_graphs(self._transaction_graphs, update_graphs(query))
+
+    async def transaction_commit(self) -> None:
+        """
+        Commits the running transaction.
+
+        :raises OldapError: If no user is logged in, no transaction is started, or the commit fails.
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        if self._transaction_url is None:
+            raise OldapError("No GraphDB transaction started")
+        res = await self._client.put(self._transaction_url,
+                                     params={'action': 'COMMIT'},
+                                     headers={"Accept": "*/*"},
+                                     auth=self._auth)
+        if not res.is_success:
+            raise OldapError(f'GraphDB transaction commit failed. Reason: "{res.text}"')
+        self._transaction_url = None
+        if self._transaction_graphs != frozenset():
+            QueryResultCache().invalidate(self._server, self._repo, self._transaction_graphs)
+        self._transaction_graphs = frozenset()
+
+    async def transaction_abort(self) -> None:
+        """
+        Aborts the running transaction.
+
+        :raises OldapError: If no user is logged in, no transaction is started, or the abort fails.
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        if self._transaction_url is None:
+            raise OldapError("No GraphDB transaction started")
+        res = await self._client.delete(self._transaction_url, headers={"Accept": "*/*"}, auth=self._auth)
+        if not res.is_success:
+            raise OldapError(f'GraphDB transaction abort failed. Reason: "{res.text}"')
+        self._transaction_url = None
+        self._transaction_graphs = frozenset()
+
+    def in_transaction(self) -> bool:
+        """
+        Determines if a transaction is running.
+
+        :return: True if in a transaction, False otherwise
+        :rtype: bool
+        """
+        return self._transaction_url is not None
+
+    @staticmethod
+    def _decode(res: httpx.Response, format: SparqlResultFormat) -> Any:
+        if format in (SparqlResultFormat.TSV, SparqlResultFormat.BINARY, SparqlResultFormat.AUTO):
+            return decode_query_result(res.headers.get('Content-Type', ''), res.content)
+        if format in (SparqlResultFormat.JSON, SparqlResultFormat.JSONLD):
+            return res.json()
+        return res.text
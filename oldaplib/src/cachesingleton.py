@@ -1,12 +1,21 @@
-import json
 import os
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
 from copy import deepcopy
 from threading import Lock
-from typing import Any
+from typing import Any, Iterable
 
 import redis
 
-from oldaplib.src.helpers.serializer import serializer
+from oldaplib.src.helpers import cache_codec
+from oldaplib.src.helpers.cache_codec import CacheCodec, get_codec, JSON_CODEC
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, REDIS
+from oldaplib.src.helpers.cache_namespace import CacheKey, CacheKeyspace, namespace_of
+from oldaplib.src.helpers.cache_policy import CacheFamily, CachePolicies, CachePolicy, Eviction, family_of
+from oldaplib.src.helpers.near_cache import NearCache
+from oldaplib.src.helpers.oldaperror import OldapErrorInconsistency
 from oldaplib.src.helpers.singletonmeta import SingletonMeta
 from oldaplib.src.iconnection import IConnection
 from oldaplib.src.xsd.iri import Iri
@@ -14,6 +23,114 @@ from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
 from oldaplib.src.xsd.xsd_qname import Xsd_QName
 
 
+class _Entry:
+    """
+    A snapshot in the CacheSingleton with its bookkeeping. The size is only computed if the family is bounded
+    by bytes (None otherwise).
+    """
+    __slots__ = ('value', 'family', 'size', 'expires', 'accesses')
+
+    def __init__(self, value: Any, family: CacheFamily, size: int | None, expires: float | None) -> None:
+        self.value = value
+        self.family = family
+        self.size = size
+        self.expires = expires
+        self.accesses = 0
+
+
+def _size_of(value: Any) -> int:
+    try:
+        return len(JSON_CODEC.encode(value))
+    except (TypeError, ValueError, AttributeError):
+        return sys.getsizeof(value)
+
+
+class _Family:
+    """
+    The entries of one family in the order of eviction: for LRU an ordered dict (least recently used first),
+    for LFU one ordered dict per number of accesses (least recently used first) and the lowest number of
+    accesses. Adding, touching and evicting an entry are O(1); only if the entries with the fewest accesses
+    have all been removed, the next lowest number is searched among the numbers of accesses.
+    """
+    __slots__ = ('eviction', 'entries', 'buckets', 'min_accesses', 'bytes', 'unsized')
+    eviction: Eviction
+    entries: OrderedDict[Iri | Xsd_NCName, _Entry]
+    buckets: dict[int, OrderedDict[Iri | Xsd_NCName, None]]
+    min_accesses: int
+    bytes: int
+    unsized: int
+
+    def __init__(self, eviction: Eviction) -> None:
+        self.eviction = eviction
+        self.entries = OrderedDict()
+        self.buckets = {}
+        self.min_accesses = 0
+        self.bytes = 0
+        self.unsized = 0
+
+    def add(self, key: Iri | Xsd_NCName, entry: _Entry) -> None:
+        self.entries[key] = entry
+        if entry.size is None:
+            self.unsized += 1
+        else:
+            self.bytes += entry.size
+        if self.eviction == Eviction.LFU:
+            self.buckets.setdefault(entry.accesses, OrderedDict())[key] = None
+            if len(self.entries) == 1 or entry.accesses < self.min_accesses:
+                self.min_accesses = entry.accesses
+
+    def remove(self, key: Iri | Xsd_NCName) -> _Entry:
+        entry = self.entries.pop(key)
+        if entry.size is None:
+            self.unsized -= 1
+        else:
+            self.bytes -= entry.size
+        if self.eviction == Eviction.LFU:
+            bucket = self.buckets[entry.accesses]
+            del bucket[key]
+            if not bucket:
+                del self.buckets[entry.accesses]
+        return entry
+
+    def touch(self, key: Iri | Xsd_NCName, entry: _Entry) -> None:
+        if self.eviction == Eviction.LFU:
+            bucket = self.buckets[entry.accesses]
+            del bucket[key]
+            if not bucket:
+                del self.buckets[entry.accesses]
+                if self.min_accesses == entry.accesses:
+                    self.min_accesses += 1
+            entry.accesses += 1
+            self.buckets.setdefault(entry.accesses, OrderedDict())[key] = None
+        else:
+            entry.accesses += 1
+            self.entries.move_to_end(key)
+
+    def victim(self) -> Iri | Xsd_NCName | None:
+        """
+        Returns the key to evict next, or None if the family is empty.
+        """
+        if self.eviction == Eviction.LFU:
+            if self.min_accesses not in self.buckets:
+                if not self.buckets:
+                    return None
+                self.min_accesses = min(self.buckets)  # after a removal of the last entry with the fewest accesses
+            return next(iter(self.buckets[self.min_accesses]))
+        return next(iter(self.entries), None)
+
+    def size(self) -> int:
+        """
+        Returns the total size of the entries, computing the sizes not yet known.
+        """
+        if self.unsized:
+            for entry in self.entries.values():
+                if entry.size is None:
+                    entry.size = _size_of(entry.value)
+                    self.bytes += entry.size
+            self.unsized = 0
+        return self.bytes
+
+
 class CacheSingleton(metaclass=SingletonMeta):
     """
     Singleton class for thread-safe caching.
@@ -23,40 +140,270 @@ class CacheSingleton(metaclass=SingletonMeta):
     metaclass. The cache allows storing, retrieving, deleting, and clearing
     key-value pairs in a thread-safe manner.
 
-    :ivar _lock: Lock object ensuring thread-safe access to the cache.
+    The cache stores a private deep copy of each value (a snapshot) that is never
+    modified afterward. Readers therefore do not need the lock: `get_snapshot()`
+    returns the shared snapshot in O(1), `get()` returns a private deep copy of it.
+    Only writers serialize on the lock.
+
+    The entries are bounded per family of values (data models, classes, users, projects,
+    lists, ...) by the ~CachePolicy of the family: number of entries, size of the
+    serialized values, time to live, and LRU or LFU eviction. The evictions happen when
+    a value is set, expired entries are removed when they are read or evicted. `stats()`
+    reports entries, bytes and counters per family.
+
+    The readers record their accesses in a bounded buffer, which is applied to the eviction
+    order of the families by the next writer (or by a reader that finds the buffer full and
+    the lock free). The sizes of the values are only computed for families bounded by bytes.
+
+    :ivar _lock: Lock object serializing the writers.
     :type _lock: Lock
     :ivar _cache: Internal dictionary used for storing the cache data.
-    :type _cache: dict[Iri | Xsd_NCName, Any]
+    :type _cache: dict[Iri | Xsd_NCName, _Entry]
     """
     _lock: Lock
-    _cache: dict[Iri | Xsd_NCName, Any]
+    _cache: dict[Iri | Xsd_NCName, _Entry]
+    _families: dict[CacheFamily, _Family]
+    _accesses: deque[tuple[Iri | Xsd_NCName, _Entry]]
+    _stats: dict[CacheFamily, dict[str, int]]
+
+    ACCESS_BUFFER_SIZE = 1024
 
     def __init__(self):
         self._lock = Lock()
         self._cache = {}
+        self._families = {}
+        self._accesses = deque(maxlen=CacheSingleton.ACCESS_BUFFER_SIZE)
+        self._stats = {}
 
     def __str__(self) -> str:
-        with self._lock:
-            return str(self._cache)
+        return str({key: entry.value for key, entry in self._cache.items()})
+
+    def _counter(self, family: CacheFamily) -> dict[str, int]:
+        counter = self._stats.get(family)
+        if counter is None:
+            counter = self._stats.setdefault(family, {'hits': 0, 'evictions': 0, 'expirations': 0})
+        return counter
+
+    def _family(self, family: CacheFamily, policy: CachePolicy) -> _Family:
+        entries = self._families.get(family)
+        if entries is None:
+            entries = self._families[family] = _Family(policy.eviction)
+        elif entries.eviction != policy.eviction:
+            # the policy has been changed: rebuild the eviction order once
+            old, entries = entries, _Family(policy.eviction)
+            for key, entry in old.entries.items():
+                entries.add(key, entry)
+            self._families[family] = entries
+        return entries
+
+    def _remove(self, key: Iri | Xsd_NCName) -> _Entry | None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._families[entry.family].remove(key)
+        return entry
+
+    def _apply_accesses(self) -> None:
+        while self._accesses:
+            try:
+                key, entry = self._accesses.popleft()
+            except IndexError:
+                break
+            if self._cache.get(key) is entry:
+                self._families[entry.family].touch(key, entry)
+
+    def _lookup(self, key: Iri | Xsd_NCName) -> _Entry | None:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry.expires is not None and entry.expires <= time.monotonic():
+            with self._lock:
+                if self._cache.get(key) is entry:
+                    self._remove(key)
+                    self._counter(entry.family)['expirations'] += 1
+            return None
+        self._accesses.append((key, entry))
+        if len(self._accesses) == CacheSingleton.ACCESS_BUFFER_SIZE and self._lock.acquire(blocking=False):
+            try:
+                self._apply_accesses()
+            finally:
+                self._lock.release()
+        self._counter(entry.family)['hits'] += 1
+        return entry
 
     def get(self, key: Iri | Xsd_NCName) -> Any:
-        with self._lock:
-            return deepcopy(self._cache.get(key))
+        entry = self._lookup(key)
+        return deepcopy(entry.value) if entry is not None else None
+
+    def get_snapshot(self, key: Iri | Xsd_NCName) -> Any:
+        """
+        Returns the cached value without copying it. The value is shared by all readers and
+        must not be modified.
+
+        :param key: The key
+        :type key: Iri | Xsd_NCName
+        :return: The shared (read-only) value or None
+        :rtype: Any
+        """
+        entry = self._lookup(key)
+        return entry.value if entry is not None else None
 
     def set(self, key: Iri | Xsd_NCName, value: Any, key2: Iri | Xsd_NCName | None = None) -> None:
+        snapshot = deepcopy(value)
+        family = family_of(value)
+        policy = CachePolicies().policy(family)
+        ttl = policy.expires_in()
+        expires = time.monotonic() + ttl if ttl is not None else None
+        size = _size_of(value) if policy.max_bytes is not None else None
+        keys = [k for k in (key, key2) if k is not None]
         with self._lock:
-            self._cache[key] = deepcopy(value)
-            if key2 is not None:
-                self._cache[key2] = self._cache[key]
+            self._apply_accesses()
+            entries = self._family(family, policy)
+            for k in keys:
+                self._remove(k)
+            self._evict(family, policy, entries, len(keys), len(keys) * (size or 0))
+            for k in keys:
+                entry = self._cache[k] = _Entry(snapshot, family, size, expires)
+                entries.add(k, entry)
+
+    def _evict(self, family: CacheFamily, policy: CachePolicy, entries: _Family, count: int, size: int) -> None:
+        # makes room for count new entries with the given total size
+        if policy.max_entries is None and policy.max_bytes is None:
+            return
+        counter = self._counter(family)
+        now = time.monotonic()
+        while (policy.max_entries is not None and len(entries.entries) + count > policy.max_entries) or \
+                (policy.max_bytes is not None and entries.size() + size > policy.max_bytes):
+            key = entries.victim()
+            if key is None:
+                break
+            entry = self._remove(key)
+            if entry.expires is not None and entry.expires <= now:
+                counter['expirations'] += 1
+            else:
+                counter['evictions'] += 1
 
     def delete(self, key: Iri | Xsd_NCName):
         with self._lock:
-            if key in self._cache:
-                self._cache.pop(key, None)
+            self._remove(key)
 
     def clear(self):
         with self._lock:
             self._cache.clear()
+            self._families.clear()
+            self._accesses.clear()
+
+    def reset_stats(self) -> None:
+        """
+        Resets the hit, eviction and expiration counters.
+
+        :return: None
+        """
+        self._stats = {}
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Returns the memory accounting and the counters of the cache per family: number of entries, size of
+        the serialized values in bytes, hits, evictions and expirations.
+
+        :return: The statistics by family name
+        :rtype: dict[str, dict[str, int]]
+        """
+        result: dict[str, dict[str, int]] = {}
+        with self._lock:
+            for family, entries in self._families.items():
+                if entries.entries:
+                    result[family.value] = {'entries': len(entries.entries), 'bytes': entries.size()}
+        for family, counter in self._stats.items():
+            result.setdefault(family.value, {'entries': 0, 'bytes': 0}).update(counter)
+        return result
+
+
+_RESOLVE_SCRIPT = """
+local epoch = redis.call('GET', KEYS[1]) or '0'
+local results = {}
+for i = 2, #KEYS do
+    local generation = redis.call('GET', KEYS[i]) or '0'
+    results[i - 1] = redis.call(ARGV[2], ARGV[1] .. ARGV[2 * i - 1] .. ':' .. epoch .. '.' .. generation .. ':' .. ARGV[2 * i])
+end
+return results
+"""
+"""Applies a command (GET, EXISTS or DEL) to the value keys of the current generations.
+KEYS: epoch, generation of each key. ARGV: prefix, command, (namespace, key) for each key."""
+
+_SET_SCRIPT = """
+local epoch = redis.call('GET', KEYS[1]) or '0'
+for i = 2, #KEYS do
+    local generation = redis.call('GET', KEYS[i]) or '0'
+    local j = 4 * i - 6
+    local key = ARGV[1] .. ARGV[j] .. ':' .. epoch .. '.' .. generation .. ':' .. ARGV[j + 1]
+    local px = tonumber(ARGV[j + 3])
+    if px > 0 then
+        redis.call('SET', key, ARGV[j + 2], 'PX', px)
+    else
+        redis.call('SET', key, ARGV[j + 2])
+    end
+end
+return #KEYS - 1
+"""
+"""Sets the value keys of the current generations.
+KEYS: epoch, generation of each key. ARGV: prefix, (namespace, key, value, expiration in ms or 0) for each key."""
+
+_SET_GROUPED_SCRIPT = """
+local version = (redis.call('GET', KEYS[1]) or '0') .. '.' .. (redis.call('GET', KEYS[2]) or '0')
+local base = ARGV[1] .. ARGV[2] .. ':' .. version .. ':'
+local px = tonumber(ARGV[6])
+redis.call('SADD', base .. ARGV[5], ARGV[3])
+if px > 0 then
+    redis.call('SET', base .. ARGV[3], ARGV[4], 'PX', px)
+    if redis.call('PTTL', base .. ARGV[5]) < px then
+        redis.call('PEXPIRE', base .. ARGV[5], px)
+    end
+else
+    redis.call('SET', base .. ARGV[3], ARGV[4])
+    redis.call('PERSIST', base .. ARGV[5])
+end
+return 1
+"""
+"""Sets a value key of the current generation and adds it to a group, which expires with its last key.
+KEYS: epoch, generation. ARGV: prefix, namespace, key, value, group key, expiration in ms or 0."""
+
+_DELETE_GROUP_SCRIPT = """
+local version = (redis.call('GET', KEYS[1]) or '0') .. '.' .. (redis.call('GET', KEYS[2]) or '0')
+local base = ARGV[1] .. ARGV[2] .. ':' .. version .. ':'
+local members = redis.call('SMEMBERS', base .. ARGV[3])
+for _, key in ipairs(members) do
+    redis.call('DEL', base .. key)
+end
+redis.call('DEL', base .. ARGV[3])
+return members
+"""
+"""Deletes the value keys of a group of the current generation and the group.
+KEYS: epoch, generation. ARGV: prefix, namespace, group key. Returns the deleted keys."""
+
+_GROUP_MARK = '#'
+"""Start of the key of a group, a group is stored as Redis set next to the value keys of its namespace"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+"""Deletes a lock if it is still held by the given token."""
+
+NOT_FOUND_VALUE = b'\x00nf'
+"""Stored value of a key marked as not found. Neither JSON nor values with codec header start like this."""
+
+
+class _NotFound:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return 'NOT_FOUND'
+
+
+NOT_FOUND = _NotFound()
+"""Returned by `CacheSingletonRedis.get(..., negative=True)` for a key marked as not found"""
 
 
 class CacheSingletonRedis:
@@ -69,35 +416,417 @@ class CacheSingletonRedis:
     methods for synchronous operations like setting, retrieving, deleting, and
     clearing cache entries.
 
+    The keys are stored namespaced by the scope (triple store) and the project, with a
+    generation counter per namespace (see ~CacheKeyspace). `bump_generation()` invalidates
+    all keys of a project or of the scope in O(1). The generations are resolved by Lua
+    scripts in Redis, so that every operation still needs only one round trip. `clear()` bumps the epoch of the
+    scope and removes its old keys, other keys in the same Redis database are not touched. Since the
+    scripts compute the names of the value keys, a standalone Redis (not Redis Cluster) is required.
+
+    The serialized values are additionally kept in the in-process ~NearCache, which
+    is kept coherent by publishing every change to the channel "oldap:cache:invalidate".
+    The values are written with the codec given by OLDAP_CACHE_CODEC (see ~CacheCodec);
+    values of all codecs can be read. The keys expire after the time to live of the
+    ~CachePolicy of the family of the value.
+
+    Lookups of objects that do not exist are cached as well (negative caching): `set_not_found()`
+    stores a marker under the key of the object, with the short time to live of the family
+    "negative". Since the marker has the same key as the object, it is replaced when the object is
+    created and removed by the same deletions and generation bumps as the object. `get()` returns
+    the marker as `NOT_FOUND` if called with `negative=True`, otherwise as None.
+
+    All instances using the same Redis URL share one client and its connection pool. The
+    size of the pool is given by the environment variable OLDAP_REDIS_MAX_CONNECTIONS
+    (default: 50); if all connections are in use, a request waits for a free connection.
+
     :ivar _r: Connection to the Redis database.
     :type _r: redis.client.Redis
     """
-    def __init__(self):
+    _clients: dict[str, redis.Redis] = {}
+    _clients_lock = Lock()
+
+    def __init__(self,
+                 con: IConnection | None = None, *,
+                 codec: CacheCodec | str | None = None,
+                 scope: str | None = None):
+        """
+        Constructor.
+
+        :param con: The connection the cached objects are read with. Its ~IConnection.cache_scope is the scope
+            of the keys. If None, the default scope is used (see ~CacheKeyspace)
+        :type con: IConnection | None
+        :param codec: The codec the values are written with (default: OLDAP_CACHE_CODEC)
+        :type codec: CacheCodec | str | None
+        :param scope: An explicit scope, used instead of the scope of the connection
+        :type scope: str | None
+        """
         # default connection to local redis server on port 6379
 
         #self._r = redis.Redis(host=os.getenv("OLDAP_REDIS_HOST", 'localhost'), port=os.getenv("OLDAP_REDIS_PORT", 6379), db=0)
 
         redis_url = os.getenv("OLDAP_REDIS_URL", "redis://localhost:6379")
-        self._r = redis.from_url(redis_url)
+        self._r = CacheSingletonRedis._client(redis_url)
+        self._codec = codec if isinstance(codec, CacheCodec) else get_codec(codec)
+        self._keys = CacheKeyspace(scope or (con.cache_scope if con is not None else None))
+        self._resolve = self._r.register_script(_RESOLVE_SCRIPT)
+        self._release = self._r.register_script(_RELEASE_SCRIPT)
 
-    def get(self, key: Iri | Xsd_NCName | Xsd_QName, connection: IConnection | None = None) -> Any:
-        value = self._r.get(str(key))
-        if connection:
-            return json.loads(value, object_hook=serializer.make_decoder_hook(connection=connection)) if value else None
-        else:
-            return json.loads(value, object_hook=serializer.decoder_hook) if value else None
+    @classmethod
+    def _client(cls, redis_url: str) -> redis.Redis:
+        client = cls._clients.get(redis_url)
+        if client is None:
+            with cls._clients_lock:
+                client = cls._clients.get(redis_url)
+                if client is None:
+                    max_connections = int(os.getenv("OLDAP_REDIS_MAX_CONNECTIONS", "50"))
+                    pool = redis.BlockingConnectionPool.from_url(redis_url, max_connections=max_connections)
+                    client = redis.Redis(connection_pool=pool)
+                    cls._clients[redis_url] = client
+        return client
+
+    @staticmethod
+    def _decode(value: bytes | None, connection: IConnection | None, negative: bool = False) -> Any:
+        if not value:
+            return None
+        if value == NOT_FOUND_VALUE:
+            return NOT_FOUND if negative else None
+        return cache_codec.decode(value, connection)
+
+    def _names(self, keys: Iterable[Iri | Xsd_NCName | Xsd_QName]) -> list[tuple[str, str]]:
+        return [(namespace_of(key), str(key)) for key in keys]
+
+    def _call(self, command: str, names: list[tuple[str, str]], pipe: redis.client.Pipeline | None = None) -> Any:
+        keys = [self._keys.epoch_key, *(self._keys.generation_key(namespace) for namespace, _ in names)]
+        args = [self._keys.prefix, command]
+        for namespace, key in names:
+            args += [namespace, key]
+        if pipe is not None:
+            # a script object would check with an additional round trip that the script is loaded
+            return pipe.eval(_RESOLVE_SCRIPT, len(keys), *keys, *args)
+        return self._resolve(keys=keys, args=args)
+
+    def _get_raw_many(self, names: list[tuple[str, str]]) -> list[bytes | None]:
+        if not names:
+            return []
+        near = NearCache()
+        if not near.enabled or not near.listen(self._r):
+            return self._call('GET', names)
+        near_keys = [self._keys.name(namespace, key) for namespace, key in names]
+        values = [near.get(near_key) for near_key in near_keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            generation = near.generation
+            for i, value in zip(missing, self._call('GET', [names[i] for i in missing])):
+                values[i] = value
+                if value is not None:
+                    near.set(near_keys[i], value, generation)
+        return values
+
+    @staticmethod
+    def _expires_ms(value: Any) -> int | None:
+        ttl = CachePolicies().policy(family_of(value)).expires_in()
+        return max(1, int(ttl * 1000)) if ttl is not None else None
+
+    def get(self, key: Iri | Xsd_NCName | Xsd_QName,
+            connection: IConnection | None = None,
+            family: CacheFamily | None = None,
+            negative: bool = False) -> Any:
+        """
+        Gets the value of a key.
+
+        :param key: The key
+        :type key: Iri | Xsd_NCName | Xsd_QName
+        :param connection: The connection the decoded object is bound to
+        :type connection: IConnection | None
+        :param family: The family of the value, used to count a miss in the ~CacheMetrics
+        :type family: CacheFamily | None
+        :param negative: If True, a key marked as not found is returned as `NOT_FOUND` (otherwise as None)
+        :type negative: bool
+        :return: The value, NOT_FOUND or None
+        :rtype: Any
+        """
+        return self.get_many([key], connection, family, negative)[0]
+
+    def get_many(self, keys: Iterable[Iri | Xsd_NCName | Xsd_QName],
+                 connection: IConnection | None = None,
+                 family: CacheFamily | None = None,
+                 negative: bool = False) -> list[Any]:
+        """
+        Gets the values of several keys with one round trip to Redis.
+
+        :param keys: The keys
+        :type keys: Iterable[Iri | Xsd_NCName | Xsd_QName]
+        :param connection: The connection the decoded objects are bound to
+        :type connection: IConnection | None
+        :param family: The family of the values, used to count the misses in the ~CacheMetrics
+        :type family: CacheFamily | None
+        :param negative: If True, keys marked as not found are returned as `NOT_FOUND` (otherwise as None)
+        :type negative: bool
+        :return: The values in the order of the keys (None for keys not in the cache)
+        :rtype: list[Any]
+        """
+        metrics = CacheMetrics()
+        if not metrics.enabled:
+            return [CacheSingletonRedis._decode(value, connection, negative)
+                    for value in self._get_raw_many(self._names(keys))]
+        started = time.perf_counter()
+        raw = self._get_raw_many(self._names(keys))
+        seconds = time.perf_counter() - started
+        values = []
+        for data in raw:
+            if not data:
+                metrics.lookup(REDIS, family or CacheFamily.OTHER, False)
+                values.append(None)
+                continue
+            if data == NOT_FOUND_VALUE:
+                metrics.lookup(REDIS, CacheFamily.NEGATIVE, True, len(data))
+                values.append(NOT_FOUND if negative else None)
+                continue
+            started = time.perf_counter()
+            value = cache_codec.decode(data, connection)
+            value_family = family_of(value)
+            metrics.record(REDIS, value_family, 'decode', time.perf_counter() - started)
+            metrics.lookup(REDIS, value_family, True, len(data))
+            values.append(value)
+        if raw:
+            found = (family_of(v) for v in values if v is not None and v is not NOT_FOUND)
+            metrics.record(REDIS, family or next(found, CacheFamily.OTHER), 'get', seconds)
+        return values
 
     def set(self, key: Iri | Xsd_NCName | Xsd_QName, value: Any, key2: Iri | Xsd_NCName | None = None) -> None:
-        self._r.set(str(key), json.dumps(value, default=serializer.encoder_default))
-        if key2 is not None:
-            self._r.set(str(key2), json.dumps(value, default=serializer.encoder_default))
+        self.set_many([(key, value)] if key2 is None else [(key, value), (key2, value)])
+
+    def set_many(self, items: Iterable[tuple[Iri | Xsd_NCName | Xsd_QName, Any]]) -> None:
+        """
+        Sets several keys with one round trip to Redis.
+
+        :param items: The keys and their values
+        :type items: Iterable[tuple[Iri | Xsd_NCName | Xsd_QName, Any]]
+        :return: None
+        """
+        started = time.perf_counter() if CacheMetrics().enabled else None
+        items = list(items)
+        keys = [self._keys.epoch_key]
+        args = [self._keys.prefix]
+        names = []
+        encoded: dict[int, bytes] = {}
+        for key, value in items:
+            namespace = namespace_of(key)
+            data = encoded.get(id(value))
+            if data is None:
+                data = encoded[id(value)] = self._codec.encode(value)
+            keys.append(self._keys.generation_key(namespace))
+            args += [namespace, str(key), data, CacheSingletonRedis._expires_ms(value) or 0]
+            names.append(self._keys.name(namespace, str(key)))
+        if not names:
+            return
+        self._write(keys, args, names)
+        if started is not None:
+            seconds = (time.perf_counter() - started) / len(items)
+            metrics = CacheMetrics()
+            for _, value in items:
+                metrics.record(REDIS, family_of(value), 'set', seconds, len(encoded[id(value)]))
+
+    def set_not_found(self, key: Iri | Xsd_NCName | Xsd_QName, group: CacheKey | None = None) -> None:
+        """
+        Marks a key as not found (negative caching), so that repeated lookups of an object that does not exist
+        are answered from the cache. The marker expires after the time to live of the family "negative", or is
+        replaced when a value is set for the key.
+
+        If a group is given, the marker is added to it and removed by `delete_group()`. This allows to remove
+        the markers of one object that are kept per user (e.g. of a media object by its asset ID). The key must
+        be in the namespace of the group.
+
+        :param key: The key
+        :type key: Iri | Xsd_NCName | Xsd_QName
+        :param group: The group of the marker
+        :type group: CacheKey | None
+        :return: None
+        """
+        started = time.perf_counter() if CacheMetrics().enabled else None
+        namespace = namespace_of(key)
+        ttl = CachePolicies().policy(CacheFamily.NEGATIVE).expires_in()
+        expires = max(1, int(ttl * 1000)) if ttl is not None else 0
+        if group is None:
+            self._write([self._keys.epoch_key, self._keys.generation_key(namespace)],
+                        [self._keys.prefix, namespace, str(key), NOT_FOUND_VALUE, expires],
+                        [self._keys.name(namespace, str(key))])
+        else:
+            if namespace_of(group) != namespace:
+                raise OldapErrorInconsistency(f'Key "{key}" is not in the namespace of group "{group}".')
+            pipe = self._r.pipeline(transaction=False)
+            pipe.eval(_SET_GROUPED_SCRIPT, 2, self._keys.epoch_key, self._keys.generation_key(namespace),
+                      self._keys.prefix, namespace, str(key), NOT_FOUND_VALUE, _GROUP_MARK + str(group),
+                      expires)
+            NearCache().publish(pipe, self._keys.name(namespace, str(key)))
+            pipe.execute()
+        if started is not None:
+            CacheMetrics().record(REDIS, CacheFamily.NEGATIVE, 'set', time.perf_counter() - started,
+                                  len(NOT_FOUND_VALUE))
+
+    def _write(self, keys: list[str], args: list, names: list[str]) -> None:
+        pipe = self._r.pipeline(transaction=False)
+        pipe.eval(_SET_SCRIPT, len(keys), *keys, *args)
+        NearCache().publish(pipe, *names)
+        pipe.execute()
 
     def delete(self, key: Iri | Xsd_NCName | Xsd_QName):
-        self._r.delete(str(key))
+        self.delete_many([key])
+
+    def delete_many(self, keys: Iterable[Iri | Xsd_NCName | Xsd_QName]) -> None:
+        """
+        Deletes several keys with one round trip to Redis.
+
+        :param keys: The keys
+        :type keys: Iterable[Iri | Xsd_NCName | Xsd_QName]
+        :return: None
+        """
+        names = self._names(keys)
+        if not names:
+            return
+        pipe = self._r.pipeline(transaction=False)
+        self._call('DEL', names, pipe)
+        NearCache().publish(pipe, *(self._keys.name(namespace, key) for namespace, key in names))
+        pipe.execute()
+
+    def delete_group(self, group: CacheKey) -> int:
+        """
+        Deletes all keys added to a group by `set_not_found()`, and the group itself, with one round trip to
+        Redis.
+
+        :param group: The group
+        :type group: CacheKey
+        :return: The number of deleted keys
+        :rtype: int
+        """
+        namespace = namespace_of(group)
+        keys = self._r.eval(_DELETE_GROUP_SCRIPT, 2, self._keys.epoch_key, self._keys.generation_key(namespace),
+                            self._keys.prefix, namespace, _GROUP_MARK + str(group))
+        if keys:
+            NearCache().publish(self._r, *(self._keys.name(namespace, key.decode('utf-8')) for key in keys))
+        return len(keys)
+
+    def bump_generation(self, namespace: str | None = None) -> int:
+        """
+        Invalidates all keys of a namespace (a project short name or "admin"), or of the whole scope, by
+        incrementing its generation counter. The keys of the old generation are not read anymore, they expire
+        or are removed by `collect_garbage()`.
+
+        :param namespace: The namespace, None for all namespaces of the scope
+        :type namespace: str | None
+        :return: The new generation
+        :rtype: int
+        """
+        pipe = self._r.pipeline(transaction=False)
+        if namespace is None:
+            pipe.incr(self._keys.epoch_key)
+            NearCache().publish_prefix(pipe, self._keys.prefix)
+        else:
+            pipe.incr(self._keys.generation_key(namespace))
+            NearCache().publish_prefix(pipe, self._keys.name(namespace, ''))
+        return pipe.execute()[0]
+
+    def collect_garbage(self, namespace: str | None = None, count: int = 1000) -> int:
+        """
+        Removes the keys of old generations of a namespace, or of all namespaces of the scope. The keys are
+        scanned incrementally (SCAN) and removed in the background by Redis (UNLINK).
+
+        :param namespace: The namespace, None for all namespaces of the scope
+        :type namespace: str | None
+        :param count: Number of keys scanned and removed per round trip
+        :type count: int
+        :return: The number of removed keys
+        :rtype: int
+        """
+        epoch = int(self._r.get(self._keys.epoch_key) or 0)
+        versions: dict[str, str] = {}
+        removed = 0
+        stale: list[bytes] = []
+        for name in self._r.scan_iter(match=self._keys.pattern(namespace), count=count):
+            parsed = self._keys.parse(name.decode('utf-8'))
+            if parsed is None:
+                continue
+            ns, version, _ = parsed
+            current = versions.get(ns)
+            if current is None:
+                current = versions[ns] = f'{epoch}.{int(self._r.get(self._keys.generation_key(ns)) or 0)}'
+            if version != current:
+                stale.append(name)
+            if len(stale) >= count:
+                removed += self._r.unlink(*stale)
+                stale = []
+        if stale:
+            removed += self._r.unlink(*stale)
+        return removed
+
+    def lock_name(self, key: Iri | Xsd_NCName | Xsd_QName) -> str:
+        """
+        Returns the name of the lock of a key, namespaced like the value keys (see ~CacheKeyspace).
+
+        :param key: The key
+        :type key: Iri | Xsd_NCName | Xsd_QName
+        :return: The name of the lock
+        :rtype: str
+        """
+        return self._keys.lock_key(namespace_of(key), str(key))
+
+    def acquire_lock(self, key: Iri | Xsd_NCName | Xsd_QName, ttl: float) -> str | None:
+        """
+        Acquires the lock of a key across all processes (SET NX with expiration). The lock is released by
+        `release_lock()` or expires after the time to live, if the holder dies.
+
+        :param key: The key
+        :type key: Iri | Xsd_NCName | Xsd_QName
+        :param ttl: Time to live of the lock in seconds
+        :type ttl: float
+        :return: The token of the holder, or None if the lock is held by another caller
+        :rtype: str | None
+        """
+        token = uuid.uuid4().hex
+        return token if self._r.set(self.lock_name(key), token, nx=True, px=max(1, int(ttl * 1000))) else None
+
+    def release_lock(self, key: Iri | Xsd_NCName | Xsd_QName, token: str) -> None:
+        """
+        Releases the lock of a key, if it is still held with the given token.
+
+        :param key: The key
+        :type key: Iri | Xsd_NCName | Xsd_QName
+        :param token: The token returned by `acquire_lock()`
+        :type token: str
+        :return: None
+        """
+        self._release(keys=[self.lock_name(key)], args=[token])
+
+    def server_stats(self) -> dict[str, int]:
+        """
+        Returns the key statistics of the Redis server (INFO): evicted and expired keys, keyspace hits and
+        misses, and the used memory in bytes.
+
+        :return: The statistics
+        :rtype: dict[str, int]
+        """
+        info = {**self._r.info('stats'), **self._r.info('memory')}
+        return {name: int(info.get(name, 0))
+                for name in ('evicted_keys', 'expired_keys', 'keyspace_hits', 'keyspace_misses', 'used_memory')}
 
     def clear(self):
-        self._r.flushdb()
+        """
+        Invalidates all keys of the scope and removes them. Keys of other scopes, and other keys in the same
+        Redis database (e.g. of the ~SessionStore), are kept.
+
+        :return: None
+        """
+        self.bump_generation()
+        self.collect_garbage()
 
     def exists(self, key: Iri | Xsd_NCName | Xsd_QName) -> bool:
-        value = self._r.get(str(key))
-        return value is not None
+        """
+        Checks if a value is cached for a key. A key marked as not found (see `set_not_found()`) does not exist.
+
+        :param key: The key
+        :type key: Iri | Xsd_NCName | Xsd_QName
+        :return: True if a value is cached
+        :rtype: bool
+        """
+        value = self._get_raw_many([(namespace_of(key), str(key))])[0]
+        return bool(value) and value != NOT_FOUND_VALUE
@@ -0,0 +1,206 @@
+"""
+# CacheWarmup
+
+Fills the object caches after a deploy or after Redis has been flushed, so that the first requests of every
+project do not pay for reading the data models, lists and admin objects from the triple store:
+
+- _admin_: the system and shared projects (`GlobalConfig`) and all users (`User`)
+- _per project_: the `Project`, its `DataModel` (with all property and resource classes) and all `OldapList`s
+  with their nodes (also in the in-process `CacheSingleton` used by `dump_list_to`)
+
+The projects are warmed up in parallel by a bounded pool of worker threads. A project that fails is reported
+with its error, the others are warmed up nevertheless.
+
+Usage as command:
+
+    python -m oldaplib.src.cachewarmup -u USERID [-p PASSWORD] [-w WORKERS] [--refresh] [PROJECT ...]
+
+The command exits with status 1 if a project failed. It uses the following environment variables:
+
+- _OLDAP_TS_SERVER_, _OLDAP_TS_REPO_: The triple store (default: http://localhost:7200, oldap)
+- _OLDAP_PASSWORD_: The password, if not given by -p
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.datamodel import DataModel
+from oldaplib.src.globalconfig import GlobalConfig
+from oldaplib.src.iconnection import IConnection
+from oldaplib.src.oldaplist import OldapList
+from oldaplib.src.oldaplist_helpers import dump_list_to, ListFormat
+from oldaplib.src.project import Project
+from oldaplib.src.user import User
+from oldaplib.src.xsd.iri import Iri
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+
+ADMIN = 'admin'
+"""Name of the result of the admin objects"""
+
+
+@dataclass
+class WarmupResult:
+    """
+    The result of warming up a project (or the admin objects).
+
+    :ivar name: The project short name, or "admin"
+    :ivar seconds: The time needed
+    :ivar objects: Number of objects read (projects, data models, lists, users)
+    :ivar error: The error, if the warm-up failed
+    """
+    name: str
+    seconds: float = 0.0
+    objects: int = 0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class WarmupReport:
+    """
+    The results of a warm-up.
+    """
+    results: list[WarmupResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def failed(self) -> list[WarmupResult]:
+        return [result for result in self.results if not result.ok]
+
+    def __str__(self) -> str:
+        lines = [f'{"project":<24} {"objects":>8} {"seconds":>8}  status']
+        for result in self.results:
+            status = 'ok' if result.ok else f'FAILED: {result.error}'
+            lines.append(f'{result.name:<24} {result.objects:>8} {result.seconds:>8.2f}  {status}')
+        lines.append(f'{len(self.results)} warmed up in {self.seconds:.2f}s, {len(self.failed)} failed')
+        return '\n'.join(lines)
+
+
+def _list_id(iri: Iri) -> Xsd_NCName:
+    fragment = iri.fragment if iri.is_qname else str(iri).rsplit('#', 1)[-1].rsplit('/', 1)[-1]
+    return Xsd_NCName(fragment, validate=False)
+
+
+def _warm_admin(con: IConnection, refresh: bool, result: WarmupResult) -> None:
+    GlobalConfig(con)
+    result.objects += 2
+    for user_iri in User.search(con=con):
+        User.read(con, user_iri, ignore_cache=refresh)
+        result.objects += 1
+
+
+def _warm_project(con: IConnection, shortname: Xsd_NCName, refresh: bool, lists: bool, result: WarmupResult) -> None:
+    project = Project.read(con, shortname, ignore_cache=refresh)
+    result.objects += 1
+    DataModel.read(con, project, ignore_cache=refresh)
+    result.objects += 1
+    if not lists:
+        return
+    for list_iri in OldapList.search(con, project):
+        list_id = _list_id(list_iri)
+        OldapList.read(con, project, list_id, ignore_cache=refresh)
+        dump_list_to(con, project, list_id, listformat=ListFormat.PYTHON, ignore_cache=refresh)
+        result.objects += 1
+
+
+def _timed(name: str, task: Callable[[WarmupResult], None]) -> WarmupResult:
+    result = WarmupResult(name)
+    start = time.perf_counter()
+    try:
+        task(result)
+    except Exception as err:
+        logging.getLogger(__name__).warning(f'Cache warm-up of "{name}" failed: {err}')
+        result.error = str(err) or type(err).__name__
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def warm_up(con: IConnection,
+            projects: Iterable[Xsd_NCName | str] | None = None, *,
+            workers: int = 4,
+            refresh: bool = False,
+            lists: bool = True,
+            admin: bool = True,
+            progress: Callable[[WarmupResult], None] | None = None) -> WarmupReport:
+    """
+    Fills the caches with the admin objects and the data models and lists of the projects.
+
+    :param con: The connection (its user must be allowed to read the projects and users)
+    :type con: IConnection
+    :param projects: The short names of the projects. If None, all projects (`Project.search`)
+    :type projects: Iterable[Xsd_NCName | str] | None
+    :param workers: Maximal number of projects warmed up in parallel
+    :type workers: int
+    :param refresh: If True, the objects are read from the triple store even if they are in the cache
+    :type refresh: bool
+    :param lists: If False, the lists are not warmed up
+    :type lists: bool
+    :param admin: If False, the admin objects (GlobalConfig, users) are not warmed up
+    :type admin: bool
+    :param progress: Called with the result of every project when it is done
+    :type progress: Callable[[WarmupResult], None] | None
+    :return: The results per project (and "admin")
+    :rtype: WarmupReport
+    """
+    start = time.perf_counter()
+    report = WarmupReport()
+
+    def done(result: WarmupResult) -> WarmupResult:
+        if progress:
+            progress(result)
+        return result
+
+    if admin:
+        report.results.append(done(_timed(ADMIN, lambda result: _warm_admin(con, refresh, result))))
+    if projects is None:
+        try:
+            projects = [found.projectShortName for found in Project.search(con)]
+        except Exception as err:
+            report.results.append(done(WarmupResult('projects', error=str(err) or type(err).__name__)))
+            projects = []
+    shortnames = [Xsd_NCName(shortname, validate=True) for shortname in projects]
+
+    def task(shortname: Xsd_NCName) -> WarmupResult:
+        return done(_timed(str(shortname),
+                           lambda result: _warm_project(con, shortname, refresh, lists, result)))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='oldap-warmup') as pool:
+        report.results.extend(pool.map(task, shortnames))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='cachewarmup', description='Fill the OLDAP caches')
+    parser.add_argument('projects', nargs='*', help='Project short names (default: all projects)')
+    parser.add_argument('-s', '--server', default=os.getenv("OLDAP_TS_SERVER", "http://localhost:7200"))
+    parser.add_argument('-r', '--repo', default=os.getenv("OLDAP_TS_REPO", "oldap"))
+    parser.add_argument('-u', '--user', required=True)
+    parser.add_argument('-p', '--password', default=os.getenv("OLDAP_PASSWORD"))
+    parser.add_argument('-w', '--workers', type=int, default=4)
+    parser.add_argument('--refresh', action='store_true', help='Read from the triple store even if cached')
+    parser.add_argument('--no-lists', action='store_true')
+    parser.add_argument('--no-admin', action='store_true')
+    args = parser.parse_args(argv)
+
+    con = Connection(server=args.server, repo=args.repo, userId=args.user, credentials=args.password,
+                     context_name="DEFAULT")
+    report = warm_up(con, args.projects or None, workers=args.workers, refresh=args.refresh,
+                     lists=not args.no_lists, admin=not args.no_admin,
+                     progress=lambda result: print(f'{result.name}: {"ok" if result.ok else result.error}'
+                                                   f' ({result.seconds:.2f}s)', file=sys.stderr))
+    print(report)
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
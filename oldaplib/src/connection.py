@@ -1,14 +1,20 @@
+import gzip
 import json
 import os
+import re
 import time
+import uuid
 
 import bcrypt
 import jwt
+import redis
 import requests
 import logging
 
+from copy import deepcopy
+
 from jwt import InvalidTokenError
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Iterator, Callable
 from datetime import datetime, timedelta
 from rdflib.plugins.stores.sparqlstore import SPARQLUpdateStore
 from pathlib import Path
@@ -22,10 +28,23 @@ from oldaplib.src.enums.adminpermissions import AdminPermission
 from oldaplib.src.userdataclass import UserData
 from oldaplib.src.xsd.xsd_qname import Xsd_QName
 from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
-from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorNoPermission, OldapErrorNotFound
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorNoPermission, OldapErrorNotFound, OldapErrorValue, \
+    OldapErrorBulkLoad
 from oldaplib.src.helpers.context import Context, DEFAULT_CONTEXT
-from oldaplib.src.helpers.query_processor import QueryProcessor
+from oldaplib.src.helpers.irincname import IriOrNCName
+from oldaplib.src.helpers.query_processor import QueryProcessor, RowType
 from oldaplib.src.helpers.serializer import serializer
+from oldaplib.src.helpers.cache_namespace import graph_namespace
+from oldaplib.src.helpers.bulk_load import BulkLoadProgress, RdfFile, gzip_chunks
+from oldaplib.src.helpers.login_cache import LoginCache
+from oldaplib.src.helpers.query_cache import QueryResultCache, query_graphs, update_graphs, merge_graphs, Graphs
+from oldaplib.src.helpers.query_metrics import QueryMetrics, QueryEvent, calling_method, result_rows
+from oldaplib.src.helpers.replica_set import ReplicaSet
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.helpers.session_store import SessionStore
+from oldaplib.src.helpers.sparql_prologue import prune_prefixes
+from oldaplib.src.helpers.sparql_result_table import decode_query_result
+from oldaplib.src.helpers.token_cache import TokenCache
 from oldaplib.src.iconnection import IConnection
 from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
 from oldaplib.src.xsd.xsd_string import Xsd_string
@@ -69,6 +88,12 @@ class Connection(IConnection):
         - Any setting of the _server_, _repo_ or _context_name_ - variables raises an OldapError-exception
     * Further methods
         - _Constructor(server,repo,contextname)_: requires _server_ and _repo_string, _context_name defaults to "DEFAULT"
+          All HTTP requests use the keep-alive session of the process-wide ~SessionPool for the server, that is,
+          all Connection instances talking to the same server share one bounded pool of TCP connections.
+          The project prefixes and the UserData needed for the login are taken from the ~LoginCache if possible,
+          the UserData of a token that has been verified before from the ~TokenCache.
+          If the ~QueryResultCache is enabled, the results of _query()_ are cached and evicted by all writes
+          through the connection to the graphs the query depends on.
         - _clear_graph_(graph_name: QName)_: Deletes the given graph (must be given as QName)
         - _clear_repo()_ Deletes all data in the repository given by the Connection instance
         - _upload_turtle(filename: str, graphname:str)_: Loads the data in the given file (must be turtle or trig
@@ -76,13 +101,27 @@ class Connection(IConnection):
           default graph of the repository or into the graph given in the trig file.
           _Note_: The method returns before the triple store has digested all the data! It may not immediately
           available after this method returns!
+        - _bulk_load(filename, graphname, batch_size, compress, ...)_: Loads large RDF files (Turtle, TriG, N-Triples,
+          N-Quads, optionally gzipped) in bounded memory, streamed or in resumable batches, with progress reports.
         - _query(query: str, format: SparqlResultFormat)_: Sends a SPARQL query to the triple store and returns the
-          result in the given format. If no format is given, JSON will be used as default format.
+          result in the given format. If no format is given, the cheapest format supported by the triple store
+          is negotiated (see ~SparqlResultFormat.AUTO). The result is then either a dict (JSON) or a
+          ~SparqlResultTable which both can be processed by the ~QueryProcessor.
+        - _transaction_start()_, _transaction_query(query)_, _transaction_update(query)_, _transaction_commit()_,
+          _transaction_abort()_: The RDF4J transaction protocol. If _coalesce_updates_ is set, consecutive
+          transaction updates are sent together in one request.
+        - If read replicas are configured, _query()_ is answered by the replica with the least outstanding
+          requests (slow reads are hedged to a second replica), except for a short read-your-writes window after
+          each write of the user. All other requests go to the primary server (see ~ReplicaSet).
+        - Unless _prune_prefixes_ is switched off, the PREFIX declarations not used by a query or update
+          are removed before it is sent (see ~prune_prefixes).
         - _update_query(query: str)_: Send a SPARQL update query to the SPARQL endpoint. The method return either
           {'status': 'OK'} or {'status': 'ERROR', 'message': 'error-text'}
         - _rdflib_query(query: str, bindings: Optional[Mapping[str, Identifier]])_: Send a SPAQRL query using rdflib
           to the SPARQL endpoint. The variable _bindings_ allows to set query parameters to given values.
 
+    If enabled, all SPARQL requests are measured and passed to the ~QueryMetrics (histograms per query
+    fingerprint, slow query log, listeners).
     """
     _server: str
     _repo: str
@@ -93,9 +132,18 @@ class Connection(IConnection):
     _token: Optional[str]
     _context_name: str = DEFAULT_CONTEXT
     _store: SPARQLUpdateStore
+    _session: requests.Session
     _query_url: str
     _update_url: str
     _transaction_url: Optional[str]
+    _transaction_graphs: Graphs
+    _coalesce_updates: bool
+    _coalesce_max_bytes: int
+    _pending_updates: list[str]
+    _pending_bytes: int
+    _prune_prefixes: bool
+    _replicas: Optional[ReplicaSet]
+    _read_your_writes: float
     __jwtkey: str
     _switcher = {
         SparqlResultFormat.XML: lambda a: a.text,
@@ -106,7 +154,10 @@ class Connection(IConnection):
         SparqlResultFormat.JSONLD: lambda a: a.json(),
         SparqlResultFormat.TRIX: lambda a: a.text,
         SparqlResultFormat.TRIG: lambda a: a.text,
-        SparqlResultFormat.TEXT: lambda a: a.text
+        SparqlResultFormat.TEXT: lambda a: a.text,
+        SparqlResultFormat.TSV: lambda a: decode_query_result(a.headers.get('Content-Type', ''), a.content),
+        SparqlResultFormat.BINARY: lambda a: decode_query_result(a.headers.get('Content-Type', ''), a.content),
+        SparqlResultFormat.AUTO: lambda a: decode_query_result(a.headers.get('Content-Type', ''), a.content),
     }
 
     def __init__(self, *,
@@ -117,7 +168,11 @@ class Connection(IConnection):
                  token: Optional[str] = None,
                  dbuser: Optional[str] = None,
                  dbpassword: Optional[str] = None,
-                 context_name: Optional[str] = DEFAULT_CONTEXT) -> None:
+                 context_name: Optional[str] = DEFAULT_CONTEXT,
+                 coalesce_updates: Optional[bool] = None,
+                 prune_prefixes: Optional[bool] = None,
+                 replicas: Optional[list[str]] = None,
+                 compact_token: Optional[bool] = None) -> None:
         """
         Constructor that establishes the connection parameters.
 
@@ -135,6 +190,22 @@ class Connection(IConnection):
         :param context_name: A name of the Context to be used (see ~Context). If no such context exists,
                              a new context with this name is created.
         :type context_name: Optional[str]
+        :param coalesce_updates: If True, the updates within a transaction are buffered and sent in as few
+                                 requests as possible (see ~coalesce_updates). If None, the environment variable
+                                 OLDAP_COALESCE_UPDATES decides (default: False).
+        :type coalesce_updates: Optional[bool]
+        :param prune_prefixes: If True, the PREFIX declarations not used by a query or update are removed before
+                               it is sent (see ~prune_prefixes). If None, the environment variable
+                               OLDAP_PRUNE_PREFIXES decides (default: True).
+        :type prune_prefixes: Optional[bool]
+        :param replicas: Server URLs of read replicas. Plain queries are sent to the replicas (see ~ReplicaSet),
+                         all other requests to the primary _server_. If None, the environment variable
+                         OLDAP_TS_REPLICAS (comma separated URLs) decides (default: no replicas).
+        :type replicas: Optional[list[str]]
+        :param compact_token: If True, the token issued at login carries only the user IRI, a session id and the
+                              permissions version; the UserData is kept in the ~SessionStore. If None, the
+                              environment variable OLDAP_COMPACT_TOKENS decides (default: False).
+        :type compact_token: Optional[bool]
         :raises OldapError: Raised when invalid credentials or token are provided, or if there is
                             an issue during the authentication process. Also raised on login failure
                             in specific scenarios.
@@ -148,17 +219,29 @@ class Connection(IConnection):
         self._query_url = f'{self._server}/repositories/{self._repo}'
         self._update_url = f'{self._server}/repositories/{self._repo}/statements'
         self._store = SPARQLUpdateStore(self._query_url, self._update_url)
+        self._session = SessionPool().session(self._server)
+        self._transaction_graphs = frozenset()
+        if coalesce_updates is None:
+            coalesce_updates = os.getenv("OLDAP_COALESCE_UPDATES", "false").lower() in ("1", "true", "yes")
+        self._coalesce_updates = coalesce_updates
+        self._coalesce_max_bytes = int(os.getenv("OLDAP_COALESCE_MAX_BYTES", str(512 * 1024)))
+        self._pending_updates = []
+        self._pending_bytes = 0
+        if prune_prefixes is None:
+            prune_prefixes = os.getenv("OLDAP_PRUNE_PREFIXES", "true").lower() in ("1", "true", "yes")
+        self._prune_prefixes = prune_prefixes
+        if replicas is None:
+            replicas = [r.strip() for r in os.getenv("OLDAP_TS_REPLICAS", "").split(",") if r.strip()]
+        self._replicas = ReplicaSet.shared(replicas, self._repo) if replicas else None
+        self._read_your_writes = int(os.getenv("OLDAP_READ_YOUR_WRITES_MS", "1000")) / 1000.0
+        if compact_token is None:
+            compact_token = os.getenv("OLDAP_COMPACT_TOKENS", "false").lower() in ("1", "true", "yes")
 
         logger = logging.getLogger(__name__)
 
         context = Context(name=context_name)
         if token is not None:
-            try:
-                payload = jwt.decode(jwt=token, key=self.__jwtkey, algorithms="HS256")
-            except InvalidTokenError:
-                logger.error("Connection with invalid token")
-                raise OldapError("Wrong credentials")
-            self._userdata = json.loads(payload['userdata'], object_hook=serializer.decoder_hook)
+            self._userdata = Connection._userdata_from_token(token, self.__jwtkey, loader=self._userdata_loader)
             self._token = token
             return
         if userId is None and credentials is None:
@@ -169,10 +252,28 @@ class Connection(IConnection):
             logger.error("Connection with wrong credentials")
             raise OldapError("Wrong credentials")
 
-        auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        #
-        # Get projects and add to Context
-        #
+        login_cache = LoginCache()
+        self._add_project_prefixes(context)
+        userdata = login_cache.get_userdata(self._server, self._repo, userId)
+        if userdata is None:
+            userdata = self._read_userdata(context, userId)
+            login_cache.set_userdata(self._server, self._repo, userdata)
+
+        self._userdata = userdata
+        Connection._check_credentials(self._userdata, userId, credentials)
+        self._token = Connection._issue_token(self._userdata, self.__jwtkey, compact=compact_token)
+        logger.info(f'Connection established. User "{str(self._userdata.userId)}".')
+
+    @staticmethod
+    def _projects_sparql(context: Context) -> str:
+        """
+        Returns the SPARQL query used at login to get the short names and namespaces of all projects.
+
+        :param context: The context of the connection
+        :type context: Context
+        :return: The SPARQL query
+        :rtype: str
+        """
         sparql = context.sparql_context
         sparql += """
         SELECT ?sname ?ns
@@ -187,27 +288,9 @@ class Connection(IConnection):
             }
         }
         """
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-            "Accept": "application/x-sparqlstar-results+json, application/sparql-results+json;q=0.9, */*;q=0.8",
-        }
-        data = {
-            'query': sparql,
-        }
-        res = requests.post(url=self._query_url, headers=headers, data=data, auth=auth)
-        if res.status_code == 200:
-            jsonobj = res.json()
-        else:
-            logger.error(f"Could not connect to triplestore: {res.text}")
-            raise OldapError(res.status_code, res.text)
-        res = QueryProcessor(context=context, query_result=jsonobj)
-        for r in res:
-            context[r['sname']] = r['ns']
+        return sparql
 
-        #
-        # Query the user data
-        #
-        sparql = UserData.sparql_query(context=context, userId=userId)
+    def _post_login_query(self, sparql: str) -> dict:
         headers = {
             "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
             "Accept": "application/x-sparqlstar-results+json, application/sparql-results+json;q=0.9, */*;q=0.8",
@@ -218,36 +301,195 @@ class Connection(IConnection):
         #
         # if we have protected the triplestore by a user/password, add it to the request
         #
-        res = requests.post(url=self._query_url, headers=headers, data=data, auth=auth)
-        if res.status_code == 200:
-            jsonobj = res.json()
-        else:
-            logger.error(f"Could not connect to triplestore: {res.text}")
+        auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
+        res = self._session.post(url=self._query_url, headers=headers, data=data, auth=auth)
+        if res.status_code != 200:
+            logging.getLogger(__name__).error(f"Could not connect to triplestore: {res.text}")
             raise OldapError(res.status_code, res.text)
-        res = QueryProcessor(context=context, query_result=jsonobj)
+        return res.json()
+
+    def _add_project_prefixes(self, context: Context) -> None:
+        """
+        Adds the short names and namespaces of all projects to the context (from the ~LoginCache if possible).
+
+        :param context: The context of the connection
+        :type context: Context
+        :return: None
+        """
+        login_cache = LoginCache()
+        prefixes = login_cache.get_prefixes(self._server, self._repo)
+        if prefixes is None:
+            res = QueryProcessor(context=context,
+                                 query_result=self._post_login_query(Connection._projects_sparql(context)))
+            prefixes = [(r['sname'], r['ns']) for r in res]
+            login_cache.set_prefixes(self._server, self._repo, prefixes)
+        for sname, ns in prefixes:
+            context[sname] = ns
+
+    def _read_userdata(self, context: Context, userId: IriOrNCName | Xsd_NCName) -> UserData:
+        """
+        Reads the UserData of a user from the triple store.
+
+        :param context: The context of the connection (with the project prefixes)
+        :type context: Context
+        :param userId: The userId or the IRI of the user
+        :type userId: IriOrNCName | Xsd_NCName
+        :return: The UserData
+        :rtype: UserData
+        :raises OldapErrorNotFound: If the user does not exist
+        """
+        sparql = UserData.sparql_query(context=context, userId=userId)
+        return UserData.from_query(QueryProcessor(context=context, query_result=self._post_login_query(sparql)))
 
-        self._userdata = UserData.from_query(res)
-        if not self._userdata.isActive:
+    def _userdata_loader(self, userIri: str) -> UserData:
+        context = Context(name=self._context_name)
+        self._add_project_prefixes(context)
+        return self._read_userdata(context, IriOrNCName(userIri))
+
+    @staticmethod
+    def _check_credentials(userdata: UserData, userId: Xsd_NCName, credentials: str | Xsd_string | None) -> None:
+        """
+        Checks if the user is active and the credentials match the stored (bcrypt-hashed) credentials.
+
+        :param userdata: The user data as read from the triple store
+        :type userdata: UserData
+        :param userId: The userId used for the login
+        :type userId: Xsd_NCName
+        :param credentials: The credentials given for the login
+        :type credentials: str | Xsd_string | None
+        :return: None
+        :raises OldapError: If the user is inactive or the credentials are wrong
+        """
+        logger = logging.getLogger(__name__)
+        if not userdata.isActive:
             logger.error("Connection with wrong credentials")
             raise OldapError("Wrong credentials")  # On purpose, we are not providing too much information why the login failed
         if userId != "unknown":
-            hashed = str(self._userdata.credentials).encode('utf-8')
-            if not bcrypt.checkpw(credentials.encode('utf-8'), hashed):
+            hashed = str(userdata.credentials).encode('utf-8')
+            if not bcrypt.checkpw(str(credentials).encode('utf-8'), hashed):
                 logger.error("Connection with wrong credentials")
                 raise OldapError("Wrong credentials")  # On purpose, we are not providing too much information why the login failed
 
+    @staticmethod
+    def _issue_token(userdata: UserData, jwtkey: str, compact: bool = False) -> str:
+        """
+        Creates the JWT token for a logged-in user. The token is valid for one day. By default, the token
+        carries the complete UserData. A compact token carries only the user IRI ("sub"), a new session id
+        ("sid") and the permissions version ("pv"), the UserData is stored in the ~SessionStore.
+
+        :param userdata: The user data of the logged-in user
+        :type userdata: UserData
+        :param jwtkey: The secret used to sign the token
+        :type jwtkey: str
+        :param compact: If True, a compact token is issued
+        :type compact: bool
+        :return: The signed token
+        :rtype: str
+        """
         expiration = datetime.now().astimezone() + timedelta(days=1)
-        payload = {
-            "userdata": json.dumps(self._userdata, default=serializer.encoder_default),
+        if compact:
+            store = SessionStore()
+            version = store.version(userdata.userIri)
+            store.set_userdata(userdata.userIri, version, userdata)
+            payload = {
+                "sub": str(userdata.userIri),
+                "sid": uuid.uuid4().hex,
+                "pv": version,
+            }
+        else:
+            payload = {
+                "userdata": json.dumps(userdata, default=serializer.encoder_default),
+            }
+        payload |= {
             "exp": expiration.timestamp(),
             "iat": int(datetime.now().astimezone().timestamp()),
             "iss": "http://oldap.org"
         }
-        self._token = jwt.encode(
+        return jwt.encode(
             payload=payload,
-            key=self.__jwtkey,
+            key=jwtkey,
             algorithm="HS256")
-        logger.info(f'Connection established. User "{str(self._userdata.userId)}".')
+
+    @staticmethod
+    def _userdata_from_token(token: str, jwtkey: str,
+                             loader: Optional[Callable[[str], UserData]] = None) -> UserData:
+        """
+        Verifies the given JWT token and returns the user data it carries. Tokens that have been verified
+        before are answered by the ~TokenCache; the UserData is then shared and must not be modified.
+        The UserData of compact tokens is taken from the ~SessionStore; if the permissions of the user have
+        changed since it has been stored, it is read again using the loader.
+
+        :param token: The JWT token
+        :type token: str
+        :param jwtkey: The secret used to sign the token
+        :type jwtkey: str
+        :param loader: Reads the UserData of a user (given by IRI) from the triple store (for compact tokens)
+        :type loader: Optional[Callable[[str], UserData]]
+        :return: The user data
+        :rtype: UserData
+        :raises OldapError: If the token is invalid, expired or revoked
+        """
+        cache = TokenCache()
+        userdata = cache.get(token, jwtkey)
+        if userdata is not None:
+            return userdata
+        logger = logging.getLogger(__name__)
+        try:
+            payload = jwt.decode(jwt=token, key=jwtkey, algorithms="HS256")
+        except InvalidTokenError:
+            logger.error("Connection with invalid token")
+            raise OldapError("Wrong credentials")
+        if 'userdata' not in payload:
+            return Connection._userdata_from_session(payload, loader)
+        userdata = json.loads(payload['userdata'], object_hook=serializer.decoder_hook)
+        cache.set(token, jwtkey, userdata, payload.get('exp'))
+        return userdata
+
+    @staticmethod
+    def _userdata_from_session(payload: dict[str, Any], loader: Optional[Callable[[str], UserData]]) -> UserData:
+        """
+        Resolves the UserData of a verified compact token (see ~_issue_token) using the ~SessionStore.
+
+        :param payload: The claims of the token
+        :type payload: dict[str, Any]
+        :param loader: Reads the UserData of a user from the triple store
+        :type loader: Optional[Callable[[str], UserData]]
+        :return: The user data
+        :rtype: UserData
+        :raises OldapError: If the token is malformed or revoked, the user is inactive or the UserData
+            cannot be resolved
+        """
+        logger = logging.getLogger(__name__)
+        userIri, sid = payload.get('sub'), payload.get('sid')
+        if userIri is None or sid is None:
+            logger.error("Connection with invalid token")
+            raise OldapError("Wrong credentials")
+        store = SessionStore()
+        version = store.session_version(userIri, sid)
+        if version is None:
+            logger.error("Connection with token of a revoked session")
+            raise OldapError("Wrong credentials")
+        userdata = store.get_userdata(userIri, version)
+        if userdata is None:
+            if loader is None:
+                raise OldapError(f'The UserData of "{userIri}" is not in the session store and cannot be read')
+            userdata = loader(userIri)
+            store.set_userdata(userIri, version, userdata)
+        if not userdata.isActive:
+            logger.error("Connection with token of an inactive user")
+            raise OldapError("Wrong credentials")
+        return userdata
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'Connection':
+        cls = self.__class__
+        instance = cls.__new__(cls)
+        memo[id(self)] = instance
+        for key, value in self.__dict__.items():
+            if key in ('_session', '_replicas'):
+                setattr(instance, key, value)  # the pooled session and the replica set are shared, never copied
+            else:
+                setattr(instance, key, deepcopy(value, memo))
+        return instance
 
     @staticmethod
     def version(self) -> str:
@@ -268,6 +510,26 @@ class Connection(IConnection):
         """Getter for repository name"""
         return self._repo
 
+    @property
+    def cache_scope(self) -> str:
+        """Scope of the cache: "<server>/<repo>" (see ~CacheKeyspace)"""
+        return f'{self._server}/{self._repo}'
+
+    @property
+    def coalesce_updates(self) -> bool:
+        """
+        If True, consecutive transaction updates are buffered and sent as one SPARQL update request
+        (the operations separated by ";") when the transaction is queried or committed, or when the buffer
+        exceeds OLDAP_COALESCE_MAX_BYTES (default: 512 KiB). This saves a round trip per update.
+        """
+        return self._coalesce_updates
+
+    @coalesce_updates.setter
+    def coalesce_updates(self, value: bool) -> None:
+        if not value and self._transaction_url is not None:
+            self._flush_updates()
+        self._coalesce_updates = value
+
 
     def graph_exists(self, graph: Xsd_QName) -> bool:
         """Checks if the given RDF graph exists in the system.
@@ -328,13 +590,18 @@ class Connection(IConnection):
         }
         data = f"CLEAR GRAPH <{context.qname2iri(graph_iri)}>"
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        req = requests.post(self._update_url,
-                            headers=headers,
-                            data=data,
-                            auth=auth)
+        req = self._session.post(self._update_url,
+                                 headers=headers,
+                                 data=data,
+                                 auth=auth)
         if not req.ok:
             logger.error(f'Clearing of graph "{graph_iri}" failed: {req.text}')
             raise OldapError(req.text)
+        QueryResultCache().invalidate(self._server, self._repo, frozenset({str(context.qname2iri(graph_iri))}))
+        LoginCache().clear()
+        SessionStore().bump()  # invalidates the cached UserData of all processes
+        Connection._invalidate_object_cache(self, graph_iri)
+        self._written()
         logger.info(f'Graph "{graph_iri}" cleared.')
 
     def move_graph(self, from_graph_iri: Xsd_QName, to_graph_iri: Xsd_QName) -> None:
@@ -374,13 +641,20 @@ class Connection(IConnection):
         }
         data = f"MOVE GRAPH <{context.qname2iri(from_graph_iri)}> TO GRAPH <{context.qname2iri(to_graph_iri)}>"
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        req = requests.post(self._update_url,
-                            headers=headers,
-                            data=data,
-                            auth=auth)
+        req = self._session.post(self._update_url,
+                                 headers=headers,
+                                 data=data,
+                                 auth=auth)
         if not req.ok:
             logger.error(f'Moving graph "{from_graph_iri}" to "{to_graph_iri}" failed: {req.text}')
             raise OldapError(req.text)
+        QueryResultCache().invalidate(self._server, self._repo, frozenset({str(context.qname2iri(from_graph_iri)),
+                                                                           str(context.qname2iri(to_graph_iri))}))
+        LoginCache().clear()
+        SessionStore().bump()
+        Connection._invalidate_object_cache(self, from_graph_iri)
+        Connection._invalidate_object_cache(self, to_graph_iri)
+        self._written()
         logger.info(f'Moving graph "{from_graph_iri}" to "{to_graph_iri}" successfully.')
 
     def clear_repo(self) -> None:
@@ -396,12 +670,35 @@ class Connection(IConnection):
         }
         data = {"update": "CLEAR ALL"}
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        req = requests.post(self._update_url,
-                            headers=headers,
-                            data=data,
-                            auth=auth)
+        req = self._session.post(self._update_url,
+                                 headers=headers,
+                                 data=data,
+                                 auth=auth)
         if not req.ok:
             raise OldapError(req.text)
+        QueryResultCache().invalidate(self._server, self._repo, None)
+        LoginCache().clear()
+        SessionStore().bump()
+        Connection._invalidate_object_cache(self, None)
+        self._written()
+
+    @staticmethod
+    def _invalidate_object_cache(con: IConnection, graph: Xsd_QName | None) -> None:
+        """
+        Invalidates the cached objects (data models, classes, lists, ...) read from a graph by bumping the
+        generation of its namespace in the Redis cache (see ~CacheKeyspace). If Redis is not reachable, a
+        warning is logged.
+
+        :param con: The connection the graph has been changed with (gives the scope of the cache)
+        :type con: IConnection
+        :param graph: The graph, None for all graphs
+        :type graph: Xsd_QName | None
+        :return: None
+        """
+        try:
+            CacheSingletonRedis(con).bump_generation(graph_namespace(graph))
+        except redis.RedisError as err:
+            logging.getLogger(__name__).warning(f'Cached objects of graph "{graph}" not invalidated: {err}')
 
     def recompute_inference(self) -> None:
         """
@@ -421,61 +718,199 @@ class Connection(IConnection):
             "Accept": "text/plain"  # or */*, result body is usually empty
         }
 
-        resp = requests.post(url, headers=headers, auth=auth)
+        resp = self._session.post(url, headers=headers, auth=auth)
         if not resp.ok:
             logger.error(f'Recomputation of inference failed: {resp.status_code} {resp.text}.')
             raise OldapError(resp.text)
+        self._written()
 
         logger.info(f'Recomputation of inference successful.')
 
     def upload_turtle(self, filename: str, graphname: Optional[str] = None) -> None:
         """
-        Upload a TTL/TRiG file to GraphDB using the RDF4J /statements endpoint.
+        Upload a TTL/TRiG file to GraphDB using the RDF4J /statements endpoint. The file is streamed
+        (see ~bulk_load), it is never read into memory completely.
 
         This call is synchronous: when it returns without error, the data is loaded.
         """
+        self.bulk_load(filename, graphname)
+
+    def bulk_load(self, filename: str | Path, graphname: Optional[str] = None, *,
+                  batch_size: Optional[int] = None,
+                  compress: bool = False,
+                  chunk_size: int = 1 << 20,
+                  start_batch: int = 0,
+                  progress: Optional[Callable[[BulkLoadProgress], None]] = None) -> BulkLoadProgress:
+        """
+        Loads a (large) RDF file into the triple store in bounded memory using the RDF4J /statements endpoint.
+        Supported are Turtle (.ttl), TriG (.trig), N-Triples (.nt) and N-Quads (.nq), optionally gzip compressed
+        (e.g. "dump.nq.gz").
+
+        Without a batch_size, the file is streamed in chunks within one request (chunked transfer encoding),
+        that is, the load is atomic. With a batch_size, the file is split into batches of at most batch_size
+        statements which are sent one after the other (see ~RdfFile). Each batch is a transaction of its own.
+        If a batch fails, the OldapErrorBulkLoad gives the number of the batch, the load can be resumed by
+        passing it as start_batch.
+
+        :param filename: The RDF file
+        :type filename: str | Path
+        :param graphname: Optional graph IRI all triples are loaded into. For TriG and N-Quads usually
+                          not given, so that the graphs of the file are respected.
+        :type graphname: str | None
+        :param batch_size: Maximal number of statements per request. If None, the file is sent in one request.
+        :type batch_size: int | None
+        :param compress: If True, the request bodies are gzip compressed ("Content-Encoding: gzip"). This requires
+                         a triple store (or a proxy in front of it) that accepts compressed request bodies.
+        :type compress: bool
+        :param chunk_size: Size of the chunks read from the file
+        :type chunk_size: int
+        :param start_batch: Number of the first batch to send (the batches before are skipped)
+        :type start_batch: int
+        :param progress: Callback called with the progress after every batch (or every chunk, if not batched)
+        :type progress: Callable[[BulkLoadProgress], None] | None
+        :return: The final progress (numbers of batches, statements, bytes and the throughput)
+        :rtype: BulkLoadProgress
+        :raises OldapError: If the file format is not supported or the load fails
+        :raises OldapErrorBulkLoad: If a batch fails
+        """
         logger = logging.getLogger(__name__)
+        if batch_size is not None and batch_size < 1:
+            raise OldapErrorValue(f'Batch size must be at least 1, got {batch_size}')
+        rdf = RdfFile(filename)
 
-        ext = Path(filename).suffix.lower()
-        if ext == ".ttl":
-            mime = "text/turtle"
-        elif ext == ".trig":
-            # use the standard MIME type for TriG
-            mime = "application/trig"
-        else:
-            raise OldapError(f"Unsupported RDF extension: {ext}")
-
-        with open(filename, "rb") as f:
-            data = f.read()
-
-        # RDF4J / GraphDB statements endpoint
-        url = f"{self._server.rstrip('/')}/repositories/{self._repo}/statements"
-
-        # Optional context: only use this if you really want to force
-        # all triples into a single named graph. For TriG you usually
-        # leave this empty so the quads' graph IRIs are respected.
-        params = {}
-        if graphname:
-            # GraphDB expects the context IRI wrapped in < > and URL-encoded
-            params["context"] = f"<{graphname}>"
-
+        # GraphDB expects the context IRI wrapped in < > and URL-encoded
+        params = {"context": f"<{graphname}>"} if graphname else {}
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
         headers = {
-            "Content-Type": mime,
+            "Content-Type": rdf.mime,
             "Accept": "text/plain"  # or */*, result body is usually empty
         }
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+
+        status = BulkLoadProgress(filename=str(filename), total_bytes=rdf.size)
+        loaded = False
+        try:
+            with rdf:
+                if batch_size is None:
+                    def body() -> Iterator[bytes]:
+                        if compress and rdf.gzipped:
+                            chunks = rdf.raw_chunks(chunk_size)
+                        elif compress:
+                            chunks = gzip_chunks(rdf.chunks(chunk_size))
+                        else:
+                            chunks = rdf.chunks(chunk_size)
+                        for chunk in chunks:
+                            status.bytes_read = rdf.position
+                            status.bytes_sent += len(chunk)
+                            if progress:
+                                progress(status)
+                            yield chunk
+
+                    loaded = True
+                    resp = self._session.post(self._update_url, params=params, headers=headers, data=body(), auth=auth)
+                    if not resp.ok:
+                        logger.error(f'Upload of file "{filename}" failed: {resp.status_code} {resp.text}')
+                        raise OldapError(resp.text)
+                    status.batches = 1
+                else:
+                    for document, count in rdf.batches(batch_size, chunk_size):
+                        status.bytes_read = rdf.position
+                        if status.batches < start_batch:
+                            status.batches += 1
+                            continue
+                        data = gzip.compress(document) if compress else document
+                        loaded = True
+                        resp = self._session.post(self._update_url, params=params, headers=headers, data=data, auth=auth)
+                        if not resp.ok:
+                            logger.error(f'Batch {status.batches} of file "{filename}" failed: '
+                                         f'{resp.status_code} {resp.text}')
+                            raise OldapErrorBulkLoad(f'Batch {status.batches} of file "{filename}" failed: {resp.text}',
+                                                     batch=status.batches)
+                        status.batches += 1
+                        status.statements += count
+                        status.bytes_sent += len(data)
+                        if progress:
+                            progress(status)
+                    status.bytes_read = status.total_bytes
+        finally:
+            if loaded:
+                QueryResultCache().invalidate(self._server, self._repo, frozenset({graphname}) if graphname else None)
+                LoginCache().clear()
+                SessionStore().bump()
+                context = Context(name=self._context_name)
+                Connection._invalidate_object_cache(self, context.iri2qname(graphname, validate=False)
+                                                    if graphname else None)
+                self._written()
+
+        logger.info(f'File "{filename}" loaded: {status.batches} batch(es), {status.statements} statements, '
+                    f'{status.bytes_read} bytes in {status.elapsed:.1f}s '
+                    f'({status.statements_per_second:.0f} statements/s, {status.bytes_per_second / 1e6:.1f} MB/s).')
+        return status
+
+    def _record(self, kind: str, sparql: str, started: float, res: requests.Response | None, *,
+                rows: int | None = None,
+                cached: bool = False,
+                response_bytes: int | None = None,
+                server: str | None = None) -> None:
+        """
+        Passes a ~QueryEvent for a request to the ~QueryMetrics. Called only if the instrumentation is enabled.
+
+        :param kind: The kind of the request (see ~QueryEvent)
+        :param sparql: The SPARQL text
+        :param started: The value of time.perf_counter() before the request was sent
+        :param res: The response (None, if answered from the ~QueryResultCache)
+        :param rows: The number of result rows
+        :param cached: True, if answered from the ~QueryResultCache
+        :param response_bytes: The size of the response body, if it has been streamed
+        :param server: The server that answered, if not the primary (read replicas)
+        :return: None
+        """
+        seconds = time.perf_counter() - started
+        request_bytes = 0
+        if res is not None:
+            body = res.request.body
+            request_bytes = len(body) if isinstance(body, (str, bytes)) else 0
+            if response_bytes is None:
+                response_bytes = len(res.content)
+        QueryMetrics().record(QueryEvent(kind=kind,
+                                         sparql=sparql,
+                                         seconds=seconds,
+                                         status=res.status_code if res is not None else 200,
+                                         request_bytes=request_bytes,
+                                         response_bytes=response_bytes or 0,
+                                         rows=rows,
+                                         caller=calling_method(),
+                                         cached=cached,
+                                         server=server or self._server,
+                                         repo=self._repo))
+
+    def _post_read(self, headers: dict[str, str], data: dict[str, str],
+                   auth: Optional[HTTPBasicAuth]) -> tuple[str, requests.Response]:
+        """
+        Sends a read query to a replica (if configured and not within the read-your-writes window of the user) or
+        to the primary. If all replicas failed, the primary answers.
 
-        resp = requests.post(url, params=params, headers=headers, data=data, auth=auth)
-
-        if not resp.ok:
-            logger.error(f'Upload of file "{filename}" failed: {resp.status_code} {resp.text}')
-            raise OldapError(resp.text)
+        :return: The server that answered and its response
+        """
+        if self._replicas is not None and not self._replicas.pinned(str(self._userdata.userId)):
+            try:
+                return self._replicas.post(headers=headers, data=data, auth=auth)
+            except requests.RequestException as err:
+                logging.getLogger(__name__).warning(f'No read replica available, reading from the primary: {err}')
+        return self._server, self._session.post(url=self._query_url, headers=headers, data=data, auth=auth)
 
-        logger.info(f'File "{filename}" uploaded synchronously via /statements.')
+    def _written(self) -> None:
+        """Starts the read-your-writes window of the user: reads go to the primary until the replicas caught up"""
+        if self._replicas is not None:
+            self._replicas.written(str(self._userdata.userId), self._read_your_writes)
 
-    def query(self, query: str, format: SparqlResultFormat = SparqlResultFormat.JSON) -> Any:
+    def query(self, query: str, format: SparqlResultFormat = SparqlResultFormat.AUTO) -> Any:
         """
-        Send a SPARQL-query and return the result. The result may be nested dict (in case of JSON) or a text.
+        Send a SPARQL-query and return the result. The result may be nested dict (in case of JSON), a
+        ~SparqlResultTable (in case of TSV or the binary format) or a text. By default, the cheapest result
+        format supported by the triple store is negotiated (see ~SparqlResultFormat.AUTO).
+        If the ~QueryResultCache is enabled, results are answered from the cache if possible.
 
         :param query: SPARQL query as string
         :type query: str
@@ -489,6 +924,20 @@ class Connection(IConnection):
         if not self._userdata:
             logger.error("Not a valid user session.")
             raise OldapError("No login")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        started = time.perf_counter() if QueryMetrics().enabled else None
+        cache = QueryResultCache()
+        key = None
+        if cache.enabled and format in QueryResultCache.FORMATS:
+            key = cache.key(self._server, self._repo, self._userdata.userIri, format, query)
+            hit = cache.get(key)
+            if hit is not None:
+                result = hit.decode(format)
+                if started is not None:
+                    self._record('QUERY', query, started, None, rows=result_rows(result), cached=True)
+                return result
+            generation = cache.generation
         headers = {
             "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
             "Accept": format.value,
@@ -497,16 +946,88 @@ class Connection(IConnection):
             'query': query,
         }
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        res = requests.post(url=self._query_url,
-                            headers=headers,
-                            data=data,
-                            auth=auth)
+        server, res = self._post_read(headers, data, auth)
         if res.status_code == 200:
-            return Connection._switcher[format](res)
+            if key is not None:
+                cache.put(key, res.headers.get('Content-Type', ''), res.content, query_graphs(query), generation)
+            result = Connection._switcher[format](res)
+            if started is not None:
+                self._record('QUERY', query, started, res, rows=result_rows(result), server=server)
+            return result
         else:
+            if started is not None:
+                self._record('QUERY', query, started, res, server=server)
+            logger.error(f"SPARQL query failed: {res.text}")
+            raise OldapError(res.text)
+
+    def query_stream(self, query: str, context: Context, chunk_size: int = 65536) -> Iterator[RowType]:
+        """
+        Sends a SPARQL SELECT query and returns a generator of the result rows. The response is read
+        in chunks and parsed incrementally (see ~SparqlJsonStreamParser), so that rows are yielded as
+        the bytes arrive and at most one row is held in memory. The HTTP connection is returned to the pool
+        once the generator is exhausted or closed.
+
+        :param query: SPARQL SELECT query
+        :type query: str
+        :param context: The context used to convert the IRIs of the result into QNames
+        :type context: Context
+        :param chunk_size: Size of the chunks read from the response
+        :type chunk_size: int
+        :return: Generator of rows
+        :rtype: Iterator[RowType]
+        :raises OldapError: Raised if not logged in or if the query fails. Errors in the result data
+            are raised while iterating.
+        """
+        logger = logging.getLogger(__name__)
+        if not self._userdata:
+            logger.error("Not a valid user session.")
+            raise OldapError("No login")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+            "Accept": SparqlResultFormat.JSON.value,
+        }
+        data = {
+            'query': query,
+        }
+        auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
+        started = time.perf_counter() if QueryMetrics().enabled else None
+        res = self._session.post(url=self._query_url,
+                                 headers=headers,
+                                 data=data,
+                                 auth=auth,
+                                 stream=True)
+        if res.status_code != 200:
             logger.error(f"SPARQL query failed: {res.text}")
+            if started is not None:
+                self._record('QUERY', query, started, res)
+            res.close()
             raise OldapError(res.text)
 
+        def rows() -> Iterator[RowType]:
+            with res:
+                if started is None:
+                    yield from QueryProcessor.stream(context, res.iter_content(chunk_size=chunk_size))
+                    return
+                #
+                # instrumented: the event is recorded when the last row has been read
+                #
+                nbytes = nrows = 0
+
+                def counted() -> Iterator[bytes]:
+                    nonlocal nbytes
+                    for chunk in res.iter_content(chunk_size=chunk_size):
+                        nbytes += len(chunk)
+                        yield chunk
+
+                for row in QueryProcessor.stream(context, counted()):
+                    nrows += 1
+                    yield row
+                self._record('QUERY', query, started, res, rows=nrows, response_bytes=nbytes)
+
+        return rows()
+
     def update_query(self, query: str) -> Dict[str,str]:
         """
         Sends an SPARQL UPDATE query to the triple store.
@@ -524,15 +1045,22 @@ class Connection(IConnection):
         if not self._userdata:
             logger.error("Not a valid user session.")
             raise OldapError("No login")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
         headers = {
             "Accept": "*/*"
         }
         url = f"{self._server}/repositories/{self._repo}/statements"
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        res = requests.post(url, data={"update": query}, headers=headers, auth=auth)
+        started = time.perf_counter() if QueryMetrics().enabled else None
+        res = self._session.post(url, data={"update": query}, headers=headers, auth=auth)
+        if started is not None:
+            self._record('UPDATE', query, started, res)
         if not res.ok:
             logger.error(f"SPARQL update query failed: {res.text}")
             raise OldapError(f'Update query failed. Reason: "{res.text}"')
+        QueryResultCache().invalidate_update(self._server, self._repo, query)
+        self._written()
 
     def transaction_start(self) -> None:
         """
@@ -553,12 +1081,18 @@ class Connection(IConnection):
         }
         url = f"{self._server}/repositories/{self._repo}/transactions"
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        res = requests.post(url, headers=headers, auth=auth)
+        started = time.perf_counter() if QueryMetrics().enabled else None
+        res = self._session.post(url, headers=headers, auth=auth)
+        if started is not None:
+            self._record('TX_START', '', started, res)
         if res.headers.get('location') is None:
             raise OldapError('GraphDB start of transaction failed')
         self._transaction_url = res.headers['location']
+        self._transaction_graphs = frozenset()
+        self._pending_updates = []
+        self._pending_bytes = 0
 
-    def transaction_query(self, query: str, result_format: SparqlResultFormat = SparqlResultFormat.JSON) -> Any:
+    def transaction_query(self, query: str, result_format: SparqlResultFormat = SparqlResultFormat.AUTO) -> Any:
         """
         Executes a SPARQL query against the currently ongoing transaction in GraphDB.
 
@@ -570,7 +1104,7 @@ class Connection(IConnection):
         :param query: The SPARQL query as a string to execute.
         :type query: str
         :param result_format: The expected format of the SPARQL query result. Defaults
-                              to JSON.
+                              to the negotiated format (see ~SparqlResultFormat.AUTO).
         :type result_format: SparqlResultFormat
         :return: The query result in the specified format.
         :rtype: Any
@@ -585,14 +1119,23 @@ class Connection(IConnection):
         }
         if self._transaction_url is None:
             raise OldapError("No GraphDB transaction started")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        self._flush_updates()
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        res = requests.post(self._transaction_url,
-                            data={'action': 'QUERY', 'query': query},
-                            headers=headers,
-                            auth=auth)
+        started = time.perf_counter() if QueryMetrics().enabled else None
+        res = self._session.post(self._transaction_url,
+                                 data={'action': 'QUERY', 'query': query},
+                                 headers=headers,
+                                 auth=auth)
         if not res.ok:
+            if started is not None:
+                self._record('TX_QUERY', query, started, res)
             raise OldapError(f'GraphDB Transaction query failed. Reason: "{res.text}"')
-        return Connection._switcher[result_format](res)
+        result = Connection._switcher[result_format](res)
+        if started is not None:
+            self._record('TX_QUERY', query, started, res, rows=result_rows(result))
+        return result
 
     def transaction_update(self, query: str) -> None:
         """
@@ -603,6 +1146,10 @@ class Connection(IConnection):
         if no GraphDB transaction URL is available. If the request fails, an exception
         is raised containing the reason for the failure.
 
+        If the coalescing of updates is enabled (see ~coalesce_updates), the update is buffered and sent
+        together with the following updates as one request when the transaction is queried or committed,
+        or when the buffer is full. Errors are then raised by the call that sends the buffer.
+
         :param query: The SPARQL update query to execute as part of the current GraphDB
                       transaction.
         :type query: str
@@ -612,19 +1159,81 @@ class Connection(IConnection):
         """
         if not self._userdata:
             raise OldapError("No login")
+        if self._transaction_url is None:
+            raise OldapError("No GraphDB transaction started")
+        if self._prune_prefixes:
+            query = prune_prefixes(query)
+        if QueryResultCache().enabled:
+            self._transaction_graphs = merge_graphs(self._transaction_graphs, update_graphs(query))
+        if not self._coalesce_updates or '_:' in query:
+            #
+            # blank node labels are scoped to the request, statements using them are never combined
+            #
+            self._flush_updates()
+            res = self._post_transaction_update(query)
+            if not res.ok:
+                raise OldapError(f'GraphDB Transaction update failed. Reason: "{res.text}"')
+            return
+        statement = query.strip().rstrip(';')
+        if statement:
+            self._pending_updates.append(statement)
+            self._pending_bytes += len(statement)
+        if self._pending_bytes >= self._coalesce_max_bytes:
+            self._flush_updates()
+
+    def _post_transaction_update(self, update: str) -> requests.Response:
         headers = {
             "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
             "Accept": "*/*"
         }
-        if self._transaction_url is None:
-            raise OldapError("No GraphDB transaction started")
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        res = requests.post(self._transaction_url,
-                            data={'action': 'UPDATE', 'update': query},
-                            headers=headers,
-                            auth=auth)
-        if not res.ok:
+        started = time.perf_counter() if QueryMetrics().enabled else None
+        res = self._session.post(self._transaction_url,
+                                 data={'action': 'UPDATE', 'update': update},
+                                 headers=headers,
+                                 auth=auth)
+        if started is not None:
+            self._record('TX_UPDATE', update, started, res)
+        return res
+
+    def _flush_updates(self) -> None:
+        """
+        Sends the buffered updates of the transaction as one SPARQL update request (the operations
+        are separated by ";"). If the request fails, the error identifies the failing statement if the triple
+        store reports the line of the error.
+
+        :return: None
+        :raises OldapError: If the GraphDB transaction update fails.
+        """
+        if not self._pending_updates:
+            return
+        updates = self._pending_updates
+        self._pending_updates = []
+        self._pending_bytes = 0
+        res = self._post_transaction_update('\n;\n'.join(updates))
+        if res.ok:
+            return
+        if len(updates) == 1:
             raise OldapError(f'GraphDB Transaction update failed. Reason: "{res.text}"')
+        logger = logging.getLogger(__name__)
+        #
+        # find the statement containing the line given in the error message
+        #
+        match = re.search(r'\bline:? (\d+)', res.text)
+        if match:
+            line = int(match.group(1))
+            first_line = 1
+            for index, update in enumerate(updates):
+                first_line += update.count('\n') + 2
+                if line < first_line:
+                    break
+            logger.error(f'Coalesced transaction update {index + 1} of {len(updates)} failed: {updates[index]}')
+            raise OldapError(f'GraphDB Transaction update failed in statement {index + 1} of {len(updates)}. '
+                             f'Reason: "{res.text}". Statement: "{updates[index]}"')
+        for index, update in enumerate(updates):
+            logger.error(f'Coalesced transaction update {index + 1} of {len(updates)}: {update}')
+        raise OldapError(f'GraphDB Transaction update failed in one of {len(updates)} coalesced statements. '
+                         f'Reason: "{res.text}"')
 
     def transaction_commit(self) -> None:
         """
@@ -644,11 +1253,19 @@ class Connection(IConnection):
         }
         if self._transaction_url is None:
             raise OldapError("No GraphDB transaction started")
+        self._flush_updates()
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        res = requests.put(f'{self._transaction_url}?action=COMMIT', headers=headers, auth=auth)
+        started = time.perf_counter() if QueryMetrics().enabled else None
+        res = self._session.put(f'{self._transaction_url}?action=COMMIT', headers=headers, auth=auth)
+        if started is not None:
+            self._record('TX_COMMIT', '', started, res)
         if not res.ok:
             raise OldapError(f'GraphDB transaction commit failed. Reason: "{res.text}"')
         self._transaction_url = None
+        if self._transaction_graphs != frozenset():
+            QueryResultCache().invalidate(self._server, self._repo, self._transaction_graphs)
+        self._transaction_graphs = frozenset()
+        self._written()
 
     def transaction_abort(self) -> None:
         """
@@ -667,11 +1284,17 @@ class Connection(IConnection):
         }
         if self._transaction_url is None:
             raise OldapError("No GraphDB transaction started")
+        self._pending_updates = []
+        self._pending_bytes = 0
         auth = HTTPBasicAuth(self._dbuser, self._dbpassword) if self._dbuser and self._dbpassword else None
-        res = requests.delete(self._transaction_url, headers=headers, auth=auth)
+        started = time.perf_counter() if QueryMetrics().enabled else None
+        res = self._session.delete(self._transaction_url, headers=headers, auth=auth)
+        if started is not None:
+            self._record('TX_ABORT', '', started, res)
         if not res.ok:
             raise OldapError(f'GraphDB transaction abort failed. Reason: "{res.text}"')
         self._transaction_url = None
+        self._transaction_graphs = frozenset()
 
     def in_transaction(self) -> bool:
         """
@@ -693,7 +1316,7 @@ if __name__ == "__main__":
                      credentials="RioGrande",
                      repo="oldap",
                      context_name="DEFAULT")
-    cache = CacheSingletonRedis()
+    cache = CacheSingletonRedis(con)
     cache.clear()
     exitus = input("Nur cache löschen? [Y/N] ?(N):").strip().lower()
     if exitus in ['y', 'yes', 'ja']:
@@ -1,11 +1,14 @@
 import io
 import logging
+import time
 from copy import deepcopy
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, List, Optional, Union, Any, Self, TextIO
 
 from oldaplib.src.cachesingleton import CacheSingleton, CacheSingletonRedis
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, REDIS
+from oldaplib.src.helpers.cache_policy import CacheFamily
 from oldaplib.src.dtypes.namespaceiri import NamespaceIRI
 from oldaplib.src.enums.adminpermissions import AdminPermission
 from oldaplib.src.externalontology import ExternalOntology
@@ -22,6 +25,7 @@ from oldaplib.src.helpers.oldaperror import OldapErrorInconsistency, OldapError,
     OldapErrorNoPermission, OldapErrorNotFound, OldapErrorAlreadyExists
 from oldaplib.src.helpers.query_processor import QueryProcessor
 from oldaplib.src.helpers.semantic_version import SemanticVersion
+from oldaplib.src.helpers.single_flight import SingleFlight
 from oldaplib.src.iconnection import IConnection
 from oldaplib.src.model import Model
 from oldaplib.src.propertyclass import PropertyClass
@@ -424,11 +428,17 @@ class DataModel(Model):
             project = project
         else:
             project = Project.read(con, project)
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(con)
         if not ignore_cache:
-            tmp = cache.get(Xsd_QName(project.projectShortName, 'shacl'), connection=con)
+            key = Xsd_QName(project.projectShortName, 'shacl')
+            tmp = cache.get(key, connection=con, family=CacheFamily.DATAMODEL)
             if tmp is not None:
                 return tmp
+            return SingleFlight().run(key,
+                                      lambda: cache.get(key, connection=con, family=CacheFamily.DATAMODEL),
+                                      lambda: cls.read(con, project, ignore_cache=True),
+                                      cache)
+        started = time.perf_counter() if CacheMetrics().enabled else None
         context = Context(name=con.context_name)
         context[project.projectShortName] = project.namespaceIri
         context.use(project.projectShortName)
@@ -499,14 +509,18 @@ class DataModel(Model):
         jsonobj = con.query(query)
         res = QueryProcessor(context=context, query_result=jsonobj)
         #
-        # now read all standalone properties
+        # now read all standalone properties. The cached ones are fetched from the cache with one round trip,
+        # the missing ones are read from the triple store
         #
+        propclassiris = [Xsd_QName(str(r['prop']).removesuffix("Shape"), validate=False) for r in res]
+        cached = [None] * len(propclassiris) if ignore_cache else cache.get_many(propclassiris, connection=con,
+                                                                                      family=CacheFamily.CLASS)
         propclasses: list[PropertyClass] = []
-        for r in res:
-            projectid = graph
-            propnameshacl = str(r['prop'])
-            propclassiri = propnameshacl.removesuffix("Shape")
-            propclass = PropertyClass.read(con, projectid, Xsd_QName(propclassiri, validate=False), ignore_cache=ignore_cache)
+        for propclassiri, propclass in zip(propclassiris, cached):
+            if propclass is None:
+                propclass = PropertyClass.read(con, graph, propclassiri, ignore_cache=True)
+            else:
+                propclass.update_notifier()
             propclass.force_external()
             propclasses.append(propclass)
         sa_props = {x.property_class_iri: x for x in propclasses}
@@ -526,17 +540,23 @@ class DataModel(Model):
 
         res = QueryProcessor(context=context, query_result=jsonobj)
         #
-        # now read all resource classes
+        # now read all resource classes (the cached ones with one round trip)
         #
+        resclassiris = [Xsd_QName(str(r['shape']).removesuffix("Shape"), validate=False) for r in res]
+        cached = [None] * len(resclassiris) if ignore_cache else cache.get_many(resclassiris, connection=con,
+                                                                                     family=CacheFamily.CLASS)
         resclasses = []
-        for r in res:
-            resnameshacl = str(r['shape'])
-            resclassiri = resnameshacl.removesuffix("Shape")
+        for resclassiri, resclass in zip(resclassiris, cached):
+            if resclass is not None:
+                resclass.update_notifier()
+                resclass.clear_changeset()
+                resclasses.append(resclass)
+                continue
             # TODO: If ignore cache is not True, _prop_changeset of resourceclass is not empty!
             # create empty data model -> update -> add resource without property -> add property -> update
             # _prop_changeset is not empoty after update... ERROR!!!!!!!!!!!!!!!!!!!!!
             try:
-                resclass = ResourceClass.read(con=con, project=project, owl_class_iri=Xsd_QName(resclassiri, validate=False), sa_props=sa_props, ignore_cache=ignore_cache)
+                resclass = ResourceClass.read(con=con, project=project, owl_class_iri=resclassiri, sa_props=sa_props, ignore_cache=True)
                 resclass.clear_changeset()
                 resclasses.append(resclass)
             except OldapError as er:
@@ -552,6 +572,8 @@ class DataModel(Model):
         cache.set(Xsd_QName(project.projectShortName, 'shacl'), instance)
 
         instance.clear_changeset()
+        if started is not None:
+            CacheMetrics().record(REDIS, CacheFamily.DATAMODEL, 'fill', time.perf_counter() - started)
         return instance
 
     def create(self, indent: int = 0, indent_inc: int = 4) -> None:
@@ -647,8 +669,10 @@ class DataModel(Model):
 
         self.clear_changeset()
 
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(Xsd_QName(self._project.projectShortName, 'shacl'), self)
+        # the classes are not cached here, but lookups before may have marked them as not found
+        cache.delete_many(self.__resclasses.keys())
 
     def update(self) -> None:
         """
@@ -702,7 +726,7 @@ class DataModel(Model):
                     #self.__resclasses[qname].delete()
                     change.old_value.delete()
         self.clear_changeset()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(Xsd_QName(self._project.projectShortName, 'shacl'))
         #cache.set(Xsd_QName(self._project.projectShortName, 'shacl'), self)
 
@@ -741,8 +765,8 @@ class DataModel(Model):
         except OldapError as err:
             self._con.transaction_abort()
             raise
-        cache = CacheSingletonRedis()
-        cache.delete(Xsd_QName(self._project.projectShortName, 'shacl'))
+        # the data model, its classes and everything else cached for the project
+        CacheSingletonRedis(self._con).bump_generation(str(self._project.projectShortName))
 
     def __to_trig_format(self, f: TextIO, indent: int = 0, indent_inc: int = 4) -> None:
         """
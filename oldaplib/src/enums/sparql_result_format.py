@@ -5,6 +5,11 @@ from enum import unique, Enum
 class SparqlResultFormat(Enum):
     """
     Enumeration of formats that may be returned by the triple store (if the specific store supports these)
+
+    - _TSV_ and _BINARY_ are the compact tabular formats for SELECT queries (SPARQL 1.1 TSV and the RDF4J binary
+      results table). They are decoded into a ~SparqlResultTable.
+    - _AUTO_ negotiates the cheapest format the triple store supports (binary, then TSV, then JSON). ASK queries
+      are always answered in JSON. The result is decoded according to the content type of the response.
     """
     XML ="application/sparql-results+xml"
     JSON = "application/x-sparqlstar-results+json, application/sparql-results+json;q=0.9, */*;q=0.8" # Accept: application/x-sparqlstar-results+json, application/sparql-results+json;q=0.9, */*;q=0.8
@@ -15,3 +20,6 @@ class SparqlResultFormat(Enum):
     TRIX = "application/trix"
     TRIG = "application/x-trig"
     TEXT = "text/plain"
+    TSV = "text/tab-separated-values"
+    BINARY = "application/x-binary-rdf-results-table"
+    AUTO = "application/x-binary-rdf-results-table, text/tab-separated-values;q=0.9, application/x-sparqlstar-results+json;q=0.8, application/sparql-results+json;q=0.7, */*;q=0.5"
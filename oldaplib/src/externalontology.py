@@ -200,7 +200,7 @@ class ExternalOntology(Model, Notify):
         self._modified = timestamp
         self._contributor = self._con.userIri
         #context[self._attributes[ExternalOntologyAttr.PREFIX]] = NamespaceIRI(str(self._attributes[ExternalOntologyAttr.NAMESPACE_IRI]))
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self.__extonto_qname, self)
 
     @classmethod
@@ -217,7 +217,7 @@ class ExternalOntology(Model, Notify):
         else:
             extonto_qname = Xsd_QName(projectShortName, Xsd_NCName(prefix, validate=validate), validate=validate)
         if not ignore_cache:
-            cache = CacheSingletonRedis()
+            cache = CacheSingletonRedis(con)
             tmp = cache.get(extonto_qname, connection=con)
             if tmp is not None:
                 tmp.update_notifier()
@@ -279,7 +279,7 @@ class ExternalOntology(Model, Notify):
                        comment=comment,
                        validate=False)
         instance.update_notifier()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(con)
         cache.set(instance.__extonto_qname, instance)
         return instance
 
@@ -318,7 +318,7 @@ class ExternalOntology(Model, Notify):
         result: list[ExternalOntology] = []
         working_on: Xsd_QName | None = None
         data: dict = {}
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(con)
         for r in res:
             if working_on is None or working_on != r['extonto']:
                 if working_on:
@@ -411,7 +411,7 @@ class ExternalOntology(Model, Notify):
             raise
         self._modified = timestamp
         self._contributor = self._con.userIri  # TODO: move creator, created etc. to Model!
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self.__extonto_qname, self)
 
     def in_use_queries(self) -> (str, str):
@@ -511,7 +511,7 @@ class ExternalOntology(Model, Notify):
             raise OldapErrorInUse("External ontology is used in the data.")
         self.safe_update(sparql)
         self._con.transaction_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__extonto_qname)
 
     @classmethod
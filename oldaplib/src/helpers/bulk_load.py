@@ -0,0 +1,351 @@
+"""
+# Bulk loading of RDF files
+
+Helpers for `Connection.bulk_load()`, which loads (possibly very large) RDF files into the triple store
+in bounded memory:
+
+- `RdfFile` opens Turtle (.ttl), TriG (.trig), N-Triples (.nt) and N-Quads (.nq) files, optionally gzip
+  compressed (e.g. "dump.nq.gz"). The file is either streamed in chunks (one request, chunked transfer encoding)
+  or split into batches of a bounded number of statements. Every batch is a complete document in the format of
+  the file which repeats the prefix declarations that precede it.
+- `gzip_chunks()` compresses a stream of chunks on the fly (for "Content-Encoding: gzip").
+- `BulkLoadProgress` reports the progress and the throughput of a load.
+
+N-Triples and N-Quads files are split at line ends. Turtle and TriG files are split at the end of the statements
+by a tokenizer which understands literals, IRIs, comments, blank node property lists, collections, quoted
+triples (RDF-star) and graph blocks
+(a large graph block is split into several blocks for the same graph).
+
+_Note_: The triple store scopes blank node labels (e.g. "_:b1") to a request. A blank node label that is
+used in statements of different batches therefore results in different blank nodes. Anonymous blank nodes
+("[ ... ]") are always within one statement and are not affected. Load data with labelled blank nodes without
+batching.
+"""
+import gzip
+import io
+import os
+import re
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterator, Iterable
+
+from oldaplib.src.helpers.oldaperror import OldapError
+
+RDF_MIME_TYPES = {
+    '.ttl': 'text/turtle',
+    '.trig': 'application/trig',
+    '.nt': 'application/n-triples',
+    '.nq': 'application/n-quads',
+}
+
+_STRING = r'"""(?:[^"\\]|\\.|"(?!""))*"""|' \
+          r"'''(?:[^'\\]|\\.|'(?!''))*'''|" \
+          r'"(?:[^"\\\n]|\\.)*"(?!")|' \
+          r"'(?:[^'\\\n]|\\.)*'(?!')"  # an empty short string is never followed by a quote
+_DELIMITERS = r'\s"\'<>#{}\[\]();,.'
+_TOKEN = re.compile(r'(?P<string>' + _STRING + r')'
+                    r'|(?P<open><<|[\[(])'
+                    r'|(?P<close>>>|[\])])'
+                    r'|(?P<iri><[^>\n]*>)'
+                    r'|(?P<comment>#[^\n]*)'
+                    r'|(?P<ws>\s+)'
+                    r'|(?P<lbrace>\{)'
+                    r'|(?P<rbrace>\})'
+                    r'|(?P<dot>\.)'
+                    r'|(?P<word>(?:[^' + _DELIMITERS + r']|\.(?=[^' + _DELIMITERS + r']))+|[;,])', re.S)
+_AT_DIRECTIVE = re.compile(r'@(?:prefix|base)\b', re.I)
+_SPARQL_DIRECTIVE = re.compile(r'(?:PREFIX|BASE)\s', re.I)
+_GRAPH_KEYWORD = re.compile(r'^GRAPH\s+', re.I)
+
+
+@dataclass
+class BulkLoadProgress:
+    """
+    Progress of a bulk load. It is passed to the progress callback of `Connection.bulk_load()` after every
+    request (or every chunk of an unbatched load) and returned at the end.
+
+    :ivar filename: The file being loaded
+    :ivar total_bytes: Size of the file
+    :ivar bytes_read: Number of bytes of the file read so far
+    :ivar bytes_sent: Number of bytes sent to the triple store (after compression)
+    :ivar batches: Number of batches processed (including skipped batches). When a batch fails, this is the
+        number of the failed batch, which can be passed as `start_batch` to resume the load.
+    :ivar statements: Number of statements sent (unknown for unbatched loads)
+    """
+    filename: str
+    total_bytes: int = 0
+    bytes_read: int = 0
+    bytes_sent: int = 0
+    batches: int = 0
+    statements: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the start of the load"""
+        return time.monotonic() - self.started
+
+    @property
+    def fraction(self) -> float:
+        """Fraction of the file read (0.0 - 1.0)"""
+        return self.bytes_read / self.total_bytes if self.total_bytes else 1.0
+
+    @property
+    def statements_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.statements / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Throughput in bytes of the file per second"""
+        elapsed = self.elapsed
+        return self.bytes_read / elapsed if elapsed > 0 else 0.0
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Compresses a stream of chunks with gzip.
+
+    :param chunks: The uncompressed chunks
+    :type chunks: Iterable[bytes]
+    :param level: The compression level (1 - 9)
+    :type level: int
+    :return: Generator of the compressed chunks
+    :rtype: Iterator[bytes]
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class RdfFile:
+    """
+    An RDF file opened for bulk loading. Use it as context manager:
+
+    ```python
+    with RdfFile("dump.nq.gz") as rdf:
+        for document, count in rdf.batches(100000):
+            ...
+    ```
+    """
+    filename: str
+    mime: str
+    gzipped: bool
+    _raw: BinaryIO | None
+    _stream: BinaryIO | None
+
+    def __init__(self, filename: str | Path) -> None:
+        """
+        Constructor. The format is given by the extension of the file, an additional ".gz" extension
+        denotes a gzip compressed file.
+
+        :param filename: The file
+        :type filename: str | Path
+        :raises OldapError: If the extension is not supported
+        """
+        path = Path(filename)
+        self.filename = str(filename)
+        suffixes = [s.lower() for s in path.suffixes]
+        self.gzipped = bool(suffixes) and suffixes[-1] == '.gz'
+        ext = suffixes[-2] if self.gzipped and len(suffixes) > 1 else (suffixes[-1] if suffixes else '')
+        mime = RDF_MIME_TYPES.get(ext)
+        if mime is None:
+            raise OldapError(f"Unsupported RDF extension: {ext}")
+        self.mime = mime
+        self._ext = ext
+        self._raw = None
+        self._stream = None
+
+    def __enter__(self) -> 'RdfFile':
+        self._raw = open(self.filename, 'rb')
+        self._stream = gzip.GzipFile(fileobj=self._raw, mode='rb') if self.gzipped else self._raw
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+
+    @property
+    def size(self) -> int:
+        """Size of the file (compressed, if it is gzipped)"""
+        return os.path.getsize(self.filename)
+
+    @property
+    def position(self) -> int:
+        """Number of bytes of the file read so far"""
+        return self._raw.tell()
+
+    def raw_chunks(self, chunk_size: int) -> Iterator[bytes]:
+        """
+        Returns the content of the file as it is stored (i.e. compressed if the file is gzipped).
+
+        :param chunk_size: The size of the chunks
+        :type chunk_size: int
+        :return: Generator of chunks
+        :rtype: Iterator[bytes]
+        """
+        while chunk := self._raw.read(chunk_size):
+            yield chunk
+
+    def chunks(self, chunk_size: int) -> Iterator[bytes]:
+        """
+        Returns the (uncompressed) content of the file in chunks.
+
+        :param chunk_size: The size of the chunks
+        :type chunk_size: int
+        :return: Generator of chunks
+        :rtype: Iterator[bytes]
+        """
+        while chunk := self._stream.read(chunk_size):
+            yield chunk
+
+    def batches(self, batch_size: int, chunk_size: int = 1 << 20) -> Iterator[tuple[bytes, int]]:
+        """
+        Splits the file into documents of at most batch_size statements.
+
+        :param batch_size: The maximal number of statements of a batch
+        :type batch_size: int
+        :param chunk_size: The size of the chunks read from the file
+        :type chunk_size: int
+        :return: Generator of (document, number of statements)
+        :rtype: Iterator[tuple[bytes, int]]
+        :raises OldapError: If a Turtle/TriG file is truncated
+        """
+        text = io.TextIOWrapper(self._stream, encoding='utf-8', newline='')
+        try:
+            if self._ext in ('.nt', '.nq'):
+                yield from _line_batches(text, batch_size)
+            else:
+                yield from _TurtleSplitter(batch_size).batches(text, chunk_size)
+        finally:
+            text.detach()
+
+
+def _line_batches(text: io.TextIOWrapper, batch_size: int) -> Iterator[tuple[bytes, int]]:
+    lines = []
+    for line in text:
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        lines.append(stripped)
+        if len(lines) >= batch_size:
+            yield ('\n'.join(lines) + '\n').encode('utf-8'), len(lines)
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8'), len(lines)
+
+
+class _TurtleSplitter:
+    """
+    Splits a Turtle or TriG document into statements and reassembles them into batches. Each batch starts with
+    the directives (prefixes, base) seen before, the statements of a graph block are wrapped in a block for
+    the same graph.
+    """
+
+    def __init__(self, batch_size: int) -> None:
+        self._batch_size = batch_size
+        self._directives: list[str] = []
+        self._header: list[str] = []
+        self._units: list[tuple[bool, str | None, str]] = []  # (is directive, graph, text)
+        self._count = 0
+        self._graph: str | None = None
+        self._in_block = False
+        self._depth = 0
+        self._stmt: list[str] = []
+
+    def batches(self, text: io.TextIOWrapper, chunk_size: int) -> Iterator[tuple[bytes, int]]:
+        buf = ''
+        final = False
+        while not final:
+            chunk = text.read(chunk_size)
+            final = not chunk
+            buf += chunk
+            pos = 0
+            while pos < len(buf):
+                m = _TOKEN.match(buf, pos)
+                if m is None or (not final and m.end() + 1 >= len(buf)):
+                    if final:
+                        raise OldapError(f'Invalid Turtle/TriG: unexpected "{buf[pos:pos + 20]}"')
+                    break  # the token might continue in the next chunk
+                pos = m.end()
+                self._token(m.lastgroup, m.group())
+                if self._count >= self._batch_size:
+                    yield self._flush()
+            buf = buf[pos:]
+        if ''.join(self._stmt).strip() or self._in_block:
+            raise OldapError('Invalid Turtle/TriG: truncated document')
+        if self._units:
+            yield self._flush()
+
+    def _token(self, kind: str, text: str) -> None:
+        match kind:
+            case 'ws' | 'comment':
+                if self._stmt:
+                    self._stmt.append('\n' if kind == 'comment' else ' ')
+            case 'open':
+                self._depth += 1
+                self._stmt.append(text)
+            case 'close':
+                self._depth -= 1
+                self._stmt.append(text)
+            case 'lbrace' if self._depth == 0 and not self._in_block:
+                self._graph = _GRAPH_KEYWORD.sub('', ''.join(self._stmt).strip())
+                self._in_block = True
+                self._stmt = []
+            case 'rbrace' if self._depth == 0 and self._in_block:
+                self._statement()
+                self._in_block = False
+                self._graph = None
+            case 'dot' if self._depth == 0:
+                self._statement()
+            case 'iri':
+                self._stmt.append(text)
+                if not self._in_block and self._depth == 0 and _SPARQL_DIRECTIVE.match(''.join(self._stmt).lstrip()):
+                    self._directive(''.join(self._stmt).strip())
+                    self._stmt = []
+            case _:
+                self._stmt.append(text)
+
+    def _statement(self) -> None:
+        stmt = ''.join(self._stmt).strip()
+        self._stmt = []
+        if not stmt:
+            return
+        if not self._in_block and _AT_DIRECTIVE.match(stmt):
+            self._directive(stmt + ' .')
+            return
+        self._units.append((False, self._graph if self._in_block else None, stmt))
+        self._count += 1
+
+    def _directive(self, directive: str) -> None:
+        self._directives.append(directive)
+        self._units.append((True, None, directive))
+
+    def _flush(self) -> tuple[bytes, int]:
+        lines = list(self._header)
+        graph = None
+        count = 0
+        for is_directive, unit_graph, text in self._units:
+            if unit_graph != graph:
+                if graph is not None:
+                    lines.append('}')
+                if unit_graph is not None:
+                    lines.append(f'{unit_graph} {{')
+                graph = unit_graph
+            if is_directive:
+                lines.append(text)
+            else:
+                lines.append(f'{text} .')
+                count += 1
+        if graph is not None:
+            lines.append('}')
+        self._header = list(self._directives)
+        self._units = []
+        self._count = 0
+        return ('\n'.join(lines) + '\n').encode('utf-8'), count
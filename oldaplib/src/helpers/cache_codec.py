@@ -0,0 +1,220 @@
+"""
+# CacheCodec
+
+Codecs for the values stored in the Redis cache (see `CacheSingletonRedis`).
+
+- _JsonCodec_ ("json"): The original format, `json.dumps(value, default=serializer.encoder_default)`. The values
+  are written without header, so that they can be read by all versions of oldaplib.
+- _BinaryCodec_ ("binary"): msgpack. The class names of the serialized objects are replaced by indexes into a
+  class table stored once per value. Values larger than a threshold are compressed with zlib.
+
+Values of the binary codec start with a versioned header (magic, header version, codec id, flags). A value
+without header is JSON. `decode()` reads all formats, independent of the configured codec. A new codec can
+therefore be rolled out gradually: first deploy a version that reads it everywhere, then switch the writers.
+
+The codec is configured by the following environment variables:
+
+- _OLDAP_CACHE_CODEC_: "json" or "binary" (default: json)
+- _OLDAP_CACHE_COMPRESS_MIN_: Minimal size of a value in bytes to be compressed by the binary codec,
+  "0" disables compression (default: 4096)
+"""
+import json
+import os
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any
+
+import msgpack
+
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.serializer import serializer
+
+MAGIC = b'\x00oc'
+"""Start of a value with header. JSON never starts with a NUL byte."""
+
+HEADER_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+FLAG_ZLIB = 0x01
+
+_CLASS_KEY = b'c'  # bytes are never keys of values that can be serialized as JSON
+
+
+class CacheCodec(ABC):
+    """
+    Encodes cache values to bytes and back. Subclasses are registered with `register_codec()`.
+
+    :ivar name: The name of the codec (used by OLDAP_CACHE_CODEC)
+    :type name: str
+    :ivar codec_id: The id of the codec in the header (0 is reserved for JSON without header)
+    :type codec_id: int
+    """
+    name: str
+    codec_id: int
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        """
+        Encodes a value.
+
+        :param value: The value (an object serializable by the ~serializer)
+        :type value: Any
+        :return: The encoded value
+        :rtype: bytes
+        """
+        pass
+
+    @abstractmethod
+    def decode_payload(self, payload: bytes, connection: Any | None = None) -> Any:
+        """
+        Decodes the payload of a value (without header, decompressed).
+
+        :param payload: The payload
+        :type payload: bytes
+        :param connection: The connection the decoded objects are bound to
+        :type connection: IConnection | None
+        :return: The value
+        :rtype: Any
+        """
+        pass
+
+
+class JsonCodec(CacheCodec):
+    """
+    The original JSON format, written without header.
+    """
+    name = 'json'
+    codec_id = 0
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, default=serializer.encoder_default).encode('utf-8')
+
+    def decode_payload(self, payload: bytes, connection: Any | None = None) -> Any:
+        if connection:
+            return json.loads(payload, object_hook=serializer.make_decoder_hook(connection=connection))
+        return json.loads(payload, object_hook=serializer.decoder_hook)
+
+
+class BinaryCodec(CacheCodec):
+    """
+    msgpack with a table of the class names and optional zlib compression. Values that cannot be represented
+    by msgpack (e.g. integers with more than 64 bits) are written as JSON.
+
+    :ivar compress_min: Minimal size of a payload in bytes to be compressed (0 disables compression)
+    :type compress_min: int
+    """
+    name = 'binary'
+    codec_id = 1
+
+    def __init__(self, compress_min: int | None = None) -> None:
+        if compress_min is None:
+            compress_min = int(os.getenv("OLDAP_CACHE_COMPRESS_MIN", "4096"))
+        self.compress_min = compress_min
+
+    def encode(self, value: Any) -> bytes:
+        classes: dict[str, int] = {}
+
+        def default(obj: Any) -> dict:
+            d = serializer.encoder_default(obj)
+            classname = d.pop(serializer._key)
+            d[_CLASS_KEY] = classes.setdefault(classname, len(classes))
+            return d
+
+        try:
+            body = msgpack.packb(value, default=default, use_bin_type=True)
+        except (OverflowError, ValueError, TypeError, AttributeError):
+            return JSON_CODEC.encode(value)
+        payload = msgpack.packb(list(classes), use_bin_type=True) + body
+        flags = 0
+        if 0 < self.compress_min <= len(payload):
+            compressed = zlib.compress(payload, 1)
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= FLAG_ZLIB
+        return MAGIC + bytes((HEADER_VERSION, self.codec_id, flags)) + payload
+
+    def decode_payload(self, payload: bytes, connection: Any | None = None) -> Any:
+        table: list[str] = []
+
+        def hook(d: dict) -> Any:
+            classid = d.pop(_CLASS_KEY, None)
+            if classid is None:
+                return d
+            d[serializer._key] = table[classid]
+            return serializer.decoder_hook(d, connection=connection)
+
+        unpacker = msgpack.Unpacker(object_hook=hook, raw=False, strict_map_key=False, max_buffer_size=0)
+        unpacker.feed(payload)
+        table.extend(unpacker.unpack())
+        return unpacker.unpack()
+
+
+JSON_CODEC = JsonCodec()
+
+_codecs: dict[int, CacheCodec] = {}
+_codecs_by_name: dict[str, CacheCodec] = {}
+
+
+def register_codec(codec: CacheCodec) -> None:
+    """
+    Registers a codec, so that its values can be decoded and it can be selected by name.
+
+    :param codec: The codec
+    :type codec: CacheCodec
+    :return: None
+    :raises OldapErrorValue: If the id or name is already used by another codec
+    """
+    for registered in (_codecs.get(codec.codec_id), _codecs_by_name.get(codec.name)):
+        if registered is not None and type(registered) is not type(codec):
+            raise OldapErrorValue(f'Codec "{codec.name}" ({codec.codec_id}) conflicts with "{registered.name}"')
+    _codecs[codec.codec_id] = codec
+    _codecs_by_name[codec.name] = codec
+
+
+register_codec(JSON_CODEC)
+register_codec(BinaryCodec())
+
+
+def get_codec(name: str | None = None) -> CacheCodec:
+    """
+    Returns a registered codec.
+
+    :param name: The name of the codec. If None, the environment variable OLDAP_CACHE_CODEC decides
+        (default: json)
+    :type name: str | None
+    :return: The codec
+    :rtype: CacheCodec
+    :raises OldapErrorValue: If there is no codec with this name
+    """
+    if name is None:
+        name = os.getenv("OLDAP_CACHE_CODEC", "json").lower()
+    codec = _codecs_by_name.get(name)
+    if codec is None:
+        raise OldapErrorValue(f'Unknown cache codec "{name}" (known: {", ".join(_codecs_by_name)})')
+    return codec
+
+
+def decode(data: bytes, connection: Any | None = None) -> Any:
+    """
+    Decodes a value written by any registered codec.
+
+    :param data: The encoded value
+    :type data: bytes
+    :param connection: The connection the decoded objects are bound to
+    :type connection: IConnection | None
+    :return: The value
+    :rtype: Any
+    :raises OldapErrorValue: If the header version or the codec is unknown
+    """
+    if not data.startswith(MAGIC):
+        return JSON_CODEC.decode_payload(data, connection)
+    version, codec_id, flags = data[len(MAGIC):HEADER_SIZE]
+    if version != HEADER_VERSION:
+        raise OldapErrorValue(f'Unsupported cache value header version {version}')
+    codec = _codecs.get(codec_id)
+    if codec is None:
+        raise OldapErrorValue(f'Unknown cache codec id {codec_id}')
+    payload = data[HEADER_SIZE:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    return codec.decode_payload(payload, connection)
@@ -0,0 +1,232 @@
+"""
+# CacheMetrics
+
+Statistics of the object caches, to tune the ~CachePolicy settings (sizes, time to live) from data. The
+statistics are kept per cache tier and key family (see `CacheFamily`):
+
+- _tiers_: "redis" (`CacheSingletonRedis`) and "local" (the in-process `CacheSingleton` used by `dump_list_to`)
+- _counters_: hits, misses, sets and fills (objects rebuilt from the triple store after a miss)
+- _latency histograms_ of the operations: "get" (round trip to the cache), "decode" (deserialization of a
+  value), "set" (serialization and round trip) and "fill" (rebuild from the triple store)
+- _size histogram_ of the serialized values read and written, in bytes
+
+`CacheMetrics().snapshot()` returns all statistics as a dict that can be serialized as JSON, together with the
+counters of the in-process cache (entries, bytes, evictions, expirations), of the ~NearCache and optionally
+of the Redis server (evicted and expired keys). `reset()` discards them.
+
+The statistics are disabled by default. If they are disabled, a cache operation costs a single attribute check.
+They are configured by the following environment variable (or by calling `configure()`):
+
+- _OLDAP_CACHE_METRICS_: "true" enables the statistics (default: false)
+"""
+import os
+from bisect import bisect_left
+from threading import Lock
+from typing import Any
+
+from oldaplib.src.helpers.cache_policy import CacheFamily
+from oldaplib.src.helpers.near_cache import NearCache
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+
+LATENCY_BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+"""Upper bounds of the buckets of the latency histograms in milliseconds (plus one bucket for longer operations)"""
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+"""Upper bounds of the buckets of the size histograms in bytes (plus one bucket for larger values)"""
+
+REDIS = 'redis'
+LOCAL = 'local'
+
+
+class Histogram:
+    """
+    Count, sum, maximum and bucket counts of a measured quantity.
+    """
+    __slots__ = ('bounds', 'count', 'total', 'max', 'buckets')
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(bounds) + 1)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.buckets[bisect_left(self.bounds, value)] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Returns an estimate of the given percentile: the upper bound of the bucket containing the percentile,
+        but at most the maximum.
+
+        :param p: The percentile (0 - 100)
+        :type p: float
+        :return: The estimate
+        :rtype: float
+        """
+        if self.count == 0:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n > 0:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        return {'count': self.count, 'mean': self.mean, 'p50': self.percentile(50), 'p95': self.percentile(95),
+                'p99': self.percentile(99), 'max': self.max, 'buckets': list(self.buckets)}
+
+
+class CacheFamilyStats:
+    """
+    The statistics of a key family in a cache tier.
+    """
+    __slots__ = ('hits', 'misses', 'sets', 'fills', 'latency_ms', 'size')
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.fills = 0
+        self.latency_ms: dict[str, Histogram] = {}
+        self.size = Histogram(SIZE_BUCKETS)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def latency(self, operation: str) -> Histogram:
+        histogram = self.latency_ms.get(operation)
+        if histogram is None:
+            histogram = self.latency_ms[operation] = Histogram(LATENCY_BUCKETS_MS)
+        return histogram
+
+    def as_dict(self) -> dict[str, Any]:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hit_ratio, 'sets': self.sets,
+                'fills': self.fills,
+                'latency_ms': {operation: h.as_dict() for operation, h in self.latency_ms.items()},
+                'bytes': self.size.as_dict()}
+
+
+class CacheMetrics(metaclass=SingletonMeta):
+    """
+    Singleton collecting the statistics of the caches of the process. `enabled` is checked by the caches before
+    they measure anything.
+    """
+    enabled: bool
+    _stats: dict[tuple[str, CacheFamily], CacheFamilyStats]
+    _lock: Lock
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = Lock()
+        self.configure(enabled=os.getenv("OLDAP_CACHE_METRICS", "false").lower() in ("1", "true", "yes"))
+
+    def configure(self, *, enabled: bool | None = None) -> None:
+        """
+        Changes the configuration. The collected statistics are kept.
+
+        :param enabled: True enables the statistics
+        :type enabled: bool | None
+        :return: None
+        """
+        if enabled is not None:
+            self.enabled = enabled
+
+    def _family(self, tier: str, family: CacheFamily) -> CacheFamilyStats:
+        stats = self._stats.get((tier, family))
+        if stats is None:
+            stats = self._stats.setdefault((tier, family), CacheFamilyStats())
+        return stats
+
+    def lookup(self, tier: str, family: CacheFamily, hit: bool, size: int | None = None) -> None:
+        """
+        Records a lookup of a key.
+
+        :param tier: The cache tier ("redis" or "local")
+        :param family: The family of the key
+        :param hit: True if the value was in the cache
+        :param size: The size of the serialized value in bytes
+        :return: None
+        """
+        with self._lock:
+            stats = self._family(tier, family)
+            if hit:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+            if size is not None:
+                stats.size.add(size)
+
+    def record(self, tier: str, family: CacheFamily, operation: str, seconds: float, size: int | None = None) -> None:
+        """
+        Records an operation ("get", "decode", "set" or "fill").
+
+        :param tier: The cache tier ("redis" or "local")
+        :param family: The family of the value
+        :param operation: The operation
+        :param seconds: The time of the operation
+        :param size: The size of the serialized value in bytes
+        :return: None
+        """
+        with self._lock:
+            stats = self._family(tier, family)
+            match operation:
+                case 'set':
+                    stats.sets += 1
+                case 'fill':
+                    stats.fills += 1
+            stats.latency(operation).add(seconds * 1000.0)
+            if size is not None:
+                stats.size.add(size)
+
+    def stats(self, tier: str, family: CacheFamily) -> CacheFamilyStats | None:
+        return self._stats.get((tier, family))
+
+    def snapshot(self, server: bool = False) -> dict[str, Any]:
+        """
+        Returns the statistics as dict (serializable as JSON): the statistics per tier and family
+        ("redis.datamodel", "local.list", ...), the counters of the in-process cache ("local") and of the
+        near-cache ("near").
+
+        :param server: If True, the key statistics of the Redis server are added ("server": evicted and expired
+            keys, keyspace hits and misses, used memory). Redis does not count them per family.
+        :type server: bool
+        :return: The statistics
+        :rtype: dict[str, Any]
+        """
+        from oldaplib.src.cachesingleton import CacheSingleton, CacheSingletonRedis  # they import this module
+
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: (item[0][0], item[0][1].value))
+            result: dict[str, Any] = {f'{tier}.{family.value}': stats.as_dict() for (tier, family), stats in items}
+        result[LOCAL] = CacheSingleton().stats()
+        near = NearCache()
+        result['near'] = {'entries': len(near), 'bytes': near.size, 'hits': near.hits, 'misses': near.misses,
+                          'evictions': near.evictions}
+        if server:
+            result['server'] = CacheSingletonRedis().server_stats()
+        return result
+
+    def reset(self) -> None:
+        """
+        Discards the statistics (including the counters of the in-process cache and of the near-cache).
+
+        :return: None
+        """
+        from oldaplib.src.cachesingleton import CacheSingleton  # the caches import this module
+
+        with self._lock:
+            self._stats = {}
+        CacheSingleton().reset_stats()
+        NearCache().reset_stats()
@@ -0,0 +1,161 @@
+"""
+# CacheNamespace
+
+Namespaces and generation counters of the keys of the Redis cache (see `CacheSingletonRedis`).
+
+The objects of a project (data model, property and resource classes, lists, roles, external ontologies) are
+cached with QName keys "<project>:<name>", their namespace is the project short name. Keys of other namespaces
+are given explicitly as `CacheKey` (e.g. the not-found markers of media objects in the namespace "media"). All
+other keys (users, and projects by IRI or short name) are in the namespace "admin".
+
+In Redis, a value is stored under the key "oldap:<scope>:<namespace>:<epoch>.<generation>:<key>":
+
+- _scope_: The triple store the values have been read from, "<server>/<repository>" of the connection
+- _generation_: Counter of the namespace, stored under "oldap:gen:<scope>:<namespace>"
+- _epoch_: Counter of the scope, stored under "oldap:gen:<scope>"
+
+Incrementing a generation makes all keys of the namespace unreachable at once, incrementing the epoch all keys
+of the scope. This is done when a project's data model or graph is deleted, or a graph is cleared or loaded. The
+keys of older generations expire with the time to live of their ~CachePolicy or are removed by
+`CacheSingletonRedis.collect_garbage()`.
+
+The counters are written without expiration. If Redis evicts keys (maxmemory), a "volatile-*" policy must be
+used, so that the counters are never evicted.
+
+The scope is given by the connection (see ~IConnection.cache_scope), so that connections to different
+repositories in the same process do not share keys and generations. Without a connection, the scope is
+"<OLDAP_TS_SERVER>/<OLDAP_TS_REPO>". It can be overridden by the following environment variable:
+
+- _OLDAP_CACHE_SCOPE_: Scope of all cache keys of the process
+"""
+import os
+from typing import Self
+
+from oldaplib.src.xsd.iri import Iri
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+
+ADMIN_NAMESPACE = 'admin'
+"""Namespace of the users and projects"""
+
+MEDIA_NAMESPACE = 'media'
+"""Namespace of the lookups of media objects"""
+
+SYSTEM_PREFIX = 'oldap'
+"""Prefix of the graphs of the system project, which are used by all projects"""
+
+
+class CacheKey(str):
+    """
+    A cache key with an explicit namespace, for values that are not identified by an IRI or QName.
+
+    :ivar namespace: The namespace
+    :type namespace: str
+    """
+    namespace: str
+
+    def __new__(cls, namespace: str, key: str) -> Self:
+        instance = super().__new__(cls, key)
+        instance.namespace = namespace
+        return instance
+
+
+def namespace_of(key: Iri | Xsd_NCName | Xsd_QName | CacheKey | str) -> str:
+    """
+    Returns the namespace of a cache key: the namespace of a `CacheKey`, the prefix of a QName, "admin" for all
+    other keys.
+
+    :param key: The cache key
+    :type key: Iri | Xsd_NCName | Xsd_QName | CacheKey | str
+    :return: The namespace
+    :rtype: str
+    """
+    if isinstance(key, CacheKey):
+        return key.namespace
+    if isinstance(key, Xsd_QName) or (isinstance(key, Iri) and key.is_qname):
+        return str(key.prefix)
+    return ADMIN_NAMESPACE
+
+
+def graph_namespace(graph: Xsd_QName | None) -> str | None:
+    """
+    Returns the namespace to invalidate if a graph changes. The graphs of the system project ("oldap:admin",
+    "oldap:shacl", ...) are used by all projects, they invalidate the whole scope (None).
+
+    :param graph: The graph as QName, None for all graphs
+    :type graph: Xsd_QName | None
+    :return: The namespace, or None for all namespaces
+    :rtype: str | None
+    """
+    if graph is None or graph.prefix == SYSTEM_PREFIX:
+        return None
+    return str(graph.prefix)
+
+
+def _glob_escape(s: str) -> str:
+    return ''.join('\\' + c if c in '*?[]\\' else c for c in s)
+
+
+class CacheKeyspace:
+    """
+    The names of the Redis keys of one scope.
+
+    :ivar scope: The scope
+    :type scope: str
+    :ivar prefix: Start of the names of all value keys of the scope
+    :type prefix: str
+    :ivar epoch_key: Name of the epoch counter
+    :type epoch_key: str
+    """
+    scope: str
+    prefix: str
+    epoch_key: str
+
+    def __init__(self, scope: str | None = None) -> None:
+        """
+        Constructor.
+
+        :param scope: The scope, usually the ~IConnection.cache_scope of the connection. If None,
+            "<OLDAP_TS_SERVER>/<OLDAP_TS_REPO>" is used. OLDAP_CACHE_SCOPE overrides both.
+        :type scope: str | None
+        """
+        scope = os.getenv("OLDAP_CACHE_SCOPE") or scope or \
+                f'{os.getenv("OLDAP_TS_SERVER", "http://localhost:7200")}/{os.getenv("OLDAP_TS_REPO", "oldap")}'
+        self.scope = scope
+        self.prefix = f'oldap:{scope}:'
+        self.epoch_key = f'oldap:gen:{scope}'
+
+    def generation_key(self, namespace: str) -> str:
+        return f'{self.epoch_key}:{namespace}'
+
+    def name(self, namespace: str, key: str) -> str:
+        """
+        Returns the name of a key without generation, as used by the ~NearCache.
+        """
+        return f'{self.prefix}{namespace}:{key}'
+
+    def value_key(self, namespace: str, epoch: int, generation: int, key: str) -> str:
+        return f'{self.prefix}{namespace}:{epoch}.{generation}:{key}'
+
+    def lock_key(self, namespace: str, key: str) -> str:
+        return f'oldap:lock:{self.scope}:{namespace}:{key}'
+
+    def pattern(self, namespace: str | None = None) -> str:
+        """
+        Returns the SCAN pattern of the value keys of a namespace, or of all namespaces.
+        """
+        return _glob_escape(self.prefix if namespace is None else f'{self.prefix}{namespace}:') + '*'
+
+    def parse(self, value_key: str) -> tuple[str, str, str] | None:
+        """
+        Splits the name of a value key into namespace, version ("<epoch>.<generation>") and key.
+
+        :param value_key: The name of the value key
+        :type value_key: str
+        :return: Namespace, version and key, or None if the name is not a value key of the scope
+        :rtype: tuple[str, str, str] | None
+        """
+        if not value_key.startswith(self.prefix):
+            return None
+        parts = value_key[len(self.prefix):].split(':', 2)
+        return tuple(parts) if len(parts) == 3 else None
@@ -0,0 +1,196 @@
+"""
+# CachePolicy
+
+Size bounds, eviction and time to live of the object caches (`CacheSingleton` and `CacheSingletonRedis`).
+
+The cached values are grouped into key families (see `CacheFamily`) by the class of the value: data models,
+property and resource classes, users, projects, roles, lists and external ontologies. The markers of keys that
+have been looked up but do not exist (negative caching, see `CacheSingletonRedis.set_not_found()`) form the
+family "negative". Each family has its own `CachePolicy`:
+
+- _eviction_: "lru" (least recently used) or "lfu" (least frequently used)
+- _entries_: Maximal number of entries of the family (in-process cache only)
+- _bytes_: Maximal size of the entries of the family in bytes, measured as the size of the serialized value
+  (in-process cache only)
+- _ttl_: Time to live in seconds. In Redis, the keys are written with this expiration.
+- _jitter_: Relative random variation of the ttl (e.g. 0.1 for ±10%), so that entries written together do not
+  expire together
+
+The bounds of the Redis cache itself are set by the Redis configuration (maxmemory and maxmemory-policy).
+
+The policies can be changed by environment variables OLDAP_CACHE_POLICY_<FAMILY> (e.g.
+OLDAP_CACHE_POLICY_LIST) with a comma separated list of settings, e.g. "lfu,entries=500,ttl=600,jitter=0.2".
+Settings that are not given keep their default. "ttl=0", "entries=0" and "bytes=0" remove the respective
+bound.
+"""
+import os
+import random
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Any, Self
+
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+
+
+class CacheFamily(Enum):
+    """
+    The families of the cached values.
+    """
+    DATAMODEL = 'datamodel'
+    CLASS = 'class'
+    USER = 'user'
+    PROJECT = 'project'
+    ROLE = 'role'
+    LIST = 'list'
+    ONTOLOGY = 'ontology'
+    NEGATIVE = 'negative'
+    OTHER = 'other'
+
+
+_FAMILY_BY_CLASS = {
+    'DataModel': CacheFamily.DATAMODEL,
+    'PropertyClass': CacheFamily.CLASS,
+    'ResourceClass': CacheFamily.CLASS,
+    'User': CacheFamily.USER,
+    'UserData': CacheFamily.USER,
+    'Project': CacheFamily.PROJECT,
+    'Role': CacheFamily.ROLE,
+    'OldapList': CacheFamily.LIST,
+    'OldapListNode': CacheFamily.LIST,
+    'ExternalOntology': CacheFamily.ONTOLOGY,
+}
+
+
+def family_of(value: Any) -> CacheFamily:
+    """
+    Returns the family of a cached value (by the name of its class or base classes).
+
+    :param value: The cached value
+    :type value: Any
+    :return: The family
+    :rtype: CacheFamily
+    """
+    for cls in type(value).__mro__:
+        family = _FAMILY_BY_CLASS.get(cls.__name__)
+        if family is not None:
+            return family
+    return CacheFamily.OTHER
+
+
+class Eviction(Enum):
+    LRU = 'lru'
+    LFU = 'lfu'
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    The policy of a cache family. None means "no bound".
+    """
+    eviction: Eviction = Eviction.LRU
+    max_entries: int | None = None
+    max_bytes: int | None = None
+    ttl: float | None = None
+    jitter: float = 0.1
+
+    def __post_init__(self):
+        for name in ('max_entries', 'max_bytes', 'ttl'):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise OldapErrorValue(f'Cache policy: {name} must be positive, got {value}')
+        if not 0 <= self.jitter < 1:
+            raise OldapErrorValue(f'Cache policy: jitter must be within [0, 1), got {self.jitter}')
+
+    def expires_in(self) -> float | None:
+        """
+        Returns the time to live of a new entry in seconds (with jitter), or None if entries do not expire.
+
+        :return: The time to live
+        :rtype: float | None
+        """
+        if self.ttl is None:
+            return None
+        return self.ttl * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+    def updated(self, settings: str) -> Self:
+        """
+        Returns a copy of the policy with the settings given as string (e.g. "lfu,entries=500,ttl=600").
+
+        :param settings: Comma separated settings
+        :type settings: str
+        :return: The new policy
+        :rtype: CachePolicy
+        :raises OldapErrorValue: If a setting is invalid
+        """
+        changes: dict[str, Any] = {}
+        for setting in filter(None, (x.strip() for x in settings.split(','))):
+            name, _, value = setting.partition('=')
+            name = name.strip().lower()
+            try:
+                if not value and name in ('lru', 'lfu'):
+                    changes['eviction'] = Eviction(name)
+                elif name == 'entries':
+                    changes['max_entries'] = int(value) or None
+                elif name == 'bytes':
+                    changes['max_bytes'] = int(value) or None
+                elif name == 'ttl':
+                    changes['ttl'] = float(value) or None
+                elif name == 'jitter':
+                    changes['jitter'] = float(value)
+                else:
+                    raise OldapErrorValue(f'Unknown cache policy setting "{setting}"')
+            except ValueError as err:
+                raise OldapErrorValue(f'Invalid cache policy setting "{setting}": {err}')
+        return replace(self, **changes)
+
+
+DEFAULT_POLICIES: dict[CacheFamily, CachePolicy] = {
+    CacheFamily.DATAMODEL: CachePolicy(max_entries=256, ttl=86400.0),
+    CacheFamily.CLASS: CachePolicy(max_entries=10000, ttl=86400.0),
+    CacheFamily.USER: CachePolicy(max_entries=10000, ttl=3600.0),
+    CacheFamily.PROJECT: CachePolicy(max_entries=1000, ttl=3600.0),
+    CacheFamily.ROLE: CachePolicy(max_entries=1000, ttl=3600.0),
+    CacheFamily.LIST: CachePolicy(max_entries=1000, max_bytes=256 * 1024 * 1024, ttl=3600.0),
+    CacheFamily.ONTOLOGY: CachePolicy(max_entries=1000, ttl=86400.0),
+    CacheFamily.NEGATIVE: CachePolicy(ttl=60.0, jitter=0.2),
+    CacheFamily.OTHER: CachePolicy(max_entries=10000, ttl=86400.0),
+}
+
+
+class CachePolicies(metaclass=SingletonMeta):
+    """
+    Singleton holding the policies of all cache families.
+    """
+    _policies: dict[CacheFamily, CachePolicy]
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Sets the policies to the defaults, changed by the environment variables OLDAP_CACHE_POLICY_<FAMILY>.
+
+        :return: None
+        :raises OldapErrorValue: If an environment variable contains invalid settings
+        """
+        policies = {}
+        for family, policy in DEFAULT_POLICIES.items():
+            settings = os.getenv(f'OLDAP_CACHE_POLICY_{family.name}')
+            policies[family] = policy.updated(settings) if settings else policy
+        self._policies = policies
+
+    def policy(self, family: CacheFamily) -> CachePolicy:
+        return self._policies[family]
+
+    def configure(self, family: CacheFamily, policy: CachePolicy) -> None:
+        """
+        Sets the policy of a family. The caches apply it to new entries and at the next eviction.
+
+        :param family: The family
+        :type family: CacheFamily
+        :param policy: The policy
+        :type policy: CachePolicy
+        :return: None
+        """
+        self._policies[family] = policy
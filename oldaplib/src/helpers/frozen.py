@@ -0,0 +1,30 @@
+"""
+# Frozen
+
+Read-only containers. A container shared by several users of a cache (e.g. the permissions of the `UserData` of a
+cached token, see `TokenCache`) is frozen with `freeze()`: its mutating methods then raise `OldapErrorImmutable`
+instead of changing the shared value. Copies (`copy()`, `deepcopy()`) of a frozen container are not frozen.
+"""
+from functools import wraps
+from typing import Callable, TypeVar
+
+from oldaplib.src.helpers.oldaperror import OldapErrorImmutable
+
+F = TypeVar('F', bound=Callable)
+
+
+def mutator(method: F) -> F:
+    """
+    Decorator of the mutating methods of a container with a `_frozen` attribute.
+
+    :param method: The mutating method
+    :type method: Callable
+    :return: The method, raising OldapErrorImmutable if the container is frozen
+    :rtype: Callable
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._frozen:
+            raise OldapErrorImmutable(f'{type(self).__name__} is shared and read-only.')
+        return method(self, *args, **kwargs)
+    return wrapper
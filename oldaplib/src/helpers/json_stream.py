@@ -0,0 +1,200 @@
+"""
+# SparqlJsonStreamParser
+
+Incremental (push) parser for SPARQL 1.1 query results in JSON format
+(see https://www.w3.org/TR/sparql11-results-json/).
+
+The parser is fed with the bytes of the response as they arrive from the triple store and yields the
+elements of the `results.bindings` array one by one as soon as they are complete. It never holds more than
+the unparsed rest of the current binding in memory, so the peak memory of a large result set is bounded by
+the size of one row instead of the size of the complete response. The other members of the result object
+(`head`, `boolean`, `results.link` etc.) are small and are parsed completely.
+
+Usage:
+
+```python
+parser = SparqlJsonStreamParser()
+for chunk in response.iter_content(65536):
+    for binding in parser.feed(chunk):
+        ...
+parser.close()
+```
+"""
+import codecs
+import json
+import re
+from enum import Enum
+from typing import Iterator, Any
+
+from oldaplib.src.helpers.oldaperror import OldapError
+
+_WS = re.compile(r'[ \t\n\r]*')
+
+
+class _NeedMore(Exception):
+    pass
+
+
+class _State(Enum):
+    START = 0
+    TOP = 1
+    RESULTS = 2
+    BINDINGS = 3
+    DONE = 4
+
+
+class SparqlJsonStreamParser:
+    """
+    Push parser for SPARQL JSON results. Feed the raw bytes with `feed()`, which yields the complete
+    bindings; finish with `close()`. The generator returned by `feed()` must be exhausted before the
+    next call to `feed()`.
+
+    :ivar head: The "head" member of the result (available as soon as it has been parsed)
+    :type head: dict | None
+    :ivar boolean: The result of an ASK query, None for SELECT queries
+    :type boolean: bool | None
+    """
+    head: dict | None
+    boolean: bool | None
+
+    def __init__(self) -> None:
+        self.head = None
+        self.boolean = None
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._final = False
+        self._state = _State.START
+
+    @property
+    def vars(self) -> list[str]:
+        """The variable names of the result (empty, if the head has not yet been parsed)"""
+        return list(self.head.get('vars', [])) if self.head else []
+
+    def feed(self, data: bytes) -> Iterator[dict[str, Any]]:
+        """
+        Feeds the next chunk of the response and yields all bindings that are completed by this chunk.
+
+        :param data: The next chunk of the response
+        :type data: bytes
+        :return: Generator of the bindings (dicts from variable name to RDF term) completed by this chunk
+        :raises OldapError: If the data is not a valid SPARQL JSON result
+        """
+        self._buf += self._decoder.decode(data)
+        yield from self._parse()
+
+    def close(self) -> Iterator[dict[str, Any]]:
+        """
+        Signals the end of the response and yields the remaining bindings (if any).
+
+        :return: Generator of the remaining bindings
+        :raises OldapError: If the response is truncated or not a valid SPARQL JSON result
+        """
+        self._buf += self._decoder.decode(b'', final=True)
+        self._final = True
+        yield from self._parse()
+        if self._state != _State.DONE:
+            raise OldapError('Truncated SPARQL JSON result')
+        if self._buf[self._pos:].strip():
+            raise OldapError('Extra data after SPARQL JSON result')
+
+    def _parse(self) -> Iterator[dict[str, Any]]:
+        try:
+            while self._state != _State.DONE:
+                savepoint = self._pos
+                try:
+                    binding = self._step()
+                except _NeedMore:
+                    self._pos = savepoint
+                    break
+                if binding is not None:
+                    yield binding
+        finally:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+
+    def _step(self) -> dict[str, Any] | None:
+        match self._state:
+            case _State.START:
+                self._expect('{')
+                self._state = _State.TOP
+            case _State.TOP:
+                key = self._member_key()
+                if key is None:
+                    self._state = _State.DONE
+                elif key == 'results':
+                    self._expect('{')
+                    self._state = _State.RESULTS
+                else:
+                    value = self._value()
+                    if key == 'head':
+                        self.head = value
+                    elif key == 'boolean':
+                        self.boolean = value
+            case _State.RESULTS:
+                key = self._member_key()
+                if key is None:
+                    self._state = _State.TOP
+                elif key == 'bindings':
+                    self._expect('[')
+                    self._state = _State.BINDINGS
+                else:
+                    self._value()
+            case _State.BINDINGS:
+                c = self._peek()
+                if c == ']':
+                    self._pos += 1
+                    self._state = _State.RESULTS
+                    return None
+                if c == ',':
+                    self._pos += 1
+                    self._peek()
+                binding = self._value()
+                if not isinstance(binding, dict):
+                    raise OldapError(f'Invalid SPARQL JSON result: binding must be an object, got "{binding}"')
+                return binding
+        return None
+
+    def _peek(self) -> str:
+        """Skips whitespace and returns the next character without consuming it"""
+        self._pos = _WS.match(self._buf, self._pos).end()
+        if self._pos >= len(self._buf):
+            if self._final:
+                raise OldapError('Truncated SPARQL JSON result')
+            raise _NeedMore()
+        return self._buf[self._pos]
+
+    def _expect(self, char: str) -> None:
+        c = self._peek()
+        if c != char:
+            raise OldapError(f'Invalid SPARQL JSON result: expected "{char}" at position {self._pos}, got "{c}"')
+        self._pos += 1
+
+    def _member_key(self) -> str | None:
+        """Parses '[,] "key" :' and returns the key, or returns None at the closing '}'"""
+        c = self._peek()
+        if c == '}':
+            self._pos += 1
+            return None
+        if c == ',':
+            self._pos += 1
+            c = self._peek()
+        if c != '"':
+            raise OldapError(f'Invalid SPARQL JSON result: expected member name at position {self._pos}')
+        key = self._value()
+        self._expect(':')
+        return key
+
+    def _value(self) -> Any:
+        self._peek()
+        try:
+            value, end = self._json.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError as err:
+            if self._final:
+                raise OldapError(f'Invalid SPARQL JSON result: {err}')
+            raise _NeedMore()
+        if end >= len(self._buf) and not self._final and isinstance(value, (int, float)):
+            raise _NeedMore()  # a number at the end of the buffer may continue in the next chunk
+        self._pos = end
+        return value
@@ -0,0 +1,175 @@
+"""
+# LoginCache
+
+In-process cache for the data a login needs from the triple store: the table of the project short names and
+namespaces (added to the `Context`) and the `UserData` of the user. With a warm cache, creating a
+`Connection` costs a bcrypt check and no round trip to the triple store.
+
+The entries expire after a time to live. They are invalidated explicitly when users, projects or roles are
+changed through this process (see `User`, `Project` and `Role`). A cached UserData (with the credential hash and
+the active flag) is stored with the permissions version of the user in the ~SessionStore and only used while
+the version has not changed. With the Redis backend of the SessionStore, the version is shared by all worker
+processes, so that a password change or deactivation in one process invalidates the cached UserData of all others.
+Changes of the project prefix tables made by other processes become visible after the time to live at the latest.
+
+The cache is configured by the following environment variables (or by calling `configure()`):
+
+- _OLDAP_LOGIN_CACHE_TTL_: Time to live of the entries in seconds. "0" disables the cache (default: 300)
+- _OLDAP_LOGIN_CACHE_SIZE_: Maximal number of cached users (default: 1000)
+"""
+import os
+from copy import deepcopy
+
+from oldaplib.src.helpers.session_store import SessionStore
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+from oldaplib.src.helpers.ttlcache import TtlCache
+from oldaplib.src.userdataclass import UserData
+from oldaplib.src.xsd.iri import Iri
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+
+PrefixTable = list[tuple[Xsd_NCName, Iri]]
+
+
+class LoginCache(metaclass=SingletonMeta):
+    """
+    Singleton caching the project prefix table per triple store and the UserData per user (with the permissions
+    version it has been read at). The cached UserData is copied on the way in and out, so that connections never
+    share it.
+    """
+    _prefixes: TtlCache
+    _users: TtlCache
+
+    def __init__(self):
+        ttl = float(os.getenv("OLDAP_LOGIN_CACHE_TTL", "300"))
+        maxsize = int(os.getenv("OLDAP_LOGIN_CACHE_SIZE", "1000"))
+        self._prefixes = TtlCache(maxsize=16, ttl=ttl)
+        self._users = TtlCache(maxsize=maxsize, ttl=ttl)
+
+    def configure(self, *, ttl: float | None = None, maxsize: int | None = None) -> None:
+        """
+        Changes the configuration of the cache. All entries are discarded.
+
+        :param ttl: Time to live of the entries in seconds ("0" disables the cache)
+        :type ttl: float | None
+        :param maxsize: Maximal number of cached users
+        :type maxsize: int | None
+        :return: None
+        :raises OldapErrorValue: If the values are invalid
+        """
+        ttl = self._users.ttl if ttl is None else ttl
+        maxsize = self._users.maxsize if maxsize is None else maxsize
+        self._prefixes = TtlCache(maxsize=16, ttl=ttl)
+        self._users = TtlCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def ttl(self) -> float:
+        return self._users.ttl
+
+    @property
+    def users(self) -> TtlCache:
+        """The cache of the UserData (e.g. for reading the hit/miss counters)"""
+        return self._users
+
+    def get_prefixes(self, server: str, repo: str) -> PrefixTable | None:
+        """
+        Returns the cached project prefix table of the given repository.
+
+        :param server: The URL of the triple store
+        :type server: str
+        :param repo: The repository
+        :type repo: str
+        :return: List of (project short name, namespace) or None
+        :rtype: PrefixTable | None
+        """
+        return self._prefixes.get((server, repo))
+
+    def set_prefixes(self, server: str, repo: str, prefixes: PrefixTable) -> None:
+        """
+        Stores the project prefix table of the given repository.
+
+        :param server: The URL of the triple store
+        :type server: str
+        :param repo: The repository
+        :type repo: str
+        :param prefixes: List of (project short name, namespace)
+        :type prefixes: PrefixTable
+        :return: None
+        """
+        self._prefixes.set((server, repo), list(prefixes))
+
+    def get_userdata(self, server: str, repo: str, userId: Xsd_NCName | str) -> UserData | None:
+        """
+        Returns a copy of the cached UserData of the given user, if the permissions version of the user has not
+        changed since it has been stored.
+
+        :param server: The URL of the triple store
+        :type server: str
+        :param repo: The repository
+        :type repo: str
+        :param userId: The user id
+        :type userId: Xsd_NCName | str
+        :return: The UserData or None
+        :rtype: UserData | None
+        """
+        entry = self._users.get((server, repo, str(userId)))
+        if entry is None:
+            return None
+        version, userdata = entry
+        if SessionStore().version(userdata.userIri) != version:
+            return None
+        return deepcopy(userdata)
+
+    def set_userdata(self, server: str, repo: str, userdata: UserData) -> None:
+        """
+        Stores a copy of the UserData with the current permissions version of the user.
+
+        :param server: The URL of the triple store
+        :type server: str
+        :param repo: The repository
+        :type repo: str
+        :param userdata: The UserData
+        :type userdata: UserData
+        :return: None
+        """
+        version = SessionStore().version(userdata.userIri)
+        self._users.set((server, repo, str(userdata.userId)), (version, deepcopy(userdata)))
+
+    def invalidate_user(self, userIri: Iri | str | None = None, userId: Xsd_NCName | str | None = None) -> None:
+        """
+        Removes the cached UserData of a user, given by its IRI and/or its user id.
+
+        :param userIri: The IRI of the user
+        :type userIri: Iri | str | None
+        :param userId: The user id
+        :type userId: Xsd_NCName | str | None
+        :return: None
+        """
+        iri = str(userIri) if userIri is not None else None
+        uid = str(userId) if userId is not None else None
+        self._users.delete_where(lambda key, entry: key[2] == uid or (iri is not None and str(entry[1].userIri) == iri))
+
+    def invalidate_users(self) -> None:
+        """
+        Removes the cached UserData of all users (e.g. if a role or the permissions of a project changed).
+
+        :return: None
+        """
+        self._users.clear()
+
+    def invalidate_projects(self) -> None:
+        """
+        Removes the cached prefix tables and all UserData (which contains the project permissions).
+
+        :return: None
+        """
+        self._prefixes.clear()
+        self._users.clear()
+
+    def clear(self) -> None:
+        """
+        Removes all entries.
+
+        :return: None
+        """
+        self._prefixes.clear()
+        self._users.clear()
@@ -0,0 +1,311 @@
+"""
+# NearCache
+
+In-process cache in front of the Redis cache (see `CacheSingletonRedis`). A cache hit of `DataModel.read`,
+`Project.read` etc. then does not need a round trip to Redis.
+
+The near-cache holds the serialized values as they are stored in Redis. They are decoded on every `get()`,
+because the decoded objects are mutable and bound to the connection of the caller.
+
+Coherence between the processes is kept by the Redis pub/sub channel "oldap:cache:invalidate": every
+`set()` and `delete()` of `CacheSingletonRedis` publishes the key, and each process evicts it from its
+near-cache. `bump_generation()` and `clear()` publish the prefix of the keys of the namespace or scope, and each
+process evicts only the keys with this prefix. The near-cache is only used while the process is subscribed to the channel. Since pub/sub messages
+may get lost if the connection to Redis breaks, the entries additionally expire after a time to live.
+
+A value read from Redis is only stored if no invalidation has been received while it was read (see
+`generation`), so that a concurrent write cannot leave a stale entry behind. For the same reason, a process also
+receives its own invalidations.
+
+The near-cache is configured by the following environment variables (or by calling `configure()`):
+
+- _OLDAP_NEAR_CACHE_SIZE_: Maximal number of entries. "0" disables the near-cache (default: 1000)
+- _OLDAP_NEAR_CACHE_BYTES_: Maximal total size of the entries in bytes (default: 67108864)
+- _OLDAP_NEAR_CACHE_TTL_: Time to live of the entries in seconds (default: 60)
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable
+
+import redis
+
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+
+INVALIDATION_CHANNEL = 'oldap:cache:invalidate'
+"""The Redis pub/sub channel the invalidations are published to"""
+
+_PREFIX = '*'
+"""Marks a message as prefix of keys, "*" alone stands for all keys"""
+
+
+class NearCache(metaclass=SingletonMeta):
+    """
+    Singleton holding the serialized values of the most recently used Redis cache entries, bounded by the
+    number of entries and their total size.
+    """
+    _lock: Lock
+    _entries: OrderedDict[str, tuple[float, bytes]]
+    _maxsize: int
+    _maxbytes: int
+    _ttl: float
+    _bytes: int
+    _generation: int
+    _worker: Any
+    _clock: Callable[[], float]
+    _hits: int
+    _misses: int
+    _evictions: int
+
+    def __init__(self):
+        self._lock = Lock()
+        self._worker = None
+        self._clock = time.monotonic
+        self.configure(maxsize=int(os.getenv("OLDAP_NEAR_CACHE_SIZE", "1000")),
+                       maxbytes=int(os.getenv("OLDAP_NEAR_CACHE_BYTES", str(64 * 1024 * 1024))),
+                       ttl=float(os.getenv("OLDAP_NEAR_CACHE_TTL", "60")))
+
+    def configure(self, *, maxsize: int | None = None, maxbytes: int | None = None, ttl: float | None = None) -> None:
+        """
+        Changes the configuration of the near-cache. All entries are discarded.
+
+        :param maxsize: Maximal number of entries ("0" disables the near-cache)
+        :type maxsize: int | None
+        :param maxbytes: Maximal total size of the entries in bytes
+        :type maxbytes: int | None
+        :param ttl: Time to live of the entries in seconds
+        :type ttl: float | None
+        :return: None
+        :raises OldapErrorValue: If a value is negative
+        """
+        maxsize = self._maxsize if maxsize is None else maxsize
+        maxbytes = self._maxbytes if maxbytes is None else maxbytes
+        ttl = self._ttl if ttl is None else ttl
+        if maxsize < 0 or maxbytes < 0 or ttl < 0:
+            raise OldapErrorValue(f'Invalid near-cache configuration: maxsize={maxsize}, maxbytes={maxbytes}, ttl={ttl}')
+        with self._lock:
+            self._maxsize = maxsize
+            self._maxbytes = maxbytes
+            self._ttl = ttl
+            self._entries = OrderedDict()
+            self._bytes = 0
+            self._generation = 0
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def reset_stats(self) -> None:
+        """
+        Resets the hit, miss and eviction counters.
+
+        :return: None
+        """
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._maxsize > 0 and self._maxbytes > 0 and self._ttl > 0
+
+    @property
+    def listening(self) -> bool:
+        """True if the process is subscribed to the invalidation channel"""
+        return self._worker is not None and self._worker.is_alive()
+
+    @property
+    def generation(self) -> int:
+        """Counter of the invalidations received so far"""
+        return self._generation
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def size(self) -> int:
+        """Total size of the entries in bytes"""
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Returns the serialized value of a key if it is in the near-cache and not expired.
+
+        :param key: The key
+        :type key: str
+        :return: The serialized value or None
+        :rtype: bytes | None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires, value = entry
+            if expires <= self._clock():
+                self._remove(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: bytes, generation: int | None = None) -> None:
+        """
+        Stores the serialized value of a key. The least recently used entries are evicted if the near-cache
+        is full.
+
+        :param key: The key
+        :type key: str
+        :param value: The serialized value
+        :type value: bytes
+        :param generation: The ~generation before the value has been read from Redis. If an invalidation has
+            been received since, the value may be stale and is not stored.
+        :type generation: int | None
+        :return: None
+        """
+        if not self.enabled or len(value) > self._maxbytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + self._ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self._maxsize or self._bytes > self._maxbytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def invalidate(self, key: str | None = None) -> None:
+        """
+        Evicts a key (or all keys if None) from the near-cache of this process.
+
+        :param key: The key or None
+        :type key: str | None
+        :return: None
+        """
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            elif key in self._entries:
+                self._remove(key)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        """
+        Evicts all keys starting with a prefix from the near-cache of this process.
+
+        :param prefix: The prefix of the keys, "" for all keys
+        :type prefix: str
+        :return: None
+        """
+        if not prefix:
+            self.invalidate()
+            return
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+
+    def publish(self, client: redis.Redis | redis.client.Pipeline, *keys: str | None) -> None:
+        """
+        Evicts the keys locally and publishes them to all processes. If a pipeline is given, the messages are
+        sent when the pipeline is executed.
+
+        :param client: The Redis client or a pipeline
+        :type client: redis.Redis | redis.client.Pipeline
+        :param keys: The keys, None stands for all keys
+        :type keys: str | None
+        :return: None
+        """
+        for key in keys:
+            client.publish(INVALIDATION_CHANNEL, _PREFIX if key is None else key)
+            self.invalidate(key)
+
+    def publish_prefix(self, client: redis.Redis | redis.client.Pipeline, prefix: str) -> None:
+        """
+        Evicts the keys starting with a prefix locally and publishes the prefix to all processes. If a pipeline
+        is given, the message is sent when the pipeline is executed.
+
+        :param client: The Redis client or a pipeline
+        :type client: redis.Redis | redis.client.Pipeline
+        :param prefix: The prefix of the keys, "" for all keys
+        :type prefix: str
+        :return: None
+        """
+        client.publish(INVALIDATION_CHANNEL, _PREFIX + prefix)
+        self.invalidate_prefix(prefix)
+
+    def _on_message(self, message: dict[str, Any]) -> None:
+        key = message.get('data')
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+        if key.startswith(_PREFIX):
+            self.invalidate_prefix(key[len(_PREFIX):])
+        else:
+            self.invalidate(key)
+
+    def _on_error(self, error: Exception, pubsub: Any, worker: Any) -> None:
+        logging.getLogger(__name__).warning(f'Near-cache unsubscribed from "{INVALIDATION_CHANNEL}": {error}')
+        worker.stop()
+        pubsub.close()
+        self.invalidate()
+
+    def listen(self, client: redis.Redis) -> bool:
+        """
+        Subscribes this process to the invalidation channel (if not yet subscribed).
+
+        :param client: The Redis client
+        :type client: redis.Redis
+        :return: True if the process is subscribed
+        :rtype: bool
+        """
+        if self.listening or not self.enabled:
+            return self.listening
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return True
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_message})
+                self._worker = pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=self._on_error)
+            except redis.RedisError as err:
+                logging.getLogger(__name__).warning(f'Near-cache disabled, cannot subscribe: {err}')
+                self._worker = None
+                return False
+        self.invalidate()  # entries stored before subscribing may have missed invalidations
+        return True
+
+    def close(self) -> None:
+        """
+        Unsubscribes from the invalidation channel and discards all entries.
+
+        :return: None
+        """
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.stop()
+        self.invalidate()
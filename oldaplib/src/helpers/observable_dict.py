@@ -5,6 +5,7 @@ from typing import Callable, Self, Iterable, Mapping
 
 from oldaplib.src.enums.action import Action
 from oldaplib.src.helpers.attributechange import AttributeChange
+from oldaplib.src.helpers.frozen import mutator
 from oldaplib.src.helpers.serializer import serializer
 from oldaplib.src.xsd.xsd_qname import Xsd_QName
 
@@ -13,6 +14,7 @@ from oldaplib.src.xsd.xsd_qname import Xsd_QName
 class ObservableDict(UserDict):
     __on_change: Callable[[Self], None]
     _changeset: dict[Hashable, AttributeChange]
+    _frozen: bool = False
 
     def __init__(self,
                  obj: Iterable | Mapping | None = None, *,
@@ -51,6 +53,7 @@ class ObservableDict(UserDict):
             for item in obsdict:
                 self[item['key']] = item['val']
 
+    @mutator
     def __setitem__(self, key, value) -> None:
         if key in self.data:
             self._changeset[key] = AttributeChange(self.data[key], Action.MODIFY)
@@ -60,6 +63,7 @@ class ObservableDict(UserDict):
             self.__on_change(self.copy())
         super().__setitem__(key, value)
 
+    @mutator
     def __delitem__(self, key) -> None:
         self._changeset[key] = AttributeChange(self.data[key], Action.DELETE)
         if self.__on_change:
@@ -72,6 +76,12 @@ class ObservableDict(UserDict):
     def copy(self) -> Self:
         return ObservableDict(self.data.copy())
 
+    def freeze(self) -> None:
+        """
+        Makes the dict read-only (see ~mutator). The values are not frozen.
+        """
+        self._frozen = True
+
     def set_on_change(self, on_change: Callable[[Self], None]) -> None:
         self.__on_change = on_change
 
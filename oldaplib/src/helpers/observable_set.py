@@ -14,6 +14,7 @@ from pystrict import strict
 from oldaplib.src.enums.action import Action
 from oldaplib.src.enums.attributeclass import AttributeClass
 from oldaplib.src.helpers.Notify import Notify
+from oldaplib.src.helpers.frozen import mutator
 from oldaplib.src.helpers.oldaperror import OldapErrorKey, OldapErrorNotImplemented
 from oldaplib.src.helpers.serializer import serializer
 from oldaplib.src.helpers.attributechange import AttributeChange
@@ -33,6 +34,7 @@ class ObservableSet(Notify):
     """
     _setdata: Set[Any]
     _old_value: Self | None
+    _frozen: bool = False
 
     def __init__(self,
                  setitems: Self | Iterable | None = None,
@@ -106,6 +108,7 @@ class ObservableSet(Notify):
     def __rsub__(self, other: Iterable[Any]) -> Self:
         return ObservableSet(set(other).__sub__(self._setdata), self._notifier, self._notify_data)
 
+    @mutator
     def __ior__(self, other: Iterable[Any]) -> Self:
         tmp_copy = deepcopy(self)
         if isinstance(other, ObservableSet):
@@ -127,6 +130,7 @@ class ObservableSet(Notify):
         else:
             raise OldapErrorNotImplemented(f'Set.__and__() not implemented for {type(other).__name__}')
 
+    @mutator
     def __iand__(self, other: Iterable[Any]) -> Self:
         tmp_copy = deepcopy(self)
         if isinstance(other, ObservableSet):
@@ -155,6 +159,7 @@ class ObservableSet(Notify):
         else:
             raise OldapErrorNotImplemented(f'Set.__sub__() not implemented for {type(other).__name__}')
 
+    @mutator
     def __isub__(self, other: Iterable[Any]) -> Self:
         tmp_copy = deepcopy(self)
         if isinstance(other, ObservableSet):
@@ -174,6 +179,7 @@ class ObservableSet(Notify):
     def coerce(cls, value: Iterable[Any], *, notifier=None, notify_data=None) -> "ObservableSet":
         return value if isinstance(value, cls) else cls(value, notifier=notifier, notify_data=notify_data)
 
+    @mutator
     def update(self, items: Iterable[Any]):
         tmp_copy = deepcopy(self)
         self._setdata.update(items)
@@ -181,6 +187,7 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    @mutator
     def intersection_update(self, items: Iterable[Any]):
         tmp_copy = deepcopy(self)
         self._setdata.intersection_update(items)
@@ -188,6 +195,7 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    @mutator
     def difference_update(self, items: Iterable[Any]):
         tmp_copy = deepcopy(self)
         self._setdata.difference_update(items)
@@ -195,6 +203,7 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    @mutator
     def symmetric_difference_update(self, items: Iterable[Any]):
         tmp_copy = deepcopy(self)
         self._setdata.symmetric_difference_update(items)
@@ -202,6 +211,7 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    @mutator
     def replace(self, items: Iterable[Any]) -> None:
         tmp_copy = deepcopy(self)
         self._setdata = set(items)
@@ -209,6 +219,7 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    @mutator
     def add(self, item: Any) -> None:
         tmp_copy = deepcopy(self)
         self._setdata.add(item)
@@ -216,6 +227,7 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    @mutator
     def remove(self, item: Any) -> None:
         tmp_copy = deepcopy(self)
         self._setdata.remove(item)
@@ -223,6 +235,7 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    @mutator
     def discard(self, item: Any):
         tmp_copy = deepcopy(self)
         self._setdata.discard(item)
@@ -230,6 +243,7 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    @mutator
     def pop(self):
         tmp_copy = deepcopy(self)
         item = self._setdata.pop()
@@ -238,6 +252,7 @@ class ObservableSet(Notify):
         self.notify()
         return item
 
+    @mutator
     def clear(self) -> None:
         tmp_copy = deepcopy(self)
         self._setdata.clear()
@@ -245,6 +260,13 @@ class ObservableSet(Notify):
             self._old_value = tmp_copy
         self.notify()
 
+    def freeze(self) -> None:
+        """
+        Makes the set read-only (see ~mutator).
+        :return: None
+        """
+        self._frozen = True
+
     @property
     def old_value(self) -> Self | None:
         return self._old_value
@@ -83,4 +83,13 @@ class OldapErrorInUse(OldapError):
 class OldapErrorNotImplemented(OldapError):
     pass
 
+class OldapErrorBulkLoad(OldapError):
+    """
+    Raised if a batch of a bulk load failed. The batches before have been loaded, the load can be resumed
+    by passing the number of the failed batch (attribute `batch`) as `start_batch`.
+    """
+    def __init__(self, message: str, batch: int):
+        super().__init__(message)
+        self.batch = batch
+
 
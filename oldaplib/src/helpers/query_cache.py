@@ -0,0 +1,561 @@
+"""
+# QueryResultCache
+
+Optional in-process read-through cache for the results of the SPARQL queries sent by `Connection.query`.
+
+The entries are keyed by the normalized SPARQL text (whitespace and comments outside of literals and IRIs are
+collapsed), the result format, the triple store and the user. For every entry the cache records the named graphs
+the query reads from: A query that reads from a fixed set of graphs (given by FROM/FROM NAMED, or by GRAPH blocks with
+constant graph names that contain all the patterns of the query) depends on these graphs only. All other queries
+(e.g. queries on the default graph, which is the union of all graphs in GraphDB, or queries with `GRAPH ?g`)
+depend on all graphs.
+
+Writes through `update_query`, committed transactions, `clear_graph`, `move_graph`, `clear_repo` and `upload_turtle`
+evict the entries that depend on the graphs written to. Updates whose target graphs cannot be determined evict all
+entries of the repository. Writes by other processes are not seen by the cache, they become visible after the
+time to live at the latest.
+
+The cache is disabled by default. It is configured by the following environment variables
+(or by calling `configure()`):
+
+- _OLDAP_QUERY_CACHE_SIZE_: Maximal number of entries. "0" disables the cache (default: 0)
+- _OLDAP_QUERY_CACHE_MEMORY_: Maximal size of the cached results in bytes (default: 67108864)
+- _OLDAP_QUERY_CACHE_TTL_: Time to live of the entries in seconds (default: 60)
+"""
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable
+
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+from oldaplib.src.helpers.sparql_result_table import decode_query_result
+
+Graphs = frozenset[str] | None
+"""The set of graph IRIs a query reads or an update writes. None stands for "all graphs"."""
+
+QueryKey = tuple[str, str, str, str, str]
+"""(server, repository, user, result format, normalized SPARQL)"""
+
+_STRING = r'"""(?:[^"\\]|\\.|"(?!""))*"""|' \
+          r"'''(?:[^'\\]|\\.|'(?!''))*'''|" \
+          r'"(?:[^"\\\n]|\\.)*"|' \
+          r"'(?:[^'\\\n]|\\.)*'"
+_LEXER = re.compile(r'(?P<string>' + _STRING + r')'
+                    r'|(?P<iri><[^<>"{}|^`\\\x00-\x20]*>)'
+                    r'|(?P<gap>(?:\s|#[^\n]*)+)', re.S)
+
+_TERM = r'(<[^>]*>|[?$]\w+|[A-Za-z][\w.-]*:[\w-]*(?:\.[\w-]+)*|:[\w-]*(?:\.[\w-]+)*)'
+_PREFIX = re.compile(r'\bPREFIX\s+([A-Za-z][\w.-]*)?:\s*<([^>]*)>', re.I)
+_FROM = re.compile(r'\bFROM\s+(?:NAMED\s+)?' + _TERM, re.I)
+_GRAPH = re.compile(r'\bGRAPH\s+' + _TERM, re.I)
+_GRAPH_BLOCK = re.compile(r'\bGRAPH\s+' + _TERM + r'\s*\{', re.I)
+_WITH = re.compile(r'\bWITH\s+' + _TERM, re.I)
+_TEMPLATE = re.compile(r'\b(?:INSERT|DELETE)(?:\s+DATA|\s+WHERE)?\s*\{', re.I)
+_TRANSFER = re.compile(r'\b(?:ADD|COPY|MOVE)\s+(?:SILENT\s+)?(?:GRAPH\s+)?' + _TERM +
+                       r'\s+TO\s+(?:GRAPH\s+)?' + _TERM, re.I)
+_WHOLESALE = re.compile(r'\b(?:CLEAR|DROP|ADD|COPY|MOVE)\s+(?:SILENT\s+)?(?:ALL|DEFAULT|NAMED)\b', re.I)
+_LOAD = re.compile(r'\bLOAD\b', re.I)
+_FORM = re.compile(r'^[^{]*?\b(SELECT|ASK|CONSTRUCT|DESCRIBE)\b', re.I | re.S)
+_CALL = re.compile(r'[\w:]*\([^()]*\)')
+_FILTER_KEYWORDS = re.compile(r'\b(?:FILTER|OPTIONAL|UNION|MINUS|NOT|EXISTS|BIND)\b', re.I)
+_PUNCTUATION = re.compile(r'[\s{}.;]*')
+
+_ENTRY_OVERHEAD = 256  # rough size of the key tuple, the entry object and the index entries in bytes
+
+
+def normalize_sparql(sparql: str) -> str:
+    """
+    Returns the SPARQL text with all whitespace and comments outside of literals and IRIs collapsed to
+    single blanks. Two queries with the same normalized text are equivalent.
+
+    :param sparql: SPARQL query or update
+    :type sparql: str
+    :return: The normalized text
+    :rtype: str
+    """
+    return _LEXER.sub(lambda m: ' ' if m.lastgroup == 'gap' else m.group(), sparql).strip()
+
+
+def _skeleton(sparql: str) -> str:
+    """Normalized text with empty string literals, so that braces within literals do not disturb the analysis"""
+    def repl(m: re.Match) -> str:
+        match m.lastgroup:
+            case 'gap':
+                return ' '
+            case 'string':
+                return '""'
+            case _:
+                return m.group()
+    return _LEXER.sub(repl, sparql)
+
+
+def _block_end(text: str, start: int) -> int:
+    """Returns the position after the "}" matching the "{" at text[start - 1]"""
+    depth = 1
+    pos = start
+    while depth > 0 and pos < len(text):
+        c = text[pos]
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        pos += 1
+    return pos
+
+
+def _expand(term: str, prefixes: dict[str, str]) -> str | None:
+    if term[0] in '?$':
+        return None
+    if term[0] == '<':
+        return term[1:-1]
+    prefix, local = term.split(':', 1)
+    ns = prefixes.get(prefix)
+    return ns + local if ns is not None else term
+
+
+def _graph_closed(group: str) -> bool:
+    """True, if all triple patterns of the group are within GRAPH blocks"""
+    rest = []
+    pos = 0
+    for m in _GRAPH_BLOCK.finditer(group):
+        if m.start() < pos:
+            continue  # nested within a GRAPH block already skipped
+        rest.append(group[pos:m.start()])
+        pos = _block_end(group, m.end())
+    rest.append(group[pos:])
+    text = ''.join(rest)
+    while True:
+        stripped = _CALL.sub(' ', text)
+        if stripped == text:
+            break
+        text = stripped
+    text = _FILTER_KEYWORDS.sub(' ', text)
+    return _PUNCTUATION.fullmatch(text) is not None
+
+
+def query_graphs(sparql: str) -> Graphs:
+    """
+    Determines the named graphs a SPARQL query reads from.
+
+    :param sparql: The SPARQL query
+    :type sparql: str
+    :return: The set of graph IRIs, or None if the query (possibly) reads from the default graph or from any graph
+    :rtype: Graphs
+    """
+    skel = _skeleton(sparql)
+    prefixes = {m.group(1) or '': m.group(2) for m in _PREFIX.finditer(skel)}
+    dataset = [_expand(t, prefixes) for t in _FROM.findall(skel)]
+    if dataset:
+        return frozenset(dataset) if None not in dataset else None
+    form = _FORM.match(skel)
+    if form is None or form.group(1).upper() not in ('SELECT', 'ASK'):
+        return None
+    start = skel.find('{', form.end())
+    if start < 0:
+        return None
+    group = skel[start + 1:_block_end(skel, start + 1) - 1]
+    graphs = [_expand(t, prefixes) for t in _GRAPH.findall(group)]
+    if not graphs or None in graphs or not _graph_closed(group):
+        return None
+    return frozenset(graphs)
+
+
+def _operations(skel: str) -> list[str]:
+    """Splits a SPARQL update into its operations (separated by ";" outside of blocks)"""
+    ops = []
+    depth = 0
+    start = 0
+    for pos, c in enumerate(skel):
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        elif c == ';' and depth == 0:
+            ops.append(skel[start:pos])
+            start = pos + 1
+    ops.append(skel[start:])
+    return [op for op in ops if _PREFIX.sub('', op).strip()]
+
+
+def update_graphs(sparql: str) -> Graphs:
+    """
+    Determines the graphs a SPARQL update writes to.
+
+    :param sparql: The SPARQL update
+    :type sparql: str
+    :return: The set of graph IRIs, or None if the update (possibly) writes to the default graph or if the
+        graphs cannot be determined
+    :rtype: Graphs
+    """
+    skel = _skeleton(sparql)
+    prefixes = {m.group(1) or '': m.group(2) for m in _PREFIX.finditer(skel)}
+    graphs: set[str | None] = set()
+    for op in _operations(skel):
+        if _WHOLESALE.search(op):
+            return None
+        if _LOAD.search(op):
+            terms = _GRAPH.findall(op)
+            if not terms:
+                return None
+            graphs.update(_expand(t, prefixes) for t in terms)
+            continue
+        transfers = _TRANSFER.findall(op)
+        if transfers:
+            graphs.update(_expand(t, prefixes) for pair in transfers for t in pair)
+            continue
+        templates = list(_TEMPLATE.finditer(op))
+        if not templates:
+            terms = _GRAPH.findall(op)  # CLEAR/DROP/CREATE GRAPH
+            if not terms:
+                return None
+            graphs.update(_expand(t, prefixes) for t in terms)
+            continue
+        with_graph = _WITH.search(op)
+        for m in templates:
+            block = op[m.end():_block_end(op, m.end()) - 1]
+            graphs.update(_expand(t, prefixes) for t in _GRAPH.findall(block))
+            if not _graph_closed(block):
+                if with_graph is None:
+                    return None
+                graphs.add(_expand(with_graph.group(1), prefixes))
+    if None in graphs:
+        return None
+    return frozenset(graphs)
+
+
+def merge_graphs(a: Graphs, b: Graphs) -> Graphs:
+    """
+    Returns the union of two graph sets (None stands for all graphs).
+
+    :param a: First set
+    :type a: Graphs
+    :param b: Second set
+    :type b: Graphs
+    :return: The union
+    :rtype: Graphs
+    """
+    if a is None or b is None:
+        return None
+    return a | b
+
+
+class CachedResult:
+    """
+    A cached query result. The raw response is kept (which is much smaller than the decoded result) and
+    decoded on every hit, so that callers never share (mutable) result objects.
+    """
+    __slots__ = ('content_type', 'content', 'graphs', 'expires', 'size')
+
+    content_type: str
+    content: bytes
+    graphs: Graphs
+    expires: float
+    size: int
+
+    def __init__(self, content_type: str, content: bytes, graphs: Graphs, expires: float, size: int) -> None:
+        self.content_type = content_type
+        self.content = content
+        self.graphs = graphs
+        self.expires = expires
+        self.size = size
+
+    def decode(self, format: SparqlResultFormat) -> Any:
+        """
+        Decodes the result as `Connection.query` would have decoded the response.
+
+        :param format: The requested format
+        :type format: SparqlResultFormat
+        :return: The decoded result
+        :rtype: Any
+        """
+        if format == SparqlResultFormat.JSON:
+            return json.loads(self.content)
+        return decode_query_result(self.content_type, self.content)
+
+
+class QueryResultCache(metaclass=SingletonMeta):
+    """
+    Singleton LRU cache of SPARQL query results with graph-level invalidation. The cache is bounded by the
+    number of entries and by the size of the cached responses. It is shared by all connections of the process.
+
+    Usage (within the query method of a connection):
+
+    ```python
+    cache = QueryResultCache()
+    key = cache.key(server, repo, userIri, format, query)
+    if (hit := cache.get(key)) is not None:
+        return hit.decode(format)
+    generation = cache.generation
+    res = ...  # send the query
+    cache.put(key, res.headers['Content-Type'], res.content, query_graphs(query), generation)
+    ```
+    """
+    FORMATS = frozenset({SparqlResultFormat.AUTO, SparqlResultFormat.JSON,
+                         SparqlResultFormat.TSV, SparqlResultFormat.BINARY})
+    """The result formats which are cached"""
+
+    _lock: Lock
+    _entries: OrderedDict[QueryKey, CachedResult]
+    _index: dict[tuple[str, str, str | None], set[QueryKey]]
+    _maxsize: int
+    _maxbytes: int
+    _ttl: float
+    _clock: Callable[[], float]
+    _bytes: int
+    _generation: int
+    _hits: int
+    _misses: int
+    _evictions: int
+    _invalidations: int
+
+    def __init__(self):
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._index = {}
+        self._clock = time.monotonic
+        self._generation = 0
+        self._maxsize = 0
+        self._maxbytes = 1
+        self._ttl = 1.0
+        self.configure(maxsize=int(os.getenv("OLDAP_QUERY_CACHE_SIZE", "0")),
+                       maxbytes=int(os.getenv("OLDAP_QUERY_CACHE_MEMORY", str(64 * 1024 * 1024))),
+                       ttl=float(os.getenv("OLDAP_QUERY_CACHE_TTL", "60")))
+
+    def configure(self, *,
+                  maxsize: int | None = None,
+                  maxbytes: int | None = None,
+                  ttl: float | None = None,
+                  clock: Callable[[], float] | None = None) -> None:
+        """
+        Changes the configuration of the cache. All entries are discarded.
+
+        :param maxsize: Maximal number of entries ("0" disables the cache)
+        :type maxsize: int | None
+        :param maxbytes: Maximal size of the cached responses in bytes
+        :type maxbytes: int | None
+        :param ttl: Time to live of the entries in seconds
+        :type ttl: float | None
+        :param clock: Monotonic clock in seconds (used by tests)
+        :type clock: Callable[[], float] | None
+        :return: None
+        :raises OldapErrorValue: If the values are invalid
+        """
+        maxsize = self._maxsize if maxsize is None else maxsize
+        maxbytes = self._maxbytes if maxbytes is None else maxbytes
+        ttl = self._ttl if ttl is None else ttl
+        if maxsize < 0:
+            raise OldapErrorValue(f'Cache size must not be negative, got {maxsize}')
+        if maxbytes < 1:
+            raise OldapErrorValue(f'Cache memory must be at least 1 byte, got {maxbytes}')
+        if ttl <= 0:
+            raise OldapErrorValue(f'Time to live must be positive, got {ttl}')
+        with self._lock:
+            self._maxsize = maxsize
+            self._maxbytes = maxbytes
+            self._ttl = ttl
+            if clock is not None:
+                self._clock = clock
+        self.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return self._maxsize > 0
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @property
+    def maxbytes(self) -> int:
+        return self._maxbytes
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    @property
+    def bytes(self) -> int:
+        """The size of the cached entries in bytes"""
+        return self._bytes
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        """Number of entries evicted because the cache was full"""
+        return self._evictions
+
+    @property
+    def invalidations(self) -> int:
+        """Number of entries evicted because a graph they depend on was written to"""
+        return self._invalidations
+
+    @property
+    def generation(self) -> int:
+        """Counter incremented by every invalidation. See `put()`."""
+        return self._generation
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(server: str, repo: str, user: Any, format: SparqlResultFormat, query: str) -> QueryKey:
+        """
+        Returns the cache key of a query.
+
+        :param server: The URL of the triple store
+        :type server: str
+        :param repo: The repository
+        :type repo: str
+        :param user: The identity of the user (e.g. the user IRI)
+        :type user: Any
+        :param format: The requested result format
+        :type format: SparqlResultFormat
+        :param query: The SPARQL query
+        :type query: str
+        :return: The key
+        :rtype: QueryKey
+        """
+        return server, repo, str(user), format.name, normalize_sparql(query)
+
+    def get(self, key: QueryKey) -> CachedResult | None:
+        """
+        Returns the cached result for the key, or None if there is no (unexpired) entry.
+
+        :param key: The key (see `key()`)
+        :type key: QueryKey
+        :return: The cached result or None
+        :rtype: CachedResult | None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry
+                self._remove(key)
+            self._misses += 1
+            return None
+
+    def put(self, key: QueryKey, content_type: str, content: bytes, graphs: Graphs, generation: int) -> None:
+        """
+        Stores the response to a query. The response is not stored if an invalidation happened since
+        `generation` was read (that is, while the query was running), since it might be stale already.
+        Responses larger than a quarter of the memory limit are not stored.
+
+        :param key: The key (see `key()`)
+        :type key: QueryKey
+        :param content_type: The content type of the response
+        :type content_type: str
+        :param content: The body of the response
+        :type content: bytes
+        :param graphs: The graphs the query reads from (see `query_graphs()`)
+        :type graphs: Graphs
+        :param generation: The value of `generation` before the query was sent
+        :type generation: int
+        :return: None
+        """
+        if not self.enabled:
+            return
+        size = len(content) + len(key[4]) + _ENTRY_OVERHEAD
+        if size * 4 > self._maxbytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CachedResult(content_type, content, graphs, self._clock() + self._ttl, size)
+            self._bytes += size
+            for graph in (graphs if graphs is not None else (None,)):
+                self._index.setdefault((key[0], key[1], graph), set()).add(key)
+            while len(self._entries) > self._maxsize or self._bytes > self._maxbytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, key: QueryKey) -> None:
+        """Removes an entry and its index entries. The lock must be held."""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for graph in (entry.graphs if entry.graphs is not None else (None,)):
+            ikey = (key[0], key[1], graph)
+            keys = self._index.get(ikey)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[ikey]
+
+    def invalidate(self, server: str, repo: str, graphs: Graphs) -> int:
+        """
+        Evicts all entries of the repository that depend on one of the given graphs.
+
+        :param server: The URL of the triple store
+        :type server: str
+        :param repo: The repository
+        :type repo: str
+        :param graphs: The graphs written to. None stands for all graphs.
+        :type graphs: Graphs
+        :return: The number of evicted entries
+        :rtype: int
+        """
+        with self._lock:
+            self._generation += 1
+            if not self._entries:
+                return 0
+            if graphs is None:
+                keys = {k for k in self._entries if k[0] == server and k[1] == repo}
+            else:
+                keys = set(self._index.get((server, repo, None), ()))
+                for graph in graphs:
+                    keys.update(self._index.get((server, repo, graph), ()))
+            for key in keys:
+                self._remove(key)
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def invalidate_update(self, server: str, repo: str, update: str) -> int:
+        """
+        Evicts all entries of the repository that depend on the graphs written by the SPARQL update.
+
+        :param server: The URL of the triple store
+        :type server: str
+        :param repo: The repository
+        :type repo: str
+        :param update: The SPARQL update
+        :type update: str
+        :return: The number of evicted entries
+        :rtype: int
+        """
+        if not self._entries:
+            with self._lock:
+                self._generation += 1
+            return 0
+        return self.invalidate(server, repo, update_graphs(update))
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the counters.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._bytes = 0
+            self._generation += 1
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            self._invalidations = 0
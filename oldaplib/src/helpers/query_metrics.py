@@ -0,0 +1,389 @@
+"""
+# QueryMetrics
+
+Instrumentation of the SPARQL requests sent by `Connection`. Every request (queries, updates and the
+requests of the transaction protocol) results in a `QueryEvent` with the wall time, the sizes of request and
+response, the number of result rows, the HTTP status, the calling method (e.g. "OldapListNode.move_node_below")
+and a fingerprint of the SPARQL text. The fingerprint is the same for all queries that differ in literals, numbers
+and IRIs only, i.e. for all queries generated by the same code.
+
+The events are
+
+- aggregated in a `QueryHistogram` per fingerprint (see `QueryMetrics().histograms()` and `QueryMetrics().top()`),
+- logged with the full SPARQL text if they take longer than the slow query threshold (logger
+  "oldaplib.src.helpers.query_metrics.slow", level WARNING),
+- passed to the listeners registered with `QueryMetrics().add_listener()`.
+
+The instrumentation is disabled by default. If it is disabled (no histograms, no slow query log and no listeners),
+a request costs a single attribute check. It is configured by the following environment variables
+(or by calling `configure()`):
+
+- _OLDAP_QUERY_METRICS_: "true" enables the histograms (default: false)
+- _OLDAP_QUERY_METRICS_SIZE_: Maximal number of fingerprints with a histogram; the events of further
+  fingerprints are aggregated in the fingerprint "other" (default: 1000)
+- _OLDAP_SLOW_QUERY_MS_: Requests taking longer than this many milliseconds are logged. "0" disables the
+  slow query log (default: 0)
+"""
+import hashlib
+import logging
+import os
+import re
+import sys
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable
+
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+from oldaplib.src.helpers.sparql_result_table import SparqlResultTable
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+"""Upper bounds of the buckets of the latency histograms in milliseconds (plus one bucket for longer requests)"""
+
+OTHER = 'other'
+"""Fingerprint aggregating the events of the fingerprints exceeding OLDAP_QUERY_METRICS_SIZE"""
+
+_TEMPLATE_LEXER = re.compile(r'(?P<string>"""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^\'\\]|\\.|\'(?!\'\'))*\'\'\''
+                             r'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\')'
+                             r'(?P<suffix>@[A-Za-z]+(?:-[A-Za-z0-9]+)*|\^\^(?:<[^<>\s]*>|[\w.-]*:[\w.-]*))?'
+                             r'|(?P<iri><[^<>"{}|^`\\\x00-\x20]*>)'
+                             r'|(?P<prefix>\bPREFIX\s+[\w.-]*:\s*<[^>]*>)'
+                             r'|(?P<number>(?<![\w:?$.-])[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?(?![\w:.]))'
+                             r'|(?P<gap>(?:\s|#[^\n]*)+)', re.S | re.I)
+_SKIPPED_MODULES = frozenset({'oldaplib.src.connection', 'oldaplib.src.asyncconnection', __name__})
+
+
+def sparql_template(sparql: str) -> str:
+    """
+    Returns the SPARQL text with literals, numbers and IRIs replaced by "?", PREFIX declarations removed and
+    whitespace and comments collapsed. All queries generated by the same code have the same template.
+
+    :param sparql: SPARQL query or update
+    :type sparql: str
+    :return: The template
+    :rtype: str
+    """
+    def repl(m: re.Match) -> str:
+        match m.lastgroup:
+            case 'gap':
+                return ' '
+            case 'prefix':
+                return ''
+            case 'iri':
+                return '<?>'
+            case _:
+                return '?'
+    return ' '.join(_TEMPLATE_LEXER.sub(repl, sparql).split())
+
+
+def fingerprint(sparql: str) -> str:
+    """
+    Returns a short fingerprint of the template of the SPARQL text (see `sparql_template()`).
+
+    :param sparql: SPARQL query or update
+    :type sparql: str
+    :return: The fingerprint (16 hex digits)
+    :rtype: str
+    """
+    return hashlib.sha1(sparql_template(sparql).encode('utf-8')).hexdigest()[:16]
+
+
+def result_rows(result: Any) -> int | None:
+    """
+    Returns the number of rows of a SPARQL query result (None if the result is not a table).
+
+    :param result: The result as returned by `Connection.query()`
+    :type result: Any
+    :return: The number of rows or None
+    :rtype: int | None
+    """
+    if isinstance(result, SparqlResultTable):
+        return None if result.boolean is not None else len(result.rows)
+    if isinstance(result, dict):
+        bindings = result.get('results', {}).get('bindings')
+        return len(bindings) if bindings is not None else None
+    return None
+
+
+def calling_method() -> str | None:
+    """
+    Returns the method that sent the request, i.e. the first method on the stack outside of the connection
+    classes and the transaction helpers of the Model (`safe_query()` etc.).
+
+    :return: Qualified name of the method (e.g. "OldapListNode.move_node_below") or None
+    :rtype: str | None
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if frame.f_globals.get('__name__') not in _SKIPPED_MODULES and not code.co_name.startswith('safe_'):
+            return code.co_qualname
+        frame = frame.f_back
+    return None
+
+
+@dataclass(slots=True)
+class QueryEvent:
+    """
+    A SPARQL request sent to the triple store.
+
+    :ivar kind: The kind of the request: "QUERY", "UPDATE", "TX_START", "TX_QUERY", "TX_UPDATE", "TX_COMMIT"
+        or "TX_ABORT"
+    :ivar sparql: The SPARQL text (empty for requests without SPARQL, their fingerprint is given by the kind)
+    :ivar seconds: The wall time of the request in seconds
+    :ivar status: The HTTP status (0 if the request failed without a response)
+    :ivar request_bytes: The size of the request body
+    :ivar response_bytes: The size of the response body
+    :ivar rows: The number of result rows (None if not applicable)
+    :ivar caller: The calling method (see `calling_method()`)
+    :ivar cached: True, if the result was answered from the ~QueryResultCache
+    :ivar server: The URL of the triple store
+    :ivar repo: The repository
+    """
+    kind: str
+    sparql: str
+    seconds: float
+    status: int = 200
+    request_bytes: int = 0
+    response_bytes: int = 0
+    rows: int | None = None
+    caller: str | None = None
+    cached: bool = False
+    server: str = ''
+    repo: str = ''
+    _fingerprint: str | None = field(default=None, repr=False)
+
+    @property
+    def fingerprint(self) -> str:
+        """The fingerprint of the SPARQL text (computed on first access)"""
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self.sparql or self.kind)
+        return self._fingerprint
+
+
+class QueryHistogram:
+    """
+    Statistics of the requests with the same fingerprint: the counters and a latency histogram with the
+    buckets given by BUCKETS_MS.
+    """
+    __slots__ = ('fingerprint', 'kind', 'template', 'count', 'errors', 'cached', 'seconds', 'min', 'max',
+                 'rows', 'request_bytes', 'response_bytes', 'buckets', 'callers')
+
+    def __init__(self, fingerprint: str, kind: str, template: str) -> None:
+        self.fingerprint = fingerprint
+        self.kind = kind
+        self.template = template
+        self.count = 0
+        self.errors = 0
+        self.cached = 0
+        self.seconds = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.rows = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.callers: dict[str, int] = {}
+
+    def add(self, event: QueryEvent) -> None:
+        self.count += 1
+        if event.status >= 400 or event.status == 0:
+            self.errors += 1
+        if event.cached:
+            self.cached += 1
+        self.seconds += event.seconds
+        self.min = min(self.min, event.seconds)
+        self.max = max(self.max, event.seconds)
+        self.rows += event.rows or 0
+        self.request_bytes += event.request_bytes
+        self.response_bytes += event.response_bytes
+        self.buckets[bisect_left(BUCKETS_MS, event.seconds * 1000.0)] += 1
+        if event.caller is not None:
+            self.callers[event.caller] = self.callers.get(event.caller, 0) + 1
+
+    @property
+    def mean(self) -> float:
+        """Mean wall time in seconds"""
+        return self.seconds / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Returns an estimate of the given percentile of the wall time: the upper bound of the bucket containing
+        the percentile, but at most the maximum.
+
+        :param p: The percentile (0 - 100)
+        :type p: float
+        :return: The wall time in seconds
+        :rtype: float
+        """
+        if self.count == 0:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n > 0:
+                return min(BUCKETS_MS[i] / 1000.0, self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def copy(self) -> 'QueryHistogram':
+        other = QueryHistogram(self.fingerprint, self.kind, self.template)
+        for name in QueryHistogram.__slots__[3:]:
+            value = getattr(self, name)
+            setattr(other, name, value.copy() if isinstance(value, (list, dict)) else value)
+        return other
+
+    def __str__(self) -> str:
+        return (f'{self.fingerprint} {self.kind} n={self.count} total={self.seconds * 1000:.1f}ms '
+                f'mean={self.mean * 1000:.1f}ms p95={self.percentile(95) * 1000:.1f}ms '
+                f'max={self.max * 1000:.1f}ms rows={self.rows}: {self.template[:120]}')
+
+
+class QueryMetrics(metaclass=SingletonMeta):
+    """
+    Singleton collecting the `QueryEvent`s of all connections of the process. `enabled` is checked by the
+    connections before they measure anything.
+    """
+    enabled: bool
+    _metrics: bool
+    _slow_seconds: float
+    _maxsize: int
+    _listeners: list[Callable[[QueryEvent], None]]
+    _histograms: dict[str, QueryHistogram]
+    _lock: Lock
+
+    def __init__(self):
+        self._listeners = []
+        self._histograms = {}
+        self._lock = Lock()
+        self.configure(metrics=os.getenv("OLDAP_QUERY_METRICS", "false").lower() in ("1", "true", "yes"),
+                       slow_query_ms=float(os.getenv("OLDAP_SLOW_QUERY_MS", "0")),
+                       maxsize=int(os.getenv("OLDAP_QUERY_METRICS_SIZE", "1000")))
+
+    def configure(self, *,
+                  metrics: bool | None = None,
+                  slow_query_ms: float | None = None,
+                  maxsize: int | None = None) -> None:
+        """
+        Changes the configuration. The collected histograms are kept.
+
+        :param metrics: True enables the histograms
+        :type metrics: bool | None
+        :param slow_query_ms: Threshold of the slow query log in milliseconds ("0" disables the log)
+        :type slow_query_ms: float | None
+        :param maxsize: Maximal number of fingerprints with a histogram
+        :type maxsize: int | None
+        :return: None
+        :raises OldapErrorValue: If the values are invalid
+        """
+        if (slow_query_ms is not None and slow_query_ms < 0) or (maxsize is not None and maxsize < 1):
+            raise OldapErrorValue(f'Invalid query metrics configuration: slow_query_ms={slow_query_ms}, '
+                                  f'maxsize={maxsize}')
+        if metrics is not None:
+            self._metrics = metrics
+        if slow_query_ms is not None:
+            self._slow_seconds = slow_query_ms / 1000.0
+        if maxsize is not None:
+            self._maxsize = maxsize
+        self._update_enabled()
+
+    def _update_enabled(self) -> None:
+        self.enabled = self._metrics or self._slow_seconds > 0 or bool(self._listeners)
+
+    @property
+    def slow_query_ms(self) -> float:
+        return self._slow_seconds * 1000.0
+
+    def add_listener(self, listener: Callable[[QueryEvent], None]) -> None:
+        """
+        Registers a callable that is called with every `QueryEvent` (in the thread that sent the request).
+        Exceptions raised by the listener are logged and ignored.
+
+        :param listener: The listener
+        :type listener: Callable[[QueryEvent], None]
+        :return: None
+        """
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+        self._update_enabled()
+
+    def remove_listener(self, listener: Callable[[QueryEvent], None]) -> None:
+        """
+        Removes a listener registered with `add_listener()`.
+
+        :param listener: The listener
+        :type listener: Callable[[QueryEvent], None]
+        :return: None
+        """
+        with self._lock:
+            self._listeners = [x for x in self._listeners if x != listener]
+        self._update_enabled()
+
+    def record(self, event: QueryEvent) -> None:
+        """
+        Processes an event: updates the histogram of its fingerprint, writes the slow query log and calls
+        the listeners.
+
+        :param event: The event
+        :type event: QueryEvent
+        :return: None
+        """
+        if self._metrics:
+            template = sparql_template(event.sparql or event.kind)
+            event._fingerprint = hashlib.sha1(template.encode('utf-8')).hexdigest()[:16]
+            with self._lock:
+                histogram = self._histograms.get(event.fingerprint)
+                if histogram is None:
+                    if len(self._histograms) < self._maxsize:
+                        histogram = QueryHistogram(event.fingerprint, event.kind, template)
+                        self._histograms[event.fingerprint] = histogram
+                    else:
+                        histogram = self._histograms.get(OTHER)
+                        if histogram is None:
+                            histogram = QueryHistogram(OTHER, event.kind, '')
+                            self._histograms[OTHER] = histogram
+                histogram.add(event)
+        if 0 < self._slow_seconds <= event.seconds:
+            logging.getLogger(__name__ + '.slow').warning(
+                f'Slow SPARQL {event.kind} ({event.seconds * 1000:.1f}ms, status {event.status}, '
+                f'{event.rows if event.rows is not None else "-"} rows, {event.response_bytes} bytes, '
+                f'caller {event.caller}, fingerprint {event.fingerprint}):\n{event.sparql}')
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as err:
+                logging.getLogger(__name__).error(f'Query metrics listener {listener!r} failed: {err}')
+
+    def histograms(self) -> dict[str, QueryHistogram]:
+        """
+        Returns a copy of the histograms.
+
+        :return: Dict fingerprint -> histogram
+        :rtype: dict[str, QueryHistogram]
+        """
+        with self._lock:
+            return {fp: h.copy() for fp, h in self._histograms.items()}
+
+    def top(self, n: int = 10, key: str = 'seconds') -> list[QueryHistogram]:
+        """
+        Returns the n fingerprints that dominate the given statistic (by default the total wall time).
+
+        :param n: Number of histograms
+        :type n: int
+        :param key: Attribute of `QueryHistogram` to sort by (e.g. "seconds", "count", "max", "response_bytes")
+        :type key: str
+        :return: List of histograms, sorted descending
+        :rtype: list[QueryHistogram]
+        """
+        return sorted(self.histograms().values(), key=lambda h: getattr(h, key), reverse=True)[:n]
+
+    def reset(self) -> None:
+        """
+        Discards the histograms.
+
+        :return: None
+        """
+        with self._lock:
+            self._histograms = {}
+
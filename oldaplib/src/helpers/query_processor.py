@@ -1,10 +1,12 @@
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator
 
 from pystrict import strict
 
 from oldaplib.src.dtypes.namespaceiri import NamespaceIRI
 from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.json_stream import SparqlJsonStreamParser
+from oldaplib.src.helpers.sparql_result_table import SparqlResultTable, RdfTerm
 from oldaplib.src.dtypes.bnode import BNode
 from oldaplib.src.xsd.geo_wktLiteral import Geo_wktLiteral
 from oldaplib.src.xsd.iri import Iri
@@ -53,6 +55,56 @@ from oldaplib.src.xsd.xsd import Xsd
 RowElementType = Xsd | BNode
 RowType = Dict[str, RowElementType]
 
+_XSD = 'http://www.w3.org/2001/XMLSchema#'
+_GEO = 'http://www.opengis.net/ont/geosparql#'
+
+#
+# Python classes of the literal datatypes, indexed by the datatype IRI
+#
+_LITERAL_TYPES: Dict[str, type] = {
+    _XSD + 'string': Xsd_string,
+    _XSD + 'boolean': Xsd_boolean,
+    _XSD + 'decimal': Xsd_decimal,
+    _XSD + 'float': Xsd_float,
+    _XSD + 'double': Xsd_double,
+    _XSD + 'duration': Xsd_duration,
+    _XSD + 'dateTime': Xsd_dateTime,
+    _XSD + 'dateTimeStamp': Xsd_dateTimeStamp,
+    _XSD + 'time': Xsd_time,
+    _XSD + 'date': Xsd_date,
+    _XSD + 'gYearMonth': Xsd_gYearMonth,
+    _XSD + 'gYear': Xsd_gYear,
+    _XSD + 'gDay': Xsd_gDay,
+    _XSD + 'gMonth': Xsd_gMonth,
+    _XSD + 'gMonthDay': Xsd_gMonthDay,
+    _XSD + 'ID': Xsd_ID,
+    _XSD + 'IDREF': Xsd_IDREF,
+    _XSD + 'hexBinary': Xsd_hexBinary,
+    _XSD + 'base64Binary': Xsd_base64Binary,
+    _XSD + 'anyURI': Xsd_anyURI,
+    _XSD + 'QName': Xsd_QName,
+    _XSD + 'normalizedString': Xsd_normalizedString,
+    _XSD + 'token': Xsd_token,
+    _XSD + 'NMTOKEN': Xsd_NMTOKEN,
+    _XSD + 'language': Xsd_language,
+    _XSD + 'name': Xsd_Name,
+    _XSD + 'NCName': Xsd_NCName,
+    _XSD + 'integer': Xsd_integer,
+    _XSD + 'int': Xsd_int,
+    _XSD + 'nonPositiveInteger': Xsd_nonPositiveInteger,
+    _XSD + 'negativeInteger': Xsd_negativeInteger,
+    _XSD + 'long': Xsd_long,
+    _XSD + 'short': Xsd_short,
+    _XSD + 'byte': Xsd_byte,
+    _XSD + 'nonNegativeInteger': Xsd_nonNegativeInteger,
+    _XSD + 'unsignedLong': Xsd_unsignedLong,
+    _XSD + 'unsignedInt': Xsd_unsignedInt,
+    _XSD + 'unsignedShort': Xsd_unsignedShort,
+    _XSD + 'unsignedByte': Xsd_unsignedByte,
+    _XSD + 'positiveInteger': Xsd_positiveInteger,
+    _GEO + 'wktLiteral': Geo_wktLiteral,
+}
+
 
 @dataclass
 #@strict
@@ -62,121 +114,123 @@ class QueryProcessor:
     __rows: List[Dict[str, RowElementType]]
     __pos: int
 
-    def __init__(self, context: Context, query_result: Dict) -> None:
+    def __init__(self, context: Context, query_result: Dict | SparqlResultTable) -> None:
         self.__context = context
         self.__pos = 0
-        self.__rows = []
+        if isinstance(query_result, SparqlResultTable):
+            self.__names = list(query_result.names)
+            self.__rows = [QueryProcessor.row_from_terms(context, self.__names, terms)
+                           for terms in query_result.rows]
+            return
         self.__names = query_result["head"]["vars"]
-        for tmprow in query_result["results"]["bindings"]:
-            row: Dict[str, RowElementType] = {}
-            for name, valobj in tmprow.items():
-                if valobj["type"] == "uri":
-                    tmp = context.iri2qname(valobj["value"], validate=False)
-                    if tmp is None:
-                        row[name] = Iri(valobj["value"], validate=False)
-                    elif not tmp.fragment:
-                        row[name] = NamespaceIRI(valobj["value"], validate=False)
-                    else:
-                        #row[name] = Iri(tmp, validate=False)
-                        row[name] = tmp
-                elif valobj["type"] == "bnode":
-                    row[name] = BNode(f'_:{valobj["value"]}', validate=False)
-                elif valobj["type"] == "literal":
-                    dt = valobj.get("datatype")
-                    if dt is None:
-                        if valobj.get("xml:lang") is not None:
-                            row[name] = Xsd_string.fromRdf(valobj["value"], valobj.get("xml:lang"))
-                        else:
-                            # row[name] = Xsd_string.fromRdf(valobj["value"])
-                            row[name] = Xsd_string.fromRdf(valobj["value"])
-                    else:
-                        dt = context.iri2qname(dt, validate=False)
-                        match str(dt):
-                            case 'xsd:string':
-                                row[name] = Xsd_string.fromRdf(valobj["value"])
-                            case 'xsd:boolean':
-                                row[name] = Xsd_boolean.fromRdf(valobj["value"])
-                            case 'xsd:decimal':
-                                row[name] = Xsd_decimal.fromRdf(valobj["value"])
-                            case 'xsd:float':
-                                row[name] = Xsd_float.fromRdf(valobj["value"])
-                            case 'xsd:double':
-                                row[name] = Xsd_double.fromRdf(valobj["value"])
-                            case 'xsd:duration':
-                                row[name] = Xsd_duration.fromRdf(valobj["value"])
-                            case 'xsd:dateTime':
-                                row[name] = Xsd_dateTime.fromRdf(valobj["value"])
-                            case 'xsd:dateTimeStamp':
-                                row[name] = Xsd_dateTimeStamp.fromRdf(valobj["value"])
-                            case 'xsd:time':
-                                row[name] = Xsd_time.fromRdf(valobj["value"])
-                            case 'xsd:date':
-                                row[name] = Xsd_date.fromRdf(valobj["value"])
-                            case 'xsd:gYearMonth':
-                                row[name] = Xsd_gYearMonth.fromRdf(valobj["value"])
-                            case 'xsd:gYear':
-                                row[name] = Xsd_gYear.fromRdf(valobj["value"])
-                            case 'xsd:gDay':
-                                row[name] = Xsd_gDay.fromRdf(valobj["value"])
-                            case 'xsd:gMonth':
-                                row[name] = Xsd_gMonth.fromRdf(valobj["value"])
-                            case 'xsd:gMonthDay':
-                                row[name] = Xsd_gMonthDay.fromRdf(valobj["value"])
-                            case 'xsd:ID':
-                                row[name] = Xsd_ID.fromRdf(valobj["value"])
-                            case 'xsd:IDREF':
-                                row[name] = Xsd_IDREF.fromRdf(valobj["value"])
-                            case 'xsd:hexBinary':
-                                row[name] = Xsd_hexBinary.fromRdf(valobj["value"])
-                            case 'xsd:base64Binary':
-                                row[name] = Xsd_base64Binary.fromRdf(valobj["value"])
-                            case 'xsd:anyURI':
-                                row[name] = Xsd_anyURI.fromRdf(valobj["value"])
-                            case 'xsd:QName':
-                                row[name] = Xsd_QName.fromRdf(valobj["value"])
-                            case 'xsd:normalizedString':
-                                row[name] = Xsd_normalizedString.fromRdf(valobj["value"])
-                            case 'xsd:token':
-                                row[name] = Xsd_token.fromRdf(valobj["value"])
-                            case 'xsd:NMTOKEN':
-                                row[name] = Xsd_NMTOKEN.fromRdf(valobj["value"])
-                            case 'xsd:language':
-                                row[name] = Xsd_language.fromRdf(valobj["value"])
-                            case 'xsd:name':
-                                row[name] = Xsd_Name.fromRdf(valobj["value"])
-                            case 'xsd:NCName':
-                                row[name] = Xsd_NCName.fromRdf(valobj["value"])
-                            case 'xsd:integer':
-                                row[name] = Xsd_integer.fromRdf(valobj["value"])
-                            case 'xsd:int':
-                                row[name] = Xsd_int.fromRdf(valobj["value"])
-                            case 'xsd:nonPositiveInteger':
-                                row[name] = Xsd_nonPositiveInteger.fromRdf(valobj["value"])
-                            case 'xsd:negativeInteger':
-                                row[name] = Xsd_negativeInteger.fromRdf(valobj["value"])
-                            case 'xsd:long':
-                                row[name] = Xsd_long.fromRdf(valobj["value"])
-                            case 'xsd:short':
-                                row[name] = Xsd_short.fromRdf(valobj["value"])
-                            case 'xsd:byte':
-                                row[name] = Xsd_byte.fromRdf(valobj["value"])
-                            case 'xsd:nonNegativeInteger':
-                                row[name] = Xsd_nonNegativeInteger.fromRdf(valobj["value"])
-                            case 'xsd:unsignedLong':
-                                row[name] = Xsd_unsignedLong.fromRdf(valobj["value"])
-                            case 'xsd:unsignedInt':
-                                row[name] = Xsd_unsignedInt.fromRdf(valobj["value"])
-                            case 'xsd:unsignedShort':
-                                row[name] = Xsd_unsignedShort.fromRdf(valobj["value"])
-                            case 'xsd:unsignedByte':
-                                row[name] = Xsd_unsignedByte.fromRdf(valobj["value"])
-                            case 'xsd:positiveInteger':
-                                row[name] = Xsd_positiveInteger.fromRdf(valobj["value"])
-                            case 'geo:wktLiteral':
-                                row[name] = Geo_wktLiteral.fromRdf(valobj["value"])
-                            case _:
-                                row[name] = Xsd_string.fromRdf(valobj["value"])
-            self.__rows.append(row)
+        self.__rows = [QueryProcessor.row_from_binding(context, binding)
+                       for binding in query_result["results"]["bindings"]]
+
+    @staticmethod
+    def term_to_value(context: Context,
+                      termtype: str,
+                      value: str,
+                      datatype: str | None = None,
+                      lang: str | None = None) -> RowElementType | None:
+        """
+        Converts an RDF term of a query result into the corresponding Python object.
+
+        :param context: The context used to convert IRIs into QNames
+        :type context: Context
+        :param termtype: The type of the term ("uri", "bnode" or "literal")
+        :type termtype: str
+        :param value: The IRI, the blank node id or the lexical form of the literal
+        :type value: str
+        :param datatype: The datatype IRI of a typed literal
+        :type datatype: str | None
+        :param lang: The language tag of a literal
+        :type lang: str | None
+        :return: The value, or None for terms that are not supported (e.g. quoted triples)
+        :rtype: RowElementType | None
+        """
+        if termtype == "uri":
+            tmp = context.iri2qname(value, validate=False)
+            if tmp is None:
+                return Iri(value, validate=False)
+            elif not tmp.fragment:
+                return NamespaceIRI(value, validate=False)
+            else:
+                return tmp
+        elif termtype == "bnode":
+            return BNode(f'_:{value}', validate=False)
+        elif termtype == "literal":
+            if datatype is None:
+                if lang is not None:
+                    return Xsd_string.fromRdf(value, lang)
+                else:
+                    return Xsd_string.fromRdf(value)
+            else:
+                return _LITERAL_TYPES.get(datatype, Xsd_string).fromRdf(value)
+        return None
+
+    @staticmethod
+    def row_from_binding(context: Context, binding: Dict[str, Dict[str, str]]) -> RowType:
+        """
+        Converts one binding of a SPARQL JSON result into a row with typed values.
+
+        :param context: The context used to convert IRIs into QNames
+        :type context: Context
+        :param binding: The binding (variable name -> RDF term as defined by the SPARQL JSON result format)
+        :type binding: Dict[str, Dict[str, str]]
+        :return: The row
+        :rtype: RowType
+        """
+        row: Dict[str, RowElementType] = {}
+        for name, valobj in binding.items():
+            val = QueryProcessor.term_to_value(context, valobj["type"], valobj["value"],
+                                               valobj.get("datatype"), valobj.get("xml:lang"))
+            if val is not None:
+                row[name] = val
+        return row
+
+    @staticmethod
+    def row_from_terms(context: Context, names: List[str], terms: tuple[RdfTerm | None, ...]) -> RowType:
+        """
+        Converts one row of a ~SparqlResultTable (TSV or binary result) into a row with typed values.
+
+        :param context: The context used to convert IRIs into QNames
+        :type context: Context
+        :param names: The variable names
+        :type names: List[str]
+        :param terms: The terms of the row (None for unbound variables)
+        :type terms: tuple[RdfTerm | None, ...]
+        :return: The row
+        :rtype: RowType
+        """
+        row: Dict[str, RowElementType] = {}
+        for name, term in zip(names, terms):
+            if term is not None:
+                val = QueryProcessor.term_to_value(context, term.type, term.value, term.datatype, term.lang)
+                if val is not None:
+                    row[name] = val
+        return row
+
+    @staticmethod
+    def stream(context: Context, chunks: Iterable[bytes]) -> Iterator[RowType]:
+        """
+        Generator that parses a SPARQL JSON result incrementally and yields the rows as soon as the bytes
+        of a binding have arrived. In contrast to the constructor, neither the raw response nor the
+        complete result tree is held in memory.
+
+        :param context: The context used to convert IRIs into QNames
+        :type context: Context
+        :param chunks: The bytes of the SPARQL JSON result, e.g. `response.iter_content(65536)`
+        :type chunks: Iterable[bytes]
+        :return: Generator of rows
+        :rtype: Iterator[RowType]
+        :raises OldapError: If the result is not a valid SPARQL JSON result
+        """
+        parser = SparqlJsonStreamParser()
+        for chunk in chunks:
+            for binding in parser.feed(chunk):
+                yield QueryProcessor.row_from_binding(context, binding)
+        for binding in parser.close():
+            yield QueryProcessor.row_from_binding(context, binding)
 
     def __len__(self) -> int:
         return len(self.__rows)
@@ -0,0 +1,308 @@
+"""
+# RDF-star on rdflib
+
+rdflib does not support RDF-star, but OLDAP stores the admin and data permissions as annotations of quoted triples,
+e.g. `<<:rosenth oldap:inProject :HyperHamlet>> oldap:hasAdminPermission oldap:ADMIN_USERS`. For the
+~RdflibConnection, quoted triples are therefore rewritten into standard reification:
+
+- A quoted triple `<< S P O >>` is represented by the IRI "urn:oldap:quoted:" + SHA1 of the N-Triples like key
+  of S, P and O (see `quoted_triple_iri()`). The IRI is the same for the same triple, as the identity of a quoted
+  triple is given by its terms.
+- Wherever a quoted triple is asserted (in data files and in INSERT templates), the reification triples
+  `<iri> rdf:subject S ; rdf:predicate P ; rdf:object O` are added to the same graph.
+- In query patterns, `<< S P O >>` is replaced by a variable bound by the reification triples, i.e. S, P and O
+  may be variables. In INSERT and DELETE templates, the variable is bound to the IRI computed by the same hash
+  function in SPARQL (`BIND(IRI(CONCAT("urn:oldap:quoted:", SHA1(...))) AS ?_qt1)`).
+
+The reification triples are never deleted: deleting the annotations of a quoted triple must not affect other
+annotations of the same triple. Quoted triples must be in the subject position of a triple pattern (as everywhere
+in OLDAP) and must not be nested.
+"""
+import hashlib
+import re
+from typing import Iterator
+
+from rdflib import Dataset, Graph, URIRef, Literal, Node, RDF, XSD
+from rdflib.graph import DATASET_DEFAULT_GRAPH_ID
+
+from oldaplib.src.helpers.oldaperror import OldapError
+
+QUOTED_NS = 'urn:oldap:quoted:'
+_PLACEHOLDER = 'urn:oldap:placeholder:'
+
+_STRING = r'"""(?:[^"\\]|\\.|"(?!""))*"""|' \
+          r"'''(?:[^'\\]|\\.|'(?!''))*'''|" \
+          r'"(?:[^"\\\n]|\\.)*"|' \
+          r"'(?:[^'\\\n]|\\.)*'"
+_DELIMITERS = r'\s"\'<>#{}();,.\[\]'
+_TOKEN = re.compile(r'(?P<string>' + _STRING + r')'
+                    r'|(?P<open><<)'
+                    r'|(?P<close>>>)'
+                    r'|(?P<iri><[^<>"{}|^`\\\x00-\x20]*>)'
+                    r'|(?P<comment>#[^\n]*)'
+                    r'|(?P<ws>\s+)'
+                    r'|(?P<lbrace>\{)'
+                    r'|(?P<rbrace>\})'
+                    r'|(?P<punct>[;.,()\[\]])'
+                    r'|(?P<word>(?:[^' + _DELIMITERS + r']|\.(?=[^' + _DELIMITERS + r']))+)'
+                    r'|(?P<other>.)', re.S)
+_TERM = re.compile(r'(?:' + _STRING + r')(?:@[A-Za-z]+(?:-[A-Za-z0-9]+)*|\^\^(?:<[^<>\s]*>|[\w.-]*:[\w.-]*))?'
+                   r'|<[^<>\s]*>|[^\s<>]+', re.S)
+_DIRECTIVE = re.compile(r'^[ \t]*((?:@prefix|@base)\b[^\n]*|(?:PREFIX|BASE)\s[^\n]*)$', re.M | re.I)
+_RDF_TYPE = f'<{RDF.type}>'
+_SUBJECT, _PREDICATE, _OBJECT = f'<{RDF.subject}>', f'<{RDF.predicate}>', f'<{RDF.object}>'
+
+Token = tuple[str, str]
+
+
+def term_key(term: Node) -> str:
+    """
+    Returns the key of an RDF term used for the IRI of quoted triples. It is computed the same way in SPARQL
+    (see `_key_expression()`).
+
+    :param term: IRI or literal
+    :type term: Node
+    :return: The key
+    :rtype: str
+    """
+    if isinstance(term, Literal):
+        datatype = term.datatype or (RDF.langString if term.language else XSD.string)
+        return f'"{term}"^^<{datatype}>@{term.language or ""}'
+    return f'<{term}>'
+
+
+def quoted_triple_iri(s: Node, p: Node, o: Node) -> URIRef:
+    """
+    Returns the IRI that represents the quoted triple `<< s p o >>`.
+
+    :param s: The subject
+    :type s: Node
+    :param p: The predicate
+    :type p: Node
+    :param o: The object
+    :type o: Node
+    :return: The IRI
+    :rtype: URIRef
+    """
+    key = f'{term_key(s)} {term_key(p)} {term_key(o)}'
+    return URIRef(QUOTED_NS + hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+
+def _key_expression(term: str) -> str:
+    return (f'IF(isIRI({term}), CONCAT("<", STR({term}), ">"), '
+            f'CONCAT("\\"", STR({term}), "\\"^^<", STR(DATATYPE({term})), ">@", LANG({term})))')
+
+
+def _tokens(text: str) -> list[Token]:
+    return [(m.lastgroup, m.group()) for m in _TOKEN.finditer(text)]
+
+
+def _significant(tokens: list[Token], i: int, step: int) -> int:
+    """Index of the next token (in direction step) that is not whitespace or a comment, or -1"""
+    i += step
+    while 0 <= i < len(tokens) and tokens[i][0] in ('ws', 'comment'):
+        i += step
+    return i if 0 <= i < len(tokens) else -1
+
+
+def _quoted_terms(tokens: list[Token], start: int) -> tuple[list[str], int]:
+    """Returns the three terms of the quoted triple starting at tokens[start] and the index of its end"""
+    end = start + 1
+    while end < len(tokens) and tokens[end][0] != 'close':
+        if tokens[end][0] == 'open':
+            raise OldapError('Nested quoted triples are not supported')
+        end += 1
+    if end >= len(tokens):
+        raise OldapError('Unterminated quoted triple')
+    terms = _TERM.findall(''.join(text for _, text in tokens[start + 1:end]))
+    if len(terms) != 3:
+        raise OldapError(f'Invalid quoted triple: "{"".join(text for _, text in tokens[start:end + 1])}"')
+    return [_RDF_TYPE if term == 'a' else term for term in terms], end
+
+
+def _in_subject_position(tokens: list[Token], i: int) -> bool:
+    prev = _significant(tokens, i, -1)
+    return prev < 0 or tokens[prev][1] in ('{', '}', '.')
+
+
+def _split_operations(tokens: list[Token]) -> Iterator[list[Token]]:
+    depth = 0
+    operation = []
+    for token in tokens:
+        if token[0] == 'lbrace':
+            depth += 1
+        elif token[0] == 'rbrace':
+            depth -= 1
+        elif depth == 0 and token[1] == ';':
+            yield operation
+            operation = []
+            continue
+        operation.append(token)
+    yield operation
+
+
+def _blocks(tokens: list[Token]) -> list[tuple[str, int, int]]:
+    """
+    Returns the top level blocks of a SPARQL operation as (kind, index of "{", index of "}"). The kind is
+    "INSERT DATA", "DELETE DATA", "INSERT", "DELETE", "DELETE WHERE", "CONSTRUCT" (templates) or "WHERE".
+    """
+    blocks = []
+    depth = 0
+    pending = None
+    start = 0
+    for i, (kind, text) in enumerate(tokens):
+        if kind == 'lbrace':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif kind == 'rbrace':
+            depth -= 1
+            if depth == 0:
+                blocks.append((pending or 'WHERE', start, i))
+                pending = None
+        elif depth == 0 and kind == 'word':
+            word = text.upper()
+            if word in ('INSERT', 'DELETE', 'CONSTRUCT'):
+                pending = word
+            elif word == 'DATA' and pending in ('INSERT', 'DELETE'):
+                pending += ' DATA'
+            elif word == 'WHERE':
+                pending = 'DELETE WHERE' if pending == 'DELETE' else 'WHERE'
+    return blocks
+
+
+def _keyword_before(tokens: list[Token], start: int, keyword: str) -> int:
+    return max(j for j in range(start) if tokens[j][0] == 'word' and tokens[j][1].upper() == keyword)
+
+
+def _rewrite_operation(tokens: list[Token], counter: list[int]) -> str:
+    blocks = _blocks(tokens)
+    out = [text for _, text in tokens]
+    binds: list[str] = []
+
+    def variable() -> str:
+        counter[0] += 1
+        return f'?_qt{counter[0]}'
+
+    for kind, start, end in blocks:
+        i = start
+        while i < end:
+            if tokens[i][0] != 'open':
+                i += 1
+                continue
+            (s, p, o), close = _quoted_terms(tokens, i)
+            var = variable()
+            reification = f'{var} {_SUBJECT} {s} ; {_PREDICATE} {p} ; {_OBJECT} {o} . {var}'
+            if kind in ('WHERE', 'DELETE WHERE') or kind.startswith('INSERT') or kind == 'CONSTRUCT':
+                if not _in_subject_position(tokens, i):
+                    raise OldapError('Quoted triples are supported in the subject position only')
+            if kind == 'WHERE':
+                out[i] = reification
+            elif kind == 'DELETE WHERE':
+                out[i] = f'\x00{var}\x00{reification}\x00'  # split into template and pattern below
+            else:
+                out[i] = reification if kind.startswith('INSERT') or kind == 'CONSTRUCT' else var
+                binds.append(f'BIND(IRI(CONCAT("{QUOTED_NS}", SHA1(CONCAT({_key_expression(s)}, " ", '
+                             f'{_key_expression(p)}, " ", {_key_expression(o)})))) AS {var})')
+            for j in range(i + 1, close + 1):
+                out[j] = ''
+            i = close + 1
+    for kind, start, end in blocks:
+        if kind == 'DELETE WHERE' and any(t.startswith('\x00') for t in out[start:end]):
+            body = ''.join(out[start + 1:end])
+            template = re.sub(r'\x00([^\x00]*)\x00[^\x00]*\x00', r'\1', body)
+            pattern = re.sub(r'\x00[^\x00]*\x00([^\x00]*)\x00', r'\1', body)
+            out[_keyword_before(tokens, start, 'WHERE')] = ''
+            out[start:end + 1] = ['{' + template + '} WHERE {' + pattern + '}'] + [''] * (end - start)
+        elif kind in ('INSERT DATA', 'DELETE DATA') and binds:
+            out[_keyword_before(tokens, start, 'DATA')] = ''
+            out[end] = '} WHERE { ' + ' '.join(binds) + ' }'
+        elif kind == 'WHERE' and binds:
+            out[end] = ' ' + ' '.join(binds) + ' }'
+    return ''.join(out)
+
+
+def rewrite_sparql(sparql: str) -> str:
+    """
+    Rewrites the quoted triples in a SPARQL query or update into reification (see above). "INSERT DATA" is
+    rewritten into "INSERT {...} WHERE {}" (rdflib fails to insert data into the default graph of a dataset
+    with a default union graph).
+
+    :param sparql: SPARQL query or update
+    :type sparql: str
+    :return: The rewritten SPARQL
+    :rtype: str
+    :raises OldapError: If a quoted triple is nested or not in subject position
+    """
+    if '<<' not in sparql and not re.search(r'\bINSERT\s+DATA\b', sparql, re.I):
+        return sparql
+    counter = [0]
+    operations = []
+    for operation in _split_operations(_tokens(sparql)):
+        text = _rewrite_operation(operation, counter)
+        if any(kind == 'INSERT DATA' for kind, _, _ in _blocks(_tokens(text))):
+            text = re.sub(r'\bINSERT\s+DATA\s*(\{.*\})', r'INSERT \1 WHERE {}', text, count=1, flags=re.I | re.S)
+        operations.append(text)
+    return ';'.join(operations)
+
+
+def parse_rdf_star(data: str, format: str, graph: str | None = None) -> Dataset:
+    """
+    Parses Turtle, TriG, N-Triples or N-Quads data with quoted triples (Turtle-star etc.) into a dataset.
+    The quoted triples are replaced by their IRIs and the reification triples are added to the graph
+    of the annotation.
+
+    :param data: The data
+    :type data: str
+    :param format: The rdflib format ("turtle", "trig", "nt" or "nquads")
+    :type format: str
+    :param graph: The graph to load triples (Turtle, N-Triples) into (default: the default graph)
+    :type graph: str | None
+    :return: Dataset with the data
+    :rtype: Dataset
+    :raises OldapError: If the data is invalid
+    """
+    dataset = Dataset()
+    target = dataset.graph(URIRef(graph)) if graph is not None and format in ('turtle', 'nt') else dataset
+    tokens = _tokens(data)
+    if not any(kind == 'open' for kind, _ in tokens):
+        target.parse(data=data, format=format)
+        return dataset
+    #
+    # replace the quoted triples by placeholders and parse their terms separately
+    #
+    out = []
+    terms = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i][0] == 'open':
+            triple, i = _quoted_terms(tokens, i)
+            out.append(f' <{_PLACEHOLDER}{len(terms)}> ')
+            terms.append(triple)
+        else:
+            out.append(tokens[i][1])
+        i += 1
+    header = '\n'.join(_DIRECTIVE.findall(data))
+    aux = Graph()
+    aux.parse(data=header + '\n' + '\n'.join(f'<{_PLACEHOLDER}{n}> <{_PLACEHOLDER}s> {s} ; <{_PLACEHOLDER}p> {p} ; '
+                                             f'<{_PLACEHOLDER}o> {o} .' for n, (s, p, o) in enumerate(terms)),
+              format='turtle')
+    resolved: dict[URIRef, tuple[URIRef, Node, Node, Node]] = {}
+    for n in range(len(terms)):
+        node = URIRef(f'{_PLACEHOLDER}{n}')
+        s, p, o = (aux.value(node, URIRef(_PLACEHOLDER + x)) for x in 'spo')
+        resolved[node] = (quoted_triple_iri(s, p, o), s, p, o)
+    parsed = Dataset()
+    parsed_target = parsed.graph(URIRef(graph)) if graph is not None and format in ('turtle', 'nt') else parsed
+    parsed_target.parse(data=''.join(out), format=format)
+    for s, p, o, g in parsed.quads((None, None, None, None)):
+        g_id = g if g is not None else DATASET_DEFAULT_GRAPH_ID
+        dest = dataset.graph(g_id) if g_id != DATASET_DEFAULT_GRAPH_ID else dataset.default_context
+        for term in (s, o):
+            if term in resolved:
+                iri, qs, qp, qo = resolved[term]
+                dest.add((iri, RDF.subject, qs))
+                dest.add((iri, RDF.predicate, qp))
+                dest.add((iri, RDF.object, qo))
+        dest.add((resolved[s][0] if s in resolved else s, p, resolved[o][0] if o in resolved else o))
+    return dataset
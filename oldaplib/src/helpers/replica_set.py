@@ -0,0 +1,330 @@
+"""
+# ReplicaSet
+
+Routing of read queries to read replicas of the triple store (e.g. the worker nodes of a GraphDB cluster or
+read-only copies of the repository).
+
+A `Connection` with replicas sends its plain `query()` calls to the replica with the least outstanding requests
+(ties are resolved round-robin). Writes, uploads and the transaction protocol always go to the primary. After a
+write, all connections of the same user read from the primary for a short "read-your-writes" window, so that
+the user sees their own changes even if the replicas lag behind. The windows are kept in the `ReplicaSet`.
+
+Reads may be hedged: if a read has not been answered after the given percentile of the recent read latencies
+(e.g. the 95th percentile), the same query is sent to a second replica and the first successful response is
+used. Hedging starts once enough latencies have been observed.
+
+A replica that cannot be reached or answers with a server error (5xx) has failed: the query is sent to the next
+replica, and if all replicas failed, to the primary.
+
+The replicas are configured by the following environment variables (or by the arguments of `Connection`):
+
+- _OLDAP_TS_REPLICAS_: Comma separated list of the server URLs of the replicas (default: none). The replicas
+  must serve a repository with the same name as the primary.
+- _OLDAP_HEDGE_PERCENTILE_: Latency percentile after which a read is hedged. "0" disables hedging (default: 95)
+- _OLDAP_READ_YOUR_WRITES_MS_: Duration of the read-your-writes window in milliseconds (default: 1000)
+
+All connections using the same replicas share one `ReplicaSet` (see `ReplicaSet.shared()`), so that the
+outstanding requests are counted per process.
+"""
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from threading import Lock
+from typing import Iterable, Optional, Self
+
+import requests
+
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.session_pool import SessionPool
+
+
+class Replica:
+    """
+    A read replica and its number of outstanding requests.
+    """
+    server: str
+    query_url: str
+    outstanding: int
+    requests: int
+
+    def __init__(self, server: str, repo: str) -> None:
+        self.server = server.rstrip('/')
+        self.query_url = f'{self.server}/repositories/{repo}'
+        self.outstanding = 0
+        self.requests = 0
+
+    def __repr__(self) -> str:
+        return f'Replica({self.server!r}, outstanding={self.outstanding})'
+
+
+class ReplicaSet:
+    """
+    The read replicas of a repository with least-outstanding-requests selection and hedged reads.
+
+    :ivar replicas: The replicas
+    :type replicas: list[Replica]
+    :ivar hedged: Number of reads that have been hedged
+    :type hedged: int
+    :ivar failed: Number of requests to replicas that failed (not reachable or server error)
+    :type failed: int
+    """
+    _instances: dict[tuple[tuple[str, ...], str], 'ReplicaSet'] = {}
+    _instances_lock = Lock()
+
+    replicas: list[Replica]
+    hedged: int
+    failed: int
+    _lock: Lock
+    _next: int
+    _hedge_percentile: float
+    _min_samples: int
+    _latencies: deque[float]
+    _new_samples: int
+    _hedge_delay: Optional[float]
+    _executor: Optional[ThreadPoolExecutor]
+    _primary_until: dict[str, float]
+
+    def __init__(self, servers: Iterable[str], repo: str, *,
+                 hedge_percentile: Optional[float] = None,
+                 min_samples: int = 20,
+                 window: int = 256) -> None:
+        """
+        Constructor.
+
+        :param servers: The server URLs of the replicas
+        :type servers: Iterable[str]
+        :param repo: The name of the repository
+        :type repo: str
+        :param hedge_percentile: Latency percentile after which reads are hedged, 0 disables hedging. If None,
+            the environment variable OLDAP_HEDGE_PERCENTILE decides (default: 95)
+        :type hedge_percentile: Optional[float]
+        :param min_samples: Number of observed latencies required before reads are hedged
+        :type min_samples: int
+        :param window: Number of recent latencies the percentile is computed from
+        :type window: int
+        :raises OldapErrorValue: If no replica is given or the percentile is not within [0, 100)
+        """
+        self.replicas = [Replica(server, repo) for server in servers]
+        if not self.replicas:
+            raise OldapErrorValue('A replica set requires at least one replica')
+        if hedge_percentile is None:
+            hedge_percentile = float(os.getenv("OLDAP_HEDGE_PERCENTILE", "95"))
+        if not 0 <= hedge_percentile < 100:
+            raise OldapErrorValue(f'Hedge percentile must be within [0, 100), got {hedge_percentile}')
+        self.hedged = 0
+        self.failed = 0
+        self._lock = Lock()
+        self._next = 0
+        self._hedge_percentile = hedge_percentile
+        self._min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._new_samples = 0
+        self._hedge_delay = None
+        self._executor = None
+        self._primary_until = {}
+
+    @classmethod
+    def shared(cls, servers: Iterable[str], repo: str) -> Self:
+        """
+        Returns the ReplicaSet for the given replicas and repository, shared by all connections of the process.
+
+        :param servers: The server URLs of the replicas
+        :type servers: Iterable[str]
+        :param repo: The name of the repository
+        :type repo: str
+        :return: The shared ReplicaSet
+        :rtype: ReplicaSet
+        """
+        key = (tuple(s.rstrip('/') for s in servers), repo)
+        with cls._instances_lock:
+            replica_set = cls._instances.get(key)
+            if replica_set is None:
+                replica_set = cls(key[0], repo)
+                cls._instances[key] = replica_set
+            return replica_set
+
+    @classmethod
+    def close_all(cls) -> None:
+        """
+        Shuts down the hedging threads of the shared ReplicaSets and forgets them.
+
+        :return: None
+        """
+        with cls._instances_lock:
+            for replica_set in cls._instances.values():
+                replica_set.close()
+            cls._instances = {}
+
+    def close(self) -> None:
+        """
+        Shuts down the threads used for hedged reads.
+
+        :return: None
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def choose(self, exclude: Optional[Replica] = None) -> Replica:
+        """
+        Returns the replica with the least outstanding requests (round-robin among equally loaded replicas).
+
+        :param exclude: A replica that must not be chosen (if there are others)
+        :type exclude: Optional[Replica]
+        :return: The replica
+        :rtype: Replica
+        """
+        with self._lock:
+            n = len(self.replicas)
+            start = self._next
+            self._next = (self._next + 1) % n
+            best = None
+            for i in range(n):
+                replica = self.replicas[(start + i) % n]
+                if replica is exclude and n > 1:
+                    continue
+                if best is None or replica.outstanding < best.outstanding:
+                    best = replica
+            return best
+
+    def written(self, user: str, window: float) -> None:
+        """
+        Starts the read-your-writes window of a user: the reads of all connections of the user go to the primary
+        until the replicas caught up.
+
+        :param user: The user who has written
+        :type user: str
+        :param window: Duration of the window in seconds
+        :type window: float
+        :return: None
+        """
+        now = time.monotonic()
+        with self._lock:
+            if len(self._primary_until) >= 1024:
+                self._primary_until = {u: t for u, t in self._primary_until.items() if t > now}
+            self._primary_until[user] = max(self._primary_until.get(user, 0.0), now + window)
+
+    def pinned(self, user: str) -> bool:
+        """
+        Returns True if the reads of a user must go to the primary (within the read-your-writes window).
+
+        :param user: The user
+        :type user: str
+        :return: True if within the window
+        :rtype: bool
+        """
+        return time.monotonic() < self._primary_until.get(user, 0.0)
+
+    @property
+    def hedge_delay(self) -> Optional[float]:
+        """
+        The time in seconds after which a read is hedged, or None if reads are not hedged (hedging disabled,
+        a single replica or not enough latencies observed yet).
+        """
+        if self._hedge_percentile == 0 or len(self.replicas) < 2 or len(self._latencies) < self._min_samples:
+            return None
+        with self._lock:
+            if self._hedge_delay is None or self._new_samples >= 32:
+                latencies = sorted(self._latencies)
+                index = min(len(latencies) - 1, int(len(latencies) * self._hedge_percentile / 100.0))
+                self._hedge_delay = latencies[index]
+                self._new_samples = 0
+            return self._hedge_delay
+
+    def _send(self, replica: Replica, headers: dict[str, str], data: dict[str, str],
+              auth: Optional[requests.auth.AuthBase]) -> requests.Response:
+        with self._lock:
+            replica.outstanding += 1
+            replica.requests += 1
+        started = time.perf_counter()
+        try:
+            res = SessionPool().session(replica.server).post(url=replica.query_url, headers=headers, data=data,
+                                                             auth=auth)
+        except requests.RequestException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                replica.outstanding -= 1
+        if res.status_code >= 500:
+            with self._lock:
+                self.failed += 1
+            raise requests.HTTPError(f'{res.status_code} {res.reason}', response=res)
+        if res.ok:
+            with self._lock:
+                self._latencies.append(time.perf_counter() - started)
+                self._new_samples += 1
+        return res
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4 * len(self.replicas),
+                                                    thread_name_prefix='oldap-hedge')
+            return self._executor
+
+    def post(self, headers: dict[str, str], data: dict[str, str],
+             auth: Optional[requests.auth.AuthBase] = None) -> tuple[str, requests.Response]:
+        """
+        Sends a read query to a replica, hedging it to a second replica if it is slow. If a replica failed
+        (not reachable or server error), the query is sent to the next one. A client error (4xx) is returned
+        only if no other replica answered successfully.
+
+        :param headers: The HTTP headers
+        :type headers: dict[str, str]
+        :param data: The form data (the query)
+        :type data: dict[str, str]
+        :param auth: The authentication of the triple store
+        :type auth: Optional[requests.auth.AuthBase]
+        :return: The server that answered and its response
+        :rtype: tuple[str, requests.Response]
+        :raises requests.RequestException: If all replicas failed
+        """
+        delay = self.hedge_delay
+        if delay is None:
+            return self._post_failover(headers, data, auth)
+        first = self.choose()
+        pool = self._pool()
+        futures: dict[Future, Replica] = {pool.submit(self._send, first, headers, data, auth): first}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            second = self.choose(exclude=first)
+            futures[pool.submit(self._send, second, headers, data, auth)] = second
+            with self._lock:
+                self.hedged += 1
+            logging.getLogger(__name__).debug(f'Read hedged to {second.server} after {delay * 1000:.1f} ms')
+        pending = set(futures)
+        answer: Optional[tuple[str, requests.Response]] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                res = future.result()
+                if res.ok:
+                    return futures[future].server, res
+                answer = answer or (futures[future].server, res)
+        if answer is not None:
+            return answer
+        return self._post_failover(headers, data, auth, exclude=set(futures.values()))
+
+    def _post_failover(self, headers: dict[str, str], data: dict[str, str],
+                       auth: Optional[requests.auth.AuthBase],
+                       exclude: Optional[set[Replica]] = None) -> tuple[str, requests.Response]:
+        tried = set(exclude or ())
+        error: Optional[requests.RequestException] = None
+        while len(tried) < len(self.replicas):
+            replica = self.choose()
+            if replica in tried:
+                replica = next(r for r in self.replicas if r not in tried)
+            tried.add(replica)
+            try:
+                return replica.server, self._send(replica, headers, data, auth)
+            except requests.RequestException as err:
+                logging.getLogger(__name__).warning(f'Read replica {replica.server} failed: {err}')
+                error = err
+        raise error or requests.ConnectionError('No read replica reachable')
@@ -1,7 +1,7 @@
 import inspect
 from base64 import b85encode, b85decode
 from enum import Enum
-from typing import Dict, Any, Self
+from typing import Dict, Any, Self, Callable
 from datetime import datetime
 from uuid import UUID
 import json
@@ -30,6 +30,9 @@ class _Serializer:
 
     - Additions done by me:
       - serialization/deserialization of `datetime`- and `UUID` objects added
+    - When a class is registered, a decoder for it is prepared: it knows whether the constructor takes a
+      connection (parameter "con" or "connection") and whether the class is an Enum. Decoding an object
+      therefore does not need any introspection.
     """
     _instance: Self | None = None
 
@@ -42,11 +45,55 @@ class _Serializer:
     def __init__(self, classname_key='__class__'):
         self._key = classname_key
         self._classes = {}  # to keep a reference to the classes used
+        self._decoders: Dict[str, Callable[[Dict[str, Any], Any], Any]] = {
+            'datetime': lambda d, connection: datetime.fromisoformat(d['__value__']),
+            'UUID': lambda d, connection: UUID(d['__value__']),
+            'bytes': lambda d, connection: b85decode(d['__value__'].encode(encoding='UTF-8')),
+        }
 
     def __call__(self, class_):  # decorate a class
         self._classes[class_.__name__] = class_
+        self._decoders[class_.__name__] = _Serializer._make_decoder(class_)
         return class_
 
+    @staticmethod
+    def _make_decoder(class_: type) -> Callable[[Dict[str, Any], Any], Any]:
+        """
+        Prepares the function that rebuilds an instance of the class from its dict.
+
+        :param class_: The registered class
+        :type class_: type
+        :return: A function taking the dict (without class name) and the connection (or None)
+        :rtype: Callable[[Dict[str, Any], Any], Any]
+        """
+        if issubclass(class_, Enum):
+            #
+            # for Enums and subclasses
+            #
+            def decode_enum(d: Dict[str, Any], connection: Any) -> Any:
+                value = d['__value__']
+                return class_(*value) if isinstance(value, list) else class_(value)
+            return decode_enum
+
+        parameters = inspect.signature(class_.__init__).parameters
+        takes_connection = 'connection' in parameters
+        takes_con = 'con' in parameters
+        if not takes_connection and not takes_con:
+            return lambda d, connection: class_(**d)
+
+        #
+        # we have a class with a connection parameter that we have to update.
+        # this requires that the "json.loads" uses the "make_decoder_hook(...)" hook!
+        #
+        def decode(d: Dict[str, Any], connection: Any) -> Any:
+            if connection:
+                if takes_connection:
+                    d['connection'] = connection
+                if takes_con:
+                    d['con'] = connection
+            return class_(**d)
+        return decode
+
     def encoder_default(self, obj):
         if isinstance(obj, datetime):
             return {self._key: 'datetime', '__value__': str(obj)}
@@ -70,45 +117,7 @@ class _Serializer:
                      connection: Any | None = None) -> Dict[Any, Any] | datetime | UUID | bytes:
         classname = d.pop(self._key, None)
         if classname:
-            if connection:
-                #
-                # we have a class with a connection parameter that we have to update.
-                # this requires that the "json.loads" uses the "make_decoder_hook(...)" hook!
-                #
-                sig = inspect.signature(self._classes[classname].__init__)
-                if 'connection' in sig.parameters:
-                    d['connection'] = connection
-                if 'con' in sig.parameters:
-                    d['con'] = connection
-            if classname == 'datetime':
-                #
-                # For datetime datatype
-                #
-                return datetime.fromisoformat(d['__value__'])
-            if classname == 'UUID':
-                #
-                # for UUID datatype
-                #
-                return UUID(d['__value__'])
-            if classname == 'bytes':
-                #
-                # for bytes datatype
-                #
-                return b85decode(d['__value__'].encode(encoding='UTF-8'))
-            #if type(self._classes[classname]) == type(Enum):
-            if isinstance(self._classes[classname], type) and issubclass(self._classes[classname], Enum):
-                #
-                # for Enums and subclasses
-                #
-                if isinstance(d['__value__'], list):
-                    return self._classes[classname](*d['__value__'])
-                else:
-                    return self._classes[classname](d['__value__'])
-            else:
-                #
-                # all other classes
-                #
-                return self._classes[classname](**d)
+            return self._decoders[classname](d, connection)
         return d
 
     def make_decoder_hook(self, connection: Any | None = None) -> Dict[Any, Any] | datetime | UUID | bytes:
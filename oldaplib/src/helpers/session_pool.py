@@ -0,0 +1,146 @@
+"""
+# SessionPool
+
+Pooled keep-alive HTTP sessions for the connections to the triple store.
+
+Opening a new TCP (and often TLS) connection for every SPARQL round trip is expensive. The `SessionPool`
+keeps one `requests.Session` per host (scheme, host and port). Each session mounts an `HTTPAdapter` with a bounded
+urllib3 connection pool, so connections are kept alive and reused by all `Connection` instances talking to
+the same host. The pool is a process-wide singleton and may be shared between threads.
+
+The pool is configured by the following environment variables (or by calling `configure()` before the first
+session is used):
+
+- _OLDAP_HTTP_POOL_MAXSIZE_: Maximal number of connections kept alive per host (default: 10)
+- _OLDAP_HTTP_POOL_BLOCK_: If "true", requests wait for a free connection if the pool is exhausted instead of
+  opening an additional, non-pooled connection (default: false)
+- _OLDAP_HTTP_MAX_RETRIES_: Number of retries for failed connection attempts (default: 0)
+"""
+import os
+from threading import Lock
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+
+
+class SessionPool(metaclass=SingletonMeta):
+    """
+    Singleton holding the pooled HTTP sessions, one per host.
+
+    :ivar _lock: Lock protecting the creation of new sessions
+    :type _lock: Lock
+    :ivar _sessions: The sessions, indexed by "scheme://host:port"
+    :type _sessions: dict[str, requests.Session]
+    """
+    _lock: Lock
+    _sessions: dict[str, requests.Session]
+    _pool_maxsize: int
+    _pool_block: bool
+    _max_retries: int
+
+    def __init__(self):
+        self._lock = Lock()
+        self._sessions = {}
+        self._pool_maxsize = int(os.getenv("OLDAP_HTTP_POOL_MAXSIZE", "10"))
+        self._pool_block = os.getenv("OLDAP_HTTP_POOL_BLOCK", "false").lower() in ('1', 'true', 'yes')
+        self._max_retries = int(os.getenv("OLDAP_HTTP_MAX_RETRIES", "0"))
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        """
+        Returns the key identifying the pool for the given URL ("scheme://host:port").
+
+        :param url: Any URL on the host
+        :type url: str
+        :return: The pool key
+        :rtype: str
+        :raises OldapErrorValue: If the URL has no scheme or host
+        """
+        parts = urlsplit(url)
+        if not parts.scheme or not parts.hostname:
+            raise OldapErrorValue(f'Invalid server URL "{url}"')
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        return f'{parts.scheme}://{parts.hostname}:{port}'
+
+    def configure(self, *,
+                  pool_maxsize: int | None = None,
+                  pool_block: bool | None = None,
+                  max_retries: int | None = None) -> None:
+        """
+        Changes the pool configuration. Sessions which are already open are closed, the next request
+        creates a new session with the new configuration.
+
+        :param pool_maxsize: Maximal number of connections kept alive per host
+        :type pool_maxsize: int | None
+        :param pool_block: Wait for a free connection if the pool is exhausted
+        :type pool_block: bool | None
+        :param max_retries: Number of retries for failed connection attempts
+        :type max_retries: int | None
+        :return: None
+        """
+        if pool_maxsize is not None and pool_maxsize < 1:
+            raise OldapErrorValue(f'Pool size must be at least 1, got {pool_maxsize}')
+        with self._lock:
+            if pool_maxsize is not None:
+                self._pool_maxsize = pool_maxsize
+            if pool_block is not None:
+                self._pool_block = pool_block
+            if max_retries is not None:
+                self._max_retries = max_retries
+            self._close_all()
+
+    @property
+    def pool_maxsize(self) -> int:
+        return self._pool_maxsize
+
+    @property
+    def pool_block(self) -> bool:
+        return self._pool_block
+
+    @property
+    def max_retries(self) -> int:
+        return self._max_retries
+
+    def session(self, url: str) -> requests.Session:
+        """
+        Returns the pooled session for the host of the given URL. The session is created on first use.
+
+        :param url: Any URL on the host (usually the server URL of the triple store)
+        :type url: str
+        :return: The shared session for this host
+        :rtype: requests.Session
+        """
+        key = SessionPool.host_key(url)
+        session = self._sessions.get(key)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=self._pool_maxsize,
+                                      pool_block=self._pool_block,
+                                      max_retries=self._max_retries)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+            return session
+
+    def _close_all(self) -> None:
+        for session in self._sessions.values():
+            session.close()
+        self._sessions = {}
+
+    def close(self) -> None:
+        """
+        Closes all sessions and their kept-alive connections.
+
+        :return: None
+        """
+        with self._lock:
+            self._close_all()
@@ -0,0 +1,221 @@
+"""
+# SessionStore
+
+Server-side state of the compact session tokens (see `Connection`, parameter `compact_token`).
+
+A compact token carries only the IRI of the user ("sub"), a session id ("sid") and the permissions version
+("pv") the user had at login. The `UserData` is kept in the SessionStore and resolved on every request:
+
+- The _permissions version_ of a user is a counter that is incremented whenever the user, its roles or the
+  projects are changed (see `bump()`). It is combined with a global counter for changes affecting many users
+  (roles and projects).
+- The `UserData` is cached together with the version it was read at. If the version has changed since, the
+  UserData is read again from the triple store.
+- A session can be revoked (`revoke()`), tokens of a revoked session are rejected.
+
+The store is either in-process (one process, e.g. tests and single-worker servers) or in Redis (shared by all
+worker processes). With Redis, the decoded UserData is additionally kept in-process per version, so that a
+request costs one Redis round trip.
+
+The store is configured by the following environment variables:
+
+- _OLDAP_SESSION_STORE_: "memory" or "redis" (default: memory)
+- _OLDAP_REDIS_URL_: The URL of the Redis server (default: redis://localhost:6379)
+- _OLDAP_SESSION_TTL_: Time to live of the cached UserData in seconds (default: 3600)
+"""
+import json
+import os
+from threading import Lock
+
+import redis
+
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.serializer import serializer
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+from oldaplib.src.helpers.ttlcache import TtlCache
+from oldaplib.src.userdataclass import UserData
+from oldaplib.src.xsd.iri import Iri
+
+SESSION_LIFETIME = 86400
+"""Lifetime of a session in seconds (the tokens are valid for one day)"""
+
+_PREFIX = 'oldap:session:'
+
+
+class SessionStore(metaclass=SingletonMeta):
+    """
+    Singleton holding the permissions versions, the UserData and the revoked sessions of compact tokens.
+    """
+    _lock: Lock
+    _redis: redis.Redis | None
+    _ttl: float
+    _epoch: int
+    _versions: dict[str, int]
+    _users: TtlCache
+    _revoked: TtlCache
+
+    def __init__(self):
+        self._redis = None
+        backend = os.getenv("OLDAP_SESSION_STORE", "memory").lower()
+        ttl = float(os.getenv("OLDAP_SESSION_TTL", "3600"))
+        self.configure(backend=backend, ttl=ttl)
+
+    def configure(self, *, backend: str | None = None, ttl: float | None = None) -> None:
+        """
+        Changes the configuration of the store. The in-process state is discarded.
+
+        :param backend: "memory" or "redis"
+        :type backend: str | None
+        :param ttl: Time to live of the cached UserData in seconds
+        :type ttl: float | None
+        :return: None
+        :raises OldapErrorValue: If the backend is unknown
+        """
+        if backend is None:
+            backend = 'redis' if self._redis is not None else 'memory'
+        if backend not in ('memory', 'redis'):
+            raise OldapErrorValue(f'Unknown session store "{backend}" (expected "memory" or "redis")')
+        self._lock = Lock()
+        self._redis = redis.from_url(os.getenv("OLDAP_REDIS_URL", "redis://localhost:6379")) \
+            if backend == 'redis' else None
+        self._ttl = self._ttl if ttl is None else ttl
+        self._epoch = 0
+        self._versions = {}
+        self._users = TtlCache(maxsize=10000, ttl=self._ttl)
+        self._revoked = TtlCache(maxsize=100000, ttl=SESSION_LIFETIME)
+
+    @property
+    def backend(self) -> str:
+        return 'memory' if self._redis is None else 'redis'
+
+    def version(self, userIri: Iri | str) -> str:
+        """
+        Returns the current permissions version of the user.
+
+        :param userIri: The IRI of the user
+        :type userIri: Iri | str
+        :return: The version
+        :rtype: str
+        """
+        if self._redis is not None:
+            epoch, version = self._redis.mget(_PREFIX + 'pv', f'{_PREFIX}pv:{userIri}')
+            return f'{int(epoch or 0)}.{int(version or 0)}'
+        with self._lock:
+            return f'{self._epoch}.{self._versions.get(str(userIri), 0)}'
+
+    def session_version(self, userIri: Iri | str, sid: str) -> str | None:
+        """
+        Returns the current permissions version of the user, or None if the session has been revoked
+        (with Redis in one round trip).
+
+        :param userIri: The IRI of the user
+        :type userIri: Iri | str
+        :param sid: The session id
+        :type sid: str
+        :return: The version or None
+        :rtype: str | None
+        """
+        if self._redis is not None:
+            epoch, version, revoked = self._redis.mget(_PREFIX + 'pv', f'{_PREFIX}pv:{userIri}',
+                                                       f'{_PREFIX}revoked:{sid}')
+            return None if revoked is not None else f'{int(epoch or 0)}.{int(version or 0)}'
+        if self._revoked.get(sid, False, count=False):
+            return None
+        return self.version(userIri)
+
+    def bump(self, userIri: Iri | str | None = None) -> None:
+        """
+        Increments the permissions version of a user, or of all users if no user is given. Must be called
+        whenever data contained in the UserData is changed.
+
+        :param userIri: The IRI of the user or None for all users
+        :type userIri: Iri | str | None
+        :return: None
+        """
+        if self._redis is not None:
+            self._redis.incr(_PREFIX + 'pv' if userIri is None else f'{_PREFIX}pv:{userIri}')
+            return
+        with self._lock:
+            if userIri is None:
+                self._epoch += 1
+            else:
+                self._versions[str(userIri)] = self._versions.get(str(userIri), 0) + 1
+
+    def get_userdata(self, userIri: Iri | str, version: str) -> UserData | None:
+        """
+        Returns the UserData of the user if it has been stored for the given permissions version.
+
+        :param userIri: The IRI of the user
+        :type userIri: Iri | str
+        :param version: The current permissions version
+        :type version: str
+        :return: The UserData (shared, read-only) or None
+        :rtype: UserData | None
+        """
+        userdata = self._users.get((str(userIri), version))
+        if userdata is not None or self._redis is None:
+            return userdata
+        value = self._redis.get(f'{_PREFIX}user:{userIri}')
+        if value is None:
+            return None
+        entry = json.loads(value)
+        if entry['pv'] != version:
+            return None
+        userdata = json.loads(entry['userdata'], object_hook=serializer.decoder_hook).freeze()
+        self._users.set((str(userIri), version), userdata)
+        return userdata
+
+    def set_userdata(self, userIri: Iri | str, version: str, userdata: UserData) -> None:
+        """
+        Stores the UserData of the user for the given permissions version. The UserData is frozen
+        (see ~UserData.freeze).
+
+        :param userIri: The IRI of the user
+        :type userIri: Iri | str
+        :param version: The permissions version the UserData has been read at
+        :type version: str
+        :param userdata: The UserData
+        :type userdata: UserData
+        :return: None
+        """
+        self._users.set((str(userIri), version), userdata.freeze())
+        if self._redis is not None:
+            value = json.dumps({'pv': version,
+                                'userdata': json.dumps(userdata, default=serializer.encoder_default)})
+            self._redis.set(f'{_PREFIX}user:{userIri}', value, ex=max(1, int(self._ttl)))
+
+    def revoke(self, sid: str) -> None:
+        """
+        Revokes a session: the tokens carrying this session id are rejected.
+
+        :param sid: The session id
+        :type sid: str
+        :return: None
+        """
+        if self._redis is not None:
+            self._redis.set(f'{_PREFIX}revoked:{sid}', 1, ex=SESSION_LIFETIME)
+        else:
+            self._revoked.set(sid, True)
+
+    def is_revoked(self, sid: str) -> bool:
+        """
+        :param sid: The session id
+        :type sid: str
+        :return: True if the session has been revoked
+        :rtype: bool
+        """
+        if self._redis is not None:
+            return self._redis.exists(f'{_PREFIX}revoked:{sid}') > 0
+        return self._revoked.get(sid, False, count=False)
+
+    def clear(self) -> None:
+        """
+        Removes the in-process state (cached UserData, versions and revoked sessions of the memory backend).
+
+        :return: None
+        """
+        with self._lock:
+            self._epoch = 0
+            self._versions = {}
+        self._users.clear()
+        self._revoked.clear()
@@ -0,0 +1,168 @@
+"""
+# SingleFlight
+
+Protection of the object cache (see `CacheSingletonRedis`) against a thundering herd: if a hot entry (e.g. a
+`DataModel`) is evicted or invalidated, all callers reading it at the same moment would rebuild it from the
+triple store. With single-flight, exactly one caller rebuilds the entry, the others wait for it and read the
+result from the cache:
+
+- Within a process, the callers of the same key (in the same scope and namespace, see `CacheLocks.lock_name()`)
+  wait for the first one (the "leader").
+- Across processes, the leaders hold a short-lived lock in Redis (SET NX with expiration). The leader that gets
+  the lock rebuilds the entry, the others poll the cache until it is there or the lock has been released.
+
+If the rebuild takes longer than the maximal waiting time, or the entry is still not in the cache afterward
+(e.g. because the rebuild failed), a waiting caller rebuilds the entry itself. A caller waiting in the same
+process gets the `OldapErrorNotFound` of its leader, since the object does not exist.
+
+Single-flight is configured by the following environment variables (or by calling `configure()`):
+
+- _OLDAP_SINGLE_FLIGHT_LOCK_TTL_: Time to live of the Redis lock in seconds (default: 30)
+- _OLDAP_SINGLE_FLIGHT_WAIT_: Maximal time in seconds a caller waits for the rebuild by another one (default: 30)
+- _OLDAP_SINGLE_FLIGHT_POLL_: Interval in seconds in which the cache is polled while another process
+  rebuilds (default: 0.05)
+"""
+import logging
+import os
+import time
+from threading import Event, Lock
+from typing import Callable, Protocol, TypeVar
+
+from oldaplib.src.cachesingleton import CacheSingletonRedis
+from oldaplib.src.helpers.oldaperror import OldapErrorValue, OldapErrorNotFound
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+
+T = TypeVar('T')
+
+
+class CacheLocks(Protocol):
+    """
+    The locks used across processes, implemented by `CacheSingletonRedis`.
+    """
+    def lock_name(self, key) -> str: ...
+
+    def acquire_lock(self, key, ttl: float) -> str | None: ...
+
+    def release_lock(self, key, token: str) -> None: ...
+
+
+class _Flight:
+    __slots__ = ('done', 'error')
+
+    def __init__(self) -> None:
+        self.done = Event()
+        self.error: OldapErrorNotFound | None = None
+
+
+class SingleFlight(metaclass=SingletonMeta):
+    """
+    Singleton coordinating the rebuilds of cache entries. The number of rebuilds and of callers served by the
+    rebuild of another caller are available by `loads` and `shared`.
+    """
+    _lock: Lock
+    _flights: dict[str, _Flight]
+    _lock_ttl: float
+    _wait: float
+    _poll: float
+
+    def __init__(self):
+        self._lock = Lock()
+        self._flights = {}
+        self.loads = 0
+        self.shared = 0
+        self.configure(lock_ttl=float(os.getenv("OLDAP_SINGLE_FLIGHT_LOCK_TTL", "30")),
+                       wait=float(os.getenv("OLDAP_SINGLE_FLIGHT_WAIT", "30")),
+                       poll=float(os.getenv("OLDAP_SINGLE_FLIGHT_POLL", "0.05")))
+
+    def configure(self, *,
+                  lock_ttl: float | None = None,
+                  wait: float | None = None,
+                  poll: float | None = None) -> None:
+        """
+        Changes the configuration.
+
+        :param lock_ttl: Time to live of the Redis lock in seconds
+        :type lock_ttl: float | None
+        :param wait: Maximal time in seconds a caller waits for the rebuild by another one
+        :type wait: float | None
+        :param poll: Interval in seconds in which the cache is polled while another process rebuilds
+        :type poll: float | None
+        :return: None
+        :raises OldapErrorValue: If a value is not positive
+        """
+        lock_ttl = self._lock_ttl if lock_ttl is None else lock_ttl
+        wait = self._wait if wait is None else wait
+        poll = self._poll if poll is None else poll
+        if lock_ttl <= 0 or wait <= 0 or poll <= 0:
+            raise OldapErrorValue('Single-flight: lock_ttl, wait and poll must be positive')
+        self._lock_ttl = lock_ttl
+        self._wait = wait
+        self._poll = poll
+
+    def run(self, key, lookup: Callable[[], T | None], load: Callable[[], T], locks: CacheLocks | None = None) -> T:
+        """
+        Returns the value of a key after a cache miss, rebuilding it at most once at a time.
+
+        :param key: The cache key
+        :type key: Iri | Xsd_NCName | Xsd_QName
+        :param lookup: Reads the value from the cache (returns None on a miss)
+        :type lookup: Callable[[], T | None]
+        :param load: Rebuilds the value and writes it to the cache
+        :type load: Callable[[], T]
+        :param locks: The locks across processes, usually the cache of the connection (default: CacheSingletonRedis())
+        :type locks: CacheLocks | None
+        :return: The value
+        :rtype: T
+        :raises OldapErrorNotFound: If the object does not exist
+        """
+        if locks is None:
+            locks = CacheSingletonRedis()
+        name = locks.lock_name(key)
+        with self._lock:
+            flight = self._flights.get(name)
+            leader = flight is None
+            if leader:
+                flight = self._flights[name] = _Flight()
+        if not leader:
+            flight.done.wait(self._wait)
+            if flight.error is not None:
+                raise flight.error
+            value = lookup()
+            if value is not None:
+                self.shared += 1
+                return value
+            self.loads += 1
+            return load()
+        try:
+            return self._lead(key, lookup, load, locks)
+        except OldapErrorNotFound as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._flights[name]
+            flight.done.set()
+
+    def _lead(self, key, lookup: Callable[[], T | None], load: Callable[[], T], locks: CacheLocks) -> T:
+        deadline = time.monotonic() + self._wait
+        while True:
+            token = locks.acquire_lock(key, self._lock_ttl)
+            if token is not None:
+                try:
+                    value = lookup()  # the holder of the lock before may just have written it
+                    if value is not None:
+                        self.shared += 1
+                        return value
+                    self.loads += 1
+                    return load()
+                finally:
+                    locks.release_lock(key, token)
+            if time.monotonic() >= deadline:
+                logging.getLogger(__name__).warning(f'Waiting for the rebuild of "{key}" timed out.')
+                self.loads += 1
+                return load()
+            time.sleep(self._poll)
+            value = lookup()
+            if value is not None:
+                self.shared += 1
+                return value
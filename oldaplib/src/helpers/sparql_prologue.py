@@ -0,0 +1,154 @@
+"""
+# SPARQL prologue pruning
+
+Most queries of oldaplib start with `Context.sparql_context`, which declares every namespace of the context:
+the predefined ones and all project, list and external ontology prefixes registered in the process. With many
+projects loaded, a small ASK query carries kilobytes of PREFIX declarations which the triple store has to parse.
+
+`prune_prefixes()` removes the declarations of the leading prologue that are not used by the query body:
+
+```python
+sparql = prune_prefixes(context.sparql_context + "ASK { ?s a oldap:Project }")  # keeps only "PREFIX oldap: <...>"
+```
+
+The prefixes used by a query body are found by a scan of the body without its literals, IRIs and comments (the
+"template" of the query). The result of the scan is cached per template, so that the scan is done once for all
+queries generated by the same code. The pruned prologue is cached per prologue and set of used prefixes, and the
+recently seen prologues (usually the `sparql_context` of the few contexts in use) are recognized without a scan.
+
+Pruning is conservative: every `name:` outside of literals, IRIs and comments counts as usage, and BASE
+declarations, later prologues (of multi-operation updates) and prefixes declared more than once are kept. A
+`<...>` containing variables or "&&" (e.g. `FILTER(?o<ex:x&&?y>3)`) is taken for comparisons, not for an IRI,
+unless the token before it rules out a comparison (e.g. `{ <http://example.org/?a=1&&b=2> ...`).
+"""
+import re
+from functools import lru_cache
+
+_PROLOGUE = re.compile(r'(?:[ \t\r\n]*(?:PREFIX[ \t]+[\w.-]*:[ \t]*<[^<>\n]*>|BASE[ \t]*<[^<>\n]*>|#[^\n]*))*'
+                       r'[ \t\r\n]*', re.I)
+_DECLARATION = re.compile(r'(?P<gap>\s+|#[^\n]*)|PREFIX\s+(?P<name>[\w.-]*):\s*<[^<>]*>|BASE\s*<[^<>]*>', re.I)
+_BODY_LEXER = re.compile(r'(?=["\'<#\d+-])(?:"""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^\'\\]|\\.|\'(?!\'\'))*\'\'\''
+                         r'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\''
+                         r'|(?P<iri><[^<>"{}|^`\\\x00-\x20]*>)'
+                         r'|(?<![\w:?$.-])[+-]?\d+(?:\.\d*)?(?:[eE][+-]?\d+)?(?![\w:])'
+                         r'|#[^\n]*)', re.S)
+_PREFIXED_NAME = re.compile(r'(?<![\w:?$.-])([A-Za-z_][\w.-]*)?:')
+_OPERANDS = re.compile(r'[?$]\w|&&')
+_IRI_KEYWORDS = frozenset({'a', 'from', 'named', 'graph', 'service', 'silent', 'with', 'using', 'into', 'load', 'to',
+                           'clear', 'drop', 'create', 'add', 'move', 'copy'})
+
+
+def _is_iri(body: str, m: re.Match) -> bool:
+    """Decides whether "<...>" is an IRI or an expression between the comparison operators < and >"""
+    if _OPERANDS.search(m.group('iri')) is None:
+        return True
+    i = m.start()
+    while i > 0 and body[i - 1].isspace():
+        i -= 1
+    if i == 0 or body[i - 1] in '{(.;,[^':
+        return True
+    j = i
+    while j > 0 and body[j - 1].isalpha():
+        j -= 1
+    if j > 0 and (body[j - 1].isalnum() or body[j - 1] in '_-?$:'):
+        return False
+    return body[j:i].lower() in _IRI_KEYWORDS
+
+
+def _neutral(m: re.Match) -> str:
+    match m.group()[0]:
+        case '"' | "'":
+            return '""'
+        case '<':
+            return '<>'
+        case '#':
+            return ' '
+        case _:
+            return '0'
+
+
+def body_template(body: str) -> str:
+    """
+    Returns the query body with literals replaced by "", IRIs by <>, numbers by 0 and without comments. Datatype
+    suffixes (`^^xsd:int`) are kept since they use prefixes.
+
+    :param body: The SPARQL text without the leading prologue
+    :type body: str
+    :return: The template
+    :rtype: str
+    """
+    parts = []
+    pos = 0
+    while (m := _BODY_LEXER.search(body, pos)) is not None:
+        if m.group('iri') is not None and not _is_iri(body, m):
+            parts.append(body[pos:m.start() + 1])  # a "<" comparison, scan on after it
+            pos = m.start() + 1
+            continue
+        parts.append(body[pos:m.start()])
+        parts.append(_neutral(m))
+        pos = m.end()
+    parts.append(body[pos:])
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=2048)
+def used_prefixes(template: str) -> frozenset[str]:
+    """
+    Returns the prefixes used by the prefixed names of a query template (see `body_template()`).
+
+    :param template: The template of the query body
+    :type template: str
+    :return: The prefix names ("" for the empty prefix)
+    :rtype: frozenset[str]
+    """
+    return frozenset(m.group(1) or '' for m in _PREFIXED_NAME.finditer(template))
+
+
+@lru_cache(maxsize=256)
+def _pruned_prologue(prologue: str, used: frozenset[str]) -> str:
+    declared: dict[str, int] = {}
+    for m in _DECLARATION.finditer(prologue):
+        if m.group('name') is not None:
+            declared[m.group('name')] = declared.get(m.group('name'), 0) + 1
+    lines = []
+    for m in _DECLARATION.finditer(prologue):
+        name = m.group('name')
+        if m.group('gap') is not None:
+            continue
+        if name is None or name in used or declared[name] > 1:
+            lines.append(m.group())
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+_recent_prologues: tuple[str, ...] = ()
+
+
+def _split(sparql: str) -> int:
+    """Returns the length of the prologue, using the recently seen prologues to avoid a scan of the prologue"""
+    global _recent_prologues
+    for prologue in _recent_prologues:
+        if sparql.startswith(prologue):
+            end = _PROLOGUE.match(sparql, len(prologue)).end()
+            if end == len(prologue):
+                return end
+            break
+    end = _PROLOGUE.match(sparql).end()
+    if end > 0:
+        _recent_prologues = (sparql[:end],) + _recent_prologues[:15]
+    return end
+
+
+def prune_prefixes(sparql: str) -> str:
+    """
+    Removes the unused PREFIX declarations of the prologue of a SPARQL query or update.
+
+    :param sparql: SPARQL query or update
+    :type sparql: str
+    :return: The SPARQL text with the pruned prologue
+    :rtype: str
+    """
+    end = _split(sparql)
+    if end == 0:
+        return sparql
+    prologue, body = sparql[:end], sparql[end:]
+    return _pruned_prologue(prologue, used_prefixes(body_template(body))) + body
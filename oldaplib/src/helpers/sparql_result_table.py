@@ -0,0 +1,402 @@
+"""
+# SparqlResultTable
+
+Decoders for the compact tabular SPARQL result formats:
+
+- _SPARQL 1.1 TSV_ ("text/tab-separated-values", see https://www.w3.org/TR/sparql11-results-csv-tsv/)
+- _RDF4J binary query results_ ("application/x-binary-rdf-results-table"), supported by GraphDB
+
+Both are much smaller on the wire than SPARQL JSON and are decoded without building a nested dict per
+binding. The decoders return a `SparqlResultTable` that holds the variable names and one tuple of `RdfTerm`
+per row. The `QueryProcessor` converts the terms into `Xsd_*`, `Iri` and `BNode` instances.
+
+For compatibility with code that indexes the SPARQL JSON structure directly (`res['results']['bindings']`,
+`res['boolean']`), a `SparqlResultTable` is a read-only mapping that offers the same structure. The JSON
+view is only built if it is accessed.
+"""
+import json
+import re
+import struct
+from collections.abc import Mapping
+from typing import NamedTuple, Any, Iterator
+
+from oldaplib.src.helpers.oldaperror import OldapError
+
+XSD_NS = 'http://www.w3.org/2001/XMLSchema#'
+
+
+class RdfTerm(NamedTuple):
+    """
+    An RDF term of a result row. The fields correspond to the members of an RDF term in the
+    SPARQL JSON result format.
+
+    :ivar type: "uri", "bnode", "literal" or "triple"
+    :ivar value: The IRI, the blank node id (without "_:"), the lexical form of the literal, or the
+        N-Triples representation of a quoted triple
+    :ivar datatype: The datatype IRI of a typed literal
+    :ivar lang: The language tag of a language tagged literal
+    """
+    type: str
+    value: str
+    datatype: str | None = None
+    lang: str | None = None
+
+
+class SparqlResultTable(Mapping):
+    """
+    Result of a SPARQL SELECT (or ASK) query as table of `RdfTerm`s. Unbound variables are `None`.
+
+    :ivar names: The variable names
+    :type names: list[str]
+    :ivar rows: The rows, each a tuple with one term per variable
+    :type rows: list[tuple[RdfTerm | None, ...]]
+    :ivar boolean: The result of an ASK query, None for SELECT queries
+    :type boolean: bool | None
+    """
+    names: list[str]
+    rows: list[tuple[RdfTerm | None, ...]]
+    boolean: bool | None
+
+    def __init__(self, names: list[str], rows: list[tuple[RdfTerm | None, ...]], boolean: bool | None = None):
+        self.names = names
+        self.rows = rows
+        self.boolean = boolean
+        self.__json: dict[str, Any] | None = None
+
+    def __len__(self) -> int:
+        return len(self._json())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._json())
+
+    def __getitem__(self, key: str) -> Any:
+        return self._json()[key]
+
+    def _json(self) -> dict[str, Any]:
+        if self.__json is None:
+            if self.boolean is not None:
+                self.__json = {'head': {}, 'boolean': self.boolean}
+            else:
+                self.__json = {'head': {'vars': list(self.names)},
+                               'results': {'bindings': [SparqlResultTable._binding(self.names, row)
+                                                        for row in self.rows]}}
+        return self.__json
+
+    @staticmethod
+    def _binding(names: list[str], row: tuple[RdfTerm | None, ...]) -> dict[str, dict[str, str]]:
+        binding = {}
+        for name, term in zip(names, row):
+            if term is None:
+                continue
+            tmp = {'type': term.type, 'value': term.value}
+            if term.datatype is not None:
+                tmp['datatype'] = term.datatype
+            if term.lang is not None:
+                tmp['xml:lang'] = term.lang
+            binding[name] = tmp
+        return binding
+
+    #
+    # SPARQL 1.1 TSV
+    #
+    _escapes = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))', re.S)
+    _echars = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+    _integer = re.compile(r'[+-]?[0-9]+')
+    _decimal = re.compile(r'[+-]?[0-9]*\.[0-9]+')
+    _double = re.compile(r'[+-]?(?:[0-9]+\.[0-9]*|\.?[0-9]+)[eE][+-]?[0-9]+')
+
+    @staticmethod
+    def _unescape(value: str) -> str:
+        if '\\' not in value:
+            return value
+
+        def repl(m: re.Match) -> str:
+            if m.group(3) is not None:
+                return SparqlResultTable._echars.get(m.group(3), m.group(3))
+            return chr(int(m.group(1) or m.group(2), 16))
+
+        return SparqlResultTable._escapes.sub(repl, value)
+
+    @staticmethod
+    def _tsv_term(text: str) -> RdfTerm | None:
+        if not text:
+            return None
+        c = text[0]
+        if c == '<':
+            if text.startswith('<<'):
+                return RdfTerm('triple', text)
+            return RdfTerm('uri', SparqlResultTable._unescape(text[1:-1]))
+        if c == '"':
+            end = text.rindex('"')
+            if end == 0:
+                raise OldapError(f'Invalid term in TSV result: {text}')
+            label = SparqlResultTable._unescape(text[1:end])
+            suffix = text[end + 1:]
+            if not suffix:
+                return RdfTerm('literal', label)
+            if suffix[0] == '@':
+                return RdfTerm('literal', label, None, suffix[1:])
+            if suffix.startswith('^^<') and suffix[-1] == '>':
+                return RdfTerm('literal', label, SparqlResultTable._unescape(suffix[3:-1]))
+            raise OldapError(f'Invalid term in TSV result: {text}')
+        if text.startswith('_:'):
+            return RdfTerm('bnode', text[2:])
+        if text == 'true' or text == 'false':
+            return RdfTerm('literal', text, XSD_NS + 'boolean')
+        if SparqlResultTable._integer.fullmatch(text):
+            return RdfTerm('literal', text, XSD_NS + 'integer')
+        if SparqlResultTable._decimal.fullmatch(text):
+            return RdfTerm('literal', text, XSD_NS + 'decimal')
+        if SparqlResultTable._double.fullmatch(text):
+            return RdfTerm('literal', text, XSD_NS + 'double')
+        raise OldapError(f'Invalid term in TSV result: {text}')
+
+    @staticmethod
+    def from_tsv(data: bytes | str) -> 'SparqlResultTable':
+        """
+        Decodes a SPARQL 1.1 TSV result.
+
+        :param data: The TSV result
+        :type data: bytes | str
+        :return: The result table
+        :rtype: SparqlResultTable
+        :raises OldapError: If the data is not a valid TSV result
+        """
+        text = data.decode('utf-8') if isinstance(data, bytes) else data
+        lines = text.split('\n')
+        if lines and lines[-1] == '':
+            lines.pop()
+        if not lines:
+            raise OldapError('Empty TSV result')
+        header = lines[0].rstrip('\r')
+        names = [n[1:] if n[:1] in ('?', '$') else n for n in header.split('\t')] if header else []
+        ncols = len(names)
+        term = SparqlResultTable._tsv_term
+        terms: dict[str, RdfTerm | None] = {'': None}  # terms are immutable, repeated values are parsed once
+        rows = []
+        for line in lines[1:]:
+            if line.endswith('\r'):
+                line = line[:-1]
+            fields = line.split('\t')
+            if len(fields) != ncols and not (ncols == 0 and fields == ['']):
+                raise OldapError(f'Invalid row in TSV result: expected {ncols} fields, got {len(fields)}')
+            row = []
+            for f in fields:
+                t = terms.get(f, terms)
+                if t is terms:
+                    t = term(f)
+                    if len(terms) < 65536:
+                        terms[f] = t
+                row.append(t)
+            rows.append(tuple(row) if ncols else ())
+        return SparqlResultTable(names, rows)
+
+    #
+    # RDF4J binary query results format
+    #
+    MAGIC = b'BRTR'
+    NULL_RECORD_MARKER = 0
+    REPEAT_RECORD_MARKER = 1
+    NAMESPACE_RECORD_MARKER = 2
+    QNAME_RECORD_MARKER = 3
+    URI_RECORD_MARKER = 4
+    BNODE_RECORD_MARKER = 5
+    PLAIN_LITERAL_RECORD_MARKER = 6
+    LANG_LITERAL_RECORD_MARKER = 7
+    DATATYPE_LITERAL_RECORD_MARKER = 8
+    EMPTY_ROW_RECORD_MARKER = 9
+    TRIPLE_RECORD_MARKER = 10
+    ERROR_RECORD_MARKER = 126
+    TABLE_END_RECORD_MARKER = 127
+
+    @staticmethod
+    def from_binary(data: bytes) -> 'SparqlResultTable':
+        """
+        Decodes a result in the RDF4J binary query results format (versions 1 to 4).
+
+        :param data: The binary result
+        :type data: bytes
+        :return: The result table
+        :rtype: SparqlResultTable
+        :raises OldapError: If the data is not a valid binary result, or if the result contains an error record
+        """
+        return _BinaryReader(data).read()
+
+
+def decode_query_result(content_type: str, content: bytes) -> dict | SparqlResultTable:
+    """
+    Decodes the response to a SPARQL query depending on its content type. SPARQL JSON is returned as dict,
+    TSV and the binary format as `SparqlResultTable`.
+
+    :param content_type: The value of the Content-Type header of the response
+    :type content_type: str
+    :param content: The body of the response
+    :type content: bytes
+    :return: The decoded result
+    :rtype: dict | SparqlResultTable
+    :raises OldapError: If the content type is not a supported query result format
+    """
+    mime = content_type.split(';')[0].strip().lower()
+    match mime:
+        case 'application/x-binary-rdf-results-table':
+            return SparqlResultTable.from_binary(content)
+        case 'text/tab-separated-values':
+            return SparqlResultTable.from_tsv(content)
+        case 'application/sparql-results+json' | 'application/x-sparqlstar-results+json' | 'application/json':
+            return json.loads(content)
+        case 'text/boolean':
+            return {'head': {}, 'boolean': content.strip().lower() == b'true'}
+        case _:
+            raise OldapError(f'Unsupported SPARQL result format "{content_type}"')
+
+
+class _BinaryReader:
+    """
+    Reader for the RDF4J binary query results format. The hot loop binds everything it needs to local
+    variables, since attribute and method lookups dominate the decoding time in Python.
+    """
+    _int = struct.Struct('>i')
+    _short = struct.Struct('>H')
+
+    def __init__(self, data: bytes):
+        self._data = bytes(data)
+        self._pos = 0
+        self._namespaces: dict[int, str] = {}
+        self._version = 0
+
+    def _integer(self) -> int:
+        try:
+            value, = self._int.unpack_from(self._data, self._pos)
+        except struct.error:
+            raise OldapError('Truncated binary SPARQL result')
+        self._pos += 4
+        return value
+
+    def _string(self) -> str:
+        if self._version == 1:
+            try:
+                length, = self._short.unpack_from(self._data, self._pos)
+            except struct.error:
+                raise OldapError('Truncated binary SPARQL result')
+            self._pos += 2
+        else:
+            length = self._integer()
+        end = self._pos + length
+        if end > len(self._data):
+            raise OldapError('Truncated binary SPARQL result')
+        value = self._data[self._pos:end].decode('utf-8')
+        self._pos = end
+        return value
+
+    def _qname(self) -> str:
+        nsid = self._integer()
+        local = self._string()
+        try:
+            return self._namespaces[nsid] + local
+        except KeyError:
+            raise OldapError(f'Undefined namespace id {nsid} in binary SPARQL result')
+
+    def _marker(self) -> int:
+        """Reads the next record marker, processing namespace and error records"""
+        data = self._data
+        while True:
+            if self._pos >= len(data):
+                raise OldapError('Truncated binary SPARQL result')
+            marker = data[self._pos]
+            self._pos += 1
+            if marker == _NAMESPACE:
+                nsid = self._integer()
+                self._namespaces[nsid] = self._string()
+            elif marker == _ERROR:
+                self._pos += 1  # error type
+                raise OldapError(f'SPARQL query failed: {self._string()}')
+            else:
+                return marker
+
+    def _value(self, marker: int) -> RdfTerm:
+        if marker == _QNAME:
+            return RdfTerm('uri', self._qname())
+        if marker == _PLAIN:
+            return RdfTerm('literal', self._string())
+        if marker == _DATATYPE:
+            label = self._string()
+            datatype = self._qname()
+            return RdfTerm('literal', label, None if datatype == XSD_NS + 'string' else datatype)
+        if marker == _LANG:
+            label = self._string()
+            return RdfTerm('literal', label, None, self._string())
+        if marker == _URI:
+            return RdfTerm('uri', self._string())
+        if marker == _BNODE:
+            return RdfTerm('bnode', self._string())
+        if marker == _TRIPLE:
+            parts = [self._value(self._marker()) for _ in range(3)]
+            return RdfTerm('triple', '<< ' + ' '.join(_ntriples(p) for p in parts) + ' >>')
+        raise OldapError(f'Invalid record marker {marker} in binary SPARQL result')
+
+    def read(self) -> SparqlResultTable:
+        if self._data[:4] != SparqlResultTable.MAGIC:
+            raise OldapError('Invalid binary SPARQL result: bad magic number')
+        self._pos = 4
+        self._version = self._integer()
+        if not 1 <= self._version <= 4:
+            raise OldapError(f'Unsupported binary SPARQL result format version {self._version}')
+        names = [self._string() for _ in range(self._integer())]
+        ncols = len(names)
+        empty = (None,) * ncols
+        rows: list[tuple[RdfTerm | None, ...]] = []
+        previous: tuple[RdfTerm | None, ...] = empty
+        current: list[RdfTerm | None] = []
+        marker_ = self._marker
+        value_ = self._value
+        append = current.append
+        while True:
+            marker = marker_()
+            if marker == _NULL:
+                append(None)
+            elif marker == _REPEAT:
+                append(previous[len(current)])
+            elif marker == _TABLE_END:
+                break
+            elif marker == _EMPTY_ROW:
+                rows.append(empty)
+                continue
+            else:
+                append(value_(marker))
+            if len(current) == ncols:
+                previous = tuple(current)
+                rows.append(previous)
+                current.clear()
+        if current:
+            raise OldapError('Truncated row in binary SPARQL result')
+        return SparqlResultTable(names, rows)
+
+
+_NULL = SparqlResultTable.NULL_RECORD_MARKER
+_REPEAT = SparqlResultTable.REPEAT_RECORD_MARKER
+_NAMESPACE = SparqlResultTable.NAMESPACE_RECORD_MARKER
+_QNAME = SparqlResultTable.QNAME_RECORD_MARKER
+_URI = SparqlResultTable.URI_RECORD_MARKER
+_BNODE = SparqlResultTable.BNODE_RECORD_MARKER
+_PLAIN = SparqlResultTable.PLAIN_LITERAL_RECORD_MARKER
+_LANG = SparqlResultTable.LANG_LITERAL_RECORD_MARKER
+_DATATYPE = SparqlResultTable.DATATYPE_LITERAL_RECORD_MARKER
+_EMPTY_ROW = SparqlResultTable.EMPTY_ROW_RECORD_MARKER
+_TRIPLE = SparqlResultTable.TRIPLE_RECORD_MARKER
+_ERROR = SparqlResultTable.ERROR_RECORD_MARKER
+_TABLE_END = SparqlResultTable.TABLE_END_RECORD_MARKER
+
+
+def _ntriples(term: RdfTerm) -> str:
+    if term.type == 'uri':
+        return f'<{term.value}>'
+    if term.type == 'bnode':
+        return f'_:{term.value}'
+    if term.type == 'triple':
+        return term.value
+    label = term.value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+    if term.lang:
+        return f'"{label}"@{term.lang}'
+    if term.datatype:
+        return f'"{label}"^^<{term.datatype}>'
+    return f'"{label}"'
@@ -0,0 +1,125 @@
+"""
+# TokenCache
+
+In-process cache of verified JWT tokens. Web backends create a `Connection(token=...)` for every HTTP request.
+Without the cache, each of them verifies the signature of the token and rebuilds the complete `UserData` (with
+the `InProjectClass` and all Xsd objects) from the JSON in the token.
+
+The cache maps the SHA-256 digest of a token (and the secret it was verified with) to the `UserData` decoded
+from it. An entry expires together with the token (claim "exp"), at the latest after the time to live of the
+cache. Repeated tokens therefore cost a dictionary lookup. Invalid tokens are never cached.
+
+The `UserData` of a cached token is shared by all connections created with this token. It is frozen (see
+`UserData.freeze()`): changing its permissions raises `OldapErrorImmutable`.
+
+The cache is configured by the following environment variables (or by calling `configure()`):
+
+- _OLDAP_TOKEN_CACHE_TTL_: Maximal time to live of the entries in seconds. "0" disables the cache (default: 3600)
+- _OLDAP_TOKEN_CACHE_SIZE_: Maximal number of cached tokens (default: 10000)
+"""
+import hashlib
+import os
+import time
+
+from oldaplib.src.helpers.singletonmeta import SingletonMeta
+from oldaplib.src.helpers.ttlcache import TtlCache
+from oldaplib.src.userdataclass import UserData
+
+
+class TokenCache(metaclass=SingletonMeta):
+    """
+    Singleton caching the UserData of verified tokens. The hit and miss counters are available by `hits`,
+    `misses` and `hit_rate`.
+    """
+    _tokens: TtlCache
+
+    def __init__(self):
+        ttl = float(os.getenv("OLDAP_TOKEN_CACHE_TTL", "3600"))
+        maxsize = int(os.getenv("OLDAP_TOKEN_CACHE_SIZE", "10000"))
+        self._tokens = TtlCache(maxsize=maxsize, ttl=ttl)
+
+    def configure(self, *, ttl: float | None = None, maxsize: int | None = None) -> None:
+        """
+        Changes the configuration of the cache. All entries are discarded.
+
+        :param ttl: Maximal time to live of the entries in seconds ("0" disables the cache)
+        :type ttl: float | None
+        :param maxsize: Maximal number of cached tokens
+        :type maxsize: int | None
+        :return: None
+        :raises OldapErrorValue: If the values are invalid
+        """
+        ttl = self._tokens.ttl if ttl is None else ttl
+        maxsize = self._tokens.maxsize if maxsize is None else maxsize
+        self._tokens = TtlCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self._tokens.ttl > 0
+
+    @property
+    def hits(self) -> int:
+        return self._tokens.hits
+
+    @property
+    def misses(self) -> int:
+        return self._tokens.misses
+
+    @property
+    def evictions(self) -> int:
+        return self._tokens.evictions
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of the lookups answered by the cache (0.0 if there was no lookup)"""
+        lookups = self._tokens.hits + self._tokens.misses
+        return self._tokens.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    @staticmethod
+    def _key(token: str, jwtkey: str) -> tuple[bytes, str]:
+        return hashlib.sha256(token.encode('utf-8')).digest(), jwtkey
+
+    def get(self, token: str, jwtkey: str) -> UserData | None:
+        """
+        Returns the UserData of a token that has been verified with the given secret before and is not expired.
+
+        :param token: The JWT token
+        :type token: str
+        :param jwtkey: The secret the token is verified with
+        :type jwtkey: str
+        :return: The shared (read-only) UserData or None
+        :rtype: UserData | None
+        """
+        if self._tokens.ttl <= 0:
+            return None
+        return self._tokens.get(TokenCache._key(token, jwtkey))
+
+    def set(self, token: str, jwtkey: str, userdata: UserData, exp: float | None) -> None:
+        """
+        Stores the UserData of a verified token. The UserData is frozen (see ~UserData.freeze).
+
+        :param token: The JWT token
+        :type token: str
+        :param jwtkey: The secret the token has been verified with
+        :type jwtkey: str
+        :param userdata: The UserData decoded from the token
+        :type userdata: UserData
+        :param exp: The expiration time of the token (seconds since the epoch) or None
+        :type exp: float | None
+        :return: None
+        """
+        ttl = self._tokens.ttl
+        if exp is not None:
+            ttl = min(ttl, int(exp) - time.time())  # PyJWT compares the integral part of "exp"
+        self._tokens.set(TokenCache._key(token, jwtkey), userdata.freeze(), ttl=ttl)
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the counters.
+
+        :return: None
+        """
+        self._tokens.clear()
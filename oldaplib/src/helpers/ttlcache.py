@@ -0,0 +1,167 @@
+"""
+# TtlCache
+
+A small thread-safe in-process cache with a least-recently-used bound and a time-to-live per entry.
+It is the building block of the in-process caches of oldaplib (e.g. the ~LoginCache).
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+
+_MISSING = object()
+
+
+class TtlCache:
+    """
+    LRU cache with expiring entries. When the cache is full, the least recently used entry is evicted.
+    Expired entries are removed when they are accessed or when space is needed.
+
+    :ivar maxsize: Maximal number of entries
+    :type maxsize: int
+    :ivar ttl: Default time to live of an entry in seconds (0 disables the cache)
+    :type ttl: float
+    """
+    _lock: Lock
+    _entries: OrderedDict[Hashable, tuple[float, Any]]
+    _maxsize: int
+    _ttl: float
+    _clock: Callable[[], float]
+    _hits: int
+    _misses: int
+    _evictions: int
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Constructor of the cache.
+
+        :param maxsize: Maximal number of entries (at least 1)
+        :type maxsize: int
+        :param ttl: Default time to live of an entry in seconds. A ttl of 0 disables the cache.
+        :type ttl: float
+        :param clock: Monotonic clock in seconds (used by tests)
+        :type clock: Callable[[], float]
+        :raises OldapErrorValue: If maxsize or ttl are invalid
+        """
+        if maxsize < 1:
+            raise OldapErrorValue(f'Cache size must be at least 1, got {maxsize}')
+        if ttl < 0:
+            raise OldapErrorValue(f'Time to live must not be negative, got {ttl}')
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._clock = clock
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        """
+        Returns the value stored for the key, or the default if there is no (unexpired) entry.
+
+        :param key: The key
+        :param default: Returned if the key is not in the cache
+        :param count: If True, the lookup is counted as hit or miss
+        :return: The cached value or the default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self._clock():
+                    self._entries.move_to_end(key)
+                    if count:
+                        self._hits += 1
+                    return value
+                del self._entries[key]
+            if count:
+                self._misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """
+        Stores a value. If the cache is full, expired entries and then the least recently used entries
+        are evicted.
+
+        :param key: The key
+        :param value: The value
+        :param ttl: Time to live in seconds (default: the ttl of the cache)
+        :return: None
+        """
+        ttl = self._ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            now = self._clock()
+            self._entries[key] = (now + ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._maxsize:
+                for k in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[k]
+                while len(self._entries) > self._maxsize:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Removes the entry for the key (if any).
+
+        :param key: The key
+        :return: None
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        Removes all entries for which predicate(key, value) is True.
+
+        :param predicate: The selection function
+        :return: The number of removed entries
+        """
+        with self._lock:
+            keys = [k for k, (_, v) in self._entries.items() if predicate(k, v)]
+            for k in keys:
+                del self._entries[k]
+            return len(keys)
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the counters.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
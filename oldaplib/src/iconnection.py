@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, Iterator
 
 
-from oldaplib.src.helpers.context import DEFAULT_CONTEXT
+from oldaplib.src.helpers.context import DEFAULT_CONTEXT, Context
+from oldaplib.src.helpers.query_processor import QueryProcessor, RowType
 from oldaplib.src.userdataclass import UserData
 from oldaplib.src.xsd.iri import Iri
 from oldaplib.src.xsd.xsd_qname import Xsd_QName
@@ -77,6 +78,14 @@ class IConnection(ABC):
     def token(self) -> str:
         return self._token
 
+    @property
+    def cache_scope(self) -> str | None:
+        """
+        Scope of the cached objects read through this connection (see ~CacheKeyspace). Connections to
+        the same repository must return the same scope. None if the default scope is used.
+        """
+        return None
+
     @abstractmethod
     def clear_graph(self, graph_iri: Xsd_QName) -> None:
         pass
@@ -90,9 +99,24 @@ class IConnection(ABC):
         pass
 
     @abstractmethod
-    def query(self, query: str, format: SparqlResultFormat = SparqlResultFormat.JSON) -> Any:
+    def query(self, query: str, format: SparqlResultFormat = SparqlResultFormat.AUTO) -> Any:
         pass
 
+    def query_stream(self, query: str, context: Context) -> Iterator[RowType]:
+        """
+        Sends a SPARQL SELECT query and returns the result rows one by one. Implementations that can parse
+        the response incrementally override this method so that the complete result is never held in memory.
+        The default implementation processes the complete JSON result.
+
+        :param query: SPARQL SELECT query
+        :type query: str
+        :param context: The context used to convert the IRIs of the result into QNames
+        :type context: Context
+        :return: Iterator of rows
+        :rtype: Iterator[RowType]
+        """
+        return iter(QueryProcessor(context, self.query(query)))
+
     @abstractmethod
     def update_query(self, query: str) -> Dict[str, str]:
         pass
@@ -102,7 +126,7 @@ class IConnection(ABC):
         pass
 
     @abstractmethod
-    def transaction_query(self, query: str, result_format: SparqlResultFormat = SparqlResultFormat.JSON) -> Any:
+    def transaction_query(self, query: str, result_format: SparqlResultFormat = SparqlResultFormat.AUTO) -> Any:
         pass
 
     @abstractmethod
@@ -14,6 +14,7 @@ from oldaplib.src.enums.action import Action
 from oldaplib.src.enums.attributeclass import AttributeClass
 from oldaplib.src.helpers.Notify import Notify
 from oldaplib.src.helpers.attributechange import AttributeChange
+from oldaplib.src.helpers.frozen import mutator
 from oldaplib.src.xsd.iri import Iri
 from oldaplib.src.xsd.xsd_anyuri import Xsd_anyURI
 from oldaplib.src.xsd.xsd_qname import Xsd_QName
@@ -42,6 +43,7 @@ class InProjectClass(Notify):
     """
     __setdata: dict[Iri, ObservableSet]
     _changeset: dict[Iri, AttributeChange]
+    _frozen: bool = False
 
     def __init__(self,
                  setdata: Self | Dict[Iri | str, set[AdminPermission | str] | ObservableSet] | None = None,
@@ -117,6 +119,7 @@ class InProjectClass(Notify):
         except (KeyError, AttributeError) as err:
             raise OldapErrorKey(str(err), key)
 
+    @mutator
     def __setitem__(self, key: Iri | str, value: set[AdminPermission | str] | ObservableSet | None) -> None:
         if not isinstance(key, Iri):
             key = Iri(key, validate=True)
@@ -134,6 +137,7 @@ class InProjectClass(Notify):
             self.__setdata[key] = self.__perms(key, value)
         self.notify()
 
+    @mutator
     def __delitem__(self, key: Iri | str) -> None:
         if not isinstance(key, Iri):
             key = Iri(key, validate=True)
@@ -188,6 +192,15 @@ class InProjectClass(Notify):
             self.__setdata[key].clear_changeset()
         self._changeset = {}
 
+    def freeze(self) -> None:
+        """
+        Makes the permissions read-only (see ~mutator), the permission sets of the projects included.
+        :return: None
+        """
+        for perms in self.__setdata.values():
+            perms.freeze()
+        self._frozen = True
+
     def copy(self) -> Self:
         data_copy: dict[Iri, set[AdminPermission | str] | ObservableSet] = {}
         for key, val in self.__setdata.items():
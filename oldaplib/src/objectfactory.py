@@ -7,12 +7,14 @@ from dataclasses import dataclass
 from pprint import pprint
 
 import jwt
+import redis
 
 from datetime import datetime, timedelta
 from enum import Flag, auto, Enum
 from functools import partial
 from typing import Type, Any, Self, cast, Dict
 
+from oldaplib.src.cachesingleton import CacheSingletonRedis, NOT_FOUND
 from oldaplib.src.datamodel import DataModel
 from oldaplib.src.dtypes.namespaceiri import NamespaceIRI
 from oldaplib.src.enums.action import Action
@@ -23,6 +25,8 @@ from oldaplib.src.enums.propertyclassattr import PropClassAttr
 from oldaplib.src.enums.xsd_datatypes import XsdDatatypes
 from oldaplib.src.hasproperty import HasProperty
 from oldaplib.src.helpers.attributechange import AttributeChange
+from oldaplib.src.helpers.cache_namespace import CacheKey, MEDIA_NAMESPACE
+from oldaplib.src.helpers.cache_policy import CacheFamily
 from oldaplib.src.helpers.context import Context
 from oldaplib.src.helpers.convert2datatype import convert2datatype
 from oldaplib.src.helpers.langstring import LangString
@@ -712,6 +716,20 @@ class ResourceInstance:
             result = self._con.query(permission_query)
         return result['boolean']
 
+    def _invalidate_media_lookups(self) -> None:
+        #
+        # lookups of media objects by asset ID may have been cached as not found (see get_media_object_by_id())
+        #
+        asset_ids = self._values.get(Xsd_QName('shared:assetId', validate=False))
+        if asset_ids is None:
+            return
+        try:
+            cache = CacheSingletonRedis(self._con)
+            for asset_id in asset_ids if isinstance(asset_ids, ObservableSet) else {asset_ids}:
+                cache.delete_group(CacheKey(MEDIA_NAMESPACE, str(asset_id)))
+        except redis.RedisError as err:
+            logger.warning(f'Cached lookups of media object "{self._iri}" not invalidated: {err}')
+
     def create(self, indent: int = 0, indent_inc: int = 4) -> str:
         """
         Generates an RDF/SPARQL INSERT DATA query for creating a resource with associated
@@ -786,6 +804,7 @@ class ResourceInstance:
             self._con.transaction_abort()
             raise
         self._con.transaction_commit()
+        self._invalidate_media_lookups()
 
 
     @classmethod
@@ -1100,6 +1119,7 @@ class ResourceInstance:
             self._con.transaction_abort()
             raise
         self.clear_changeset()
+        self._invalidate_media_lookups()
 
     def delete(self) -> None:
         """
@@ -1410,11 +1430,13 @@ class ResourceInstance:
         sparql += '\n'
 
         try:
-            jsonres = con.query(sparql)
+            if countOnly:
+                res = QueryProcessor(context, con.query(sparql))
+            else:
+                res = con.query_stream(sparql, context)  # rows are processed while the result arrives
         except OldapError:
             logger.error(f'SPARQL: Failed to search for resources in project "{projectShortName}"', exc_info=True)
             raise
-        res = QueryProcessor(context, jsonres)
         if countOnly:
             return res[0]['numResult']
         else:
@@ -1539,11 +1561,13 @@ class ResourceInstance:
         sparql += '\n'
 
         try:
-            jsonres = con.query(sparql)
+            if countOnly:
+                res = QueryProcessor(context, con.query(sparql))
+            else:
+                res = con.query_stream(sparql, context)  # rows are processed while the result arrives
         except OldapError:
             logger.error(f'SPARQL: Failed to retrieve resources for project "{projectShortName}"', exc_info=True)
             raise
-        res = QueryProcessor(context, jsonres)
         if countOnly:
             return res[0]['numResult']
         else:
@@ -1600,6 +1624,14 @@ class ResourceInstance:
         """
         if not isinstance(mediaObjectId, Xsd_string):
             mediaObjectId = Xsd_string(mediaObjectId, validate=True)
+        #
+        # Only unknown IDs are cached (per user, since the media objects found depend on the permissions)
+        #
+        cache = CacheSingletonRedis(con)
+        not_found_key = CacheKey(MEDIA_NAMESPACE, f'{mediaObjectId}@{con.userIri}')
+        not_found_group = CacheKey(MEDIA_NAMESPACE, str(mediaObjectId))
+        if cache.get(not_found_key, family=CacheFamily.NEGATIVE, negative=True) is NOT_FOUND:
+            raise OldapErrorNotFound(f'Media object with id {mediaObjectId} not found.')
         blank = ''
         context = Context(name=con.context_name)
         sparql = context.sparql_context
@@ -1659,6 +1691,7 @@ class ResourceInstance:
 
         res = QueryProcessor(context, jsonres)
         if len(res) == 0:
+            cache.set_not_found(not_found_key, not_found_group)
             raise OldapErrorNotFound(f'Media object with id {mediaObjectId} not found.')
         result: dict[str, Xsd] = {
             'iri': res[0].get('subject'),
@@ -72,12 +72,15 @@ A list item object is a `skos:Concept` with the following properties:
 - `oldap:rightIndex`: Nested Set Model right value (will be automatically managed by OLDAP)
 
 """
+import time
 from copy import deepcopy
 from functools import partial
 from pprint import pprint
 from typing import Self, Any
 
 from oldaplib.src.cachesingleton import CacheSingleton, CacheSingletonRedis
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, REDIS
+from oldaplib.src.helpers.cache_policy import CacheFamily
 from oldaplib.src.dtypes.namespaceiri import NamespaceIRI
 from oldaplib.src.enums.action import Action
 from oldaplib.src.enums.oldaplistattr import OldapListAttr
@@ -93,6 +96,7 @@ from oldaplib.src.helpers.serializer import serializer
 from oldaplib.src.iconnection import IConnection
 from oldaplib.src.model import Model
 from oldaplib.src.helpers.attributechange import AttributeChange
+from oldaplib.src.helpers.single_flight import SingleFlight
 from oldaplib.src.oldaplistnode import OldapListNode
 from oldaplib.src.project import Project
 from oldaplib.src.xsd.iri import Iri
@@ -420,7 +424,8 @@ class OldapList(Model):
     def read(cls,
              con: IConnection,
              project: Project | Iri | Xsd_NCName | str,
-             oldapListId: Xsd_NCName | str) -> Self:
+             oldapListId: Xsd_NCName | str,
+             ignore_cache: bool = False) -> Self:
         """
         Reads a list object from the OLDAP server. This function retrieves only the list object
         without the nodes belonging to the list. It ensures that a valid connection and proper
@@ -433,6 +438,8 @@ class OldapList(Model):
         :param oldapListId: An ID uniquely identifying the list, which must be unique within a particular project.
                            The input must be convertible to an NCName.
         :type oldapListId: Xsd_NCName | str
+        :param ignore_cache: If True, the list is read from the triple store even if it is in the cache.
+        :type ignore_cache: bool
         :return: A list object fetched from the OLDAP server.
         :rtype: OldapList
 
@@ -449,10 +456,16 @@ class OldapList(Model):
             project = Project.read(con, project)
             oldaplist_iri = Iri.fromPrefixFragment(project.projectShortName, oldapListId, validate=False)
 
-        cache = CacheSingletonRedis()
-        tmp = cache.get(oldaplist_iri, connection=con)
-        if tmp is not None:
-            return tmp
+        cache = CacheSingletonRedis(con)
+        if not ignore_cache:
+            tmp = cache.get(oldaplist_iri, connection=con, family=CacheFamily.LIST)
+            if tmp is not None:
+                return tmp
+            return SingleFlight().run(oldaplist_iri,
+                                      lambda: cache.get(oldaplist_iri, connection=con, family=CacheFamily.LIST),
+                                      lambda: cls.read(con, project, oldapListId, ignore_cache=True),
+                                      cache)
+        started = time.perf_counter() if CacheMetrics().enabled else None
 
         if not isinstance(project, Project):
             project = Project.read(con, project)
@@ -515,6 +528,8 @@ class OldapList(Model):
                        definition=definition)
         instance.nodes = instance.get_nodes_from_list()
         cache.set(oldaplist_iri, instance)
+        if started is not None:
+            CacheMetrics().record(REDIS, CacheFamily.LIST, 'fill', time.perf_counter() - started)
         return instance
 
     @staticmethod
@@ -721,7 +736,7 @@ class OldapList(Model):
         self._contributor = self._con.userIri
         self.clear_changeset()
 
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(Xsd_QName(self.project.projectShortName, 'shacl'))
         cache.set(self.__iri, self)
 
@@ -794,7 +809,7 @@ class OldapList(Model):
         #
         # we changed something, therefore we invalidate the list cache
         #
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__iri)
         cache.delete(Xsd_QName(self.project.projectShortName, 'shacl'))
 
@@ -954,6 +969,6 @@ class OldapList(Model):
             self._con.transaction_abort()
             raise
         self.safe_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__iri)
 
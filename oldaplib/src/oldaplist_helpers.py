@@ -1,4 +1,5 @@
 import json
+import time
 from enum import Enum
 from pathlib import Path
 from pprint import pprint
@@ -9,11 +10,12 @@ import yaml
 
 from oldaplib.src.cachesingleton import CacheSingleton
 from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, LOCAL
+from oldaplib.src.helpers.cache_policy import CacheFamily
 from oldaplib.src.helpers.context import Context
 from oldaplib.src.helpers.json_encoder import SpecialEncoder
 from oldaplib.src.helpers.langstring import LangString
 from oldaplib.src.helpers.oldaperror import OldapErrorNotImplemented, OldapErrorValue
-from oldaplib.src.helpers.query_processor import QueryProcessor
 from oldaplib.src.iconnection import IConnection
 from oldaplib.src.oldaplist import OldapList
 from oldaplib.src.oldaplistnode import OldapListNode
@@ -62,10 +64,8 @@ def get_node_indices(con: IConnection, oldapList: OldapList) -> list[tuple[Iri,
     }}
     ORDER BY ?node
     """
-    jsonobj = con.query(query)
-    res = QueryProcessor(context, jsonobj)
     result: list[tuple[Iri, Xsd_integer, Xsd_integer]] = []
-    for r in res:
+    for r in con.query_stream(query, context):
         result.append((r['node'], r['lindex'], r['rindex']))
     return result
 
@@ -156,10 +156,21 @@ def dump_list_to(con: IConnection,
         project = Project.read(con, project)
     oldapListIri = Iri.fromPrefixFragment(project.projectShortName, Xsd_NCName(oldapListId), validate=False)
     cache = CacheSingleton()
+    metrics = CacheMetrics()
     listnode = None
     if not ignore_cache:
-        listnode = cache.get(oldapListIri)
-        if listnode is not None:
+        started = time.perf_counter() if metrics.enabled else None
+        if listformat != ListFormat.PYTHON:
+            #
+            # JSON and YAML only read the list, so the shared snapshot of the cache can be used without copying it
+            #
+            listnode = cache.get_snapshot(oldapListIri)
+        else:
+            listnode = cache.get(oldapListIri)
+        if started is not None:
+            metrics.lookup(LOCAL, CacheFamily.LIST, listnode is not None)
+            metrics.record(LOCAL, CacheFamily.LIST, 'get', time.perf_counter() - started)
+        if listnode is not None and listformat == ListFormat.PYTHON:
             # rectify the connection
             listnode._con = con
             # if listnode.nodes:
@@ -169,6 +180,7 @@ def dump_list_to(con: IConnection,
         #
         # List was not in cache, read it from database
         #
+        started = time.perf_counter() if metrics.enabled else None
         listnode = OldapList.read(con=con,
                                   project=project,
                                   oldapListId=oldapListId)
@@ -176,6 +188,8 @@ def dump_list_to(con: IConnection,
         listnode.nodes = nodes
         setattr(listnode, 'source', 'db')
         cache.set(oldapListIri, listnode)
+        if started is not None:
+            metrics.record(LOCAL, CacheFamily.LIST, 'fill', time.perf_counter() - started)
 
     match listformat:
         case ListFormat.PYTHON:
@@ -449,7 +449,7 @@ class OldapListNode(Model):
 
         self.safe_update(sparql2)
         self.safe_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     def update(self, indent: int = 0, indent_inc: int = 4):
@@ -510,7 +510,7 @@ class OldapListNode(Model):
         self._modified = timestamp
         self._contributor = self._con.userIri  # TODO: move creator, created etc. to Model!
         self.clear_changeset()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     def insert_node_right_of(self, leftnode: Self, indent: int = 0, indent_inc: int = 4) -> None:
@@ -659,7 +659,7 @@ class OldapListNode(Model):
 
         self.safe_commit()
         self.clear_changeset()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     def insert_node_left_of(self, rightnode: Self, indent: int = 0, indent_inc: int = 4) -> None:
@@ -811,7 +811,7 @@ class OldapListNode(Model):
 
         self.safe_commit()
         self.clear_changeset()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     def insert_node_below_of(self, parentnode: Self, indent: int = 0, indent_inc: int = 4) -> None:
@@ -979,7 +979,7 @@ class OldapListNode(Model):
 
         self.safe_commit()
         self.clear_changeset()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     def in_use(self) -> bool:
@@ -1167,7 +1167,7 @@ class OldapListNode(Model):
 
         self.safe_commit()
         self.clear_changeset()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     def delete_node_recursively(self, indent: int = 0, indent_inc: int = 4) -> None:
@@ -1303,7 +1303,7 @@ class OldapListNode(Model):
         self.safe_update(update3)
 
         self.safe_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
 
@@ -1558,7 +1558,7 @@ class OldapListNode(Model):
         # commit
         #
         self.safe_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     def move_node_right_of(self, con: IConnection, leftnode: Self, indent: int = 0, indent_inc: int = 4):
@@ -1816,7 +1816,7 @@ class OldapListNode(Model):
         # commit
         #
         self.safe_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     def move_node_left_of(self, con: IConnection, rightnode: Self, indent: int = 0, indent_inc: int = 4):
@@ -2071,7 +2071,7 @@ class OldapListNode(Model):
         # commit
         #
         self.safe_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__oldapListIri)
 
     @staticmethod
@@ -1,4 +1,5 @@
 import json
+import time
 from copy import deepcopy
 from dataclasses import dataclass
 from functools import partial
@@ -7,7 +8,11 @@ from pprint import pprint
 from typing import List, Self, Any, Callable
 from datetime import date, datetime
 
-from oldaplib.src.cachesingleton import CacheSingletonRedis
+from oldaplib.src.cachesingleton import CacheSingletonRedis, NOT_FOUND
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, REDIS
+from oldaplib.src.helpers.cache_policy import CacheFamily
+from oldaplib.src.helpers.login_cache import LoginCache
+from oldaplib.src.helpers.session_store import SessionStore
 from oldaplib.src.enums.adminpermissions import AdminPermission
 from oldaplib.src.enums.projectattr import ProjectAttr
 from oldaplib.src.helpers.context import Context
@@ -30,6 +35,7 @@ from oldaplib.src.helpers.query_processor import QueryProcessor
 from oldaplib.src.iconnection import IConnection
 from oldaplib.src.model import Model
 from oldaplib.src.helpers.attributechange import AttributeChange
+from oldaplib.src.helpers.single_flight import SingleFlight
 from oldaplib.src.xsd.xsd_string import Xsd_string
 
 @serializer
@@ -276,13 +282,27 @@ class Project(Model):
         #         projectIri = Iri(projectIri_SName)
         #     else:
         #         shortname = Xsd_NCName(projectIri_SName)
-        cache = CacheSingletonRedis()
-        if projectIri is not None:
-            if not ignore_cache:
-                tmp = cache.get(projectIri, connection=con)
+        cache = CacheSingletonRedis(con)
+        if not ignore_cache:
+            key = projectIri if projectIri is not None else shortname
+
+            def lookup() -> Self | None:
+                tmp = cache.get(key, connection=con, family=CacheFamily.PROJECT, negative=True)
+                if tmp is NOT_FOUND:
+                    raise OldapErrorNotFound(f'Project with IRI/shortname "{projectIri_SName}" not found.')
                 if tmp is not None:
-                    tmp.update_notifier()
-                    return tmp
+                    if projectIri is not None:
+                        tmp.update_notifier()
+                    else:
+                        tmp._con = con
+                return tmp
+
+            tmp = lookup()
+            if tmp is not None:
+                return tmp
+            return SingleFlight().run(key, lookup, lambda: cls.read(con, projectIri_SName, ignore_cache=True), cache)
+        started = time.perf_counter() if CacheMetrics().enabled else None
+        if projectIri is not None:
             query += f"""
                 SELECT ?prop ?val
                 FROM NAMED oldap:admin
@@ -293,11 +313,6 @@ class Project(Model):
                 }}
             """
         elif shortname is not None:
-            if not ignore_cache:
-                tmp = cache.get(shortname, connection=con)
-                if tmp is not None:
-                    tmp._con = con
-                    return tmp
             query += f"""
                 SELECT ?proj ?prop ?val ?prefix ?iri
                 WHERE {{
@@ -315,6 +330,7 @@ class Project(Model):
         jsonobj = con.query(query)
         res = QueryProcessor(context, jsonobj)
         if len(res) == 0:
+            cache.set_not_found(projectIri if projectIri is not None else shortname)
             raise OldapErrorNotFound(f'Project with IRI/shortname "{projectIri_SName}" not found.')
         creator: Iri | None = None
         created: Xsd_dateTime | None = None
@@ -367,8 +383,10 @@ class Project(Model):
                        comment=comment,
                        projectStart=projectStart,
                        projectEnd=projectEnd)
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(con)
         cache.set(instance.projectIri, instance, instance.projectShortName)
+        if started is not None:
+            CacheMetrics().record(REDIS, CacheFamily.PROJECT, 'fill', time.perf_counter() - started)
         return instance
 
     @staticmethod
@@ -563,8 +581,10 @@ class Project(Model):
         self._contributor = self._con.userIri
         context[self._attributes[ProjectAttr.PROJECT_SHORTNAME]] = self._attributes[ProjectAttr.NAMESPACE_IRI]
 
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self.projectIri, self, self.projectShortName)
+        LoginCache().invalidate_projects()
+        SessionStore().bump()
 
     def update(self, indent: int = 0, indent_inc: int = 4) -> None:
         """
@@ -666,8 +686,10 @@ class Project(Model):
         self._modified = timestamp
         self._contributor = self._con.userIri
         self.clear_changeset()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self.projectIri, self, self.projectShortName)
+        LoginCache().invalidate_projects()
+        SessionStore().bump()
 
     def delete(self) -> None:
         """
@@ -698,9 +720,11 @@ class Project(Model):
         }} 
         """
         self._con.update_query(sparql)
-        cache = CacheSingletonRedis()
-        cache.delete(self.projectIri)
-        cache.delete(self.projectShortName)
+        cache = CacheSingletonRedis(self._con)
+        cache.delete_many([self.projectIri, self.projectShortName])
+        cache.bump_generation(str(self.projectShortName))
+        LoginCache().invalidate_projects()
+        SessionStore().bump()
 
     @staticmethod
     def get_shortname_from_iri(con: IConnection, iri: Iri) -> Xsd_NCName:
@@ -15,6 +15,7 @@ classes is being deleted from the triple store, the class instance will also be
 cache is implemented using a metaclass based singleton and uses locking to be compatible in a threaded environment.
 """
 import logging
+import time
 from copy import deepcopy
 from dataclasses import dataclass
 from datetime import datetime
@@ -26,6 +27,8 @@ from oldaplib.src.helpers.irincname import IriOrNCName
 from oldaplib.src.helpers.observable_set import ObservableSet
 from oldaplib.src.helpers.serializer import serializer
 from oldaplib.src.cachesingleton import CacheSingletonRedis
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, REDIS
+from oldaplib.src.helpers.cache_policy import CacheFamily
 from oldaplib.src.dtypes.languagein import LanguageIn
 from oldaplib.src.dtypes.xsdset import XsdSet
 from oldaplib.src.enums.adminpermissions import AdminPermission
@@ -1015,13 +1018,14 @@ class PropertyClass(Model, Notify):
 
         if not isinstance(property_class_iri, Xsd_QName):
             property_class_iri = Xsd_QName(property_class_iri)
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(con)
         if not ignore_cache:
-            tmp = cache.get(property_class_iri, connection=con)
+            tmp = cache.get(property_class_iri, connection=con, family=CacheFamily.CLASS)
             if tmp is not None:
                 tmp.update_notifier()
                 #logger.info(f'Property class "{property_class_iri}" already cached in triple store!')
                 return tmp
+        started = time.perf_counter() if CacheMetrics().enabled else None
         property = cls(con=con, project=project, property_class_iri=property_class_iri)
         attributes = PropertyClass.__query_shacl(con, property._graph, property_class_iri)
         property.parse_shacl(attributes=attributes)
@@ -1030,6 +1034,8 @@ class PropertyClass(Model, Notify):
 
         property.update_notifier()
         cache.set(property.property_class_iri, property)
+        if started is not None:
+            CacheMetrics().record(REDIS, CacheFamily.CLASS, 'fill', time.perf_counter() - started)
 
         return property
 
@@ -1309,7 +1315,7 @@ class PropertyClass(Model, Notify):
 
         self.clear_changeset()
 
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self._property_class_iri, self)
 
 
@@ -1711,7 +1717,7 @@ class PropertyClass(Model, Notify):
             if change.action == Action.MODIFY:
                 self._attributes[prop].clear_changeset()
         self._changeset = {}
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self._property_class_iri, self)
 
     def delete_shacl(self, *,
@@ -1859,6 +1865,6 @@ class PropertyClass(Model, Notify):
                 self._con.transaction_commit()
         else:
             self._con.transaction_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self._property_class_iri)
 
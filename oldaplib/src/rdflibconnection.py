@@ -0,0 +1,601 @@
+"""
+# RdflibConnection
+
+In-process implementation of ~IConnection backed by an rdflib `Dataset`. It needs neither a triple store nor
+a network and is intended for benchmarks and load tests of the object layer (`Project`, `DataModel`,
+`ResourceInstance`, `OldapList` etc.) on a laptop:
+
+```python
+store = RdflibStore.with_ontologies()   # oldap.trig, shared.trig, admin.trig and admin-testing.trig
+con = RdflibConnection(store, userId="rosenth", credentials="RioGrande")
+project = Project.read(con, "hyha")
+```
+
+The data lives in a ~RdflibStore which can be shared by several connections (like a repository of a triple
+store). As in GraphDB, the default graph is the union of all named graphs. Quoted triples (RDF-star) are
+rewritten into reification (see `oldaplib.src.helpers.rdf_star`).
+
+Transactions change the dataset in place and record the added and removed quads in an undo log:
+`transaction_query()` and `transaction_update()` see the changes of the transaction, `transaction_commit()`
+drops the log and `transaction_abort()` reverts the changes in reverse order. Queries outside the transaction
+do not see its changes (they are reverted for the duration of the query). A store has at most one open
+transaction, a second one waits until it is finished. A write outside the transaction reverts it, its commit
+then fails.
+
+_Note_: rdflib is considerably slower than GraphDB for larger data sets and implements no reasoning. Use the
+RdflibConnection to compare the costs of the object layer, not as a replacement of the triple store.
+"""
+import json
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from threading import RLock, Condition, get_ident
+from typing import Optional, Any, Dict, Iterable, Iterator, Self
+
+from rdflib import Dataset, URIRef, Literal, BNode
+from rdflib.plugins.stores.memory import Memory
+from rdflib.query import Result
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.enums.adminpermissions import AdminPermission
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.bulk_load import RdfFile
+from oldaplib.src.helpers.context import Context, DEFAULT_CONTEXT
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorNoPermission
+from oldaplib.src.helpers.query_processor import QueryProcessor
+from oldaplib.src.helpers.rdf_star import rewrite_sparql, parse_rdf_star
+from oldaplib.src.iconnection import IConnection
+from oldaplib.src.userdataclass import UserData
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+from oldaplib.src.xsd.xsd_string import Xsd_string
+
+ONTOLOGIES = Path(__file__).parent.parent / 'ontologies'
+
+_RDFLIB_FORMATS = {
+    'text/turtle': 'turtle',
+    'application/trig': 'trig',
+    'application/n-triples': 'nt',
+    'application/n-quads': 'nquads',
+}
+
+_GRAPH_FORMATS = {
+    SparqlResultFormat.TURTLE: 'turtle',
+    SparqlResultFormat.N3: 'n3',
+    SparqlResultFormat.NQUADS: 'nquads',
+    SparqlResultFormat.JSONLD: 'json-ld',
+    SparqlResultFormat.TRIX: 'trix',
+    SparqlResultFormat.TRIG: 'trig',
+}
+
+_TRANSACTION_WAIT = 30.0
+"""Maximal time in seconds a transaction waits for the open transaction of the store"""
+
+_UndoLog = list[tuple[bool, tuple, Any]]
+"""The changes of a transaction: (added, triple, context) in the order they have been made"""
+
+
+class _UndoMemory(Memory):
+    """
+    The rdflib memory store, recording the quads actually added and removed in `log` (if set).
+    """
+    log: Optional[_UndoLog] = None
+
+    def add(self, triple, context, quoted: bool = False) -> None:
+        if self.log is not None and not quoted and not any(True for _ in self.triples(triple, context)):
+            self.log.append((True, triple, context))
+        super().add(triple, context, quoted)
+
+    def remove(self, triple_pattern, context=None) -> None:
+        if self.log is not None:
+            for triple, contexts in list(self.triples(triple_pattern, context)):
+                for ctx in contexts:
+                    if context is None or ctx.identifier == context.identifier:
+                        self.log.append((False, triple, ctx))
+        super().remove(triple_pattern, context)
+
+    def undo(self, log: _UndoLog) -> None:
+        for added, triple, context in reversed(log):
+            if added:
+                super().remove(triple, context)
+            else:
+                super().add(triple, context)
+
+    def redo(self, log: _UndoLog) -> None:
+        for added, triple, context in log:
+            if added:
+                super().add(triple, context)
+            else:
+                super().remove(triple, context)
+
+
+def _new_dataset() -> Dataset:
+    return Dataset(store=_UndoMemory(), default_union=True)
+
+
+class RdflibTransaction:
+    """
+    An open transaction of a ~RdflibStore: its undo log and the thread that started it.
+    """
+    __slots__ = ('log', 'owner')
+
+    def __init__(self) -> None:
+        self.log: _UndoLog = []
+        self.owner = get_ident()
+
+
+def _term_json(term: Any) -> dict[str, str]:
+    if isinstance(term, URIRef):
+        return {'type': 'uri', 'value': str(term)}
+    if isinstance(term, BNode):
+        return {'type': 'bnode', 'value': str(term)}
+    if term.language:
+        return {'type': 'literal', 'value': str(term), 'xml:lang': term.language}
+    if term.datatype:
+        return {'type': 'literal', 'value': str(term), 'datatype': str(term.datatype)}
+    return {'type': 'literal', 'value': str(term)}
+
+
+def _result(result: Result, format: SparqlResultFormat) -> Any:
+    """Converts an rdflib query result into the form returned by ~Connection for the given format"""
+    if result.type == 'ASK':
+        return {'head': {}, 'boolean': bool(result.askAnswer)}
+    if result.type == 'SELECT':
+        if format == SparqlResultFormat.XML:
+            return result.serialize(format='xml').decode('utf-8')
+        names = [str(v) for v in result.vars]
+        bindings = []
+        for row in result:
+            bindings.append({name: _term_json(term) for name, term in zip(names, row) if term is not None})
+        return {'head': {'vars': names}, 'results': {'bindings': bindings}}
+    text = result.serialize(format=_GRAPH_FORMATS.get(format, 'turtle')).decode('utf-8')
+    return json.loads(text) if format == SparqlResultFormat.JSONLD else text
+
+
+class RdflibStore:
+    """
+    An in-process "repository": an rdflib Dataset (the default graph is the union of all graphs) that is
+    shared by the RdflibConnections using it.
+    """
+    _dataset: Dataset
+    _version: int
+    _lock: RLock
+    _idle: Condition
+    _transaction: Optional[RdflibTransaction]
+    _scope: str
+
+    def __init__(self, files: Iterable[str | Path] = ()) -> None:
+        """
+        Constructor.
+
+        :param files: RDF files to load (see `load()`)
+        :type files: Iterable[str | Path]
+        """
+        self._dataset = _new_dataset()
+        self._version = 0
+        self._lock = RLock()
+        self._idle = Condition(self._lock)
+        self._transaction = None
+        self._scope = f'rdflib:{uuid.uuid4()}'
+        for file in files:
+            self.load(file)
+
+    @classmethod
+    def with_ontologies(cls, testing: bool = True) -> Self:
+        """
+        Creates a store with the OLDAP ontologies and the admin data, like a freshly initialized triple store.
+
+        :param testing: If True, the test data (users and projects of admin-testing.trig) are loaded too
+        :type testing: bool
+        :return: The store
+        :rtype: RdflibStore
+        """
+        files = ['oldap.trig', 'shared.trig', 'admin.trig'] + (['admin-testing.trig'] if testing else [])
+        return cls(ONTOLOGIES / file for file in files)
+
+    @property
+    def scope(self) -> str:
+        """Scope of the cached objects read from the store (see ~CacheKeyspace)"""
+        return self._scope
+
+    @property
+    def version(self) -> int:
+        """Number of committed changes of the store"""
+        return self._version
+
+    def __len__(self) -> int:
+        with self._lock, self._visible(None):
+            return len(self._dataset)
+
+    @contextmanager
+    def _visible(self, transaction: Optional[RdflibTransaction]) -> Iterator[None]:
+        """Reverts the changes of the open transaction while the block runs, unless it is the given one"""
+        open_transaction = self._transaction
+        if open_transaction is None or open_transaction is transaction or not open_transaction.log:
+            yield
+            return
+        self._dataset.store.undo(open_transaction.log)
+        try:
+            yield
+        finally:
+            self._dataset.store.redo(open_transaction.log)
+
+    def _check(self, transaction: RdflibTransaction) -> None:
+        if transaction is not self._transaction:
+            raise OldapError('Transaction conflict: the store has been changed by another connection')
+
+    def _abandon(self) -> None:
+        """Reverts the open transaction before a write outside of it (the transaction can't be committed)"""
+        if self._transaction is not None:
+            self._dataset.store.undo(self._transaction.log)
+            self._transaction = None
+            self._idle.notify_all()
+
+    def load(self, filename: str | Path, graphname: Optional[str] = None) -> None:
+        """
+        Loads a Turtle, TriG, N-Triples or N-Quads file (optionally gzipped, see ~RdfFile) with RDF-star support.
+
+        :param filename: The file
+        :type filename: str | Path
+        :param graphname: The graph for the triples of Turtle and N-Triples files (default: the default graph)
+        :type graphname: Optional[str]
+        :return: None
+        :raises OldapError: If the file cannot be parsed
+        """
+        with RdfFile(filename) as rdf:
+            data = b''.join(rdf.chunks(1 << 20)).decode('utf-8')
+            format = _RDFLIB_FORMATS[rdf.mime]
+        try:
+            parsed = parse_rdf_star(data, format, graphname)
+        except OldapError:
+            raise
+        except Exception as err:
+            raise OldapError(f'Loading "{filename}" failed: {err}')
+        with self._lock:
+            self._abandon()
+            self._dataset.addN((s, p, o, self._dataset.graph(g)) for s, p, o, g in parsed.quads((None, None, None, None)))
+            self._version += 1
+
+    def query(self, sparql: str, transaction: Optional[RdflibTransaction] = None) -> Result:
+        """
+        Executes a SPARQL query on the store (within the given transaction).
+
+        :param sparql: The SPARQL query
+        :type sparql: str
+        :param transaction: A transaction (see `begin()`) or None
+        :type transaction: Optional[RdflibTransaction]
+        :return: The rdflib result
+        :rtype: Result
+        :raises OldapError: If the query is invalid or the transaction has been reverted
+        """
+        sparql = rewrite_sparql(sparql)
+        with self._lock:
+            if transaction is not None:
+                self._check(transaction)
+            with self._visible(transaction):
+                try:
+                    result = self._dataset.query(sparql)
+                    if result.type == 'SELECT':
+                        result.bindings  # evaluate while holding the lock
+                except Exception as err:
+                    raise OldapError(f'SPARQL query failed: {err}')
+        return result
+
+    def update(self, sparql: str, transaction: Optional[RdflibTransaction] = None) -> None:
+        """
+        Executes a SPARQL update on the store (within the given transaction). An update outside of the open
+        transaction reverts it.
+
+        :param sparql: The SPARQL update
+        :type sparql: str
+        :param transaction: A transaction (see `begin()`) or None
+        :type transaction: Optional[RdflibTransaction]
+        :return: None
+        :raises OldapError: If the update is invalid or the transaction has been reverted
+        """
+        sparql = rewrite_sparql(sparql)
+        with self._lock:
+            if transaction is None:
+                self._abandon()
+            else:
+                self._check(transaction)
+                self._dataset.store.log = transaction.log
+            try:
+                self._dataset.update(sparql)
+            except Exception as err:
+                raise OldapError(f'Update query failed. Reason: "{err}"')
+            finally:
+                self._dataset.store.log = None
+            if transaction is None:
+                self._version += 1
+
+    def clear(self, graph: Optional[str] = None) -> None:
+        """
+        Removes all data, or the data of the given graph.
+
+        :param graph: The graph IRI or None
+        :type graph: Optional[str]
+        :return: None
+        """
+        with self._lock:
+            self._abandon()
+            if graph is None:
+                self._dataset = _new_dataset()
+            else:
+                self._dataset.remove_graph(URIRef(graph))
+            self._version += 1
+
+    def begin(self) -> RdflibTransaction:
+        """
+        Starts a transaction. If another transaction is open, it waits until that one is finished.
+
+        :return: The transaction
+        :rtype: RdflibTransaction
+        :raises OldapError: If the open transaction belongs to the same thread or is not finished in time
+        """
+        with self._lock:
+            if self._transaction is not None and self._transaction.owner == get_ident():
+                raise OldapError('Another transaction on the store is open in this thread')
+            if not self._idle.wait_for(lambda: self._transaction is None, timeout=_TRANSACTION_WAIT):
+                raise OldapError('Transaction conflict: another transaction on the store is still open')
+            self._transaction = RdflibTransaction()
+            return self._transaction
+
+    def commit(self, transaction: RdflibTransaction) -> None:
+        """
+        Commits a transaction: its changes are kept.
+
+        :param transaction: The transaction
+        :type transaction: RdflibTransaction
+        :return: None
+        :raises OldapError: If the transaction has been reverted by a write outside of it
+        """
+        with self._lock:
+            self._check(transaction)
+            self._transaction = None
+            self._version += 1
+            self._idle.notify_all()
+
+    def rollback(self, transaction: RdflibTransaction) -> None:
+        """
+        Aborts a transaction: its changes are reverted in reverse order.
+
+        :param transaction: The transaction
+        :type transaction: RdflibTransaction
+        :return: None
+        """
+        with self._lock:
+            if transaction is self._transaction:
+                self._abandon()
+
+
+class RdflibConnection(IConnection):
+    """
+    Connection to an in-process ~RdflibStore (see above). The login works as for ~Connection: with
+    userId/credentials (checked against the users in the store) or with a token.
+    """
+    _store: RdflibStore
+    _transaction: Optional[RdflibTransaction]
+    __jwtkey: str
+
+    def __init__(self,
+                 store: Optional[RdflibStore] = None, *,
+                 userId: Optional[str | Xsd_NCName] = None,
+                 credentials: Optional[str | Xsd_string] = None,
+                 token: Optional[str] = None,
+                 context_name: Optional[str] = DEFAULT_CONTEXT) -> None:
+        """
+        Constructor that logs in.
+
+        :param store: The store. If omitted, a new store with the ontologies and the test data is created
+            (see ~RdflibStore.with_ontologies).
+        :type store: Optional[RdflibStore]
+        :param userId: The user id. If userId and credentials are omitted, the user "unknown" is used
+        :type userId: Optional[str | Xsd_NCName]
+        :param credentials: The credentials
+        :type credentials: Optional[str | Xsd_string]
+        :param token: JWT token (see ~Connection). If given, userId and credentials are ignored
+        :type token: Optional[str]
+        :param context_name: A name of the Context to be used (see ~Context)
+        :type context_name: Optional[str]
+        :raises OldapError: Wrong credentials or token
+        :raises OldapErrorNotFound: The user does not exist
+        """
+        super().__init__(context_name=context_name)
+        self.__jwtkey = os.getenv("OLDAP_JWT_SECRET", "You have to change this!!! +D&RWG+")
+        self._store = store if store is not None else RdflibStore.with_ontologies()
+        self._transaction = None
+        if token is not None:
+            self._userdata = Connection._userdata_from_token(token, self.__jwtkey)
+            self._token = token
+            return
+        if userId is None and credentials is None:
+            userId = Xsd_NCName("unknown", validate=False)
+        if not isinstance(userId, Xsd_NCName):
+            userId = Xsd_NCName(userId)
+        context = Context(name=context_name)
+        for r in QueryProcessor(context=context, query_result=self._query(Connection._projects_sparql(context))):
+            context[r['sname']] = r['ns']
+        userdata = UserData.from_query(QueryProcessor(context=context,
+                                                      query_result=self._query(UserData.sparql_query(context=context,
+                                                                                                     userId=userId))))
+        Connection._check_credentials(userdata, userId, credentials)
+        self._userdata = userdata
+        self._token = Connection._issue_token(userdata, self.__jwtkey)
+        logging.getLogger(__name__).info(f'Rdflib connection established. User "{str(self._userdata.userId)}".')
+
+    @property
+    def store(self) -> RdflibStore:
+        return self._store
+
+    @property
+    def cache_scope(self) -> str:
+        """Scope of the cache, unique per store (see ~CacheKeyspace)"""
+        return self._store.scope
+
+    @property
+    def jwtkey(self) -> str:
+        return self.__jwtkey
+
+    def _query(self, sparql: str, format: SparqlResultFormat = SparqlResultFormat.JSON,
+               transaction: Optional[RdflibTransaction] = None) -> Any:
+        return _result(self._store.query(sparql, transaction), format)
+
+    def _check_root(self) -> None:
+        if not self._userdata:
+            raise OldapErrorNoPermission("No permission")
+        sysperms = self._userdata.inProject.get(Xsd_QName('oldap:SystemProject'))
+        if not sysperms or AdminPermission.ADMIN_OLDAP not in sysperms:
+            raise OldapErrorNoPermission("No permission")
+
+    def clear_graph(self, graph_iri: Xsd_QName) -> None:
+        """
+        Clears the given graph (requires the ADMIN_OLDAP permission).
+
+        :param graph_iri: RDF graph name as QName
+        :type graph_iri: Xsd_QName
+        :return: None
+        :raises OldapErrorNoPermission: If the user lacks the required permission
+        """
+        self._check_root()
+        context = Context(name=self._context_name)
+        self._store.clear(str(context.qname2iri(graph_iri)))
+
+    def clear_repo(self) -> None:
+        """
+        Removes all data from the store.
+
+        :return: None
+        """
+        self._store.clear()
+
+    def upload_turtle(self, filename: str, graphname: Optional[str] = None) -> None:
+        """
+        Loads a Turtle/TriG (or N-Triples/N-Quads) file into the store (see ~RdflibStore.load).
+
+        :param filename: The file
+        :type filename: str
+        :param graphname: The graph for the triples of Turtle files
+        :type graphname: Optional[str]
+        :return: None
+        """
+        self._store.load(filename, graphname)
+
+    def query(self, query: str, format: SparqlResultFormat = SparqlResultFormat.AUTO) -> Any:
+        """
+        Executes a SPARQL query. SELECT and ASK results are returned as SPARQL JSON (dict) for the
+        formats JSON, AUTO, TSV and BINARY, and as text for XML. CONSTRUCT and DESCRIBE results are serialized
+        in the requested RDF format.
+
+        :param query: SPARQL query
+        :type query: str
+        :param format: The format desired (see ~SparqlResultFormat)
+        :type format: SparqlResultFormat
+        :return: Query result
+        :rtype: Any
+        :raises OldapError: If not logged in or if the query fails
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        return self._query(query, format)
+
+    def update_query(self, query: str) -> Dict[str, str]:
+        """
+        Executes a SPARQL update.
+
+        :param query: SPARQL update
+        :type query: str
+        :return: None
+        :raises OldapError: If not logged in or if the update fails
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        self._store.update(query)
+
+    def transaction_start(self) -> None:
+        """
+        Starts a transaction (see ~RdflibStore.begin).
+
+        :return: None
+        :raises OldapError: If not logged in or the store has another open transaction
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        self._transaction = self._store.begin()
+        self._transaction_url = f'rdflib:transaction:{id(self._transaction)}'
+
+    def transaction_query(self, query: str, result_format: SparqlResultFormat = SparqlResultFormat.AUTO) -> Any:
+        """
+        Executes a SPARQL query within the transaction (it sees the changes of the transaction).
+
+        :param query: SPARQL query
+        :type query: str
+        :param result_format: The format desired (see `query()`)
+        :type result_format: SparqlResultFormat
+        :return: Query result
+        :rtype: Any
+        :raises OldapError: If not logged in, no transaction is started or the query fails
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        if self._transaction is None:
+            raise OldapError("No transaction started")
+        return self._query(query, result_format, self._transaction)
+
+    def transaction_update(self, query: str) -> None:
+        """
+        Executes a SPARQL update within the transaction.
+
+        :param query: SPARQL update
+        :type query: str
+        :return: None
+        :raises OldapError: If not logged in, no transaction is started or the update fails
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        if self._transaction is None:
+            raise OldapError("No transaction started")
+        try:
+            self._store.update(query, self._transaction)
+        except OldapError as err:
+            raise OldapError(f'Transaction update failed. Reason: "{err}"')
+
+    def transaction_commit(self) -> None:
+        """
+        Commits the transaction: its changes are kept.
+
+        :return: None
+        :raises OldapError: If not logged in, no transaction is started, or the transaction has been reverted by a
+            write outside of it
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        if self._transaction is None:
+            raise OldapError("No transaction started")
+        transaction, self._transaction = self._transaction, None
+        self._transaction_url = None
+        self._store.commit(transaction)
+
+    def transaction_abort(self) -> None:
+        """
+        Aborts the transaction: its changes are reverted.
+
+        :return: None
+        :raises OldapError: If not logged in or no transaction is started
+        """
+        if not self._userdata:
+            raise OldapError("No login")
+        if self._transaction is None:
+            raise OldapError("No transaction started")
+        transaction, self._transaction = self._transaction, None
+        self._transaction_url = None
+        self._store.rollback(transaction)
+
+    def in_transaction(self) -> bool:
+        """
+        :return: True if a transaction is started
+        :rtype: bool
+        """
+        return self._transaction is not None
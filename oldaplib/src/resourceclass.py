@@ -1,4 +1,5 @@
 import logging
+import time
 from copy import deepcopy
 from dataclasses import dataclass
 from datetime import datetime
@@ -6,7 +7,9 @@ from functools import partial
 from pprint import pprint
 from typing import Union, List, Dict, Callable, Self, Any, TypeVar
 
-from oldaplib.src.cachesingleton import CacheSingletonRedis
+from oldaplib.src.cachesingleton import CacheSingletonRedis, NOT_FOUND
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, REDIS
+from oldaplib.src.helpers.cache_policy import CacheFamily
 from oldaplib.src.enums.adminpermissions import AdminPermission
 from oldaplib.src.enums.attributeclass import AttributeClass
 from oldaplib.src.enums.haspropertyattr import HasPropertyAttr
@@ -38,6 +41,7 @@ from oldaplib.src.helpers.context import Context
 from oldaplib.src.iconnection import IConnection
 from oldaplib.src.model import Model
 from oldaplib.src.helpers.attributechange import AttributeChange
+from oldaplib.src.helpers.single_flight import SingleFlight
 from oldaplib.src.propertyclass import PropertyClass, Attributes, HasPropertyData, PropTypes
 from oldaplib.src.xsd.xsd_nonnegativeinteger import Xsd_nonNegativeInteger
 from oldaplib.src.xsd.xsd_qname import Xsd_QName
@@ -1089,12 +1093,23 @@ class ResourceClass(Model, Notify):
         if not isinstance(owl_class_iri, Xsd_QName):
             owl_class_iri = Xsd_QName(owl_class_iri, validate=True)
 
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(con)
         if not ignore_cache:
-            tmp = cache.get(owl_class_iri, connection=con)
+            def lookup() -> Self | None:
+                tmp = cache.get(owl_class_iri, connection=con, family=CacheFamily.CLASS, negative=True)
+                if tmp is NOT_FOUND:
+                    raise OldapErrorNotFound(f'Resource with iri "{owl_class_iri}" does not exist."')
+                if tmp is not None:
+                    tmp.update_notifier()
+                return tmp
+
+            tmp = lookup()
             if tmp is not None:
-                tmp.update_notifier()
                 return tmp
+            return SingleFlight().run(owl_class_iri, lookup,
+                                      lambda: cls.read(con, project, owl_class_iri, sa_props, ignore_cache=True),
+                                      cache)
+        started = time.perf_counter() if CacheMetrics().enabled else None
 
         hasproperties: list[HasProperty | Xsd_QName] = ResourceClass.__query_resource_props(con=con,
                                                                                       project=project,
@@ -1102,7 +1117,11 @@ class ResourceClass(Model, Notify):
                                                                                       sa_props=sa_props)
         resclass = cls(con=con, project=project, owlclass_iri=owl_class_iri, hasproperties=hasproperties)
         resclass.update_notifier()
-        attributes = ResourceClass.__query_shacl(con, project=project, owl_class_iri=owl_class_iri)
+        try:
+            attributes = ResourceClass.__query_shacl(con, project=project, owl_class_iri=owl_class_iri)
+        except OldapErrorNotFound:
+            cache.set_not_found(owl_class_iri)
+            raise
         resclass._parse_shacl(attributes=attributes)
         if not resclass.externalOntology:
             resclass.__read_owl()
@@ -1111,8 +1130,9 @@ class ResourceClass(Model, Notify):
 
         resclass.update_notifier()
 
-        cache = CacheSingletonRedis()
         cache.set(resclass._owlclass_iri, resclass)
+        if started is not None:
+            CacheMetrics().record(REDIS, CacheFamily.CLASS, 'fill', time.perf_counter() - started)
         return resclass
 
     def read_modtime_shacl(self, *,
@@ -1322,7 +1342,7 @@ class ResourceClass(Model, Notify):
         else:
             self._con.transaction_commit()
         self.clear_changeset()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self._owlclass_iri, self)
 
     def write_as_trig(self, filename: str, indent: int = 0, indent_inc: int = 4) -> None:
@@ -1923,7 +1943,7 @@ class ResourceClass(Model, Notify):
         self._modified = timestamp
         self._contributor = self._con.userIri
         self._test_in_use = False
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self._owlclass_iri, self)
 
 
@@ -2032,7 +2052,7 @@ class ResourceClass(Model, Notify):
             raise OldapErrorUpdateFailed(f'Could not delete "{self._owlclass_iri}".')
         else:
             self._con.transaction_commit()
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self._owlclass_iri)
 
 
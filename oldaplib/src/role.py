@@ -11,6 +11,8 @@ from datetime import datetime
 from functools import partial
 
 from oldaplib.src.cachesingleton import CacheSingletonRedis
+from oldaplib.src.helpers.login_cache import LoginCache
+from oldaplib.src.helpers.session_store import SessionStore
 from oldaplib.src.connection import Connection
 from oldaplib.src.enums.roleattr import RoleAttr
 from oldaplib.src.enums.adminpermissions import AdminPermission
@@ -281,7 +283,7 @@ class Role(Model):
         self._creator = self._con.userIri
         self._modified = timestamp
         self._contributor = self._con.userIri
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self.__role_iri, self)
 
     @classmethod
@@ -329,7 +331,7 @@ class Role(Model):
         else:
             raise OldapErrorValue('Either the parameter "iri" of both "roleId" and "definedByProject" must be provided.')
         if not ignore_cache:
-            cache = CacheSingletonRedis()
+            cache = CacheSingletonRedis(con)
             tmp = cache.get(role_iri, connection=con)
             if tmp is not None:
                 tmp.update_notifier()
@@ -395,7 +397,7 @@ class Role(Model):
                        label=label,
                        comment=comment,
                        definedByProject=Iri(_definedByProject, validate=False))
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(con)
         cache.set(instance.__role_iri, instance)
         return instance
 
@@ -555,8 +557,10 @@ class Role(Model):
             raise
         self._modified = timestamp
         self._contributor = self._con.userIri  # TODO: move creator, created etc. to Model!
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self.__role_iri, self)
+        LoginCache().invalidate_users()
+        SessionStore().bump()
 
 
     def in_use_queries(self) -> (str, str):
@@ -680,6 +684,8 @@ class Role(Model):
         except OldapError:
             self._con.transaction_abort()
             raise
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.__role_iri)
+        LoginCache().invalidate_users()
+        SessionStore().bump()
 
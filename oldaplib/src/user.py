@@ -141,6 +141,7 @@ user3.delete()
 ```
 """
 import textwrap
+import time
 from copy import deepcopy
 from enum import Enum
 from functools import partial
@@ -149,7 +150,12 @@ from typing import List, Self, Optional, Any, Tuple
 
 import bcrypt
 
-from oldaplib.src.cachesingleton import CacheSingleton, CacheSingletonRedis
+from oldaplib.src.cachesingleton import CacheSingleton, CacheSingletonRedis, NOT_FOUND
+from oldaplib.src.helpers.cache_namespace import CacheKey, ADMIN_NAMESPACE
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, REDIS
+from oldaplib.src.helpers.cache_policy import CacheFamily
+from oldaplib.src.helpers.login_cache import LoginCache
+from oldaplib.src.helpers.session_store import SessionStore
 from oldaplib.src.enums.action import Action
 from oldaplib.src.enums.datapermissions import DataPermission
 from oldaplib.src.enums.userattr import UserAttr
@@ -175,6 +181,11 @@ from oldaplib.src.model import Model
 from oldaplib.src.helpers.attributechange import AttributeChange
 
 
+def _userid_key(userId: Xsd_NCName) -> CacheKey:
+    # users are cached by IRI only; this key holds the not-found marker of a lookup by user ID
+    return CacheKey(ADMIN_NAMESPACE, f'userid:{userId}')
+
+
 @serializer
 class User(Model):
     """
@@ -583,8 +594,9 @@ class User(Model):
         self._created = timestamp
         self._contributor = self._con.userIri
         self._modified = timestamp
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self.userIri, self)
+        cache.delete(_userid_key(self.userId))
 
 
     @classmethod
@@ -618,17 +630,21 @@ class User(Model):
         if not isinstance(userId, IriOrNCName):
             userId = IriOrNCName(userId, validate=True)
         user_id, user_iri = userId.value()
-        if user_iri is not None:
-            if not ignore_cache:
-                cache = CacheSingletonRedis()
-                tmp = cache.get(user_iri, connection=con)
-                if tmp is not None:
-                    return tmp
+        cache = CacheSingletonRedis(con)
+        key = user_iri if user_iri is not None else _userid_key(user_id)
+        if not ignore_cache:
+            tmp = cache.get(key, connection=con, family=CacheFamily.USER, negative=True)
+            if tmp is NOT_FOUND:
+                raise OldapErrorNotFound(f'User "{userId}" not found.')
+            if tmp is not None:
+                return tmp
+        started = time.perf_counter() if CacheMetrics().enabled else None
 
         context = Context(name=con.context_name)
         jsonobj = con.query(UserData.sparql_query(context, userId))
         res = QueryProcessor(context, jsonobj)
         if len(res) == 0:
+            cache.set_not_found(key)
             raise OldapErrorNotFound(f'User "{userId}" not found.')
         userdata = UserData.from_query(res)
         if userdata.inProject:
@@ -647,9 +663,10 @@ class User(Model):
                        isActive=userdata.isActive,
                        inProject=userdata.inProject,
                        hasRole=userdata.hasRole)
-        cache = CacheSingletonRedis()
         cache.set(instance.userIri, instance)
         instance.clear_changeset()
+        if started is not None:
+            CacheMetrics().record(REDIS, CacheFamily.USER, 'fill', time.perf_counter() - started)
         return instance
 
     @staticmethod
@@ -767,8 +784,10 @@ class User(Model):
         """
         # TODO: use transaction for error handling
         self._con.update_query(sparql)
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.delete(self.userIri)
+        LoginCache().invalidate_user(userIri=self.userIri, userId=self.userId)
+        SessionStore().bump(self.userIri)
 
 
     def update(self, indent: int = 0, indent_inc: int = 4) -> None:
@@ -1133,6 +1152,9 @@ class User(Model):
             raise
         self._modified = timestamp
         self._contributor = self._con.userIri
-        cache = CacheSingletonRedis()
+        cache = CacheSingletonRedis(self._con)
         cache.set(self.userIri, self)
+        cache.delete(_userid_key(self.userId))  # the user ID may have been renamed to an ID cached as not found
+        LoginCache().invalidate_user(userIri=self.userIri, userId=self.userId)
+        SessionStore().bump(self.userIri)
 
@@ -168,6 +168,19 @@ class UserData:
     def hasRole(self) -> Dict[Xsd_QName, Xsd_QName | None] | None:
         return self._hasRole
 
+    def freeze(self) -> Self:
+        """
+        Makes the permissions (inProject and hasRole) read-only, so that the UserData can be shared by
+        several connections (see ~TokenCache). Changing them raises OldapErrorImmutable.
+
+        :return: The UserData itself
+        :rtype: UserData
+        """
+        self._inProject.freeze()
+        if self._hasRole is not None:
+            self._hasRole.freeze()
+        return self
+
     @staticmethod
     def sparql_query(context: Context, userId: IriOrNCName, validate: bool = False) -> str:
         """
@@ -0,0 +1,416 @@
+"""
+A minimal, local stand-in for the SPARQL endpoints of GraphDB (RDF4J protocol).
+
+The stand-in runs a threaded HTTP/1.1 server on localhost and answers the requests issued by `Connection`:
+queries, updates and the RDF4J transaction protocol. It does not evaluate SPARQL. Queries are answered by
+registered responders, and the login queries of `Connection` are answered from the users added with `add_user()`.
+SELECT results are returned in the format negotiated by the Accept header (SPARQL JSON, TSV or the RDF4J
+binary results table).
+Uploads may use chunked transfer encoding and gzip content encoding.
+It records every request and counts the TCP connections it accepted. This makes it useful for testing the
+HTTP layer and for benchmarking round trips without a triple store.
+"""
+import gzip
+import json
+import re
+import struct
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Any
+from urllib.parse import parse_qs, urlsplit
+
+import bcrypt
+
+EMPTY_RESULT = {'head': {'vars': []}, 'results': {'bindings': []}}
+
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+JSON = 'application/sparql-results+json'
+TSV = 'text/tab-separated-values'
+BINARY = 'application/x-binary-rdf-results-table'
+OLDAP = 'http://oldap.org/base#'
+
+
+@dataclass
+class StandInRequest:
+    method: str
+    path: str
+    action: str  # 'QUERY', 'UPDATE', 'BEGIN', 'COMMIT', 'ROLLBACK', 'UPLOAD', 'OTHER'
+    body: str
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class SparqlStandIn:
+    """
+    Local SPARQL endpoint stand-in. Use it as context manager:
+
+        with SparqlStandIn() as standin:
+            standin.add_user('rosenth', 'RioGrande')
+            con = Connection(server=standin.server, repo=standin.repo, userId='rosenth', credentials='RioGrande')
+    """
+
+    def __init__(self, repo: str = 'oldap', delay: float = 0.0):
+        self.repo = repo
+        self.delay = delay
+        self.requests: list[StandInRequest] = []
+        self.connections = 0
+        self.transactions: dict[str, list[str]] = {}
+        self.committed: list[str] = []
+        self.responders: list[tuple[re.Pattern, Callable[[str], Any]]] = []
+        self.fail_updates: re.Pattern | None = None
+        self.fail_uploads: re.Pattern | None = None
+        self.query_status: int | None = None
+        self.uploads: list[bytes] = []
+        self.record_uploads = True
+        self._users: dict[str, list[dict]] = {}
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def server(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self) -> 'SparqlStandIn':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with standin._lock:
+                    standin.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                standin._handle(self, 'POST')
+
+            def do_PUT(self):
+                standin._handle(self, 'PUT')
+
+            def do_DELETE(self):
+                standin._handle(self, 'DELETE')
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = []
+            self.connections = 0
+            self.uploads = []
+            self.committed = []
+
+    def count(self, action: str | None = None) -> int:
+        with self._lock:
+            return len([r for r in self.requests if action is None or r.action == action])
+
+    def respond(self, pattern: str, responder: Callable[[str], Any] | Any) -> None:
+        """
+        Registers a responder for queries matching the given regular expression. The responder is either
+        a callable that gets the query string, or a constant result (dict for JSON, str/bytes for other formats).
+        """
+        func = responder if callable(responder) else (lambda q, r=responder: r)
+        self.responders.insert(0, (re.compile(pattern, re.S), func))
+
+    def add_user(self, userId: str, password: str, *,
+                 userIri: str | None = None,
+                 isActive: bool = True,
+                 permissions: dict[str, list[str]] | None = None) -> str:
+        """
+        Adds a user that can log in. Permissions map a project IRI to a list of admin permission names
+        (e.g. {'http://oldap.org/base#SystemProject': ['ADMIN_OLDAP']}).
+        """
+        userIri = userIri or f'urn:uuid:{uuid.uuid4()}'
+        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=4)).decode('utf-8')
+
+        def lit(value: str, dt: str) -> dict:
+            return {'type': 'literal', 'value': value, 'datatype': XSD + dt}
+
+        user = {'type': 'uri', 'value': userIri}
+        rows = [
+            {'user': user, 'prop': {'type': 'uri', 'value': 'http://purl.org/dc/terms/creator'}, 'val': user},
+            {'user': user, 'prop': {'type': 'uri', 'value': 'http://purl.org/dc/terms/created'},
+             'val': lit('2023-11-04T12:00:00+00:00', 'dateTime')},
+            {'user': user, 'prop': {'type': 'uri', 'value': 'http://purl.org/dc/terms/contributor'}, 'val': user},
+            {'user': user, 'prop': {'type': 'uri', 'value': 'http://purl.org/dc/terms/modified'},
+             'val': lit('2023-11-04T12:00:00+00:00', 'dateTime')},
+            {'user': user, 'prop': {'type': 'uri', 'value': OLDAP + 'userId'}, 'val': lit(userId, 'NCName')},
+            {'user': user, 'prop': {'type': 'uri', 'value': 'http://schema.org/familyName'}, 'val': lit('Doe', 'string')},
+            {'user': user, 'prop': {'type': 'uri', 'value': 'http://schema.org/givenName'}, 'val': lit('Jane', 'string')},
+            {'user': user, 'prop': {'type': 'uri', 'value': 'http://schema.org/email'},
+             'val': lit(f'{userId}@example.org', 'string')},
+            {'user': user, 'prop': {'type': 'uri', 'value': OLDAP + 'credentials'}, 'val': lit(hashed, 'string')},
+            {'user': user, 'prop': {'type': 'uri', 'value': OLDAP + 'isActive'},
+             'val': lit('true' if isActive else 'false', 'boolean')},
+        ]
+        for proj, perms in (permissions or {}).items():
+            rows.append({'user': user, 'prop': {'type': 'uri', 'value': OLDAP + 'inProject'},
+                         'val': {'type': 'uri', 'value': proj}})
+            for perm in perms:
+                rows.append({'user': user, 'proj': {'type': 'uri', 'value': proj},
+                             'rval': {'type': 'uri', 'value': OLDAP + perm}})
+        self._users[userId] = rows
+        return userIri
+
+    def _answer_query(self, query: str) -> Any:
+        for pattern, func in self.responders:
+            if pattern.search(query):
+                return func(query)
+        if 'oldap:projectShortName ?sname' in query:
+            return {'head': {'vars': ['sname', 'ns']}, 'results': {'bindings': []}}
+        m = re.search(r'oldap:userId\s+"([^"]+)"', query)
+        if m and '?defdp' in query:
+            return {'head': {'vars': ['user', 'prop', 'val', 'proj', 'rval', 'role', 'defdp']},
+                    'results': {'bindings': self._users.get(m.group(1), [])}}
+        m = re.search(r'BIND\(<([^>]+)> as \?user\)', query)
+        if m and '?defdp' in query:
+            rows = next((rows for rows in self._users.values() if rows[0]['user']['value'] == m.group(1)), [])
+            return {'head': {'vars': ['user', 'prop', 'val', 'proj', 'rval', 'role', 'defdp']},
+                    'results': {'bindings': rows}}
+        if re.search(r'^\s*ASK\b', query, re.M | re.I):
+            return {'head': {}, 'boolean': False}
+        return EMPTY_RESULT
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        url = urlsplit(handler.path)
+        if handler.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            parts = []
+            while size := int(handler.rfile.readline().split(b';')[0], 16):
+                parts.append(handler.rfile.read(size))
+                handler.rfile.readline()
+            handler.rfile.readline()
+            raw = b''.join(parts)
+        else:
+            length = int(handler.headers.get('Content-Length') or 0)
+            raw = handler.rfile.read(length) if length else b''
+        if handler.headers.get('Content-Encoding', '').lower() == 'gzip':
+            raw = gzip.decompress(raw)
+        ctype = handler.headers.get('Content-Type', '')
+        form = {}
+        if ctype.startswith('application/x-www-form-urlencoded'):
+            form = {k: v[0] for k, v in parse_qs(raw.decode('utf-8')).items()}
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip('/').split('/')
+        status, headers, payload = 404, {}, b''
+        action = 'OTHER'
+        body = raw.decode('utf-8', errors='replace')
+
+        if parts[:2] == ['repositories', self.repo]:
+            if len(parts) == 2 and method == 'POST':
+                action = 'QUERY'
+                body = form.get('query', body)
+                if self.query_status is not None:
+                    status = self.query_status
+                else:
+                    status, headers, payload = self._result(self._answer_query(body),
+                                                            handler.headers.get('Accept', ''))
+            elif len(parts) == 3 and parts[2] == 'statements':
+                if 'update' in form or ctype.startswith('application/sparql-update'):
+                    action = 'UPDATE'
+                    body = form.get('update', body)
+                    status, payload = self._update(body)
+                else:
+                    action = 'UPLOAD'
+                    status = 204
+                    if self.fail_uploads is not None and self.fail_uploads.search(body):
+                        status = 400
+                    elif self.record_uploads:
+                        with self._lock:
+                            self.uploads.append(raw)
+                    body = ''
+            elif len(parts) == 3 and parts[2] == 'transactions' and method == 'POST':
+                action = 'BEGIN'
+                txid = str(uuid.uuid4())
+                with self._lock:
+                    self.transactions[txid] = []
+                status = 201
+                headers = {'Location': f'{self.server}/repositories/{self.repo}/transactions/{txid}'}
+            elif len(parts) == 4 and parts[2] == 'transactions':
+                txid = parts[3]
+                if txid not in self.transactions:
+                    status, payload = 404, b'Unknown transaction'
+                elif method == 'DELETE':
+                    action = 'ROLLBACK'
+                    with self._lock:
+                        self.transactions.pop(txid, None)
+                    status = 204
+                elif params.get('action') == 'COMMIT':
+                    action = 'COMMIT'
+                    with self._lock:
+                        self.committed.extend(self.transactions.pop(txid))
+                    status = 200
+                elif form.get('action') == 'QUERY':
+                    action = 'QUERY'
+                    body = form.get('query', '')
+                    status, headers, payload = self._result(self._answer_query(body),
+                                                            handler.headers.get('Accept', ''))
+                elif form.get('action') == 'UPDATE':
+                    action = 'UPDATE'
+                    body = form.get('update', '')
+                    status, payload = self._update(body)
+                    if status < 300:
+                        with self._lock:
+                            self.transactions[txid].append(body)
+        with self._lock:
+            self.requests.append(StandInRequest(method=method, path=url.path, action=action, body=body,
+                                                headers=dict(handler.headers)))
+        if status >= 400 and not payload:
+            payload = b'Bad request'
+        handler.send_response(status)
+        for key, val in headers.items():
+            handler.send_header(key, val)
+        handler.send_header('Content-Length', str(len(payload)))
+        handler.end_headers()
+        if payload:
+            handler.wfile.write(payload)
+
+    def _update(self, update: str) -> tuple[int, bytes]:
+        if self.fail_updates is not None:
+            match = self.fail_updates.search(update)
+            if match:  # like GraphDB, report the line of the error
+                line = update.count('\n', 0, match.start()) + 1
+                return 400, f'MALFORMED QUERY: Encountered "{match.group()}" at line {line}, column 1.'.encode('utf-8')
+        return 204, b''
+
+    @staticmethod
+    def _result(result: Any, accept: str) -> tuple[int, dict[str, str], bytes]:
+        if isinstance(result, tuple):  # (content-type, payload)
+            ctype, payload = result
+            return 200, {'Content-Type': ctype}, payload if isinstance(payload, bytes) else payload.encode('utf-8')
+        if isinstance(result, (str, bytes)):
+            payload = result if isinstance(result, bytes) else result.encode('utf-8')
+            return 200, {'Content-Type': 'text/plain'}, payload
+        if 'results' in result:
+            mime = negotiate(accept)
+            if mime == TSV:
+                return 200, {'Content-Type': TSV}, encode_tsv(result)
+            if mime == BINARY:
+                return 200, {'Content-Type': BINARY}, encode_binary(result)
+        return 200, {'Content-Type': 'application/sparql-results+json'}, json.dumps(result).encode('utf-8')
+
+
+def negotiate(accept: str) -> str:
+    """Returns the result format for a SELECT query (JSON, TSV or BINARY) with the highest quality in the Accept header"""
+    best, best_q = JSON, -1.0
+    for part in accept.split(','):
+        mime, *params = [p.strip() for p in part.split(';')]
+        q = 1.0
+        for param in params:
+            if param.startswith('q='):
+                q = float(param[2:])
+        if mime in (TSV, BINARY, JSON, 'application/x-sparqlstar-results+json', '*/*') and q > best_q:
+            best, best_q = (JSON if mime in ('*/*', 'application/x-sparqlstar-results+json') else mime), q
+    return best
+
+
+def _ntriples(term: dict) -> str:
+    if term['type'] == 'uri':
+        return f'<{term["value"]}>'
+    if term['type'] == 'bnode':
+        return f'_:{term["value"]}'
+    label = term['value'].replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') \
+        .replace('\r', '\\r').replace('\t', '\\t')
+    if 'xml:lang' in term:
+        return f'"{label}"@{term["xml:lang"]}'
+    if 'datatype' in term:
+        if term['datatype'] == XSD + 'integer':
+            return term['value']
+        return f'"{label}"^^<{term["datatype"]}>'
+    return f'"{label}"'
+
+
+def encode_tsv(result: dict) -> bytes:
+    """Encodes a SPARQL JSON SELECT result as SPARQL 1.1 TSV"""
+    names = result['head']['vars']
+    lines = ['\t'.join(f'?{n}' for n in names)]
+    for binding in result['results']['bindings']:
+        lines.append('\t'.join(_ntriples(binding[n]) if n in binding else '' for n in names))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def encode_binary(result: dict) -> bytes:
+    """Encodes a SPARQL JSON SELECT result in the RDF4J binary query results format (version 3)"""
+    out = bytearray(b'BRTR')
+    namespaces: dict[str, int] = {}
+
+    def string(value: str) -> None:
+        data = value.encode('utf-8')
+        out.extend(struct.pack('>i', len(data)))
+        out.extend(data)
+
+    def qname(iri: str) -> tuple[int, str]:
+        split = max(iri.rfind('#'), iri.rfind('/'), iri.rfind(':')) + 1
+        ns, local = iri[:split], iri[split:]
+        if ns not in namespaces:
+            namespaces[ns] = len(namespaces)
+            out.append(2)  # NAMESPACE_RECORD_MARKER
+            out.extend(struct.pack('>i', namespaces[ns]))
+            string(ns)
+        return namespaces[ns], local
+
+    out.extend(struct.pack('>i', 3))
+    names = result['head']['vars']
+    out.extend(struct.pack('>i', len(names)))
+    for name in names:
+        string(name)
+    previous: list[dict | None] = [None] * len(names)
+    for binding in result['results']['bindings']:
+        if not binding:
+            out.append(9)  # EMPTY_ROW_RECORD_MARKER
+            previous = [None] * len(names)
+            continue
+        for i, name in enumerate(names):
+            term = binding.get(name)
+            if term is None:
+                out.append(0)  # NULL_RECORD_MARKER
+            elif term == previous[i]:
+                out.append(1)  # REPEAT_RECORD_MARKER
+            elif term['type'] == 'uri':
+                nsid, local = qname(term['value'])
+                out.append(3)  # QNAME_RECORD_MARKER
+                out.extend(struct.pack('>i', nsid))
+                string(local)
+            elif term['type'] == 'bnode':
+                out.append(5)  # BNODE_RECORD_MARKER
+                string(term['value'])
+            elif 'xml:lang' in term:
+                out.append(7)  # LANG_LITERAL_RECORD_MARKER
+                string(term['value'])
+                string(term['xml:lang'])
+            elif 'datatype' in term:
+                nsid, local = qname(term['datatype'])
+                out.append(8)  # DATATYPE_LITERAL_RECORD_MARKER
+                string(term['value'])
+                out.extend(struct.pack('>i', nsid))
+                string(local)
+            else:
+                out.append(6)  # PLAIN_LITERAL_RECORD_MARKER
+                string(term['value'])
+        previous = [binding.get(name) for name in names]
+    out.append(127)  # TABLE_END_RECORD_MARKER
+    return bytes(out)
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import re
+import time
+import unittest
+from unittest import mock
+
+import jwt
+
+from oldaplib.src.asyncconnection import AsyncConnection, close_clients
+from oldaplib.src.connection import Connection
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorNotFound, OldapErrorNoPermission
+from oldaplib.src.helpers.query_processor import QueryProcessor
+from oldaplib.src.helpers.session_store import SessionStore
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.iconnection import IConnection
+from oldaplib.src.xsd.xsd_integer import Xsd_integer
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+class TestAsyncConnection(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande', userIri='https://orcid.org/0000-0003-1681-4036',
+                              permissions={'http://oldap.org/base#SystemProject': ['ADMIN_OLDAP']})
+        cls._standin.add_user('bugsbunny', 'DuffyDuck', isActive=False)
+        cls._standin.add_user('unknown', '')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._standin.stop()
+
+    def setUp(self):
+        self._standin.reset()
+        self._standin.delay = 0.0
+        self._standin.responders.clear()
+
+    async def asyncTearDown(self):
+        await close_clients()
+
+    async def connect(self, **kwargs) -> AsyncConnection:
+        return await AsyncConnection.create(server=self._standin.server, repo=self._standin.repo,
+                                            context_name="DEFAULT", **kwargs)
+
+    async def test_basic_connection(self):
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        self.assertIsInstance(con, IConnection)
+        self.assertEqual(con.server, self._standin.server)
+        self.assertEqual(con.repo, 'oldap')
+        self.assertEqual(con.context_name, 'DEFAULT')
+        self.assertEqual(con.userid, Xsd_NCName("rosenth"))
+
+    async def test_basic_connection_wrong_credentials(self):
+        with self.assertRaises(OldapError) as ex:
+            await self.connect(userId="rosenth", credentials="XXX")
+        self.assertEqual(str(ex.exception), "Wrong credentials")
+
+    async def test_basic_connection_no_user(self):
+        con = await self.connect()
+        payload = jwt.decode(jwt=con.token, key=con.jwtkey, algorithms="HS256")
+        self.assertEqual(payload['iss'], 'http://oldap.org')
+
+    async def test_basic_connection_unknown_user(self):
+        with self.assertRaises(OldapErrorNotFound):
+            await self.connect(userId="XXX", credentials="RioGrande")
+
+    async def test_inactive_user(self):
+        with self.assertRaises(OldapError) as ex:
+            await self.connect(userId="bugsbunny", credentials="DuffyDuck")
+        self.assertEqual(str(ex.exception), "Wrong credentials")
+
+    async def test_basic_connection_injection_userid(self):
+        with self.assertRaises(OldapError) as ex:
+            await self.connect(userId="rosenth \". #\n; SELECT * {?s ?p ?o}", credentials="RioGrande")
+        self.assertEqual(str(ex.exception), 'Invalid string "rosenth ". #\n; SELECT * {?s ?p ?o}" for NCName')
+
+    async def test_token(self):
+        os.environ["OLDAP_JWT_SECRET"] = "This is a very special secret, yeah!"
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        con2 = await self.connect(token=con.token)
+        self.assertEqual(con2.userid, Xsd_NCName("rosenth"))
+        self.assertEqual(str(con2.userIri), "https://orcid.org/0000-0003-1681-4036")
+        with self.assertRaises(OldapError) as ex:
+            await self.connect(token=con.token + "X")
+        self.assertEqual(str(ex.exception), "Wrong credentials")
+
+    async def test_compact_token_after_bump(self):
+        con = Connection(server=self._standin.server, repo=self._standin.repo, userId="rosenth",
+                         credentials="RioGrande", context_name="DEFAULT", compact_token=True)
+        SessionStore().bump(con.userdata.userIri)
+        self._standin.reset()
+        con2 = await self.connect(token=con.token)
+        self.assertEqual(con2.userid, Xsd_NCName("rosenth"))
+        self.assertGreaterEqual(self._standin.count('QUERY'), 1)  # the UserData has been read again
+
+    async def test_query(self):
+        self._standin.respond(r'\?s \?p \?o', {
+            'head': {'vars': ['s', 'o']},
+            'results': {'bindings': [
+                {'s': {'type': 'uri', 'value': 'http://oldap.org/base#User'},
+                 'o': {'type': 'literal', 'value': 'user', 'xml:lang': 'en'}}
+            ]}})
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        jsonobj = await con.query("SELECT ?s ?o WHERE { ?s ?p ?o }")
+        res = QueryProcessor(Context(name="DEFAULT"), jsonobj)
+        self.assertEqual(len(res), 1)
+        self.assertEqual(res[0]['s'], Xsd_QName('oldap:User'))
+
+        self._standin.respond(r'CONSTRUCT', ('text/turtle', '<urn:a> <urn:b> <urn:c> .'))
+        ttl = await con.query("CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }", SparqlResultFormat.TURTLE)
+        self.assertEqual(ttl, '<urn:a> <urn:b> <urn:c> .')
+
+    async def test_query_stream(self):
+        self._standin.respond(r'SELECT \?n WHERE', {
+            'head': {'vars': ['n']},
+            'results': {'bindings': [
+                {'n': {'type': 'literal', 'value': str(i), 'datatype': 'http://www.w3.org/2001/XMLSchema#integer'}}
+                for i in range(500)]}})
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        rows = [r async for r in await con.query_stream("SELECT ?n WHERE { ?s ?p ?n }", Context(name="DEFAULT"))]
+        self.assertEqual(len(rows), 500)
+        self.assertEqual(rows[499]['n'], Xsd_integer(499))
+
+    async def test_query_no_login(self):
+        con = AsyncConnection(server=self._standin.server, repo=self._standin.repo)
+        with self.assertRaises(OldapError):
+            await con.query("SELECT ?s WHERE { ?s ?p ?o }")
+
+    async def test_update_query(self):
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        await con.update_query("INSERT DATA { <urn:a> <urn:b> <urn:c> }")
+        self.assertEqual(self._standin.count('UPDATE'), 1)
+        self._standin.fail_updates = re.compile('urn:fail')
+        try:
+            with self.assertRaises(OldapError):
+                await con.update_query("INSERT DATA { <urn:fail> <urn:b> <urn:c> }")
+        finally:
+            self._standin.fail_updates = None
+
+    async def test_transaction(self):
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        self._standin.committed.clear()
+        await con.transaction_start()
+        self.assertTrue(con.in_transaction())
+        await con.transaction_update("INSERT DATA { <urn:a> <urn:b> <urn:c> }")
+        res = await con.transaction_query("ASK { <urn:a> <urn:b> <urn:c> }")
+        self.assertIn('boolean', res)
+        await con.transaction_commit()
+        self.assertFalse(con.in_transaction())
+        self.assertEqual(self._standin.committed, ["INSERT DATA { <urn:a> <urn:b> <urn:c> }"])
+
+        await con.transaction_start()
+        await con.transaction_update("INSERT DATA { <urn:x> <urn:y> <urn:z> }")
+        await con.transaction_abort()
+        self.assertFalse(con.in_transaction())
+        self.assertEqual(len(self._standin.committed), 1)
+        with self.assertRaises(OldapError):
+            await con.transaction_commit()
+
+    async def test_graph_exists(self):
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        self.assertFalse(await con.graph_exists(Xsd_QName("oldap:admin")))
+
+    async def test_clear_graph_permission(self):
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        await con.clear_graph(Xsd_QName("oldap:admin"))
+        self.assertEqual(self._standin.count('UPDATE'), 1)
+        con = await self.connect()
+        with self.assertRaises(OldapErrorNoPermission):
+            await con.clear_graph(Xsd_QName("oldap:admin"))
+
+    async def test_clear_invalidates_object_cache(self):
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        with mock.patch('oldaplib.src.connection.CacheSingletonRedis') as cache:
+            await con.clear_graph(Xsd_QName("shared:shacl"))
+            await con.clear_repo()
+        self.assertEqual(cache.return_value.bump_generation.call_args_list, [mock.call('shared'), mock.call(None)])
+
+    async def test_concurrent_queries(self):
+        con = await self.connect(userId="rosenth", credentials="RioGrande")
+        self._standin.delay = 0.1
+        start = time.perf_counter()
+        results = await asyncio.gather(*[con.query("SELECT ?s WHERE { ?s ?p ?o }") for _ in range(8)])
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(results), 8)
+        self.assertLess(elapsed, 0.5)  # sequential execution would take at least 0.8s
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import gzip
+import re
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+
+import rdflib
+from rdflib.compare import to_isomorphic
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.bulk_load import RdfFile, gzip_chunks
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorBulkLoad
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+ONTOLOGIES = Path(__file__).parent.parent / 'ontologies'
+
+TRIG = """# a comment with a "quote" and a { brace
+PREFIX ex: <http://example.org/ns#>
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+ex:s0 ex:p "in the default graph. {not a block}" .
+GRAPH ex:g1 {
+    ex:s1 ex:p 1.5, 2 ;
+          ex:q ex:a.b .
+    ex:s2 ex:p [ ex:q "nested ; ." ; ex:r ( 1 2 3 ) ] .
+    ex:s3 ex:p \"\"\"long
+string with . and } inside\"\"\" }
+@prefix ex2: <http://example.org/other#> .
+ex:g2 {
+    ex2:s4 ex:p "x"@en .   # trailing comment
+    ex2:s5 ex:p "y"^^xsd:string
+}
+"""
+
+
+def nquads(n: int) -> str:
+    return ''.join(f'<http://example.org/s{i}> <http://example.org/p> "value {i} with some padding text to make '
+                   f'the line longer" <http://example.org/g{i % 3}> .\n' for i in range(n))
+
+
+def dataset(data: bytes | str, fmt: str) -> rdflib.Dataset:
+    ds = rdflib.Dataset()
+    ds.parse(data=data.decode('utf-8') if isinstance(data, bytes) else data, format=fmt)
+    return ds
+
+
+def same_dataset(a: rdflib.Dataset, b: rdflib.Dataset) -> bool:
+    names_a = {g.identifier for g in a.graphs() if len(g) > 0}
+    names_b = {g.identifier for g in b.graphs() if len(g) > 0}
+    return names_a == names_b and all(to_isomorphic(a.graph(n)) == to_isomorphic(b.graph(n)) for n in names_a)
+
+
+class TestRdfFile(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def merged(self, path: Path, batch_size: int, fmt: str, chunk_size: int = 1 << 20) -> tuple[rdflib.Dataset, list]:
+        merged = rdflib.Dataset()
+        with RdfFile(path) as rdf:
+            batches = list(rdf.batches(batch_size, chunk_size))
+        for document, _ in batches:
+            merged.parse(data=document.decode('utf-8'), format=fmt)
+        return merged, batches
+
+    def test_trig_batches(self):
+        path = self._dir / 'test.trig'
+        path.write_text(TRIG, encoding='utf-8')
+        for batch_size, chunk_size in ((1, 7), (2, 64), (100, 1 << 20)):
+            merged, batches = self.merged(path, batch_size, 'trig', chunk_size)
+            self.assertTrue(same_dataset(merged, dataset(TRIG, 'trig')), f'batch size {batch_size}')
+            self.assertEqual(sum(count for _, count in batches), 6)
+            self.assertTrue(all(count <= batch_size for _, count in batches))
+
+    def test_ontology(self):
+        merged, batches = self.merged(ONTOLOGIES / 'oldap.trig', 10, 'trig', 1000)
+        self.assertGreater(len(batches), 3)
+        self.assertTrue(same_dataset(merged, dataset((ONTOLOGIES / 'oldap.trig').read_bytes(), 'trig')))
+
+    def test_rdf_star(self):
+        with RdfFile(ONTOLOGIES / 'admin-testing.trig') as rdf:
+            batches = list(rdf.batches(4, 100))
+        text = b''.join(document for document, _ in batches).decode('utf-8')
+        self.assertIn('<<<https://orcid.org/0000-0003-1681-4036> :inProject :HyperHamlet>> :hasAdminPermission', text)
+        with RdfFile(ONTOLOGIES / 'admin-testing.trig') as rdf:
+            self.assertEqual(sum(count for _, count in batches), sum(count for _, count in rdf.batches(10 ** 6)))
+
+    def test_nquads_gzipped(self):
+        data = nquads(25)
+        path = self._dir / 'test.nq.gz'
+        path.write_bytes(gzip.compress(data.encode('utf-8')))
+        merged, batches = self.merged(path, 10, 'nquads')
+        self.assertEqual([count for _, count in batches], [10, 10, 5])
+        self.assertTrue(same_dataset(merged, dataset(data, 'nquads')))
+
+    def test_gzip_chunks(self):
+        chunks = [b'abc' * 1000, b'', b'xyz' * 10]
+        self.assertEqual(gzip.decompress(b''.join(gzip_chunks(chunks))), b''.join(chunks))
+
+    def test_unsupported(self):
+        with self.assertRaises(OldapError):
+            RdfFile(self._dir / 'test.rdf')
+
+    def test_truncated(self):
+        path = self._dir / 'test.trig'
+        path.write_text('@prefix ex: <http://example.org/ns#> .\nex:g { ex:s ex:p ex:o .\n', encoding='utf-8')
+        with self.assertRaises(OldapError):
+            with RdfFile(path) as rdf:
+                list(rdf.batches(10))
+
+
+class TestBulkLoad(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+        cls._con = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                              userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionPool().close()
+        cls._standin.stop()
+
+    def setUp(self):
+        self._standin.reset()
+        self._standin.fail_uploads = None
+        self._standin.record_uploads = True
+        self._tmp = tempfile.TemporaryDirectory()
+        self._dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_upload_turtle_streamed(self):
+        path = ONTOLOGIES / 'shared.trig'
+        self._con.upload_turtle(str(path))
+        self.assertEqual(self._standin.uploads, [path.read_bytes()])
+        request = self._standin.requests[-1]
+        self.assertEqual(request.headers.get('Transfer-Encoding'), 'chunked')
+        self.assertEqual(request.headers.get('Content-Type'), 'application/trig')
+        with self.assertRaises(OldapError):
+            self._con.upload_turtle(str(self._dir / 'data.xml'))
+
+    def test_compressed(self):
+        data = nquads(100).encode('utf-8')
+        path = self._dir / 'data.nq'
+        path.write_bytes(data)
+        status = self._con.bulk_load(path, compress=True, chunk_size=1000)
+        self.assertEqual(self._standin.uploads, [data])
+        self.assertEqual(self._standin.requests[-1].headers.get('Content-Encoding'), 'gzip')
+        self.assertLess(status.bytes_sent, len(data))
+        gzpath = self._dir / 'data.nq.gz'
+        gzpath.write_bytes(gzip.compress(data))
+        self._con.bulk_load(gzpath, compress=True)  # sent as stored
+        self._con.bulk_load(gzpath)  # decompressed while sending
+        self.assertEqual(self._standin.uploads[1:], [data, data])
+
+    def test_batches_and_progress(self):
+        path = self._dir / 'data.nq'
+        path.write_text(nquads(95), encoding='utf-8')
+        reports = []
+        status = self._con.bulk_load(path, batch_size=10, compress=True,
+                                     progress=lambda p: reports.append((p.batches, p.statements)))
+        self.assertEqual(status.batches, 10)
+        self.assertEqual(status.statements, 95)
+        self.assertEqual(reports[-1], (10, 95))
+        self.assertEqual(len(self._standin.uploads), 10)
+        self.assertEqual(b''.join(self._standin.uploads), path.read_bytes())
+        self.assertEqual(status.fraction, 1.0)
+
+    def test_resume(self):
+        path = self._dir / 'data.nq'
+        path.write_text(nquads(50), encoding='utf-8')
+        self._standin.fail_uploads = re.compile(r'<http://example.org/s23>')
+        with self.assertRaises(OldapErrorBulkLoad) as ctx:
+            self._con.bulk_load(path, batch_size=10)
+        self.assertEqual(ctx.exception.batch, 2)
+        self.assertEqual(len(self._standin.uploads), 2)
+        self._standin.fail_uploads = None
+        status = self._con.bulk_load(path, batch_size=10, start_batch=ctx.exception.batch)
+        self.assertEqual(status.batches, 5)
+        self.assertEqual(status.statements, 30)
+        self.assertEqual(b''.join(self._standin.uploads), path.read_bytes())
+
+    def test_bounded_memory(self):
+        path = self._dir / 'large.nq'
+        with open(path, 'w', encoding='utf-8') as f:
+            for i in range(40):
+                f.write(nquads(2000))
+        size = path.stat().st_size
+        self._standin.record_uploads = False
+        tracemalloc.start()
+        status = self._con.bulk_load(path, batch_size=1000, chunk_size=65536)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertEqual(status.statements, 80000)
+        self.assertLess(peak * 8, size)
+
+
+if __name__ == '__main__':
+    unittest.main()
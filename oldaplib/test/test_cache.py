@@ -1,8 +1,11 @@
 import unittest
+from unittest import mock
 
-from oldaplib.src.cachesingleton import CacheSingleton, CacheSingletonRedis
+from oldaplib.src.cachesingleton import CacheSingleton, CacheSingletonRedis, NOT_FOUND
+from oldaplib.src.helpers.cache_namespace import CacheKey, MEDIA_NAMESPACE
 from oldaplib.src.iconnection import IConnection
 from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
 
 
 class MyTestCase(unittest.TestCase):
@@ -21,6 +24,121 @@ class MyTestCase(unittest.TestCase):
         val = cache2.get(Xsd_NCName('test'))
         self.assertEqual(val, None)
 
+    def test_cache_many(self):
+        cache = CacheSingletonRedis()
+        cache.set_many([(Xsd_NCName('test1'), "one"), (Xsd_NCName('test2'), ["two", 2])])
+        self.assertIs(cache._r, CacheSingletonRedis()._r)
+        self.assertEqual(cache.get_many([Xsd_NCName('test2'), Xsd_NCName('nothing'), Xsd_NCName('test1')]),
+                         [["two", 2], None, "one"])
+        self.assertTrue(cache.exists(Xsd_NCName('test1')))
+        cache.delete_many([Xsd_NCName('test1'), Xsd_NCName('test2')])
+        self.assertFalse(cache.exists(Xsd_NCName('test1')))
+        self.assertEqual(cache.get_many([Xsd_NCName('test1'), Xsd_NCName('test2')]), [None, None])
+        self.assertEqual(cache.get_many([]), [])
+
+    def test_cache_generation(self):
+        cache = CacheSingletonRedis()
+        cache.set_many([(Xsd_QName('gentest:shacl'), "model"), (Xsd_QName('other:shacl'), "other"),
+                        (Xsd_NCName('gentest'), "project")])
+        cache.bump_generation('gentest')
+        self.assertIsNone(cache.get(Xsd_QName('gentest:shacl')))
+        self.assertEqual(cache.get(Xsd_QName('other:shacl')), "other")
+        self.assertEqual(cache.get(Xsd_NCName('gentest')), "project")
+        self.assertEqual(cache.collect_garbage('gentest'), 1)
+        cache.set(Xsd_QName('gentest:shacl'), "new model")
+        self.assertEqual(cache.get(Xsd_QName('gentest:shacl')), "new model")
+        cache.bump_generation()
+        self.assertEqual(cache.get_many([Xsd_QName('gentest:shacl'), Xsd_QName('other:shacl'), Xsd_NCName('gentest')]),
+                         [None, None, None])
+        self.assertEqual(cache.collect_garbage(), 3)
+
+    def test_cache_clear_scope(self):
+        cache = CacheSingletonRedis()
+        other = CacheSingletonRedis(scope='cleartest')
+        cache.set(Xsd_NCName('test'), "mine")
+        other.set(Xsd_NCName('test'), "other")
+        cache._r.set('oldap:session:revoked:cleartest', b'1')
+        cache.clear()
+        self.assertIsNone(cache.get(Xsd_NCName('test')))
+        self.assertEqual(other.get(Xsd_NCName('test')), "other")
+        self.assertEqual(cache._r.get('oldap:session:revoked:cleartest'), b'1')
+        cache._r.delete('oldap:session:revoked:cleartest')
+        other.clear()
+
+    def test_cache_connection_scope(self):
+        repo_a = CacheSingletonRedis(mock.Mock(spec=IConnection, cache_scope='http://localhost:7200/scopetest_a'))
+        repo_b = CacheSingletonRedis(mock.Mock(spec=IConnection, cache_scope='http://localhost:7200/scopetest_b'))
+        repo_a.set(Xsd_QName('scopetest:shacl'), "model a")
+        repo_b.set(Xsd_QName('scopetest:shacl'), "model b")
+        self.assertEqual(repo_a.get(Xsd_QName('scopetest:shacl')), "model a")
+        repo_b.bump_generation('scopetest')
+        self.assertIsNone(repo_b.get(Xsd_QName('scopetest:shacl')))
+        self.assertEqual(repo_a.get(Xsd_QName('scopetest:shacl')), "model a")
+        repo_a.clear()
+        repo_b.clear()
+
+    def test_cache_not_found(self):
+        cache = CacheSingletonRedis()
+        cache.set_not_found(Xsd_QName('negtest:Book'))
+        self.assertIs(cache.get(Xsd_QName('negtest:Book'), negative=True), NOT_FOUND)
+        self.assertIsNone(cache.get(Xsd_QName('negtest:Book')))
+        cache.set(Xsd_QName('negtest:Book'), "book")
+        self.assertEqual(cache.get(Xsd_QName('negtest:Book'), negative=True), "book")
+
+        media = CacheKey(MEDIA_NAMESPACE, 'x_34db.tif@urn:uuid:1')
+        cache.set_not_found(media)
+        self.assertIs(cache.get(media, negative=True), NOT_FOUND)
+        cache.bump_generation(MEDIA_NAMESPACE)
+        self.assertIsNone(cache.get(media, negative=True))
+
+    def test_cache_not_found_group(self):
+        cache = CacheSingletonRedis()
+        group = CacheKey(MEDIA_NAMESPACE, 'x_35db.tif')
+        markers = [CacheKey(MEDIA_NAMESPACE, f'x_35db.tif@urn:uuid:{i}') for i in (1, 2)]
+        other = CacheKey(MEDIA_NAMESPACE, 'x_36db.tif@urn:uuid:1')
+        for marker in markers:
+            cache.set_not_found(marker, group)
+        cache.set_not_found(other, CacheKey(MEDIA_NAMESPACE, 'x_36db.tif'))
+        self.assertEqual(cache.get_many([*markers, other], negative=True), [NOT_FOUND, NOT_FOUND, NOT_FOUND])
+        self.assertEqual(cache.delete_group(group), 2)
+        self.assertEqual(cache.get_many([*markers, other], negative=True), [None, None, NOT_FOUND])
+        self.assertEqual(cache.delete_group(group), 0)
+        cache.delete_group(CacheKey(MEDIA_NAMESPACE, 'x_36db.tif'))
+
+    def test_cache_not_found_exists(self):
+        cache = CacheSingletonRedis()
+        cache.set_not_found(Xsd_QName('negtest:Article'))
+        self.assertFalse(cache.exists(Xsd_QName('negtest:Article')))
+        self.assertIs(cache.get(Xsd_QName('negtest:Article'), negative=True), NOT_FOUND)
+        self.assertFalse(cache.exists(Xsd_QName('negtest:Article')))  # marker now also in the near-cache
+        cache.set(Xsd_QName('negtest:Article'), "article")
+        self.assertTrue(cache.exists(Xsd_QName('negtest:Article')))
+        cache.delete(Xsd_QName('negtest:Article'))
+
+
+class TestCacheSingleton(unittest.TestCase):
+
+    def tearDown(self):
+        CacheSingleton().clear()
+
+    def test_snapshot(self):
+        cache = CacheSingleton()
+        value = {'nodes': [1, 2]}
+        cache.set(Xsd_NCName('list'), value, Xsd_NCName('alias'))
+        value['nodes'].append(3)
+        snapshot = cache.get_snapshot(Xsd_NCName('list'))
+        self.assertEqual(snapshot, {'nodes': [1, 2]})
+        self.assertIs(cache.get_snapshot(Xsd_NCName('list')), snapshot)
+        self.assertIs(cache.get_snapshot(Xsd_NCName('alias')), snapshot)
+        copy = cache.get(Xsd_NCName('list'))
+        self.assertEqual(copy, snapshot)
+        self.assertIsNot(copy, snapshot)
+        copy['nodes'].append(4)
+        self.assertEqual(cache.get_snapshot(Xsd_NCName('list')), {'nodes': [1, 2]})
+        cache.delete(Xsd_NCName('list'))
+        self.assertIsNone(cache.get_snapshot(Xsd_NCName('list')))
+        self.assertIsNone(cache.get(Xsd_NCName('list')))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,107 @@
+import json
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from oldaplib.src.enums.datapermissions import DataPermission
+from oldaplib.src.enums.xsd_datatypes import XsdDatatypes
+from oldaplib.src.helpers import cache_codec
+from oldaplib.src.helpers.cache_codec import BinaryCodec, JsonCodec, get_codec, MAGIC
+from oldaplib.src.helpers.langstring import LangString
+from oldaplib.src.helpers.observable_set import ObservableSet
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.serializer import serializer
+from oldaplib.src.xsd.iri import Iri
+from oldaplib.src.xsd.xsd_datetime import Xsd_dateTime
+from oldaplib.src.xsd.xsd_integer import Xsd_integer
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+
+
+@serializer
+class ConHolder:
+    def __init__(self, con=None, value=None):
+        self.con = con
+        self.value = value
+
+    def _as_dict(self) -> dict:
+        return {'value': self.value}
+
+
+def make_value(n: int = 3) -> dict:
+    return {
+        'items': [{
+            'iri': Iri(f'http://oldap.org/test#item{i}'),
+            'qname': Xsd_QName(f'test:prop{i}'),
+            'label': LangString([f'Item {i}@en', f'Eintrag {i}@de']),
+            'count': Xsd_integer(i),
+            'modified': Xsd_dateTime('2024-02-26T12:33:01+00:00'),
+            'datatype': XsdDatatypes.langString,
+            'permission': DataPermission.DATA_UPDATE,
+            'types': ObservableSet({XsdDatatypes.string, XsdDatatypes.integer}),
+        } for i in range(n)],
+        'uuid': uuid.UUID('0b6e1d62-2c52-4d0a-9ad9-5e2a1a5b9a6f'),
+        'created': datetime(2024, 2, 26, 12, 33, 1, tzinfo=timezone.utc),
+        'raw': b'\x00\x01binary',
+        'plain': [1, 2.5, None, True, 'text'],
+    }
+
+
+class TestCacheCodec(unittest.TestCase):
+
+    def test_json_is_legacy_format(self):
+        value = make_value()
+        data = JsonCodec().encode(value)
+        self.assertEqual(data, json.dumps(value, default=serializer.encoder_default).encode('utf-8'))
+        self.assertEqual(cache_codec.decode(data), cache_codec.decode(data))
+        self.assertEqual(cache_codec.decode(data)['items'][1]['label'], LangString(['Item 1@en', 'Eintrag 1@de']))
+
+    def test_binary_roundtrip(self):
+        value = make_value()
+        data = BinaryCodec(compress_min=0).encode(value)
+        self.assertTrue(data.startswith(MAGIC))
+        decoded = cache_codec.decode(data)
+        expected = cache_codec.decode(JsonCodec().encode(value))
+        self.assertEqual(decoded, expected)
+        self.assertEqual(decoded['items'][2]['iri'], Iri('http://oldap.org/test#item2'))
+        self.assertEqual(decoded['items'][0]['permission'], DataPermission.DATA_UPDATE)
+        self.assertEqual(decoded['raw'], b'\x00\x01binary')
+        self.assertEqual(decoded['created'], value['created'])
+
+    def test_binary_smaller(self):
+        value = make_value(50)
+        json_size = len(JsonCodec().encode(value))
+        plain = BinaryCodec(compress_min=0).encode(value)
+        compressed = BinaryCodec(compress_min=1024).encode(value)
+        self.assertLess(len(plain), json_size)
+        self.assertLess(len(compressed), len(plain) / 2)
+        self.assertEqual(cache_codec.decode(compressed), cache_codec.decode(plain))
+
+    def test_large_integer(self):
+        data = BinaryCodec().encode({'big': 2 ** 70})
+        self.assertFalse(data.startswith(MAGIC))
+        self.assertEqual(cache_codec.decode(data), {'big': 2 ** 70})
+
+    def test_header(self):
+        data = BinaryCodec(compress_min=0).encode('x')
+        with self.assertRaises(OldapErrorValue):
+            cache_codec.decode(MAGIC + bytes((99,)) + data[len(MAGIC) + 1:])
+        with self.assertRaises(OldapErrorValue):
+            cache_codec.decode(MAGIC + bytes((1, 99, 0)) + data[len(MAGIC) + 3:])
+
+    def test_connection(self):
+        connection = object()
+        for codec in (JsonCodec(), BinaryCodec()):
+            decoded = cache_codec.decode(codec.encode([ConHolder(value=Iri('http://oldap.org/test#x'))]), connection)
+            self.assertIs(decoded[0].con, connection)
+            self.assertEqual(decoded[0].value, Iri('http://oldap.org/test#x'))
+            self.assertIsNone(cache_codec.decode(codec.encode(ConHolder(value=1))).con)
+
+    def test_get_codec(self):
+        self.assertIsInstance(get_codec('binary'), BinaryCodec)
+        self.assertIsInstance(get_codec(), JsonCodec)
+        with self.assertRaises(OldapErrorValue):
+            get_codec('xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import unittest
+
+from oldaplib.src.cachesingleton import CacheSingleton
+from oldaplib.src.helpers.cache_metrics import CacheMetrics, Histogram, LATENCY_BUCKETS_MS, LOCAL, REDIS
+from oldaplib.src.helpers.cache_policy import CacheFamily
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentile(self):
+        histogram = Histogram(LATENCY_BUCKETS_MS)
+        self.assertEqual(histogram.percentile(50), 0.0)
+        for _ in range(90):
+            histogram.add(0.3)
+        for _ in range(10):
+            histogram.add(42.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.percentile(50), 0.5)
+        self.assertEqual(histogram.percentile(95), 42.0)
+        self.assertEqual(histogram.max, 42.0)
+        self.assertAlmostEqual(histogram.mean, (90 * 0.3 + 10 * 42.0) / 100)
+        histogram.add(20000.0)
+        self.assertEqual(histogram.buckets[-1], 1)
+        self.assertEqual(histogram.percentile(100), 20000.0)
+
+
+class TestCacheMetrics(unittest.TestCase):
+
+    def setUp(self):
+        CacheMetrics().configure(enabled=True)
+        CacheMetrics().reset()
+        CacheSingleton().clear()
+
+    def tearDown(self):
+        CacheMetrics().reset()
+        CacheMetrics().configure(enabled=False)
+        CacheSingleton().clear()
+
+    def test_counters(self):
+        metrics = CacheMetrics()
+        metrics.lookup(REDIS, CacheFamily.DATAMODEL, True, 2000)
+        metrics.lookup(REDIS, CacheFamily.DATAMODEL, True, 3000)
+        metrics.lookup(REDIS, CacheFamily.DATAMODEL, False)
+        metrics.record(REDIS, CacheFamily.DATAMODEL, 'get', 0.001)
+        metrics.record(REDIS, CacheFamily.DATAMODEL, 'fill', 0.25)
+        metrics.record(REDIS, CacheFamily.DATAMODEL, 'set', 0.002, 2500)
+        stats = metrics.stats(REDIS, CacheFamily.DATAMODEL)
+        self.assertEqual((stats.hits, stats.misses, stats.sets, stats.fills), (2, 1, 1, 1))
+        self.assertAlmostEqual(stats.hit_ratio, 2 / 3)
+        self.assertEqual(stats.size.count, 3)
+        self.assertEqual(stats.latency('fill').max, 250.0)
+        self.assertIsNone(metrics.stats(LOCAL, CacheFamily.DATAMODEL))
+
+    def test_snapshot(self):
+        metrics = CacheMetrics()
+        metrics.lookup(REDIS, CacheFamily.USER, False)
+        metrics.lookup(LOCAL, CacheFamily.LIST, True)
+        cache = CacheSingleton()
+        cache.set(Xsd_NCName('a'), {'v': 'a'})
+        cache.get(Xsd_NCName('a'))
+        snapshot = json.loads(json.dumps(metrics.snapshot()))
+        self.assertEqual(snapshot['redis.user']['misses'], 1)
+        self.assertEqual(snapshot['local.list']['hits'], 1)
+        self.assertEqual(snapshot['local']['other']['hits'], 1)
+        self.assertIn('near', snapshot)
+        self.assertNotIn('server', snapshot)
+
+        metrics.reset()
+        snapshot = metrics.snapshot()
+        self.assertNotIn('redis.user', snapshot)
+        self.assertNotIn('hits', snapshot['local']['other'])
+
+
+if __name__ == '__main__':
+    unittest.main()
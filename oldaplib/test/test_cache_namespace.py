@@ -0,0 +1,49 @@
+import os
+import unittest
+from unittest import mock
+
+from oldaplib.src.helpers.cache_namespace import CacheKeyspace, CacheKey, namespace_of, graph_namespace, \
+    ADMIN_NAMESPACE, MEDIA_NAMESPACE
+from oldaplib.src.xsd.iri import Iri
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+
+
+class TestCacheNamespace(unittest.TestCase):
+
+    def test_namespace_of(self):
+        self.assertEqual(namespace_of(Xsd_QName('hyha:shacl')), 'hyha')
+        self.assertEqual(namespace_of(Xsd_QName('test', 'Book')), 'test')
+        self.assertEqual(namespace_of(Iri.fromPrefixFragment('test', 'mylist')), 'test')
+        self.assertEqual(namespace_of(Iri('https://orcid.org/0000-0003-1681-4036')), ADMIN_NAMESPACE)
+        self.assertEqual(namespace_of(Xsd_NCName('hyha')), ADMIN_NAMESPACE)
+        key = CacheKey(MEDIA_NAMESPACE, 'x_34db.tif@urn:uuid:1')
+        self.assertEqual(namespace_of(key), MEDIA_NAMESPACE)
+        self.assertEqual(str(key), 'x_34db.tif@urn:uuid:1')
+
+    def test_graph_namespace(self):
+        self.assertEqual(graph_namespace(Xsd_QName('hyha:shacl')), 'hyha')
+        self.assertIsNone(graph_namespace(Xsd_QName('oldap:admin')))
+        self.assertIsNone(graph_namespace(Xsd_QName('oldap:onto')))
+        self.assertIsNone(graph_namespace(None))
+
+    def test_keyspace(self):
+        keys = CacheKeyspace('http://localhost:7200/oldap')
+        name = keys.value_key('hyha', 2, 5, 'hyha:Book')
+        self.assertEqual(name, 'oldap:http://localhost:7200/oldap:hyha:2.5:hyha:Book')
+        self.assertEqual(keys.parse(name), ('hyha', '2.5', 'hyha:Book'))
+        self.assertIsNone(keys.parse('oldap:http://localhost:7200/other:hyha:2.5:hyha:Book'))
+        self.assertEqual(keys.generation_key('hyha'), 'oldap:gen:http://localhost:7200/oldap:hyha')
+        self.assertEqual(CacheKeyspace('a*b').pattern('x'), 'oldap:a\\*b:x:*')
+
+    def test_scope(self):
+        with mock.patch.dict(os.environ, {'OLDAP_TS_SERVER': 'http://db:7200', 'OLDAP_TS_REPO': 'test'}):
+            self.assertEqual(CacheKeyspace().scope, 'http://db:7200/test')
+            self.assertEqual(CacheKeyspace('http://db:7200/other').scope, 'http://db:7200/other')
+            with mock.patch.dict(os.environ, {'OLDAP_CACHE_SCOPE': 'staging'}):
+                self.assertEqual(CacheKeyspace().scope, 'staging')
+                self.assertEqual(CacheKeyspace('http://db:7200/other').scope, 'staging')
+
+
+if __name__ == '__main__':
+    unittest.main()
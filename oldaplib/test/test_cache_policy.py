@@ -0,0 +1,129 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+from oldaplib.src.cachesingleton import CacheSingleton
+from oldaplib.src.helpers.cache_policy import CachePolicy, CachePolicies, CacheFamily, Eviction, family_of
+from oldaplib.src.helpers.langstring import LangString
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+
+
+class TestCachePolicy(unittest.TestCase):
+
+    def test_updated(self):
+        policy = CachePolicy(max_entries=10, ttl=60.0).updated('lfu, entries=500, bytes=0, ttl=600, jitter=0.2')
+        self.assertEqual(policy, CachePolicy(eviction=Eviction.LFU, max_entries=500, ttl=600.0, jitter=0.2))
+        self.assertIsNone(policy.updated('ttl=0').ttl)
+        for settings in ('fifo', 'entries=many', 'jitter=1.5', 'entries=-1'):
+            with self.assertRaises(OldapErrorValue):
+                policy.updated(settings)
+
+    def test_expires_in(self):
+        self.assertIsNone(CachePolicy().expires_in())
+        ttls = [CachePolicy(ttl=100.0, jitter=0.1).expires_in() for _ in range(100)]
+        self.assertTrue(all(90.0 <= ttl <= 110.0 for ttl in ttls))
+        self.assertGreater(len(set(ttls)), 1)
+        self.assertEqual(CachePolicy(ttl=100.0, jitter=0).expires_in(), 100.0)
+
+    def test_environment(self):
+        with mock.patch.dict(os.environ, {'OLDAP_CACHE_POLICY_LIST': 'lfu,entries=5'}):
+            CachePolicies().reset()
+            self.assertEqual(CachePolicies().policy(CacheFamily.LIST).max_entries, 5)
+            self.assertEqual(CachePolicies().policy(CacheFamily.LIST).eviction, Eviction.LFU)
+        CachePolicies().reset()
+        self.assertEqual(CachePolicies().policy(CacheFamily.LIST).max_entries, 1000)
+
+    def test_family(self):
+        self.assertEqual(family_of(LangString("x@en")), CacheFamily.OTHER)
+        self.assertEqual(family_of({'a': 1}), CacheFamily.OTHER)
+
+
+class TestCacheSingletonPolicy(unittest.TestCase):
+
+    def setUp(self):
+        CacheSingleton().clear()
+        CacheSingleton()._stats = {}
+
+    def tearDown(self):
+        CachePolicies().reset()
+        CacheSingleton().clear()
+
+    def configure(self, **kwargs) -> None:
+        CachePolicies().configure(CacheFamily.OTHER, CachePolicy(**kwargs))
+
+    def test_lru(self):
+        self.configure(max_entries=2)
+        cache = CacheSingleton()
+        cache.set(Xsd_NCName('a'), {'v': 'a'})
+        cache.set(Xsd_NCName('b'), {'v': 'b'})
+        self.assertEqual(cache.get_snapshot(Xsd_NCName('a')), {'v': 'a'})
+        cache.set(Xsd_NCName('c'), {'v': 'c'})
+        self.assertIsNone(cache.get_snapshot(Xsd_NCName('b')))
+        self.assertIsNotNone(cache.get_snapshot(Xsd_NCName('a')))
+        self.assertEqual(cache.stats()['other']['entries'], 2)
+        self.assertEqual(cache.stats()['other']['evictions'], 1)
+
+    def test_lfu(self):
+        self.configure(eviction=Eviction.LFU, max_entries=2)
+        cache = CacheSingleton()
+        cache.set(Xsd_NCName('a'), {'v': 'a'})
+        cache.set(Xsd_NCName('b'), {'v': 'b'})
+        for _ in range(3):
+            cache.get_snapshot(Xsd_NCName('a'))
+        cache.get_snapshot(Xsd_NCName('b'))
+        cache.get_snapshot(Xsd_NCName('b'))
+        cache.get_snapshot(Xsd_NCName('a'))
+        cache.set(Xsd_NCName('c'), {'v': 'c'})
+        self.assertIsNone(cache.get_snapshot(Xsd_NCName('b')))
+        self.assertIsNotNone(cache.get_snapshot(Xsd_NCName('a')))
+
+    def test_bytes(self):
+        self.configure(max_bytes=100)
+        cache = CacheSingleton()
+        cache.set(Xsd_NCName('a'), {'v': 'x' * 60})
+        cache.set(Xsd_NCName('b'), {'v': 'y' * 60})
+        self.assertIsNone(cache.get_snapshot(Xsd_NCName('a')))
+        stats = cache.stats()['other']
+        self.assertEqual(stats['entries'], 1)
+        self.assertLessEqual(stats['bytes'], 100)
+
+    def test_size_only_if_bounded(self):
+        self.configure(max_entries=10)
+        cache = CacheSingleton()
+        with mock.patch('oldaplib.src.cachesingleton._size_of', return_value=10) as size_of:
+            cache.set(Xsd_NCName('a'), {'v': 'a'})
+            size_of.assert_not_called()
+            self.assertEqual(cache.stats()['other']['bytes'], 10)
+            self.configure(max_bytes=15)
+            cache.set(Xsd_NCName('b'), {'v': 'b'})
+        self.assertIsNone(cache.get_snapshot(Xsd_NCName('a')))
+        self.assertEqual(cache.stats()['other']['entries'], 1)
+
+    def test_change_eviction(self):
+        self.configure(max_entries=3)
+        cache = CacheSingleton()
+        for key in ('a', 'b', 'c'):
+            cache.set(Xsd_NCName(key), {'v': key})
+        cache.get_snapshot(Xsd_NCName('a'))
+        cache.get_snapshot(Xsd_NCName('c'))
+        self.configure(eviction=Eviction.LFU, max_entries=3)
+        cache.set(Xsd_NCName('d'), {'v': 'd'}, Xsd_NCName('e'))
+        self.assertEqual([cache.get_snapshot(Xsd_NCName(k)) is not None for k in ('a', 'b', 'c', 'd', 'e')],
+                         [False, False, True, True, True])
+        self.assertEqual(cache.stats()['other']['evictions'], 2)
+
+    def test_ttl(self):
+        self.configure(ttl=0.05, jitter=0)
+        cache = CacheSingleton()
+        cache.set(Xsd_NCName('a'), {'v': 'a'})
+        self.assertIsNotNone(cache.get(Xsd_NCName('a')))
+        time.sleep(0.08)
+        self.assertIsNone(cache.get(Xsd_NCName('a')))
+        self.assertEqual(cache.stats()['other']['expirations'], 1)
+        self.assertEqual(cache.stats()['other']['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
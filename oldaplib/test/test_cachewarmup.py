@@ -0,0 +1,51 @@
+import unittest
+
+from oldaplib.src.cachewarmup import warm_up, WarmupResult, WarmupReport
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+def project_rows(*shortnames: str) -> dict:
+    return {'head': {'vars': ['project', 'shortname']},
+            'results': {'bindings': [{
+                'project': {'type': 'uri', 'value': f'http://oldap.org/test/{shortname}'},
+                'shortname': {'type': 'literal', 'value': shortname,
+                              'datatype': 'http://www.w3.org/2001/XMLSchema#NCName'},
+            } for shortname in shortnames]}}
+
+
+class TestCacheWarmup(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+        cls._standin.respond(r'\?project oldap:projectShortName \?shortname', project_rows('nothere', 'gone'))
+        cls._con = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                              userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionPool().close()
+        cls._standin.stop()
+
+    def test_failed_projects(self):
+        done = []
+        report = warm_up(self._con, admin=False, workers=2, progress=done.append)
+        self.assertEqual(sorted(result.name for result in report.results), ['gone', 'nothere'])
+        self.assertEqual(len(report.failed), 2)
+        self.assertEqual(len(done), 2)
+        self.assertTrue(all(result.error and result.seconds >= 0 for result in report.results))
+        self.assertIn('2 failed', str(report))
+
+    def test_report(self):
+        report = WarmupReport([WarmupResult('test', 0.5, 12), WarmupResult('broken', 0.1, 0, 'not found')], 0.6)
+        self.assertEqual([result.name for result in report.failed], ['broken'])
+        self.assertIn('FAILED: not found', str(report))
+
+
+if __name__ == '__main__':
+    unittest.main()
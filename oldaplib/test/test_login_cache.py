@@ -0,0 +1,150 @@
+import asyncio
+import time
+import unittest
+
+from oldaplib.src.asyncconnection import AsyncConnection, close_clients
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.login_cache import LoginCache
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorValue
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.helpers.session_store import SessionStore
+from oldaplib.src.helpers.ttlcache import TtlCache
+from oldaplib.src.xsd.xsd_ncname import Xsd_NCName
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTtlCache(unittest.TestCase):
+
+    def test_lru(self):
+        cache = TtlCache(maxsize=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # 'b' is now least recently used
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = TtlCache(maxsize=10, ttl=10, clock=clock)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=100)
+        clock.now += 11
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_disabled(self):
+        cache = TtlCache(maxsize=10, ttl=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+        with self.assertRaises(OldapErrorValue):
+            TtlCache(maxsize=0, ttl=10)
+
+    def test_delete_where(self):
+        cache = TtlCache(maxsize=10, ttl=10)
+        for i in range(5):
+            cache.set(i, i * i)
+        self.assertEqual(cache.delete_where(lambda k, v: v > 3), 3)
+        self.assertEqual(len(cache), 2)
+
+
+class TestLoginCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._iri = cls._standin.add_user('rosenth', 'RioGrande')
+        cls._standin.add_user('unknown', '')
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionPool().close()
+        LoginCache().configure(ttl=300)
+        cls._standin.stop()
+
+    def setUp(self):
+        LoginCache().configure(ttl=300)
+        self._standin.reset()
+
+    def connect(self, credentials: str = "RioGrande") -> Connection:
+        return Connection(server=self._standin.server, repo=self._standin.repo,
+                          userId="rosenth", credentials=credentials, context_name="DEFAULT")
+
+    def test_warm_login(self):
+        con = self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 2)
+        con2 = self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 2)  # no round trip
+        self.assertEqual(con2.userid, Xsd_NCName('rosenth'))
+        self.assertIsNot(con.userdata, con2.userdata)
+        with self.assertRaises(OldapError) as ex:
+            self.connect("wrong")
+        self.assertEqual(str(ex.exception), "Wrong credentials")
+        self.assertEqual(self._standin.count('QUERY'), 2)
+        self.assertEqual(LoginCache().users.hits, 2)
+
+    def test_expiry(self):
+        LoginCache().configure(ttl=0.05)
+        self.connect()
+        time.sleep(0.1)
+        self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 4)
+
+    def test_disabled(self):
+        LoginCache().configure(ttl=0)
+        self.connect()
+        self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 4)
+
+    def test_invalidation(self):
+        self.connect()
+        LoginCache().invalidate_user(userIri=self._iri)
+        self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 3)  # prefixes are still cached
+        LoginCache().invalidate_projects()
+        self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 5)
+
+    def test_version_changed(self):
+        self.connect()
+        self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 2)
+        SessionStore().bump(self._iri)  # e.g. the password has been changed by another worker
+        self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 3)
+        self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 3)
+        SessionStore().bump()
+        self.connect()
+        self.assertEqual(self._standin.count('QUERY'), 4)
+
+    def test_async_login(self):
+        self.connect()
+
+        async def login():
+            con = await AsyncConnection.create(server=self._standin.server, repo=self._standin.repo,
+                                               userId="rosenth", credentials="RioGrande")
+            await close_clients()
+            return con
+
+        con = asyncio.run(login())
+        self.assertEqual(con.userid, Xsd_NCName('rosenth'))
+        self.assertEqual(self._standin.count('QUERY'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import time
+import unittest
+from unittest import mock
+
+from oldaplib.src.helpers.near_cache import NearCache, INVALIDATION_CHANNEL
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+
+
+class TestNearCache(unittest.TestCase):
+
+    def setUp(self):
+        self._now = 0.0
+        cache = NearCache()
+        cache.configure(maxsize=3, maxbytes=100, ttl=60)
+        cache._clock = lambda: self._now
+
+    def tearDown(self):
+        cache = NearCache()
+        cache._clock = time.monotonic
+        cache.configure(maxsize=1000, maxbytes=64 * 1024 * 1024, ttl=60)
+
+    def test_lru(self):
+        cache = NearCache()
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key.encode())
+        self.assertEqual(cache.get('a'), b'a')
+        cache.set('d', b'd')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual([cache.get(k) for k in ('a', 'c', 'd')], [b'a', b'c', b'd'])
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (4, 1, 1))
+
+    def test_bytes_bound(self):
+        cache = NearCache()
+        cache.set('a', b'x' * 60)
+        cache.set('b', b'y' * 30)
+        self.assertEqual(cache.size, 90)
+        cache.set('c', b'z' * 20)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size, 50)
+        cache.set('d', b'w' * 101)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        cache = NearCache()
+        cache.set('a', b'a')
+        self._now = 59.0
+        self.assertEqual(cache.get('a'), b'a')
+        self._now = 60.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size, 0)
+
+    def test_generation(self):
+        cache = NearCache()
+        generation = cache.generation
+        cache.invalidate('other')
+        cache.set('a', b'stale', generation)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', b'fresh', cache.generation)
+        self.assertEqual(cache.get('a'), b'fresh')
+
+    def test_messages(self):
+        cache = NearCache()
+        cache.set('a', b'a')
+        cache.set('b', b'b')
+        cache._on_message({'type': 'message', 'channel': INVALIDATION_CHANNEL.encode(), 'data': b'a'})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), b'b')
+        cache._on_message({'type': 'message', 'channel': INVALIDATION_CHANNEL.encode(), 'data': b'*'})
+        self.assertEqual(len(cache), 0)
+
+    def test_prefix_messages(self):
+        cache = NearCache()
+        cache.set('oldap:s:p1:a', b'a')
+        cache.set('oldap:s:p1:b', b'b')
+        cache.set('oldap:s:p2:a', b'c')
+        cache._on_message({'type': 'message', 'channel': INVALIDATION_CHANNEL.encode(), 'data': b'*oldap:s:p1:'})
+        self.assertIsNone(cache.get('oldap:s:p1:a'))
+        self.assertIsNone(cache.get('oldap:s:p1:b'))
+        self.assertEqual(cache.get('oldap:s:p2:a'), b'c')
+        client = mock.Mock()
+        cache.publish_prefix(client, 'oldap:s:')
+        client.publish.assert_called_once_with(INVALIDATION_CHANNEL, '*oldap:s:')
+        self.assertEqual(len(cache), 0)
+
+    def test_publish(self):
+        cache = NearCache()
+        cache.set('a', b'a')
+        client = mock.Mock()
+        cache.publish(client, 'a', None)
+        self.assertEqual(client.publish.call_args_list,
+                         [mock.call(INVALIDATION_CHANNEL, 'a'), mock.call(INVALIDATION_CHANNEL, '*')])
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        cache = NearCache()
+        cache.configure(maxsize=0)
+        self.assertFalse(cache.enabled)
+        self.assertFalse(cache.listen(mock.Mock()))
+        cache.set('a', b'a')
+        self.assertIsNone(cache.get('a'))
+        with self.assertRaises(OldapErrorValue):
+            cache.configure(ttl=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+import asyncio
+import time
+import unittest
+
+from oldaplib.src.asyncconnection import AsyncConnection, close_clients
+from oldaplib.src.connection import Connection
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.query_cache import QueryResultCache, normalize_sparql, query_graphs, update_graphs
+from oldaplib.src.helpers.query_processor import QueryProcessor
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.helpers.sparql_result_table import SparqlResultTable
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+PREFIXES = 'PREFIX oldap: <http://oldap.org/base#>\nPREFIX test: <http://oldap.org/test#>\n'
+ADMIN = 'http://oldap.org/base#admin'
+DATA = 'http://oldap.org/test#data'
+LISTS = 'http://oldap.org/test#lists'
+
+ADMIN_QUERY = PREFIXES + """
+SELECT ?label
+WHERE {
+    GRAPH oldap:admin {
+        ?proj a oldap:Project .
+        ?proj rdfs:label ?label .
+    }
+}
+"""
+DATA_QUERY = PREFIXES + """
+SELECT ?label
+FROM test:data
+WHERE {
+    ?res rdfs:label ?label .
+}
+"""
+
+
+def result(label: str) -> dict:
+    return {'head': {'vars': ['label']}, 'results': {'bindings': [
+        {'label': {'type': 'literal', 'value': label}}]}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSparqlAnalysis(unittest.TestCase):
+
+    def test_normalize(self):
+        self.assertEqual(normalize_sparql('SELECT  ?x # comment {\n WHERE {\n\t?x ?p "a  #b" . }\n'),
+                         'SELECT ?x WHERE { ?x ?p "a  #b" . }')
+        self.assertEqual(normalize_sparql('ASK { <http://a.org/x#y> ?p """multi\n\nline""" }'),
+                         'ASK { <http://a.org/x#y> ?p """multi\n\nline""" }')
+
+    def test_query_graphs(self):
+        self.assertEqual(query_graphs(ADMIN_QUERY), frozenset({ADMIN}))
+        self.assertEqual(query_graphs(DATA_QUERY), frozenset({DATA}))
+        self.assertEqual(query_graphs(PREFIXES + 'SELECT ?x WHERE { GRAPH oldap:admin { ?x ?p "}" } '
+                                                 'FILTER NOT EXISTS { GRAPH test:lists { ?x ?q ?y } } '
+                                                 'FILTER(?x != oldap:a) }'),
+                         frozenset({ADMIN, LISTS}))
+        self.assertIsNone(query_graphs(PREFIXES + 'SELECT ?x WHERE { ?x ?p ?o }'))
+        self.assertIsNone(query_graphs(PREFIXES + 'SELECT ?x WHERE { GRAPH ?g { ?x ?p ?o } }'))
+        self.assertIsNone(query_graphs(PREFIXES + 'SELECT ?x WHERE { GRAPH oldap:admin { ?x ?p ?o } ?x ?q ?y }'))
+        self.assertIsNone(query_graphs(PREFIXES + 'CONSTRUCT { ?x ?p ?o } WHERE { GRAPH oldap:admin { ?x ?p ?o } }'))
+
+    def test_update_graphs(self):
+        self.assertEqual(update_graphs(PREFIXES + 'INSERT DATA { GRAPH oldap:admin { oldap:a oldap:b "{" } }'),
+                         frozenset({ADMIN}))
+        self.assertEqual(update_graphs(PREFIXES + 'DELETE { GRAPH test:data { ?s ?p ?o } }\n'
+                                                  'INSERT { GRAPH test:lists { ?s ?p "x;" } }\n'
+                                                  'WHERE { GRAPH test:data { ?s ?p ?o } } ;\n'
+                                                  'CLEAR GRAPH <http://oldap.org/base#admin>'),
+                         frozenset({DATA, LISTS, ADMIN}))
+        self.assertEqual(update_graphs(PREFIXES + 'WITH test:data DELETE { ?s ?p ?o } WHERE { ?s ?p ?o }'),
+                         frozenset({DATA}))
+        self.assertEqual(update_graphs(PREFIXES + 'MOVE test:data TO GRAPH test:lists'), frozenset({DATA, LISTS}))
+        self.assertIsNone(update_graphs(PREFIXES + 'INSERT DATA { oldap:a oldap:b "c" }'))
+        self.assertIsNone(update_graphs(PREFIXES + 'DELETE { GRAPH ?g { ?s ?p ?o } } WHERE { GRAPH ?g { ?s ?p ?o } }'))
+        self.assertIsNone(update_graphs('CLEAR ALL'))
+
+
+class TestQueryResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self._clock = FakeClock()
+        self._cache = QueryResultCache()
+        self._cache.configure(maxsize=3, maxbytes=1_000_000, ttl=60, clock=self._clock)
+
+    def tearDown(self):
+        self._cache.configure(maxsize=0, maxbytes=64 * 1024 * 1024, ttl=60, clock=time.monotonic)
+
+    def put(self, query: str, content: bytes = b'{}', graphs=None, user: str = 'urn:user'):
+        key = self._cache.key('http://ts', 'repo', user, SparqlResultFormat.JSON, query)
+        self._cache.put(key, 'application/sparql-results+json', content, graphs, self._cache.generation)
+        return key
+
+    def test_lru_and_counters(self):
+        keys = [self.put(f'SELECT ?x{i} WHERE {{ }}') for i in range(3)]
+        self.assertIsNotNone(self._cache.get(keys[0]))
+        self.put('SELECT ?x3 WHERE { }')
+        self.assertIsNone(self._cache.get(keys[1]))
+        self.assertIsNotNone(self._cache.get(keys[0]))
+        self.assertEqual(len(self._cache), 3)
+        self.assertEqual((self._cache.hits, self._cache.misses, self._cache.evictions), (2, 1, 1))
+
+    def test_memory_bound(self):
+        self._cache.configure(maxsize=100, maxbytes=10_000)
+        for i in range(10):
+            self.put(f'SELECT ?x{i} WHERE {{ }}', b'x' * 1000)
+        self.assertLessEqual(self._cache.bytes, 10_000)
+        self.assertLess(len(self._cache), 10)
+        self.put('SELECT ?big WHERE { }', b'x' * 5000)  # larger than a quarter of the memory
+        self.assertIsNone(self._cache.get(self._cache.key('http://ts', 'repo', 'urn:user',
+                                                          SparqlResultFormat.JSON, 'SELECT ?big WHERE { }')))
+
+    def test_ttl(self):
+        key = self.put('SELECT ?x WHERE { }')
+        self._clock.now += 59
+        self.assertIsNotNone(self._cache.get(key))
+        self._clock.now += 2
+        self.assertIsNone(self._cache.get(key))
+        self.assertEqual(self._cache.bytes, 0)
+
+    def test_invalidate(self):
+        admin = self.put('SELECT ?a WHERE { }', graphs=frozenset({ADMIN}))
+        data = self.put('SELECT ?d WHERE { }', graphs=frozenset({DATA}))
+        union = self.put('SELECT ?u WHERE { }', graphs=None)
+        self.assertEqual(self._cache.invalidate('http://ts', 'repo', frozenset({DATA})), 2)
+        self.assertIsNotNone(self._cache.get(admin))
+        self.assertIsNone(self._cache.get(data))
+        self.assertIsNone(self._cache.get(union))
+        self.assertEqual(self._cache.invalidate('http://ts', 'other', None), 0)
+        self.assertEqual(self._cache.invalidate('http://ts', 'repo', None), 1)
+        self.assertEqual(self._cache.bytes, 0)
+
+    def test_stale_put(self):
+        key = self._cache.key('http://ts', 'repo', 'urn:user', SparqlResultFormat.JSON, 'SELECT ?x WHERE { }')
+        generation = self._cache.generation
+        self._cache.invalidate('http://ts', 'repo', frozenset({DATA}))  # a write while the query was running
+        self._cache.put(key, 'application/sparql-results+json', b'{}', None, generation)
+        self.assertEqual(len(self._cache), 0)
+
+    def test_invalid_config(self):
+        with self.assertRaises(OldapErrorValue):
+            self._cache.configure(maxsize=-1)
+        with self.assertRaises(OldapErrorValue):
+            self._cache.configure(ttl=0)
+
+
+class TestConnectionQueryCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+        cls._standin.add_user('other', 'Secret')
+        cls._con = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                              userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+        cls._other = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                                userId="other", credentials="Secret", context_name="DEFAULT")
+
+    @classmethod
+    def tearDownClass(cls):
+        QueryResultCache().configure(maxsize=0)
+        SessionPool().close()
+        cls._standin.stop()
+
+    def setUp(self):
+        QueryResultCache().configure(maxsize=100)
+        self._standin.responders.clear()
+        self._standin.respond(r'\?proj a oldap:Project', result('admin'))
+        self._standin.respond(r'FROM test:data', result('data'))
+        self._standin.reset()
+
+    def queries(self) -> int:
+        return len([r for r in self._standin.requests if r.action == 'QUERY' and 'SELECT ?label' in r.body])
+
+    def labels(self, res) -> list[str]:
+        return [str(r['label']) for r in QueryProcessor(Context(name="DEFAULT"), res)]
+
+    def test_hit(self):
+        first = self._con.query(ADMIN_QUERY)
+        second = self._con.query(ADMIN_QUERY.replace('\n', '\n\n  '))  # same normalized query
+        self.assertEqual(self.queries(), 1)
+        self.assertIsInstance(second, SparqlResultTable)
+        self.assertEqual(self.labels(first), ['admin'])
+        self.assertEqual(self.labels(second), ['admin'])
+        json_result = self._con.query(ADMIN_QUERY, format=SparqlResultFormat.JSON)
+        self.assertEqual(json_result['results']['bindings'][0]['label']['value'], 'admin')
+        self._con.query(ADMIN_QUERY, format=SparqlResultFormat.JSON)
+        self.assertEqual(self.queries(), 2)
+        self.assertEqual(QueryResultCache().hits, 2)
+
+    def test_per_user(self):
+        self._con.query(ADMIN_QUERY)
+        self._other.query(ADMIN_QUERY)
+        self.assertEqual(self.queries(), 2)
+
+    def test_update_invalidation(self):
+        self._con.query(ADMIN_QUERY)
+        self._con.query(DATA_QUERY)
+        self._con.update_query(PREFIXES + 'INSERT DATA { GRAPH test:data { test:a rdfs:label "new" } }')
+        self._con.query(ADMIN_QUERY)
+        self._con.query(DATA_QUERY)
+        self.assertEqual(self.queries(), 3)
+        self._con.update_query(PREFIXES + 'INSERT DATA { test:a rdfs:label "new" }')  # default graph
+        self._con.query(ADMIN_QUERY)
+        self._con.query(DATA_QUERY)
+        self.assertEqual(self.queries(), 5)
+
+    def test_transaction_invalidation(self):
+        self._con.query(ADMIN_QUERY)
+        self._con.query(DATA_QUERY)
+        self._con.transaction_start()
+        self._con.transaction_update(PREFIXES + 'INSERT DATA { GRAPH oldap:admin { oldap:a rdfs:label "x" } }')
+        self._con.query(ADMIN_QUERY)  # not yet committed
+        self._con.transaction_commit()
+        self._con.query(ADMIN_QUERY)
+        self._con.query(DATA_QUERY)
+        self.assertEqual(self.queries(), 3)
+
+        self._con.transaction_start()
+        self._con.transaction_update(PREFIXES + 'INSERT DATA { GRAPH test:data { test:a rdfs:label "x" } }')
+        self._con.transaction_abort()
+        self._con.query(DATA_QUERY)
+        self.assertEqual(self.queries(), 3)
+
+    def test_disabled(self):
+        QueryResultCache().configure(maxsize=0)
+        self._con.query(ADMIN_QUERY)
+        self._con.query(ADMIN_QUERY)
+        self.assertEqual(self.queries(), 2)
+        self.assertEqual(len(QueryResultCache()), 0)
+
+    def test_async(self):
+        async def run():
+            con = await AsyncConnection.create(server=self._standin.server, repo=self._standin.repo,
+                                               userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+            try:
+                await con.query(ADMIN_QUERY)
+                await con.query(ADMIN_QUERY)
+                await con.update_query(PREFIXES + 'DELETE DATA { GRAPH oldap:admin { oldap:a rdfs:label "x" } }')
+                return await con.query(ADMIN_QUERY)
+            finally:
+                await close_clients()
+
+        self._con.query(ADMIN_QUERY)  # the sync and async connections of the same user share the entries
+        res = asyncio.run(run())
+        self.assertEqual(self.labels(res), ['admin'])
+        self.assertEqual(self.queries(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
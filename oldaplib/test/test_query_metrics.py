@@ -0,0 +1,177 @@
+import re
+import unittest
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.oldaperror import OldapError
+from oldaplib.src.helpers.query_cache import QueryResultCache
+from oldaplib.src.helpers.query_metrics import QueryMetrics, QueryEvent, QueryHistogram, sparql_template, \
+    fingerprint, OTHER
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+QUERY = """PREFIX test: <http://oldap.org/test#>
+SELECT ?label
+WHERE {
+    ?res test:number %d ;
+        rdfs:label "%s"@en .   # a comment
+    FILTER(?res != <%s>)
+}
+"""
+
+
+def rows(n: int) -> dict:
+    return {'head': {'vars': ['label']}, 'results': {'bindings': [
+        {'label': {'type': 'literal', 'value': f'label {i}'}} for i in range(n)]}}
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_template(self):
+        self.assertEqual(sparql_template(QUERY % (42, 'a \\"quoted\\" label', 'urn:x')),
+                         'SELECT ?label WHERE { ?res test:number ? ; rdfs:label ? . FILTER(?res != <?>) }')
+        self.assertEqual(fingerprint(QUERY % (1, 'x', 'urn:a')), fingerprint(QUERY % (-2.5e3, 'y z', 'urn:b')))
+        self.assertNotEqual(fingerprint(QUERY % (1, 'x', 'urn:a')),
+                            fingerprint((QUERY % (1, 'x', 'urn:a')).replace('?label', '?res')))
+        self.assertEqual(sparql_template('INSERT DATA { ex:s2 ex:p "v"^^xsd:int, 3.5, true }'),
+                         'INSERT DATA { ex:s2 ex:p ?, ?, true }')
+
+    def test_histogram(self):
+        h = QueryHistogram('fp', 'QUERY', 'SELECT')
+        for ms in (0.5, 3, 3, 3, 40, 150, 900, 1500, 4000, 12000):
+            h.add(QueryEvent(kind='QUERY', sparql='', seconds=ms / 1000.0, rows=2, caller='A.b'))
+        self.assertEqual(h.count, 10)
+        self.assertEqual(h.rows, 20)
+        self.assertEqual(h.callers, {'A.b': 10})
+        self.assertEqual(h.percentile(50), 0.05)
+        self.assertEqual(h.percentile(100), 12.0)
+        self.assertEqual(h.percentile(10), 0.001)
+
+
+class TestQueryMetrics(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+        cls._standin.respond(r'test:number', rows(3))
+        cls._con = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                              userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+
+    @classmethod
+    def tearDownClass(cls):
+        QueryMetrics().configure(metrics=False, slow_query_ms=0, maxsize=1000)
+        QueryMetrics().reset()
+        SessionPool().close()
+        cls._standin.stop()
+
+    def setUp(self):
+        self._standin.delay = 0.0
+        QueryMetrics().configure(metrics=True, slow_query_ms=0, maxsize=1000)
+        QueryMetrics().reset()
+
+    def test_disabled(self):
+        QueryMetrics().configure(metrics=False)
+        self.assertFalse(QueryMetrics().enabled)
+        self._con.query(QUERY % (1, 'x', 'urn:a'))
+        self.assertEqual(QueryMetrics().histograms(), {})
+        events = []
+        QueryMetrics().add_listener(events.append)
+        self.assertTrue(QueryMetrics().enabled)
+        QueryMetrics().remove_listener(events.append)
+        self.assertFalse(QueryMetrics().enabled)
+
+    def test_query(self):
+        for i in range(3):
+            self._con.query(QUERY % (i, f'label {i}', f'urn:{i}'), format=SparqlResultFormat.JSON)
+        histograms = QueryMetrics().histograms()
+        self.assertEqual(len(histograms), 1)
+        h = histograms[fingerprint(QUERY % (0, '', 'urn:x'))]
+        self.assertEqual((h.kind, h.count, h.rows, h.errors), ('QUERY', 3, 9, 0))
+        self.assertEqual(h.callers, {'TestQueryMetrics.test_query': 3})
+        self.assertGreater(h.request_bytes, 3 * len(QUERY))
+        self.assertGreater(h.response_bytes, 0)
+        self.assertEqual(QueryMetrics().top(1)[0].fingerprint, h.fingerprint)
+
+    def test_query_stream(self):
+        events = []
+        QueryMetrics().add_listener(events.append)
+        try:
+            result = list(self._con.query_stream(QUERY % (1, 'x', 'urn:a'), Context(name="DEFAULT")))
+        finally:
+            QueryMetrics().remove_listener(events.append)
+        self.assertEqual(len(result), 3)
+        self.assertEqual([(e.kind, e.rows) for e in events], [('QUERY', 3)])
+        self.assertGreater(events[0].response_bytes, 0)
+
+    def test_cached(self):
+        cache = QueryResultCache()
+        cache.configure(maxsize=100)
+        try:
+            for _ in range(3):
+                self._con.query(QUERY % (1, 'x', 'urn:a'))
+        finally:
+            cache.configure(maxsize=0)
+        h = list(QueryMetrics().histograms().values())[0]
+        self.assertEqual((h.count, h.cached, h.rows), (3, 2, 9))
+
+    def test_transaction(self):
+        events = []
+        QueryMetrics().add_listener(events.append)
+        try:
+            self._con.transaction_start()
+            self._con.transaction_query(QUERY % (1, 'x', 'urn:a'))
+            self._con.transaction_update('INSERT DATA { <urn:s> <urn:p> "v" }')
+            self._con.transaction_commit()
+        finally:
+            QueryMetrics().remove_listener(events.append)
+        self.assertEqual([e.kind for e in events], ['TX_START', 'TX_QUERY', 'TX_UPDATE', 'TX_COMMIT'])
+        self.assertEqual(events[1].rows, 3)
+        self.assertTrue(all(e.caller == 'TestQueryMetrics.test_transaction' for e in events))
+        self.assertNotEqual(events[0].fingerprint, events[3].fingerprint)
+
+    def test_failed_update(self):
+        self._standin.fail_updates = re.compile(r'urn:fail')
+        try:
+            with self.assertRaises(OldapError):
+                self._con.update_query('INSERT DATA { <urn:fail> <urn:p> "v" }')
+        finally:
+            self._standin.fail_updates = None
+        h = list(QueryMetrics().histograms().values())[0]
+        self.assertEqual((h.kind, h.count, h.errors), ('UPDATE', 1, 1))
+
+    def test_slow_log(self):
+        QueryMetrics().configure(metrics=False, slow_query_ms=5)
+        self._standin.delay = 0.01
+        with self.assertLogs('oldaplib.src.helpers.query_metrics.slow', level='WARNING') as logs:
+            self._con.query(QUERY % (7, 'slow', 'urn:slow'))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('rdfs:label "slow"@en', logs.output[0])
+        self.assertIn('TestQueryMetrics.test_slow_log', logs.output[0])
+
+    def test_overflow(self):
+        QueryMetrics().configure(maxsize=2)
+        self._con.query(QUERY % (1, 'x', 'urn:a'))
+        self._con.update_query('INSERT DATA { <urn:s> <urn:p> "v" }')
+        self._con.update_query('DELETE DATA { <urn:s> <urn:p> "v" }')
+        self._con.update_query('CLEAR GRAPH <urn:g>')
+        histograms = QueryMetrics().histograms()
+        self.assertEqual(len(histograms), 3)
+        self.assertEqual(histograms[OTHER].count, 2)
+
+    def test_listener_error(self):
+        def broken(event: QueryEvent) -> None:
+            raise ValueError('broken')
+        QueryMetrics().add_listener(broken)
+        try:
+            with self.assertLogs('oldaplib.src.helpers.query_metrics', level='ERROR'):
+                self._con.query(QUERY % (1, 'x', 'urn:a'))
+        finally:
+            QueryMetrics().remove_listener(broken)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import json
+import tracemalloc
+import unittest
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.json_stream import SparqlJsonStreamParser
+from oldaplib.src.helpers.oldaperror import OldapError
+from oldaplib.src.helpers.query_processor import QueryProcessor
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.xsd.iri import Iri
+from oldaplib.src.xsd.xsd_integer import Xsd_integer
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+from oldaplib.src.xsd.xsd_string import Xsd_string
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+def make_result(n: int) -> dict:
+    return {
+        'head': {'vars': ['s', 'label', 'num']},
+        'results': {'bindings': [
+            {'s': {'type': 'uri', 'value': f'http://oldap.org/base#Node{i}'},
+             'label': {'type': 'literal', 'value': f'Knoten «{i}» – ü', 'xml:lang': 'de'},
+             'num': {'type': 'literal', 'value': str(i), 'datatype': 'http://www.w3.org/2001/XMLSchema#integer'}}
+            for i in range(n)
+        ]}
+    }
+
+
+def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestSparqlJsonStreamParser(unittest.TestCase):
+
+    def parse(self, data: bytes, size: int) -> tuple[SparqlJsonStreamParser, list[dict]]:
+        parser = SparqlJsonStreamParser()
+        bindings = []
+        for chunk in chunked(data, size):
+            bindings.extend(parser.feed(chunk))
+        bindings.extend(parser.close())
+        return parser, bindings
+
+    def test_chunk_sizes(self):
+        result = make_result(20)
+        data = json.dumps(result, indent=2, ensure_ascii=False).encode('utf-8')
+        for size in (1, 2, 3, 7, 64, 4096, len(data)):
+            parser, bindings = self.parse(data, size)
+            self.assertEqual(bindings, result['results']['bindings'], f'chunk size {size}')
+            self.assertEqual(parser.vars, ['s', 'label', 'num'])
+
+    def test_member_order_and_extra_members(self):
+        data = b'{"results": {"distinct": false, "bindings": [{"x": {"type": "literal", "value": "1"}}], ' \
+               b'"ordered": true}, "head": {"vars": ["x"], "link": ["http://example.org"]}}'
+        parser, bindings = self.parse(data, 5)
+        self.assertEqual(bindings, [{'x': {'type': 'literal', 'value': '1'}}])
+        self.assertEqual(parser.vars, ['x'])
+
+    def test_ask(self):
+        parser, bindings = self.parse(b'{"head": {}, "boolean": true}', 1)
+        self.assertEqual(bindings, [])
+        self.assertTrue(parser.boolean)
+
+    def test_empty(self):
+        parser, bindings = self.parse(b'{"head": {"vars": []}, "results": {"bindings": []}}', 3)
+        self.assertEqual(bindings, [])
+
+    def test_truncated(self):
+        data = json.dumps(make_result(3)).encode('utf-8')
+        with self.assertRaises(OldapError):
+            self.parse(data[:-10], 16)
+
+    def test_invalid(self):
+        with self.assertRaises(OldapError):
+            self.parse(b'{"head": {"vars": []}, "results": {"bindings": [1, 2]}}', 8)
+        with self.assertRaises(OldapError):
+            self.parse(b'["head"]', 8)
+        with self.assertRaises(OldapError):
+            self.parse(b'{"head": {"vars": []}} xyz', 8)
+
+
+class TestQueryStream(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+        cls._con = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                              userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionPool().close()
+        cls._standin.stop()
+
+    def test_stream_equals_eager(self):
+        context = Context(name="DEFAULT")
+        result = make_result(100)
+        eager = list(QueryProcessor(context, result))
+        streamed = list(QueryProcessor.stream(context, chunked(json.dumps(result).encode('utf-8'), 100)))
+        self.assertEqual(streamed, eager)
+        self.assertEqual(streamed[5]['s'], Xsd_QName('oldap:Node5'))
+        self.assertEqual(streamed[5]['label'], Xsd_string('Knoten «5» – ü', 'de'))
+        self.assertEqual(streamed[5]['num'], Xsd_integer(5))
+
+    def test_query_stream(self):
+        self._standin.respond(r'SELECT \?s \?label \?num', make_result(1000))
+        context = Context(name="DEFAULT")
+        rows = self._con.query_stream("SELECT ?s ?label ?num WHERE { ?s ?p ?o }", context)
+        count = 0
+        for row in rows:
+            self.assertEqual(row['num'], Xsd_integer(count))
+            count += 1
+        self.assertEqual(count, 1000)
+        # the connection has been returned to the pool
+        self._con.query("SELECT ?x WHERE { ?x ?y ?z }")
+        self.assertEqual(self._standin.connections, 1)
+
+    def test_query_stream_unknown_prefix(self):
+        self._standin.respond(r'SELECT \?u', {'head': {'vars': ['u']}, 'results': {'bindings': [
+            {'u': {'type': 'uri', 'value': 'http://example.org/unknown/thing'}}]}})
+        rows = list(self._con.query_stream("SELECT ?u WHERE { ?u ?p ?o }", Context(name="DEFAULT")))
+        self.assertEqual(rows, [{'u': Iri('http://example.org/unknown/thing')}])
+
+    def test_query_stream_error(self):
+        self._standin.respond(r'BROKEN', lambda q: ('application/sparql-results+json', b'{"head": {"vars": ['))
+        with self.assertRaises(OldapError):
+            list(self._con.query_stream("SELECT ?x WHERE { BROKEN }", Context(name="DEFAULT")))
+
+    def test_peak_memory(self):
+        context = Context(name="DEFAULT")
+        data = json.dumps(make_result(5000)).encode('utf-8')
+        tracemalloc.start()
+        for _ in QueryProcessor.stream(context, chunked(data, 65536)):
+            pass
+        _, peak_stream = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        QueryProcessor(context, json.loads(data))
+        _, peak_eager = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak_stream * 4, peak_eager)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+from rdflib import URIRef, Literal
+
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorNoPermission
+from oldaplib.src.helpers.query_processor import QueryProcessor
+from oldaplib.src.helpers.rdf_star import rewrite_sparql, quoted_triple_iri
+from oldaplib.src.rdflibconnection import RdflibConnection, RdflibStore
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+
+PERMISSIONS = """
+PREFIX oldap: <http://oldap.org/base#>
+SELECT ?proj ?perm
+WHERE {
+    GRAPH oldap:admin {
+        ?user oldap:userId "%s"^^xsd:NCName .
+        << ?user oldap:inProject ?proj >> oldap:hasAdminPermission ?perm .
+    }
+}
+"""
+
+COUNT = "SELECT (COUNT(*) AS ?n) WHERE { GRAPH <urn:test> { ?s ?p ?o } }"
+
+
+class TestRdfStar(unittest.TestCase):
+
+    def test_rewrite_plain(self):
+        query = "SELECT ?s WHERE { ?s ?p ?o }"
+        self.assertEqual(rewrite_sparql(query), query)
+
+    def test_rewrite_pattern(self):
+        rewritten = rewrite_sparql("SELECT ?p WHERE { << ?s <urn:p> ?o >> <urn:q> ?p }")
+        self.assertNotIn('<<', rewritten)
+        self.assertIn('rdf-syntax-ns#subject', rewritten)
+
+    def test_nested(self):
+        with self.assertRaises(OldapError):
+            rewrite_sparql("SELECT * WHERE { << << ?a ?b ?c >> ?p ?o >> ?q ?r }")
+
+    def test_quoted_iri(self):
+        a = quoted_triple_iri(URIRef('urn:s'), URIRef('urn:p'), Literal('x', lang='en'))
+        b = quoted_triple_iri(URIRef('urn:s'), URIRef('urn:p'), Literal('x'))
+        self.assertNotEqual(a, b)
+        self.assertEqual(a, quoted_triple_iri(URIRef('urn:s'), URIRef('urn:p'), Literal('x', lang='en')))
+
+
+class TestRdflibConnection(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._store = RdflibStore.with_ontologies()
+        cls._con = RdflibConnection(cls._store, userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+        cls._context = Context(name="DEFAULT")
+
+    def tearDown(self):
+        if self._con.in_transaction():
+            self._con.transaction_abort()
+        self._store.clear('urn:test')
+
+    def test_login(self):
+        self.assertEqual(str(self._con.userid), 'rosenth')
+        self.assertIn(Xsd_QName('oldap:SystemProject'), self._con.userdata.inProject)
+        self.assertIsNotNone(self._con.token)
+        con = RdflibConnection(self._store, token=self._con.token, context_name="DEFAULT")
+        self.assertEqual(str(con.userid), 'rosenth')
+        with self.assertRaises(OldapError):
+            RdflibConnection(self._store, userId="rosenth", credentials="Wrong", context_name="DEFAULT")
+
+    def test_query(self):
+        res = QueryProcessor(self._context, self._con.query(self._context.sparql_context + PERMISSIONS % 'rosenth'))
+        perms = {(str(r['proj']), str(r['perm'])) for r in res}
+        self.assertIn(('oldap:SystemProject', 'oldap:ADMIN_OLDAP'), perms)
+        self.assertTrue(self._con.query("ASK { ?s ?p ?o }")['boolean'])
+        turtle = self._con.query(self._context.sparql_context +
+                                 "CONSTRUCT { ?s ?p ?o } WHERE { ?s a oldap:Project ; ?p ?o }",
+                                 format=SparqlResultFormat.TURTLE)
+        self.assertIn('Project', turtle)
+
+    def test_update_rdf_star(self):
+        self._con.update_query("""
+        INSERT DATA {
+            GRAPH <urn:test> {
+                <urn:u> <urn:inProject> <urn:p> .
+                << <urn:u> <urn:inProject> <urn:p> >> <urn:perm> "READ", "WRITE" .
+            }
+        }""")
+        query = 'SELECT ?perm WHERE { GRAPH <urn:test> { << <urn:u> <urn:inProject> <urn:p> >> <urn:perm> ?perm } }'
+        res = self._con.query(query)
+        self.assertEqual({b['perm']['value'] for b in res['results']['bindings']}, {'READ', 'WRITE'})
+        self._con.update_query("""
+        DELETE WHERE {
+            GRAPH <urn:test> { << <urn:u> <urn:inProject> <urn:p> >> <urn:perm> "WRITE" }
+        }""")
+        res = self._con.query(query)
+        self.assertEqual({b['perm']['value'] for b in res['results']['bindings']}, {'READ'})
+
+    def test_transaction(self):
+        self._con.transaction_start()
+        self._con.transaction_update('INSERT DATA { GRAPH <urn:test> { <urn:s> <urn:p> "v" } }')
+        res = self._con.transaction_query(COUNT)
+        self.assertEqual(res['results']['bindings'][0]['n']['value'], '1')
+        res = self._con.query(COUNT)
+        self.assertEqual(res['results']['bindings'][0]['n']['value'], '0')
+        self._con.transaction_commit()
+        res = self._con.query(COUNT)
+        self.assertEqual(res['results']['bindings'][0]['n']['value'], '1')
+
+    def test_transaction_abort(self):
+        self._con.transaction_start()
+        self._con.transaction_update('INSERT DATA { GRAPH <urn:test> { <urn:s> <urn:p> "v" } }')
+        self._con.transaction_abort()
+        self.assertFalse(self._con.in_transaction())
+        res = self._con.query(COUNT)
+        self.assertEqual(res['results']['bindings'][0]['n']['value'], '0')
+        with self.assertRaises(OldapError):
+            self._con.transaction_commit()
+
+    def test_transaction_conflict(self):
+        self._con.transaction_start()
+        self._con.transaction_update('INSERT DATA { GRAPH <urn:test> { <urn:s> <urn:p> "v" } }')
+        self._con.update_query('INSERT DATA { GRAPH <urn:test> { <urn:s> <urn:p> "other" } }')
+        with self.assertRaises(OldapError):
+            self._con.transaction_commit()
+        self.assertFalse(self._con.in_transaction())
+
+    def test_transaction_undo(self):
+        self._con.update_query('INSERT DATA { GRAPH <urn:test> { <urn:s> <urn:p> "a", "b" } }')
+        quads = set(self._store._dataset.quads((None, None, None, None)))
+        other = RdflibConnection(self._store, token=self._con.token, context_name="DEFAULT")
+        self._con.transaction_start()
+        self._con.transaction_update('DELETE DATA { GRAPH <urn:test> { <urn:s> <urn:p> "a" } }')
+        self._con.transaction_update('INSERT DATA { GRAPH <urn:test> { <urn:s> <urn:p> "b", "c" } }')
+        res = self._con.transaction_query(COUNT)
+        self.assertEqual(res['results']['bindings'][0]['n']['value'], '2')
+        res = other.query('SELECT ?o WHERE { GRAPH <urn:test> { <urn:s> <urn:p> ?o } }')
+        self.assertEqual({b['o']['value'] for b in res['results']['bindings']}, {'a', 'b'})
+        with self.assertRaises(OldapError):
+            other.transaction_start()  # same thread
+        self._con.transaction_abort()
+        self.assertEqual(set(self._store._dataset.quads((None, None, None, None))), quads)
+
+    def test_invalid_update(self):
+        with self.assertRaises(OldapError):
+            self._con.update_query('INSERT DATA { GRAPH <urn:test> { <urn:s> <urn:p> } }')
+
+    def test_upload(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = Path(tmp) / 'data.ttl.gz'
+            with gzip.open(filename, 'wt') as f:
+                f.write('@prefix ex: <urn:ex:> .\nex:s ex:p ex:o .\n<< ex:s ex:p ex:o >> ex:since 2020 .\n')
+            self._con.upload_turtle(str(filename), 'http://oldap.org/base#rdflibtest')
+        res = self._con.query('SELECT ?y WHERE { << <urn:ex:s> <urn:ex:p> <urn:ex:o> >> <urn:ex:since> ?y }')
+        self.assertEqual(res['results']['bindings'][0]['y']['value'], '2020')
+        self._con.clear_graph(Xsd_QName('oldap:rdflibtest'))
+        res = self._con.query('SELECT * WHERE { GRAPH <http://oldap.org/base#rdflibtest> { ?s ?p ?o } }')
+        self.assertEqual(res['results']['bindings'], [])
+
+    def test_clear_graph_permission(self):
+        con = RdflibConnection(self._store, context_name="DEFAULT")
+        with self.assertRaises(OldapErrorNoPermission):
+            con.clear_graph(Xsd_QName('oldap:admin'))
+
+
+if __name__ == '__main__':
+    unittest.main()
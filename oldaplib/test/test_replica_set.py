@@ -0,0 +1,164 @@
+import os
+import time
+import unittest
+from copy import deepcopy
+from unittest import mock
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.replica_set import ReplicaSet
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+QUERY = "SELECT ?s WHERE { ?s ?p ?o } LIMIT 1"
+RESULT = {'head': {'vars': ['s']}, 'results': {'bindings': [{'s': {'type': 'uri', 'value': 'urn:s'}}]}}
+
+
+class TestReplicaSelection(unittest.TestCase):
+
+    def test_least_outstanding(self):
+        rs = ReplicaSet(['http://a:7200', 'http://b:7200', 'http://c:7200'], 'oldap', hedge_percentile=0)
+        a, b, c = rs.replicas
+        a.outstanding, b.outstanding, c.outstanding = 2, 0, 1
+        self.assertIs(rs.choose(), b)
+        self.assertIs(rs.choose(exclude=b), c)
+        b.outstanding = 2
+        self.assertEqual({rs.choose().server for _ in range(3)}, {'http://c:7200'})
+        a.outstanding = b.outstanding = c.outstanding = 0
+        self.assertEqual({rs.choose().server for _ in range(3)}, {'http://a:7200', 'http://b:7200', 'http://c:7200'})
+
+    def test_invalid(self):
+        with self.assertRaises(OldapErrorValue):
+            ReplicaSet([], 'oldap')
+        with self.assertRaises(OldapErrorValue):
+            ReplicaSet(['http://a:7200'], 'oldap', hedge_percentile=100)
+
+    def test_hedge_delay(self):
+        rs = ReplicaSet(['http://a:7200', 'http://b:7200'], 'oldap', hedge_percentile=90, min_samples=10)
+        self.assertIsNone(rs.hedge_delay)
+        rs._latencies.extend(i / 1000.0 for i in range(1, 11))
+        self.assertEqual(rs.hedge_delay, 0.01)
+        self.assertIsNone(ReplicaSet(['http://a:7200'], 'oldap', hedge_percentile=90, min_samples=0).hedge_delay)
+
+
+class TestConnectionReplicas(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._primary = SparqlStandIn()
+        cls._primary.start()
+        cls._primary.add_user('rosenth', 'RioGrande')
+        cls._primary.respond(r'LIMIT 1', RESULT)
+        cls._replicas = [SparqlStandIn(), SparqlStandIn()]
+        for replica in cls._replicas:
+            replica.start()
+            replica.respond(r'LIMIT 1', RESULT)
+
+    @classmethod
+    def tearDownClass(cls):
+        ReplicaSet.close_all()
+        SessionPool().close()
+        for standin in [cls._primary] + cls._replicas:
+            standin.stop()
+
+    def setUp(self):
+        ReplicaSet.close_all()
+        for standin in [self._primary] + self._replicas:
+            standin.delay = 0.0
+            standin.query_status = None
+            standin.reset()
+
+    def connection(self, **kwargs) -> Connection:
+        con = Connection(server=self._primary.server, repo=self._primary.repo,
+                         userId="rosenth", credentials="RioGrande", context_name="DEFAULT",
+                         replicas=[r.server for r in self._replicas], **kwargs)
+        self._primary.reset()
+        return con
+
+    def test_reads_balanced(self):
+        con = self.connection()
+        for _ in range(10):
+            self.assertEqual(con.query(QUERY), RESULT)
+        self.assertEqual(self._primary.count('QUERY'), 0)
+        self.assertEqual([r.count('QUERY') for r in self._replicas], [5, 5])
+
+    def test_writes_pinned(self):
+        con = self.connection()
+        con.update_query('INSERT DATA { <urn:s> <urn:p> "v" }')
+        con.transaction_start()
+        con.transaction_query(QUERY)
+        con.transaction_update('INSERT DATA { <urn:s> <urn:p> "w" }')
+        con.transaction_commit()
+        self.assertEqual(self._primary.count('UPDATE'), 2)
+        self.assertEqual(self._primary.count('QUERY'), 1)
+        self.assertEqual(sum(r.count() for r in self._replicas), 0)
+
+    def test_read_your_writes(self):
+        with mock.patch.dict(os.environ, {'OLDAP_READ_YOUR_WRITES_MS': '100'}):
+            con = self.connection()
+        con.update_query('INSERT DATA { <urn:s> <urn:p> "v" }')
+        con.query(QUERY)
+        self.assertEqual(self._primary.count('QUERY'), 1)
+        time.sleep(0.15)
+        con.query(QUERY)
+        self.assertEqual(self._primary.count('QUERY'), 1)
+        self.assertEqual(sum(r.count('QUERY') for r in self._replicas), 1)
+        con2 = deepcopy(con)
+        con2.query(QUERY)
+        self.assertEqual(sum(r.count('QUERY') for r in self._replicas), 2)
+        with mock.patch.dict(os.environ, {'OLDAP_READ_YOUR_WRITES_MS': '100'}):
+            con3 = self.connection()
+        con.update_query('INSERT DATA { <urn:s> <urn:p> "w" }')
+        con3.query(QUERY)  # same user, other connection
+        self.assertEqual(self._primary.count('QUERY'), 1)
+        self.assertEqual(sum(r.count('QUERY') for r in self._replicas), 2)
+
+    def test_hedged(self):
+        con = self.connection()
+        replica_set = ReplicaSet.shared([r.server for r in self._replicas], self._primary.repo)
+        replica_set._min_samples = 5
+        for _ in range(6):
+            con.query(QUERY)
+        self._replicas[0].delay = 0.5
+        start = time.perf_counter()
+        for _ in range(4):
+            self.assertEqual(con.query(QUERY), RESULT)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertGreaterEqual(replica_set.hedged, 1)
+
+    def test_hedged_error(self):
+        con = self.connection()
+        replica_set = ReplicaSet.shared([r.server for r in self._replicas], self._primary.repo)
+        replica_set._min_samples = 5
+        for _ in range(6):
+            con.query(QUERY)
+        self._replicas[0].query_status = 503
+        for _ in range(4):
+            self.assertEqual(con.query(QUERY), RESULT)
+        self.assertEqual(self._primary.count('QUERY'), 0)
+        self._replicas[1].query_status = 503
+        with self.assertLogs('oldaplib.src.connection', level='WARNING'):
+            self.assertEqual(con.query(QUERY), RESULT)
+        self.assertEqual(self._primary.count('QUERY'), 1)
+        self.assertGreaterEqual(replica_set.failed, 3)
+
+    def test_replica_down(self):
+        con = Connection(server=self._primary.server, repo=self._primary.repo,
+                         userId="rosenth", credentials="RioGrande", context_name="DEFAULT",
+                         replicas=['http://127.0.0.1:9', self._replicas[0].server])
+        self._primary.reset()
+        for _ in range(4):
+            self.assertEqual(con.query(QUERY), RESULT)
+        self.assertEqual(self._replicas[0].count('QUERY'), 4)
+        con = Connection(server=self._primary.server, repo=self._primary.repo,
+                         userId="rosenth", credentials="RioGrande", context_name="DEFAULT",
+                         replicas=['http://127.0.0.1:9'])
+        self._primary.reset()
+        with self.assertLogs('oldaplib.src.connection', level='WARNING'):
+            self.assertEqual(con.query(QUERY), RESULT)
+        self.assertEqual(self._primary.count('QUERY'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from copy import deepcopy
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.login_cache import LoginCache
+from oldaplib.src.helpers.oldaperror import OldapErrorValue
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+class TestSessionPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionPool().close()
+        cls._standin.stop()
+
+    def setUp(self):
+        SessionPool().close()
+        LoginCache().clear()
+        self._standin.reset()
+
+    def test_host_key(self):
+        self.assertEqual(SessionPool.host_key('http://localhost:7200/repositories/oldap'), 'http://localhost:7200')
+        self.assertEqual(SessionPool.host_key('https://graphdb.example.org/repositories/x'),
+                         'https://graphdb.example.org:443')
+        self.assertEqual(SessionPool.host_key('http://graphdb.example.org'), 'http://graphdb.example.org:80')
+        with self.assertRaises(OldapErrorValue):
+            SessionPool.host_key('localhost')
+
+    def test_session_per_host(self):
+        pool = SessionPool()
+        s1 = pool.session('http://localhost:7200/repositories/a')
+        s2 = pool.session('http://localhost:7200/repositories/b')
+        s3 = pool.session('http://localhost:7201')
+        self.assertIs(s1, s2)
+        self.assertIsNot(s1, s3)
+
+    def test_keep_alive(self):
+        con = Connection(server=self._standin.server,
+                         repo=self._standin.repo,
+                         userId="rosenth",
+                         credentials="RioGrande")
+        for i in range(10):
+            con.query("SELECT ?s WHERE { ?s ?p ?o }")
+        con.update_query("INSERT DATA { <urn:a> <urn:b> <urn:c> }")
+        con.transaction_start()
+        con.transaction_update("INSERT DATA { <urn:a> <urn:b> <urn:d> }")
+        con.transaction_commit()
+        self.assertEqual(self._standin.count(), 16)
+        self.assertEqual(self._standin.connections, 1)
+
+    def test_shared_between_connections(self):
+        con1 = Connection(server=self._standin.server, repo=self._standin.repo,
+                          userId="rosenth", credentials="RioGrande")
+        con2 = Connection(server=self._standin.server, repo=self._standin.repo,
+                          userId="rosenth", credentials="RioGrande")
+        con1.query("SELECT ?s WHERE { ?s ?p ?o }")
+        con2.query("SELECT ?s WHERE { ?s ?p ?o }")
+        self.assertEqual(self._standin.connections, 1)
+
+    def test_deepcopy_shares_session(self):
+        con = Connection(server=self._standin.server, repo=self._standin.repo,
+                         userId="rosenth", credentials="RioGrande")
+        con2 = deepcopy(con)
+        self.assertIs(con._session, con2._session)
+        self.assertEqual(con2.userid, "rosenth")
+        con2.query("SELECT ?s WHERE { ?s ?p ?o }")
+
+    def test_configure(self):
+        pool = SessionPool()
+        s1 = pool.session(self._standin.server)
+        pool.configure(pool_maxsize=2)
+        self.assertEqual(pool.pool_maxsize, 2)
+        s2 = pool.session(self._standin.server)
+        self.assertIsNot(s1, s2)
+        with self.assertRaises(OldapErrorValue):
+            pool.configure(pool_maxsize=0)
+        pool.configure(pool_maxsize=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
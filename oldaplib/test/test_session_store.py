@@ -0,0 +1,92 @@
+import unittest
+
+import jwt
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorValue
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.helpers.session_store import SessionStore
+from oldaplib.src.helpers.token_cache import TokenCache
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+class TestSessionStore(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionStore().configure(backend='memory')
+        SessionPool().close()
+        cls._standin.stop()
+
+    def setUp(self):
+        SessionStore().configure(backend='memory', ttl=3600)
+        TokenCache().clear()
+        self._con = Connection(server=self._standin.server, repo=self._standin.repo,
+                               userId="rosenth", credentials="RioGrande", context_name="DEFAULT",
+                               compact_token=True)
+        self._standin.reset()
+
+    def token_connection(self, token: str) -> Connection:
+        return Connection(server=self._standin.server, repo=self._standin.repo, token=token, context_name="DEFAULT")
+
+    def test_compact(self):
+        full = Connection(server=self._standin.server, repo=self._standin.repo,
+                          userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+        payload = jwt.decode(self._con.token, self._con.jwtkey, algorithms=["HS256"])
+        self.assertNotIn('userdata', payload)
+        self.assertEqual(payload['sub'], str(self._con.userdata.userIri))
+        self.assertEqual(payload['pv'], '0.0')
+        self.assertLess(len(self._con.token), len(full.token) / 2)
+
+    def test_resolved_from_store(self):
+        con = self.token_connection(self._con.token)
+        self.assertIs(con.userdata, self._con.userdata)
+        self.assertEqual(self._standin.count(), 0)
+        self.assertEqual(len(TokenCache()), 0)
+
+    def test_reloaded_after_bump(self):
+        store = SessionStore()
+        store.bump(self._con.userdata.userIri)
+        con = self.token_connection(self._con.token)
+        self.assertIsNot(con.userdata, self._con.userdata)
+        self.assertEqual(con.userdata.userId, self._con.userdata.userId)
+        self.assertEqual(self._standin.count('QUERY'), 1)
+        con = self.token_connection(self._con.token)
+        self.assertEqual(self._standin.count('QUERY'), 1)
+        store.bump()
+        self.token_connection(self._con.token)
+        self.assertEqual(self._standin.count('QUERY'), 2)
+        self.assertEqual(store.version(con.userdata.userIri), '1.1')
+
+    def test_revoked(self):
+        sid = jwt.decode(self._con.token, self._con.jwtkey, algorithms=["HS256"])['sid']
+        SessionStore().revoke(sid)
+        self.assertTrue(SessionStore().is_revoked(sid))
+        with self.assertRaises(OldapError):
+            self.token_connection(self._con.token)
+
+    def test_without_loader(self):
+        SessionStore().clear()
+        with self.assertRaises(OldapError):
+            Connection._userdata_from_token(self._con.token, self._con.jwtkey)
+
+    def test_full_token(self):
+        con = Connection(server=self._standin.server, repo=self._standin.repo,
+                         userId="rosenth", credentials="RioGrande", context_name="DEFAULT", compact_token=False)
+        self.assertIn('userdata', jwt.decode(con.token, con.jwtkey, algorithms=["HS256"]))
+        self.assertEqual(self.token_connection(con.token).userdata.userId, con.userdata.userId)
+
+    def test_invalid_backend(self):
+        with self.assertRaises(OldapErrorValue):
+            SessionStore().configure(backend='memcached')
+
+
+if __name__ == '__main__':
+    unittest.main()
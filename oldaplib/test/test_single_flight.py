@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest
+import uuid
+
+from oldaplib.src.helpers.oldaperror import OldapErrorNotFound
+from oldaplib.src.helpers.single_flight import SingleFlight
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+
+
+class Locks:
+    """
+    Locks of a single process, standing in for the Redis locks of CacheSingletonRedis.
+    """
+    def __init__(self, scope: str = 'test'):
+        self.scope = scope
+        self.held: dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def lock_name(self, key) -> str:
+        return f'{self.scope}:{key}'
+
+    def acquire_lock(self, key, ttl: float) -> str | None:
+        with self.lock:
+            if str(key) in self.held:
+                return None
+            token = self.held[str(key)] = uuid.uuid4().hex
+            return token
+
+    def release_lock(self, key, token: str) -> None:
+        with self.lock:
+            if self.held.get(str(key)) == token:
+                del self.held[str(key)]
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.key = Xsd_QName('test:shacl')
+        self.cache: dict[str, str] = {}
+        self.loads = 0
+        self.locks = Locks()
+
+    def tearDown(self):
+        SingleFlight().configure(lock_ttl=30.0, wait=30.0, poll=0.05)
+
+    def lookup(self) -> str | None:
+        return self.cache.get(str(self.key))
+
+    def load(self) -> str:
+        self.loads += 1
+        time.sleep(0.1)
+        self.cache[str(self.key)] = 'model'
+        return 'model'
+
+    def run_threads(self, func, n: int = 8) -> list:
+        results = [None] * n
+
+        def target(i: int) -> None:
+            try:
+                results[i] = func()
+            except Exception as err:
+                results[i] = err
+
+        threads = [threading.Thread(target=target, args=(i,)) for i in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_one_load(self):
+        results = self.run_threads(lambda: SingleFlight().run(self.key, self.lookup, self.load, self.locks))
+        self.assertEqual(results, ['model'] * 8)
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(self.locks.held, {})
+
+    def test_not_found(self):
+        def load():
+            self.loads += 1
+            time.sleep(0.1)
+            raise OldapErrorNotFound('Datamodel "test:shacl" not found')
+
+        results = self.run_threads(lambda: SingleFlight().run(self.key, self.lookup, load, self.locks))
+        self.assertTrue(all(isinstance(result, OldapErrorNotFound) for result in results))
+        self.assertEqual(self.loads, 1)
+
+    def test_other_process(self):
+        token = self.locks.acquire_lock(self.key, 30.0)
+
+        def other_process():
+            time.sleep(0.1)
+            self.cache[str(self.key)] = 'model'
+            self.locks.release_lock(self.key, token)
+
+        threading.Thread(target=other_process).start()
+        self.assertEqual(SingleFlight().run(self.key, self.lookup, self.load, self.locks), 'model')
+        self.assertEqual(self.loads, 0)
+
+    def test_timeout(self):
+        SingleFlight().configure(wait=0.1, poll=0.02)
+        self.locks.acquire_lock(self.key, 30.0)
+        self.assertEqual(SingleFlight().run(self.key, self.lookup, self.load, self.locks), 'model')
+        self.assertEqual(self.loads, 1)
+
+    def test_scopes(self):
+        leader = threading.Thread(target=lambda: SingleFlight().run(self.key, self.lookup, self.load, self.locks))
+        leader.start()
+        time.sleep(0.02)
+        loaded = []
+
+        def load_other():
+            loaded.append(str(self.key) in self.cache)  # must not wait for the flight of the other scope
+            return 'other model'
+
+        self.assertEqual(SingleFlight().run(self.key, lambda: None, load_other, Locks('other')), 'other model')
+        leader.join()
+        self.assertEqual(loaded, [False])
+        self.assertEqual(self.loads, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
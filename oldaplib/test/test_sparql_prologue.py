@@ -0,0 +1,94 @@
+import unittest
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.helpers.sparql_prologue import prune_prefixes, used_prefixes, body_template
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+class TestPrunePrefixes(unittest.TestCase):
+
+    def test_prune(self):
+        context = Context(name="DEFAULT")
+        sparql = prune_prefixes(context.sparql_context + 'ASK { ?s a oldap:Project ; rdfs:label ?l }')
+        self.assertEqual(sparql, 'PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>\n'
+                                 'PREFIX oldap: <http://oldap.org/base#>\n'
+                                 'ASK { ?s a oldap:Project ; rdfs:label ?l }')
+
+    def test_not_used(self):
+        sparql = ('PREFIX ex: <http://example.org/>\nPREFIX sh: <http://www.w3.org/ns/shacl#>\n'
+                  'PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>\n'
+                  'SELECT ?s WHERE {  # sh:Shape\n'
+                  '  ?s <http://example.org/ex:p> "sh:x", """a "sh:y" b""" ; ex:q "1"^^xsd:int }')
+        pruned = prune_prefixes(sparql)
+        self.assertNotIn('PREFIX sh:', pruned)
+        self.assertIn('PREFIX ex:', pruned)
+        self.assertIn('PREFIX xsd:', pruned)
+
+    def test_unchanged(self):
+        for sparql in ('SELECT ?s WHERE { ?s ?p ?o }',
+                       'BASE <http://example.org/>\nSELECT ?s WHERE { ?s <p> ?o }',
+                       'PREFIX : <http://example.org/>\nSELECT ?s WHERE { ?s :p ?o }',
+                       'PREFIX ex: <http://example.org/>\nINSERT DATA { ex:s ex:p ex: }'):
+            self.assertEqual(prune_prefixes(sparql), sparql)
+
+    def test_redeclared(self):
+        sparql = ('PREFIX ex: <http://example.org/a#>\nPREFIX ex: <http://example.org/b#>\n'
+                  'SELECT * WHERE { ?s ?p ?o }')
+        self.assertEqual(prune_prefixes(sparql), sparql)
+
+    def test_template(self):
+        self.assertEqual(body_template('{ ?s ex:p "a:b"@en, 42, <urn:x:y> } # c:d'), '{ ?s ex:p ""@en, 0, <> }  ')
+        used_prefixes.cache_clear()
+        prune_prefixes('PREFIX ex: <http://example.org/>\nASK { ex:s ex:p 1 }')
+        prune_prefixes('PREFIX ex: <http://example.org/>\nASK { ex:s ex:p 2 }')
+        info = used_prefixes.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_comparison(self):
+        sparql = ('PREFIX b: <http://example.org/b#>\nPREFIX ex: <http://example.org/>\n'
+                  'SELECT ?o WHERE { ?s ?p ?o FILTER(?o<b:x&&?y>3) }')
+        self.assertEqual(prune_prefixes(sparql), 'PREFIX b: <http://example.org/b#>\n'
+                                                 'SELECT ?o WHERE { ?s ?p ?o FILTER(?o<b:x&&?y>3) }')
+        self.assertEqual(body_template('{ <http://example.org/?a=1&&b=$c> ex:p ?o . ?o a <urn:x?y> }'),
+                         '{ <> ex:p ?o . ?o a <> }')
+
+    def test_recent_prologue(self):
+        prologue = 'PREFIX ex: <http://example.org/>\nPREFIX sh: <http://www.w3.org/ns/shacl#>\n'
+        prune_prefixes(prologue + 'ASK { ex:s ex:p ?o }')
+        self.assertEqual(prune_prefixes(prologue + 'PREFIX ex2: <urn:x:>\nASK { ex2:s ex:p ?o }'),
+                         'PREFIX ex: <http://example.org/>\nPREFIX ex2: <urn:x:>\nASK { ex2:s ex:p ?o }')
+
+
+class TestConnectionPrunePrefixes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionPool().close()
+        cls._standin.stop()
+
+    def test_query(self):
+        context = Context(name="DEFAULT")
+        sparql = context.sparql_context + 'ASK { ?s a oldap:Project }'
+        for prune, expected in ((True, 1), (False, len(context.sparql_context.splitlines()))):
+            con = Connection(server=self._standin.server, repo=self._standin.repo,
+                             userId="rosenth", credentials="RioGrande", context_name="DEFAULT",
+                             prune_prefixes=prune)
+            self._standin.reset()
+            con.query(sparql)
+            con.update_query(context.sparql_context + 'INSERT DATA { oldap:a oldap:b "c" }')
+            query, update = [r for r in self._standin.requests if r.action in ('QUERY', 'UPDATE')]
+            self.assertEqual(query.body.count('PREFIX'), expected)
+            self.assertEqual(update.body.count('PREFIX'), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import json
+import struct
+import unittest
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.dtypes.bnode import BNode
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.oldaperror import OldapError
+from oldaplib.src.helpers.query_processor import QueryProcessor
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.helpers.sparql_result_table import SparqlResultTable, RdfTerm, decode_query_result
+from oldaplib.src.xsd.iri import Iri
+from oldaplib.src.xsd.xsd_datetime import Xsd_dateTime
+from oldaplib.src.xsd.xsd_integer import Xsd_integer
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+from oldaplib.test.sparql_standin import SparqlStandIn, encode_tsv, encode_binary, BINARY, TSV
+
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+RESULT = {
+    'head': {'vars': ['s', 'label', 'num', 'date', 'b', 'opt']},
+    'results': {'bindings': [
+        {'s': {'type': 'uri', 'value': 'http://oldap.org/base#User'},
+         'label': {'type': 'literal', 'value': 'Tab\tand "quotes"\nand ünïcode', 'xml:lang': 'de'},
+         'num': {'type': 'literal', 'value': '42', 'datatype': XSD + 'integer'},
+         'date': {'type': 'literal', 'value': '2023-11-04T12:00:00+00:00', 'datatype': XSD + 'dateTime'},
+         'b': {'type': 'bnode', 'value': 'b0'}},
+        {'s': {'type': 'uri', 'value': 'http://oldap.org/base#User'},
+         'label': {'type': 'literal', 'value': 'plain'},
+         'num': {'type': 'literal', 'value': '42', 'datatype': XSD + 'integer'},
+         'opt': {'type': 'uri', 'value': 'http://example.org/unknown/thing'}},
+        {},
+    ]}
+}
+
+
+class TestSparqlResultTable(unittest.TestCase):
+
+    def test_tsv(self):
+        data = ('?s\t?label\t?n\t?d\t?x\n'
+                '<http://oldap.org/base#A>\t"a\\tb\\u00FC"@en\t-12\t1.5\t_:b1\n'
+                '\t"x"^^<http://www.w3.org/2001/XMLSchema#string>\t1.0e3\ttrue\t\n').encode('utf-8')
+        table = SparqlResultTable.from_tsv(data)
+        self.assertEqual(table.names, ['s', 'label', 'n', 'd', 'x'])
+        self.assertEqual(table.rows[0], (RdfTerm('uri', 'http://oldap.org/base#A'),
+                                         RdfTerm('literal', 'a\tbü', None, 'en'),
+                                         RdfTerm('literal', '-12', XSD + 'integer'),
+                                         RdfTerm('literal', '1.5', XSD + 'decimal'),
+                                         RdfTerm('bnode', 'b1')))
+        self.assertEqual(table.rows[1], (None,
+                                         RdfTerm('literal', 'x', XSD + 'string'),
+                                         RdfTerm('literal', '1.0e3', XSD + 'double'),
+                                         RdfTerm('literal', 'true', XSD + 'boolean'),
+                                         None))
+        with self.assertRaises(OldapError):
+            SparqlResultTable.from_tsv(b'?a\t?b\n<urn:x>\n')
+        with self.assertRaises(OldapError):
+            SparqlResultTable.from_tsv(b'?a\nnonsense\n')
+
+    def test_single_column_unbound(self):
+        table = SparqlResultTable.from_tsv(b'?a\n<urn:x>\n\n<urn:y>\n')
+        self.assertEqual(table.rows, [(RdfTerm('uri', 'urn:x'),), (None,), (RdfTerm('uri', 'urn:y'),)])
+
+    def test_binary(self):
+        table = SparqlResultTable.from_binary(encode_binary(RESULT))
+        self.assertEqual(table.names, RESULT['head']['vars'])
+        self.assertEqual(len(table.rows), 3)
+        self.assertEqual(table.rows[1][0], RdfTerm('uri', 'http://oldap.org/base#User'))  # repeated value
+        self.assertEqual(table.rows[1][2], RdfTerm('literal', '42', XSD + 'integer'))
+        self.assertIsNone(table.rows[1][4])
+        self.assertEqual(table.rows[2], (None,) * 6)
+
+    def test_binary_errors(self):
+        with self.assertRaises(OldapError):
+            SparqlResultTable.from_binary(b'XXXX' + struct.pack('>i', 3))
+        with self.assertRaises(OldapError):
+            SparqlResultTable.from_binary(encode_binary(RESULT)[:-20])
+        msg = 'Query evaluation failed'.encode('utf-8')
+        data = b'BRTR' + struct.pack('>ii', 3, 0) + bytes([126, 2]) + struct.pack('>i', len(msg)) + msg
+        with self.assertRaises(OldapError) as ex:
+            SparqlResultTable.from_binary(data)
+        self.assertIn('Query evaluation failed', str(ex.exception))
+
+    def test_json_view(self):
+        for table in (SparqlResultTable.from_binary(encode_binary(RESULT)),
+                      SparqlResultTable.from_tsv(encode_tsv(RESULT))):
+            self.assertEqual(table['head']['vars'], RESULT['head']['vars'])
+            bindings = table['results']['bindings']
+            self.assertEqual(len(bindings), 3)
+            self.assertEqual(bindings[0]['s']['value'], 'http://oldap.org/base#User')
+            self.assertEqual(bindings[0]['label'], RESULT['results']['bindings'][0]['label'])
+            self.assertEqual(bindings[2], {})
+            self.assertNotIn('boolean', table)
+
+    def test_query_processor(self):
+        context = Context(name="DEFAULT")
+        expected = list(QueryProcessor(context, RESULT))
+        for data in (encode_binary(RESULT), encode_tsv(RESULT)):
+            table = decode_query_result(BINARY if data.startswith(b'BRTR') else TSV, data)
+            res = QueryProcessor(context, table)
+            self.assertEqual(res.names, RESULT['head']['vars'])
+            self.assertEqual(list(res), expected)
+        row = expected[0]
+        self.assertEqual(row['s'], Xsd_QName('oldap:User'))
+        self.assertEqual(row['num'], Xsd_integer(42))
+        self.assertIsInstance(row['date'], Xsd_dateTime)
+        self.assertEqual(row['b'], BNode('_:b0'))
+        self.assertEqual(expected[1]['opt'], Iri('http://example.org/unknown/thing'))
+        self.assertEqual(expected[2], {})
+
+    def test_decode_query_result(self):
+        self.assertEqual(decode_query_result('application/sparql-results+json;charset=UTF-8',
+                                             json.dumps(RESULT).encode('utf-8')), RESULT)
+        self.assertEqual(decode_query_result('text/boolean', b'true'), {'head': {}, 'boolean': True})
+        with self.assertRaises(OldapError):
+            decode_query_result('text/html', b'<html/>')
+
+
+class TestResultFormatNegotiation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+        cls._standin.respond(r'SELECT \?s \?label', RESULT)
+        cls._con = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                              userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionPool().close()
+        cls._standin.stop()
+
+    def test_negotiated(self):
+        context = Context(name="DEFAULT")
+        res = self._con.query("SELECT ?s ?label WHERE { ?s ?p ?label }")
+        self.assertIsInstance(res, SparqlResultTable)
+        self.assertEqual(list(QueryProcessor(context, res)), list(QueryProcessor(context, RESULT)))
+        self.assertEqual(res['results']['bindings'][0]['s']['value'], 'http://oldap.org/base#User')
+
+    def test_explicit_formats(self):
+        res = self._con.query("SELECT ?s ?label WHERE { ?s ?p ?label }", SparqlResultFormat.JSON)
+        self.assertEqual(res, RESULT)
+        res = self._con.query("SELECT ?s ?label WHERE { ?s ?p ?label }", SparqlResultFormat.TSV)
+        self.assertIsInstance(res, SparqlResultTable)
+        self.assertEqual(self._standin.requests[-1].headers['Accept'], TSV)
+
+    def test_ask(self):
+        res = self._con.query("ASK { ?s ?p ?o }")
+        self.assertFalse(res['boolean'])
+        self.assertFalse(self._con.graph_exists(Xsd_QName('oldap:admin')))
+
+    def test_transaction_query(self):
+        self._con.transaction_start()
+        res = self._con.transaction_query("SELECT ?s ?label WHERE { ?s ?p ?label }")
+        self._con.transaction_abort()
+        self.assertIsInstance(res, SparqlResultTable)
+        self.assertEqual(len(QueryProcessor(Context(name="DEFAULT"), res)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import time
+import unittest
+
+import jwt
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.enums.adminpermissions import AdminPermission
+from oldaplib.src.helpers.oldaperror import OldapError, OldapErrorImmutable
+from oldaplib.src.helpers.serializer import serializer
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.src.helpers.token_cache import TokenCache
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+class TestTokenCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande',
+                              permissions={'http://oldap.org/base#SystemProject': ['ADMIN_OLDAP']})
+        cls._con = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                              userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+
+    @classmethod
+    def tearDownClass(cls):
+        TokenCache().configure(ttl=3600, maxsize=10000)
+        SessionPool().close()
+        cls._standin.stop()
+
+    def setUp(self):
+        TokenCache().configure(ttl=3600, maxsize=10000)
+
+    def token_connection(self, token: str) -> Connection:
+        return Connection(server=self._standin.server, repo=self._standin.repo, token=token, context_name="DEFAULT")
+
+    def test_cached(self):
+        cache = TokenCache()
+        con1 = self.token_connection(self._con.token)
+        con2 = self.token_connection(self._con.token)
+        self.assertIs(con1.userdata, con2.userdata)
+        self.assertEqual(con1.userdata.userId, self._con.userdata.userId)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 1, 1))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_frozen(self):
+        userdata = self.token_connection(self._con.token).userdata
+        project = next(iter(userdata.inProject.keys()))
+        with self.assertRaises(OldapErrorImmutable):
+            userdata.inProject[project].add(AdminPermission.ADMIN_USERS)
+        with self.assertRaises(OldapErrorImmutable):
+            del userdata.inProject[project]
+        self.assertEqual(userdata.inProject[project], {AdminPermission.ADMIN_OLDAP})
+        self.assertIs(self.token_connection(self._con.token).userdata, userdata)
+        copy = userdata.inProject[project].copy()
+        copy.add(AdminPermission.ADMIN_USERS)
+        self.assertEqual(len(copy), 2)
+
+    def test_other_secret(self):
+        Connection._userdata_from_token(self._con.token, self._con.jwtkey)
+        with self.assertRaises(OldapError):
+            Connection._userdata_from_token(self._con.token, 'another secret')
+
+    def test_invalid_not_cached(self):
+        with self.assertRaises(OldapError):
+            self.token_connection(self._con.token + 'x')
+        self.assertEqual(len(TokenCache()), 0)
+
+    def test_expiration(self):
+        cache = TokenCache()
+        cache.set('token1', 'secret', self._con.userdata, exp=time.time() + 100)
+        cache.set('token2', 'secret', self._con.userdata, exp=time.time() - 1)
+        self.assertIs(cache.get('token1', 'secret'), self._con.userdata)
+        self.assertIsNone(cache.get('token1', 'other secret'))
+        self.assertIsNone(cache.get('token2', 'secret'))
+        TokenCache().configure(ttl=0.1)
+        cache.set('token1', 'secret', self._con.userdata, exp=time.time() + 100)
+        time.sleep(0.15)
+        self.assertIsNone(cache.get('token1', 'secret'))
+
+    def test_bounded(self):
+        TokenCache().configure(maxsize=2)
+        userdata = json.dumps(self._con.userdata, default=serializer.encoder_default)
+        tokens = [jwt.encode(payload={"userdata": userdata, "exp": time.time() + 100 + i},
+                             key=self._con.jwtkey, algorithm="HS256") for i in range(3)]
+        for token in tokens:
+            self.token_connection(token)
+        self.assertEqual(len(TokenCache()), 2)
+        self.assertEqual(TokenCache().evictions, 1)
+
+    def test_disabled(self):
+        TokenCache().configure(ttl=0)
+        self.assertFalse(TokenCache().enabled)
+        con1 = self.token_connection(self._con.token)
+        con2 = self.token_connection(self._con.token)
+        self.assertIsNot(con1.userdata, con2.userdata)
+        self.assertEqual(len(TokenCache()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
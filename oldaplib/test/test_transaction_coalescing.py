@@ -0,0 +1,122 @@
+import re
+import unittest
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.oldaperror import OldapError
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+
+def update(i: int) -> str:
+    return f"""PREFIX ex: <http://example.org/ns#>
+INSERT DATA {{
+    GRAPH ex:test {{
+        ex:s{i} ex:p "value {i}" .
+    }}
+}}
+"""
+
+
+class TestTransactionCoalescing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._standin = SparqlStandIn()
+        cls._standin.start()
+        cls._standin.add_user('rosenth', 'RioGrande')
+        cls._con = Connection(server=cls._standin.server, repo=cls._standin.repo,
+                              userId="rosenth", credentials="RioGrande", context_name="DEFAULT",
+                              coalesce_updates=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        SessionPool().close()
+        cls._standin.stop()
+
+    def setUp(self):
+        self._standin.reset()
+        self._standin.fail_updates = None
+        self._con.coalesce_updates = True
+
+    def test_flush_on_commit(self):
+        self._con.transaction_start()
+        for i in range(5):
+            self._con.transaction_update(update(i))
+        self.assertEqual(self._standin.count('UPDATE'), 0)
+        self._con.transaction_commit()
+        self.assertEqual(self._standin.count('UPDATE'), 1)
+        self.assertEqual(len(self._standin.committed), 1)
+        for i in range(5):
+            self.assertIn(f'ex:s{i} ex:p "value {i}"', self._standin.committed[0])
+        self.assertEqual(self._standin.committed[0].count('\n;\n'), 4)
+
+    def test_flush_on_query(self):
+        self._con.transaction_start()
+        self._con.transaction_update(update(1))
+        self._con.transaction_update(update(2))
+        self._con.transaction_query("SELECT ?s WHERE { ?s ?p ?o }")
+        self.assertEqual([r.action for r in self._standin.requests[-2:]], ['UPDATE', 'QUERY'])
+        self._con.transaction_update(update(3))
+        self._con.transaction_commit()
+        self.assertEqual(self._standin.count('UPDATE'), 2)
+
+    def test_threshold(self):
+        self._con._coalesce_max_bytes = 2 * len(update(0).strip())
+        self._con.transaction_start()
+        for i in range(5):
+            self._con.transaction_update(update(i))
+        self.assertEqual(self._standin.count('UPDATE'), 2)
+        self._con.transaction_commit()
+        self.assertEqual(self._standin.count('UPDATE'), 3)
+        self._con._coalesce_max_bytes = 512 * 1024
+
+    def test_blank_nodes(self):
+        self._con.transaction_start()
+        self._con.transaction_update(update(1))
+        self._con.transaction_update('INSERT DATA { _:b1 <http://example.org/p> "x" }')
+        self.assertEqual(self._standin.count('UPDATE'), 2)
+        self._con.transaction_commit()
+        self.assertEqual(self._standin.count('UPDATE'), 2)
+
+    def test_abort(self):
+        self._con.transaction_start()
+        self._con.transaction_update(update(1))
+        self._con.transaction_abort()
+        self.assertEqual(self._standin.count('UPDATE'), 0)
+        self.assertEqual(self._standin.committed, [])
+
+    def test_failing_statement(self):
+        self._standin.fail_updates = re.compile(r'ex:s3 ')
+        self._con.transaction_start()
+        for i in range(5):
+            self._con.transaction_update(update(i))
+        with self.assertRaises(OldapError) as ctx:
+            self._con.transaction_commit()
+        self.assertIn('statement 4 of 5', str(ctx.exception))
+        self.assertIn('ex:s3 ex:p "value 3"', str(ctx.exception))
+        self._con.transaction_abort()
+        self.assertEqual(self._standin.committed, [])
+
+    def test_disabled(self):
+        self._con.coalesce_updates = False
+        self._con.transaction_start()
+        for i in range(3):
+            self._con.transaction_update(update(i))
+        self.assertEqual(self._standin.count('UPDATE'), 3)
+        self._standin.fail_updates = re.compile(r'ex:s3 ')
+        with self.assertRaises(OldapError):
+            self._con.transaction_update(update(3))
+        self._con.transaction_commit()
+        self.assertEqual(len(self._standin.committed), 3)
+
+    def test_switch_off_flushes(self):
+        self._con.transaction_start()
+        self._con.transaction_update(update(1))
+        self._con.coalesce_updates = False
+        self.assertEqual(self._standin.count('UPDATE'), 1)
+        self._con.transaction_commit()
+
+
+if __name__ == '__main__':
+    unittest.main()
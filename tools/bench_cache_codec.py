@@ -0,0 +1,115 @@
+"""
+Benchmark: codecs of the Redis cache (JSON and binary, with and without compression).
+
+For each codec the benchmark reports the encoded size and the encode and decode times of
+- a synthetic list of cached value objects (Iri, QName, LangString, Xsd values, enums; no server required)
+- real `DataModel` instances with the given number of resource classes, built in-process with an
+  `RdflibConnection`. Creating and decoding ResourceClasses reads the system projects from the cache, so this
+  part requires a Redis server (OLDAP_REDIS_URL) and is skipped if none is reachable.
+
+Usage: python tools/bench_cache_codec.py [-n CLASSES] [-p PROPERTIES] [-r REPEAT]
+"""
+import argparse
+import time
+
+import redis
+
+from oldaplib.src.datamodel import DataModel
+from oldaplib.src.dtypes.namespaceiri import NamespaceIRI
+from oldaplib.src.enums.datapermissions import DataPermission
+from oldaplib.src.enums.xsd_datatypes import XsdDatatypes
+from oldaplib.src.hasproperty import HasProperty
+from oldaplib.src.helpers import cache_codec
+from oldaplib.src.helpers.cache_codec import JsonCodec, BinaryCodec
+from oldaplib.src.helpers.langstring import LangString
+from oldaplib.src.project import Project
+from oldaplib.src.propertyclass import PropertyClass
+from oldaplib.src.rdflibconnection import RdflibStore, RdflibConnection
+from oldaplib.src.resourceclass import ResourceClass
+from oldaplib.src.xsd.iri import Iri
+from oldaplib.src.xsd.xsd_boolean import Xsd_boolean
+from oldaplib.src.xsd.xsd_datetime import Xsd_dateTime
+from oldaplib.src.xsd.xsd_integer import Xsd_integer
+from oldaplib.src.xsd.xsd_qname import Xsd_QName
+
+CODECS = {
+    'json': JsonCodec(),
+    'binary': BinaryCodec(compress_min=0),
+    'binary+zlib': BinaryCodec(compress_min=1024),
+}
+
+
+def make_values(n: int) -> list[dict]:
+    return [{
+        'iri': Iri(f'http://oldap.org/bench#item{i}'),
+        'qname': Xsd_QName(f'bench:prop{i}'),
+        'label': LangString([f'Item {i}@en', f'Eintrag {i}@de', f'Objet {i}@fr']),
+        'count': Xsd_integer(i),
+        'modified': Xsd_dateTime('2024-02-26T12:33:01+00:00'),
+        'datatype': XsdDatatypes.langString,
+        'permission': DataPermission.DATA_VIEW,
+    } for i in range(n)]
+
+
+def make_datamodel(con: RdflibConnection, classes: int, properties: int) -> DataModel:
+    project = Project(con=con, projectShortName='bench', namespaceIri=NamespaceIRI('http://oldap.org/bench#'),
+                      label=LangString("Benchmark@en"))
+    resclasses = []
+    for c in range(classes):
+        hasproperties = []
+        for p in range(properties):
+            prop = PropertyClass(con=con, project=project,
+                                 property_class_iri=Xsd_QName(f'bench:prop{c}_{p}'),
+                                 datatype=XsdDatatypes.langString,
+                                 name=LangString([f'Property {p}@en', f'Eigenschaft {p}@de']),
+                                 description=LangString([f'Property {p} of class {c}@en']))
+            hasproperties.append(HasProperty(con=con, project=project, prop=prop, minCount=Xsd_integer(1), order=p + 1))
+        resclasses.append(ResourceClass(con=con, project=project, owlclass_iri=Xsd_QName(f'bench:Class{c}'),
+                                        label=LangString([f'Class {c}@en', f'Klasse {c}@de']),
+                                        closed=Xsd_boolean(True), hasproperties=hasproperties))
+    return DataModel(con=con, project=project, propclasses=[], resclasses=resclasses)
+
+
+def best_of(repeat: int, func) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(title: str, value, repeat: int, connection=None) -> None:
+    print(title)
+    print(f'{"codec":<12} {"bytes":>10} {"encode ms":>10} {"decode ms":>10}')
+    for name, codec in CODECS.items():
+        data = codec.encode(value)
+        encode = best_of(repeat, lambda: codec.encode(value))
+        decode = best_of(repeat, lambda: cache_codec.decode(data, connection))
+        print(f'{name:<12} {len(data):>10} {encode * 1000:>10.2f} {decode * 1000:>10.2f}')
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_cache_codec')
+    parser.add_argument('-n', '--classes', type=int, default=20)
+    parser.add_argument('-p', '--properties', type=int, default=8)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    report(f'Value objects ({args.classes * args.properties} entries)',
+           make_values(args.classes * args.properties), args.repeat)
+
+    con = RdflibConnection(RdflibStore.with_ontologies(), userId="rosenth", credentials="RioGrande",
+                           context_name="DEFAULT")
+    try:
+        datamodel = make_datamodel(con, args.classes, args.properties)
+    except redis.ConnectionError as err:
+        print(f'DataModel skipped, Redis is not reachable: {err}')
+        return
+    report(f'DataModel ({args.classes} resource classes with {args.properties} properties each)',
+           datamodel, args.repeat, con)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: SPARQL round trips with and without the pooled keep-alive sessions.
+
+Runs against a local SPARQL stand-in (no triple store required) and compares
+
+- "unpooled": a new TCP connection for every request (module-level `requests.post`, the old behaviour)
+- "pooled": the keep-alive session of the `SessionPool` as used by `Connection`
+
+Usage: python tools/bench_connection_pool.py [-n ROUNDS] [-t THREADS]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+QUERY = "SELECT ?s ?p ?o WHERE { ?s ?p ?o } LIMIT 1"
+HEADERS = {
+    "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+    "Accept": "application/sparql-results+json",
+}
+
+
+def run(post, url: str, rounds: int, threads: int) -> float:
+    def work(n: int) -> None:
+        for _ in range(n):
+            res = post(url, headers=HEADERS, data={'query': QUERY})
+            res.json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for f in [pool.submit(work, rounds // threads) for _ in range(threads)]:
+            f.result()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_connection_pool')
+    parser.add_argument('-n', '--rounds', type=int, default=2000)
+    parser.add_argument('-t', '--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    with SparqlStandIn() as standin:
+        url = f'{standin.server}/repositories/{standin.repo}'
+        SessionPool().configure(pool_maxsize=args.threads)
+        session = SessionPool().session(standin.server)
+        run(session.post, url, 50, 1)  # warm up
+        for name, post in (('unpooled', requests.post), ('pooled', session.post)):
+            standin.reset()
+            elapsed = run(post, url, args.rounds, args.threads)
+            print(f'{name:>9}: {args.rounds} queries in {elapsed:.3f}s, '
+                  f'{elapsed / args.rounds * 1e6:.0f} µs/round trip, '
+                  f'{standin.connections} TCP connections')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: size and parse time of generated SPARQL with the full prologue and with the pruned prologue.
+
+Builds the queries of `ResourceInstance.read` and `ResourceInstance.get_data_permission` with a context
+containing the given number of additional project prefixes (as in a process that has loaded that many projects)
+and reports the request size, the time to prune the prologue (first call and cached) and the time to parse
+the query. Without a triple store the parse time is measured with the SPARQL parser of rdflib as an
+approximation of the server side parsing. With --live, the queries are also sent to the triple store configured
+by OLDAP_TS_SERVER/OLDAP_TS_REPO and the round trip times are reported.
+
+Usage: python tools/bench_prefix_pruning.py [-p PROJECTS] [-r REPEAT] [--live]
+"""
+import argparse
+import textwrap
+import time
+from urllib.parse import urlencode
+
+from rdflib.plugins.sparql.parser import parseQuery
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.enums.datapermissions import DataPermission
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.rdf_star import rewrite_sparql
+from oldaplib.src.helpers.sparql_prologue import prune_prefixes, used_prefixes
+from oldaplib.src.objectfactory import creator_or_max_perm_block
+
+RESOURCE = '<http://oldap.org/test#Book_4711>'
+USER = '<https://orcid.org/0000-0003-1681-4036>'
+
+
+def read_query(context: Context) -> str:
+    access_block = creator_or_max_perm_block(graph_data="test:data",
+                                             resource_iri=RESOURCE,
+                                             user_iri=USER,
+                                             min_perm=DataPermission.DATA_VIEW.numeric.toRdf,
+                                             alias="read1",
+                                             include_creator=True)
+    return context.sparql_context + textwrap.dedent(f'''
+    SELECT DISTINCT ?predicate ?value
+    WHERE {{
+        {access_block}
+        GRAPH test:data {{
+            {RESOURCE} ?predicate ?value .
+        }}
+    }}
+    ''')
+
+
+def permission_query(context: Context) -> str:
+    return context.sparql_context + textwrap.dedent(f'''
+    ASK {{
+        {{
+            GRAPH test:data {{
+                {RESOURCE} oldap:createdBy {USER} .
+            }}
+        }}
+        UNION
+        {{
+            GRAPH oldap:admin {{
+                {USER} oldap:hasRole ?role .
+                ?dataperm oldap:permissionValue ?permval .
+                FILTER(?permval >= {DataPermission.DATA_UPDATE.numeric.toRdf})
+            }}
+            GRAPH test:data {{
+                {RESOURCE} oldap:attachedToRole ?role .
+                <<{RESOURCE} oldap:attachedToRole ?role>> oldap:hasDataPermission ?dataperm .
+            }}
+        }}
+    }}''')
+
+
+def best_of(repeat: int, func) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_prefix_pruning')
+    parser.add_argument('-p', '--projects', type=int, default=50, help='number of additional project prefixes')
+    parser.add_argument('-r', '--repeat', type=int, default=20)
+    parser.add_argument('--live', action='store_true', help='also query the configured triple store')
+    args = parser.parse_args()
+
+    context = Context(name='BENCH_PREFIX_PRUNING')
+    context['test'] = 'http://oldap.org/test#'
+    for i in range(args.projects):
+        context[f'project{i}'] = f'http://example.org/projects/project{i}#'
+        context[f'project{i}list'] = f'http://example.org/projects/project{i}/lists#'
+    con = Connection(userId="rosenth", credentials="RioGrande", prune_prefixes=False) if args.live else None
+
+    print(f'{len(context.sparql_context.splitlines())} PREFIX declarations in the context')
+    for name, sparql in (('ResourceInstance.read', read_query(context)),
+                         ('get_data_permission', permission_query(context))):
+        pruned = prune_prefixes(sparql)
+        used_prefixes.cache_clear()
+        first = best_of(1, lambda: prune_prefixes(sparql))
+        cached = best_of(args.repeat, lambda: prune_prefixes(sparql))
+        full_parse = best_of(args.repeat, lambda: parseQuery(rewrite_sparql(sparql)))
+        pruned_parse = best_of(args.repeat, lambda: parseQuery(rewrite_sparql(pruned)))
+        print(f'{name}:')
+        print(f'    request size: {len(urlencode({"query": sparql}))} -> {len(urlencode({"query": pruned}))} bytes')
+        print(f'    pruning:      {first * 1e6:.0f} us (first), {cached * 1e6:.0f} us (cached template)')
+        print(f'    parse (rdflib): {full_parse * 1000:.2f} -> {pruned_parse * 1000:.2f} ms')
+        if con is not None:
+            full_rt = best_of(args.repeat, lambda: con.query(sparql))
+            pruned_rt = best_of(args.repeat, lambda: con.query(pruned))
+            print(f'    round trip:   {full_rt * 1000:.2f} -> {pruned_rt * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
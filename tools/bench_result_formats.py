@@ -0,0 +1,83 @@
+"""
+Benchmark: SPARQL result formats JSON, TSV and the RDF4J binary results table.
+
+For a synthetic SELECT result (resource listing with IRIs, language tagged strings, integers and timestamps)
+the benchmark reports the bytes on the wire, the time to decode the payload and the time for the
+complete `QueryProcessor` conversion into Xsd/Iri objects. It then queries a local SPARQL stand-in through
+`Connection.query` for each format (no triple store required).
+
+Usage: python tools/bench_result_formats.py [-n ROWS] [-r REPEAT]
+"""
+import argparse
+import json
+import time
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.enums.sparql_result_format import SparqlResultFormat
+from oldaplib.src.helpers.context import Context
+from oldaplib.src.helpers.query_processor import QueryProcessor
+from oldaplib.src.helpers.sparql_result_table import decode_query_result
+from oldaplib.test.sparql_standin import SparqlStandIn, encode_tsv, encode_binary, JSON, TSV, BINARY
+
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+
+def make_result(rows: int) -> dict:
+    return {
+        'head': {'vars': ['s', 't', 'label', 'num', 'modified']},
+        'results': {'bindings': [
+            {'s': {'type': 'uri', 'value': f'http://oldap.org/test#Resource{i // 3}'},
+             't': {'type': 'uri', 'value': 'http://oldap.org/test#Book'},
+             'label': {'type': 'literal', 'value': f'Ein Buch mit dem Titel «{i}»', 'xml:lang': 'de'},
+             'num': {'type': 'literal', 'value': str(i), 'datatype': XSD + 'integer'},
+             'modified': {'type': 'literal', 'value': '2024-02-26T12:33:01.123+00:00', 'datatype': XSD + 'dateTime'}}
+            for i in range(rows)
+        ]}
+    }
+
+
+def best_of(repeat: int, func) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_result_formats')
+    parser.add_argument('-n', '--rows', type=int, default=20000)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    result = make_result(args.rows)
+    context = Context(name='DEFAULT')
+    context['test'] = 'http://oldap.org/test#'
+    payloads = {
+        'JSON': (JSON, json.dumps(result).encode('utf-8')),
+        'TSV': (TSV, encode_tsv(result)),
+        'BINARY': (BINARY, encode_binary(result)),
+    }
+    print(f'{args.rows} rows')
+    print(f'{"format":>8} {"bytes":>10} {"decode ms":>10} {"decode+QP ms":>13}')
+    for name, (mime, data) in payloads.items():
+        decode = best_of(args.repeat, lambda: decode_query_result(mime, data))
+        full = best_of(args.repeat, lambda: QueryProcessor(context, decode_query_result(mime, data)))
+        print(f'{name:>8} {len(data):>10} {decode * 1000:>10.1f} {full * 1000:>13.1f}')
+
+    with SparqlStandIn() as standin:
+        standin.add_user('bench', 'bench')
+        standin.respond(r'SELECT \?s \?t', result)
+        con = Connection(server=standin.server, repo=standin.repo, userId='bench', credentials='bench',
+                         context_name='DEFAULT')
+        query = 'SELECT ?s ?t ?label ?num ?modified WHERE { ?s a ?t }'
+        print(f'{"format":>8} {"Connection.query+QP ms":>23}')
+        for fmt in (SparqlResultFormat.JSON, SparqlResultFormat.TSV, SparqlResultFormat.BINARY,
+                    SparqlResultFormat.AUTO):
+            elapsed = best_of(args.repeat, lambda: QueryProcessor(context, con.query(query, fmt)))
+            print(f'{fmt.name:>8} {elapsed * 1000:>23.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: round trips per high-level operation with and without coalescing of transaction updates.
+
+Replays the request sequences of high-level operations (transaction start, queries, updates, commit in the
+order the operation issues them) against a local SPARQL stand-in (no triple store required) and counts the
+requests sent with `coalesce_updates` off and on. The stand-in delays every request by the given latency to
+show the effect of the saved round trips.
+
+Usage: python tools/bench_transaction_coalescing.py [-n ROUNDS] [-l LATENCY_MS]
+"""
+import argparse
+import time
+
+from oldaplib.src.connection import Connection
+from oldaplib.src.helpers.session_pool import SessionPool
+from oldaplib.test.sparql_standin import SparqlStandIn
+
+QUERY = "SELECT ?s ?p ?o WHERE { ?s ?p ?o } LIMIT 1"
+UPDATE = 'INSERT DATA { GRAPH <http://example.org/g> { <http://example.org/s> <http://example.org/p> "%d" } }'
+
+#
+# "Q": transaction query, "U": transaction update (the commit follows at the end)
+#
+OPERATIONS = {
+    'OldapListNode.move_node_below': 'QQUUUUU',
+    'OldapListNode.insert_node_right_of': 'UQUUQ',
+    'OldapListNode.delete_node': 'QQQUUU',
+    'ResourceInstance.update': 'UU',
+}
+
+
+def run(con: Connection, sequence: str) -> None:
+    con.transaction_start()
+    for i, step in enumerate(sequence):
+        if step == 'Q':
+            con.transaction_query(QUERY)
+        else:
+            con.transaction_update(UPDATE % i)
+    con.transaction_commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_transaction_coalescing')
+    parser.add_argument('-n', '--rounds', type=int, default=200)
+    parser.add_argument('-l', '--latency', type=float, default=1.0, help='latency per request in ms')
+    args = parser.parse_args()
+
+    with SparqlStandIn() as standin:
+        standin.add_user('rosenth', 'RioGrande')
+        con = Connection(server=standin.server, repo=standin.repo,
+                         userId="rosenth", credentials="RioGrande", context_name="DEFAULT")
+        standin.delay = args.latency / 1000.0
+        for name, sequence in OPERATIONS.items():
+            results = []
+            for coalesce in (False, True):
+                con.coalesce_updates = coalesce
+                standin.reset()
+                start = time.perf_counter()
+                for _ in range(args.rounds):
+                    run(con, sequence)
+                elapsed = time.perf_counter() - start
+                results.append((standin.count() / args.rounds, elapsed / args.rounds * 1000))
+            (off_trips, off_ms), (on_trips, on_ms) = results
+            print(f'{name:>36}: {off_trips:.0f} -> {on_trips:.0f} round trips '
+                  f'({off_trips - on_trips:.0f} saved), {off_ms:.2f} -> {on_ms:.2f} ms/operation')
+        SessionPool().close()
+
+
+if __name__ == '__main__':
+    main()